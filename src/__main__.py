@@ -4,13 +4,26 @@
 import argparse
 import json
 import sys
+from contextlib import contextmanager
 from pathlib import Path
-from typing import Any, Dict
-from tqdm import tqdm
-
-from .similarity import calculate_json_similarity, set_gpu_mode
+from typing import Any, Callable, Dict, Optional
+
+from .similarity import (
+    calculate_json_similarity,
+    configure_embedding_cache,
+    set_gpu_mode,
+    set_list_matching
+)
 from .dual_file_extractor import DualFileExtractor
+from .multi_file_extractor import MultiFileExtractor
 from .jsonl_formatter import auto_fix_jsonl_file
+from .jsonl_reader import ByteProgressBar, JSONLReader
+from .parallel_scoring import (
+    ParseErrorCounter,
+    iter_scored_file_parallel,
+    iter_scored_records,
+    summarize_scored_rows
+)
 
 
 def load_json_file(file_path: str) -> Any:
@@ -46,125 +59,67 @@ def load_json_file(file_path: str) -> Any:
     return json.loads(content)
 
 
-def process_jsonl_file(file_path: str, output_type: str) -> Any:
+def process_jsonl_file(file_path: str, output_type: str, workers: int = 1,
+                       on_result: Optional[Callable[[Dict[str, Any]], None]] = None,
+                       should_stop: Optional[Callable[[], bool]] = None) -> Any:
     """JSONLファイルを処理して各行のinference1とinference2を比較
 
     Args:
         file_path: 入力JSONLファイルパス
         output_type: 出力タイプ (score/file)
+        workers: 採点に使うプロセス数（2以上でバイト範囲に分割して並列採点）
+        on_result: fileタイプの各行の結果を採点し次第受け取るコールバック
+            （指定した場合は結果をリストに溜めない）
+        should_stop: Trueを返したらチャンクの合間で採点を中止する関数（ジョブのキャンセル用）
 
     Returns:
         scoreタイプ: 全体平均の辞書
-        fileタイプ: 各行の詳細リスト
+        fileタイプ: 各行の詳細リスト（on_result指定時は空リスト）
     """
+    if workers < 1:
+        raise ValueError("workers は 1 以上である必要があります")
+
     path = Path(file_path)
     if not path.exists():
         raise FileNotFoundError(f"ファイルが見つかりません: {file_path}")
 
-    # JSONLファイルのフォーマットを自動修正
-    try:
-        fixed_path = auto_fix_jsonl_file(file_path)
-        path = Path(fixed_path)  # 修正後のパスを使用
-    except ValueError as e:
-        print(f"警告: JSONLフォーマット修正に失敗しました: {e}")
-        # 修正に失敗した場合は元のファイルをそのまま使用
-
-    scores = []
-    field_match_ratios = []
-    value_similarities = []
-    file_results = []
-    total_lines = 0
-
-    # まずファイルの行数を取得
-    with open(path, 'r', encoding='utf-8') as f:
-        file_lines = sum(1 for line in f if line.strip())
-
-    # tqdmプログレスバー付きで処理
-    with open(path, 'r', encoding='utf-8') as f:
-        with tqdm(total=file_lines, desc="比較処理中", unit="行",
-                 ncols=120,
-                 bar_format='{desc}: {percentage:3.0f}%|{bar}| {n_fmt}/{total_fmt}行 [{elapsed}<{remaining}, {rate_fmt}]',
-                 miniters=1) as pbar:
-            for line_num, line in enumerate(f, 1):
-                if not line.strip():
-                    continue
-
-                pbar.update(1)
-                total_lines += 1
-
-                try:
-                    # 各行をパース
-                    data = json.loads(line)
-
-                    # inference1とinference2を取得
-                    inference1 = data.get('inference1', '{}')
-                    inference2 = data.get('inference2', '{}')
-
-                    # 類似度計算
-                    score, details = calculate_json_similarity(inference1, inference2)
-
-                    # スコア収集（平均計算用）
-                    scores.append(float(score))
-                    field_match_ratios.append(float(details.get("field_match_ratio", 0)))
-                    value_similarities.append(float(details.get("value_similarity", 0)))
-
-                    # fileタイプの場合は詳細を保存
-                    if output_type == "file":
-                        result = data.copy()
-                        result['similarity_score'] = float(score)
-                        result['similarity_details'] = {
-                            "field_match_ratio": float(details.get("field_match_ratio", 0)),
-                            "value_similarity": float(details.get("value_similarity", 0))
-                        }
-                        file_results.append(result)
-
-                except json.JSONDecodeError as e:
-                    print(f"警告: {line_num}行目のJSONパースエラー: {e}", file=sys.stderr)
-                    continue
-                except Exception as e:
-                    print(f"警告: {line_num}行目の処理エラー: {e}", file=sys.stderr)
-                    continue
-
-    # scoreタイプの場合は全体平均を返す
-    if output_type == "score":
-        if scores:
-            avg_score = sum(scores) / len(scores)
-            avg_field_match = sum(field_match_ratios) / len(field_match_ratios)
-            avg_value_sim = sum(value_similarities) / len(value_similarities)
-
-            meaning = "完全一致" if avg_score >= 0.99 else \
-                     "非常に類似" if avg_score >= 0.8 else \
-                     "類似" if avg_score >= 0.6 else \
-                     "やや類似" if avg_score >= 0.4 else \
-                     "低い類似度"
-
-            return {
-                "file": str(file_path),
-                "total_lines": total_lines,
-                "score": round(avg_score, 4),
-                "meaning": meaning,
-                "calculation_method": "embedding",  # 埋め込みベースの計算方法
-                "json": {
-                    "field_match_ratio": round(avg_field_match, 4),
-                    "value_similarity": round(avg_value_sim, 4),
-                    "final_score": round(avg_score, 4)
-                }
-            }
-        else:
-            return {
-                "file": str(file_path),
-                "total_lines": 0,
-                "score": 0.0,
-                "meaning": "データなし",
-                "json": {
-                    "field_match_ratio": 0.0,
-                    "value_similarity": 0.0,
-                    "final_score": 0.0
-                }
-            }
-    else:
-        # fileタイプの場合は詳細リストを返す
-        return file_results
+    def warn(line_num, message):
+        print(f"警告: {line_num}行目の{message}", file=sys.stderr)
+
+    # 読めなかった行も警告したうえで総行数に数える
+    parse_errors = ParseErrorCounter(warn)
+
+    if workers > 1:
+        # バイト範囲で分割するため、事前に1行1オブジェクト形式に揃える
+        try:
+            path = Path(auto_fix_jsonl_file(file_path, on_error=parse_errors))
+        except ValueError as e:
+            print(f"警告: JSONLフォーマット修正に失敗しました: {e}", file=sys.stderr)
+            # 修正に失敗した場合は元のファイルをそのまま使用（読めない行はシャード側で数える）
+            parse_errors.count = 0
+
+        try:
+            with ByteProgressBar(path.stat().st_size, "比較処理中") as progress:
+                return summarize_scored_rows(
+                    iter_scored_file_parallel(str(path), output_type, workers, warn, progress.advance),
+                    output_type, str(file_path), on_result, should_stop, parse_errors
+                )
+        finally:
+            # auto_fix_jsonl_fileが作成した修正済みの一時ファイルを削除
+            if path != Path(file_path):
+                path.unlink(missing_ok=True)
+
+    # 複数行オブジェクトの修正・パース・採点を1回の読み込みで行う
+    reader = JSONLReader(str(path), on_error=parse_errors)
+    with ByteProgressBar(reader.total_bytes, "比較処理中") as progress:
+        return summarize_scored_rows(
+            iter_scored_records(
+                ((record.line_num, record.data) for record in reader),
+                output_type, warn,
+                lambda count: progress.advance(count, reader.position - reader.start)
+            ),
+            output_type, str(file_path), on_result, should_stop, parse_errors
+        )
 
 
 def format_score_output(file1: str, file2: str, score: float, details: Dict[str, Any]) -> Dict[str, Any]:
@@ -202,6 +157,28 @@ def format_score_output(file1: str, file2: str, score: float, details: Dict[str,
     }
 
 
+@contextmanager
+def open_ndjson_writer(output_path: Optional[str]):
+    """NDJSON（1行1件のJSON）の書き出し先を開き、1件ずつ書き込む関数を返す
+
+    Args:
+        output_path: 出力ファイルパス（Noneの場合は標準出力）
+    """
+    stream = open(output_path, 'w', encoding='utf-8') if output_path else sys.stdout
+
+    def write(result: Dict[str, Any]) -> None:
+        stream.write(json.dumps(result, ensure_ascii=False) + '\n')
+        if stream is sys.stdout:
+            # パイプ先がすぐに読めるよう1件ごとに送り出す
+            stream.flush()
+
+    try:
+        yield write
+    finally:
+        if stream is not sys.stdout:
+            stream.close()
+
+
 def dual_command(args):
     """2ファイル比較コマンドの処理"""
     try:
@@ -209,14 +186,41 @@ def dual_command(args):
         if args.gpu:
             set_gpu_mode(True)
 
+        # 埋め込みキャッシュの永続化先を設定
+        if getattr(args, 'embedding_cache_dir', None):
+            configure_embedding_cache(cache_dir=args.embedding_cache_dir)
+
+        # リスト要素のマッチング方式を設定
+        set_list_matching(getattr(args, 'list_matching', None) or 'greedy')
+
         # DualFileExtractorを使用して比較
         extractor = DualFileExtractor()
+
+        # fileタイプのNDJSON出力は1件ずつ書き出す
+        if args.type == 'file' and getattr(args, 'ndjson', False):
+            with open_ndjson_writer(args.output) as write:
+                extractor.compare_dual_files(
+                    args.file1,
+                    args.file2,
+                    args.column,
+                    args.type,
+                    args.gpu,
+                    workers=getattr(args, 'workers', 1),
+                    on_result=write,
+                    join_key=getattr(args, 'join_key', None)
+                )
+            if args.output:
+                print(f"結果を {args.output} に保存しました", file=sys.stderr)
+            return
+
         results = extractor.compare_dual_files(
             args.file1,
             args.file2,
             args.column,
             args.type,
-            args.gpu
+            args.gpu,
+            workers=getattr(args, 'workers', 1),
+            join_key=getattr(args, 'join_key', None)
         )
 
         # 結果出力
@@ -244,6 +248,67 @@ def dual_command(args):
         sys.exit(1)
 
 
+def multi_command(args):
+    """参照ファイルと複数の候補ファイルの比較コマンドの処理"""
+    try:
+        # GPU使用モードを設定
+        if args.gpu:
+            set_gpu_mode(True)
+
+        # 埋め込みキャッシュの永続化先を設定
+        if getattr(args, 'embedding_cache_dir', None):
+            configure_embedding_cache(cache_dir=args.embedding_cache_dir)
+
+        # リスト要素のマッチング方式を設定
+        set_list_matching(getattr(args, 'list_matching', None) or 'greedy')
+
+        extractor = MultiFileExtractor()
+
+        # fileタイプのNDJSON出力は1件ずつ書き出す
+        if args.type == 'file' and getattr(args, 'ndjson', False):
+            with open_ndjson_writer(args.output) as write:
+                extractor.compare_multi_files(
+                    args.reference,
+                    args.candidates,
+                    args.column,
+                    args.type,
+                    args.gpu,
+                    on_result=write
+                )
+            if args.output:
+                print(f"結果を {args.output} に保存しました", file=sys.stderr)
+            return
+
+        results = extractor.compare_multi_files(
+            args.reference,
+            args.candidates,
+            args.column,
+            args.type,
+            args.gpu
+        )
+
+        # 結果出力
+        output_json = json.dumps(results, ensure_ascii=False, indent=2)
+
+        if args.output:
+            # ファイルに出力
+            with open(args.output, 'w', encoding='utf-8') as f:
+                f.write(output_json)
+            print(f"結果を {args.output} に保存しました", file=sys.stderr)
+        else:
+            # 標準出力
+            print(output_json)
+
+    except (FileNotFoundError, ValueError) as e:
+        print(f"エラー: {e}", file=sys.stderr)
+        sys.exit(1)
+    except Exception as e:
+        import traceback
+        print(f"エラー: {e}", file=sys.stderr)
+        traceback.print_exc(file=sys.stderr)
+        sys.exit(1)
+
+
 def compare_command(args):
     """単一ファイル比較コマンドの処理（既存機能）"""
     try:
@@ -251,8 +316,24 @@ def compare_command(args):
         if args.gpu:
             set_gpu_mode(True)
 
+        # 埋め込みキャッシュの永続化先を設定
+        if getattr(args, 'embedding_cache_dir', None):
+            configure_embedding_cache(cache_dir=args.embedding_cache_dir)
+
+        # リスト要素のマッチング方式を設定
+        set_list_matching(getattr(args, 'list_matching', None) or 'greedy')
+
+        # fileタイプのNDJSON出力は1件ずつ書き出す
+        if args.type == 'file' and getattr(args, 'ndjson', False):
+            with open_ndjson_writer(args.output) as write:
+                process_jsonl_file(args.input_file, args.type, workers=getattr(args, 'workers', 1),
+                                   on_result=write)
+            if args.output:
+                print(f"結果を {args.output} に保存しました", file=sys.stderr)
+            return
+
         # JSONLファイル読み込みと処理
-        results = process_jsonl_file(args.input_file, args.type)
+        results = process_jsonl_file(args.input_file, args.type, workers=getattr(args, 'workers', 1))
 
         # 結果出力
         output_json = json.dumps(results, ensure_ascii=False, indent=2)
@@ -283,7 +364,8 @@ def main():
     """メイン処理"""
     parser = argparse.ArgumentParser(
         description="JSON比較ツール - JSONLファイル内のinference列を比較",
-        usage="json_compare [input_file] [options] | json_compare dual file1 file2 [options]"
+        usage="json_compare [input_file] [options] | json_compare dual file1 file2 [options] | "
+              "json_compare multi reference candidate... [options]"
     )
 
     # サブコマンドパーサーを作成（サブコマンドはオプショナル）
@@ -296,6 +378,14 @@ def main():
                                help='出力タイプ (default: score)')
     compare_parser.add_argument('--gpu', action='store_true', help='GPUを使用する')
     compare_parser.add_argument('-o', '--output', help='出力ファイルパス')
+    compare_parser.add_argument('--embedding-cache-dir',
+                               help='埋め込みベクトルを永続キャッシュするディレクトリ (default: 環境変数 EMBEDDING_CACHE_DIR)')
+    compare_parser.add_argument('--list-matching', choices=['greedy', 'hungarian'], default='greedy',
+                               help='リスト要素のマッチング方式 (greedy: 貪欲法, hungarian: 最適割当) (default: greedy)')
+    compare_parser.add_argument('--workers', type=int, default=1,
+                               help='採点に使うプロセス数 (default: 1)')
+    compare_parser.add_argument('--ndjson', action='store_true',
+                               help='--type file の結果を1行1件のNDJSONとして採点し次第出力する')
     compare_parser.set_defaults(func=compare_command)
 
     # dual コマンド（2ファイル比較）
@@ -303,18 +393,53 @@ def main():
     dual_parser.add_argument('file1', help='1つ目のJSONLファイル')
     dual_parser.add_argument('file2', help='2つ目のJSONLファイル')
     dual_parser.add_argument('--column', default='inference', help='比較する列名 (default: inference)')
+    dual_parser.add_argument('--join-key',
+                             help='行の位置ではなくこの列の値で2ファイルの行を対応付ける（例: id）')
     dual_parser.add_argument('--type', choices=['score', 'file'], default='score',
                             help='出力タイプ (default: score)')
     dual_parser.add_argument('--gpu', action='store_true', help='GPUを使用する')
     dual_parser.add_argument('-o', '--output', help='出力ファイルパス')
+    dual_parser.add_argument('--embedding-cache-dir',
+                            help='埋め込みベクトルを永続キャッシュするディレクトリ (default: 環境変数 EMBEDDING_CACHE_DIR)')
+    dual_parser.add_argument('--list-matching', choices=['greedy', 'hungarian'], default='greedy',
+                            help='リスト要素のマッチング方式 (greedy: 貪欲法, hungarian: 最適割当) (default: greedy)')
+    dual_parser.add_argument('--workers', type=int, default=1,
+                            help='採点に使うプロセス数 (default: 1)')
+    dual_parser.add_argument('--ndjson', action='store_true',
+                            help='--type file の結果を1行1件のNDJSONとして採点し次第出力する')
     dual_parser.set_defaults(func=dual_command)
 
+    # multi コマンド（1つの参照ファイルと複数の候補ファイルを比較）
+    multi_parser = subparsers.add_parser('multi', help='参照ファイルの指定列を複数の候補ファイルと比較')
+    multi_parser.add_argument('reference', help='参照JSONLファイル')
+    multi_parser.add_argument('candidates', nargs='+', help='候補JSONLファイル（複数指定可）')
+    multi_parser.add_argument('--column', default='inference', help='比較する列名 (default: inference)')
+    multi_parser.add_argument('--type', choices=['score', 'file'], default='score',
+                              help='出力タイプ (default: score)')
+    multi_parser.add_argument('--gpu', action='store_true', help='GPUを使用する')
+    multi_parser.add_argument('-o', '--output', help='出力ファイルパス')
+    multi_parser.add_argument('--embedding-cache-dir',
+                              help='埋め込みベクトルを永続キャッシュするディレクトリ (default: 環境変数 EMBEDDING_CACHE_DIR)')
+    multi_parser.add_argument('--list-matching', choices=['greedy', 'hungarian'], default='greedy',
+                              help='リスト要素のマッチング方式 (greedy: 貪欲法, hungarian: 最適割当) (default: greedy)')
+    multi_parser.add_argument('--ndjson', action='store_true',
+                              help='--type file の結果を1行1件のNDJSONとして採点し次第出力する')
+    multi_parser.set_defaults(func=multi_command)
+
     # 既存の単一ファイル処理を引数として受け付ける（後方互換性のため）
     parser.add_argument('input_file', nargs='?', help='入力JSONLファイルパス')
     parser.add_argument('-o', '--output', help='出力ファイルパス (省略時は標準出力)')
     parser.add_argument('--type', choices=['score', 'file'], default='score',
                        help='出力タイプ (default: score)')
     parser.add_argument('--gpu', action='store_true', help='GPUを使用する (default: CPU)')
+    parser.add_argument('--embedding-cache-dir',
+                       help='埋め込みベクトルを永続キャッシュするディレクトリ (default: 環境変数 EMBEDDING_CACHE_DIR)')
+    parser.add_argument('--list-matching', choices=['greedy', 'hungarian'], default='greedy',
+                       help='リスト要素のマッチング方式 (greedy: 貪欲法, hungarian: 最適割当) (default: greedy)')
+    parser.add_argument('--workers', type=int, default=1,
+                       help='採点に使うプロセス数 (default: 1)')
+    parser.add_argument('--ndjson', action='store_true',
+                       help='--type file の結果を1行1件のNDJSONとして採点し次第出力する')
 
     # 引数が存在しない場合、ヘルプを表示
     if len(sys.argv) == 1:
@@ -322,7 +447,7 @@ def main():
         sys.exit(1)
 
     # 後方互換性: 最初の引数がファイル名（サブコマンド以外）の場合
-    if len(sys.argv) > 1 and sys.argv[1] not in ['compare', 'dual', '-h', '--help'] and not sys.argv[1].startswith('-'):
+    if len(sys.argv) > 1 and sys.argv[1] not in ['compare', 'dual', 'multi', '-h', '--help'] and not sys.argv[1].startswith('-'):
         # 単一ファイル処理として扱う
         # 引数を手動で解析
         simple_parser = argparse.ArgumentParser(add_help=False)
@@ -330,6 +455,10 @@ def main():
         simple_parser.add_argument('-o', '--output')
         simple_parser.add_argument('--type', choices=['score', 'file'], default='score')
         simple_parser.add_argument('--gpu', action='store_true')
+        simple_parser.add_argument('--embedding-cache-dir')
+        simple_parser.add_argument('--list-matching', choices=['greedy', 'hungarian'], default='greedy')
+        simple_parser.add_argument('--workers', type=int, default=1)
+        simple_parser.add_argument('--ndjson', action='store_true')
         args = simple_parser.parse_args()
         compare_command(args)
     else:
@@ -340,6 +469,8 @@ def main():
             args.func(args)
         elif args.command == 'dual':
             args.func(args)
+        elif args.command == 'multi':
+            args.func(args)
         elif args.input_file:
             compare_command(args)
         else:
@@ -3,16 +3,19 @@
 
 import asyncio
 import csv
+import functools
 import io
 import json
 import os
+import shutil
 import tempfile
 import time
 import traceback
 import uuid
+from contextlib import asynccontextmanager
 from datetime import datetime
 from pathlib import Path
-from typing import Optional, Union, Dict, Any, List
+from typing import Optional, Union, Dict, Any, List, Callable
 import numpy as np
 
 from fastapi import FastAPI, HTTPException, UploadFile, File, Form, Request
@@ -24,9 +27,14 @@ from sse_starlette import EventSourceResponse
 
 # 既存実装から関数をインポート
 from .__main__ import process_jsonl_file
-from .similarity import set_gpu_mode
+from .similarity import set_gpu_mode, get_embedding_cache, warm_up_embedding_model
+from .llm_cache import get_llm_cache_statistics
+from .json_parser import get_parse_statistics, get_repair_cache
 from .dual_file_extractor import DualFileExtractor
-from .jsonl_formatter import auto_fix_jsonl_file
+from .multi_file_extractor import MultiFileExtractor
+from .checkpoint import ResumableTaskStore
+from .job_queue import JobQueue, JobStore
+from .system_monitor import get_system_sampler
 
 # エラーハンドリングとロギング
 from .error_handler import ErrorHandler, ErrorRecovery, JsonRepair
@@ -51,11 +59,78 @@ metrics_collector = get_metrics_collector()
 progress_tracker = ProgressTracker()
 tqdm_interceptor = TqdmInterceptor()
 
+# アップロードの上限サイズ（検証はストリームで行うため、メモリ使用量はこの値に比例しない）
+MAX_UPLOAD_SIZE = int(os.environ.get("JSON_COMPARE_MAX_UPLOAD_MB", "100")) * 1024 * 1024
+
+# 起動時に埋め込みモデルをロード・ウォームアップするか（無効の場合は最初のリクエストでロード）
+PRELOAD_MODEL = os.environ.get("JSON_COMPARE_PRELOAD_MODEL", "true").lower() not in ("0", "false", "no")
+
+# 埋め込みモデルの準備状態（/readyで返す）
+model_readiness: Dict[str, Any] = {"status": "not_started", "ready": False}
+
+
+async def preload_embedding_model() -> None:
+    """埋め込みモデルをロードしてウォームアップし、完了したら準備完了にする"""
+    model_readiness.update(status="loading", ready=False, started_at=datetime.now().isoformat())
+    try:
+        timings = await asyncio.get_event_loop().run_in_executor(None, warm_up_embedding_model)
+        model_readiness.update(status="ready", ready=True, **timings)
+    except Exception as e:
+        model_readiness.update(status="failed", ready=False, error=str(e))
+        logger.log_error(ErrorHandler.generate_error_id(), "model_preload_error", str(e))
+
+
+def create_resumable_task_store() -> ResumableTaskStore:
+    """非同期タスクの入力とチェックポイントの保存先（サーバー再起動後に再開する）"""
+    return ResumableTaskStore(
+        os.environ.get("JSON_COMPARE_TASK_DIR", os.path.join(tempfile.gettempdir(), "json_compare_tasks"))
+    )
+
+
+def create_job_queue(tasks: ResumableTaskStore) -> JobQueue:
+    """非同期比較ジョブのキュー（同時実行数をワーカー数で制限し、ジョブの状態をSQLiteに保存する）"""
+    queue = JobQueue(
+        JobStore(os.environ.get("JSON_COMPARE_JOB_DB", str(tasks.root_dir / "jobs.db"))),
+        workers=int(os.environ.get("JSON_COMPARE_JOB_WORKERS", "2")),
+        executor=os.environ.get("JSON_COMPARE_JOB_EXECUTOR", "thread")
+    )
+    queue.register("compare", run_compare_job)
+    queue.register("compare_dual", run_compare_dual_job)
+    return queue
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """起動時にジョブキュー・システムメトリクスの取得・モデルのプリロードを開始し、終了時に止める
+
+    タスクの保存先とジョブキューはここで作成してapp.stateに置く（モジュールのインポートだけでは
+    ディレクトリやデータベースを作らない）。モデルのロードはバックグラウンドで行い、
+    その間も/healthには応答する。
+    """
+    app.state.resumable_tasks = create_resumable_task_store()
+    app.state.job_queue = create_job_queue(app.state.resumable_tasks)
+    await get_system_sampler().start()
+    await start_job_queue()
+    preload_task = None
+    if PRELOAD_MODEL:
+        preload_task = asyncio.create_task(preload_embedding_model())
+    else:
+        model_readiness.update(status="lazy", ready=True)
+    try:
+        yield
+    finally:
+        if preload_task is not None:
+            preload_task.cancel()
+        await stop_job_queue()
+        app.state.job_queue.store.close()
+        await get_system_sampler().stop()
+
 
 app = FastAPI(
     title="JSON Compare API",
     description="JSON形式のデータを意味的類似度で比較するAPI",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # 静的ファイルの設定
@@ -82,6 +157,14 @@ def convert_numpy_types(obj):
         return obj
 
 
+def get_upload_size(file: UploadFile) -> int:
+    """アップロードされたファイルのサイズを内容を読み込まずに取得"""
+    position = file.file.tell()
+    size = file.file.seek(0, os.SEEK_END)
+    file.file.seek(position)
+    return size
+
+
 # バリデーション関数
 def validate_llm_config(config: Dict[str, Any]) -> bool:
     """LLM設定を検証"""
@@ -119,7 +202,9 @@ async def process_jsonl_file_with_llm(file_path: str, config: Dict[str, Any]) ->
         llm_enabled=True,
         model_name=config.get("model", "qwen3-14b-awq"),
         temperature=config.get("temperature", 0.2),
-        max_tokens=config.get("max_tokens", 64)
+        max_tokens=config.get("max_tokens", 64),
+        resume=config.get("resume", False),
+        checkpoint_file=config.get("checkpoint_file")
     )
 
     enhanced_cli = EnhancedCLI()
@@ -391,92 +476,32 @@ async def upload_file(
             )
             raise HTTPException(status_code=400, detail=error_response)
 
-        # ファイルサイズの確認（100MB制限）
-        MAX_FILE_SIZE = 100 * 1024 * 1024  # 100MB
-        file_content = await file.read()
-        if len(file_content) > MAX_FILE_SIZE:
+        # ファイルサイズの確認（アップロードは一時ファイルに受信済みのため、内容は読み込まない）
+        file_size = get_upload_size(file)
+        if file_size > MAX_UPLOAD_SIZE:
             error_id = ErrorHandler.generate_error_id()
             error_response = ErrorHandler.format_user_error(
                 error_id=error_id,
                 error_type="file_validation",
                 details={
-                    "file_size_mb": len(file_content) / (1024*1024),
-                    "limit_mb": 100
+                    "file_size_mb": file_size / (1024*1024),
+                    "limit_mb": MAX_UPLOAD_SIZE // (1024*1024)
                 }
             )
             logger.log_error(
                 error_id=error_id,
                 error_type="file_too_large",
-                error_message=f"File too large: {len(file_content) / (1024*1024):.1f}MB",
+                error_message=f"File too large: {file_size / (1024*1024):.1f}MB",
                 context={"filename": file.filename, "client_ip": client_ip}
             )
             metrics_collector.record_upload(
                 success=False,
                 processing_time=time.time() - start_time,
-                file_size=len(file_content)
+                file_size=file_size
             )
             raise HTTPException(status_code=413, detail=error_response)
 
-        # ファイルポインタをリセット
-        await file.seek(0)
-
-        # JSONLファイルの検証と修復
-        try:
-            content = file_content.decode('utf-8')
-        except UnicodeDecodeError:
-            error_id = ErrorHandler.generate_error_id()
-            error_response = ErrorHandler.format_user_error(
-                error_id=error_id,
-                error_type="file_validation",
-                details={"encoding": "UTF-8エンコーディングが必要です"}
-            )
-            logger.log_error(
-                error_id=error_id,
-                error_type="encoding_error",
-                error_message="Invalid UTF-8 encoding",
-                context={"filename": file.filename, "client_ip": client_ip}
-            )
-            raise HTTPException(status_code=400, detail=error_response)
-
-        # JSONLの検証と修復
-        repaired_data, error_messages, validation_ok = ErrorHandler.validate_and_repair_jsonl(content)
-
-        if not validation_ok:
-            error_id = ErrorHandler.generate_error_id()
-            error_response = ErrorHandler.format_user_error(
-                error_id=error_id,
-                error_type="file_validation",
-                details={
-                    "errors": error_messages[:5],  # 最初の5件のエラー
-                    "total_errors": len(error_messages)
-                }
-            )
-            logger.log_error(
-                error_id=error_id,
-                error_type="validation_error",
-                error_message="JSONL validation failed",
-                context={
-                    "filename": file.filename,
-                    "errors": error_messages[:10],
-                    "client_ip": client_ip
-                }
-            )
-            raise HTTPException(status_code=400, detail=error_response)
-
-        # 警告があった場合はログに記録（修復済み）
-        if error_messages:
-            logger.access_logger.warning(json.dumps({
-                "event": "jsonl_repaired",
-                "filename": file.filename,
-                "repairs": error_messages[:5],
-                "total_repairs": len(error_messages),
-                "client_ip": client_ip
-            }))
-
-        # 修復済みデータをJSONL形式に戻す
-        repaired_content = '\n'.join(json.dumps(item, ensure_ascii=False) for item in repaired_data)
-
-        # 一時ファイルの作成と保存
+        # 一時ファイルのパス
         temp_dir = tempfile.gettempdir()
         unique_id = str(uuid.uuid4())
         temp_filename = f"json_compare_{unique_id}.jsonl"
@@ -484,19 +509,63 @@ async def upload_file(
 
         temp_file_created = False
         try:
-            # 一時ファイルに修復済み内容を保存
-            with open(temp_filepath, 'w', encoding='utf-8') as f:
-                f.write(repaired_content)
+            # JSONLの検証と修復
+            # アップロードを1行ずつ読み、修復済みの行を一時ファイルに直接書き出す
             temp_file_created = True
-
-            # JSONLファイルのフォーマットを自動修正
+            await file.seek(0)
+            loop = asyncio.get_event_loop()
             try:
-                fixed_path = auto_fix_jsonl_file(temp_filepath)
-                if fixed_path != temp_filepath:
-                    # 修正されたファイルを使用
-                    temp_filepath = fixed_path
-            except ValueError as format_error:
-                print(f"警告: JSONLフォーマット修正に失敗: {format_error}")
+                validation = await loop.run_in_executor(
+                    None, ErrorHandler.validate_and_repair_jsonl_stream, file.file, temp_filepath
+                )
+            except UnicodeDecodeError:
+                error_id = ErrorHandler.generate_error_id()
+                error_response = ErrorHandler.format_user_error(
+                    error_id=error_id,
+                    error_type="file_validation",
+                    details={"encoding": "UTF-8エンコーディングが必要です"}
+                )
+                logger.log_error(
+                    error_id=error_id,
+                    error_type="encoding_error",
+                    error_message="Invalid UTF-8 encoding",
+                    context={"filename": file.filename, "client_ip": client_ip}
+                )
+                raise HTTPException(status_code=400, detail=error_response)
+
+            error_messages = validation.messages
+
+            if not validation.ok:
+                error_id = ErrorHandler.generate_error_id()
+                error_response = ErrorHandler.format_user_error(
+                    error_id=error_id,
+                    error_type="file_validation",
+                    details={
+                        "errors": error_messages[:5],  # 最初の5件のエラー
+                        "total_errors": validation.total_messages
+                    }
+                )
+                logger.log_error(
+                    error_id=error_id,
+                    error_type="validation_error",
+                    error_message="JSONL validation failed",
+                    context={
+                        "filename": file.filename,
+                        "errors": error_messages[:10],
+                        "client_ip": client_ip
+                    }
+                )
+                raise HTTPException(status_code=400, detail=error_response)
+
+            # 警告があった場合はログに記録（修復済み）
+            if error_messages:
+                logger.access_logger.warning(json.dumps({
+                    "event": "jsonl_repaired",
+                    "filename": file.filename,
+                    "repairs": error_messages[:5],
+                    "total_repairs": validation.total_messages,
+                    "client_ip": client_ip
+                }))
 
             # GPUモードの設定
             if gpu:
@@ -513,7 +582,7 @@ async def upload_file(
                 loop = asyncio.get_event_loop()
                 result = await asyncio.wait_for(
                     loop.run_in_executor(None, process_jsonl_file, temp_filepath, type),
-                    timeout=60.0  # Increased timeout for model loading
+                    timeout=60.0  # モデルのロードは起動時のプリロードで済ませる（/ready参照）
                 )
 
                 processing_time = time.time() - start_time
@@ -530,7 +599,7 @@ async def upload_file(
                         "calculation_method": existing_method  # 実際の推論方法を使用
                     }
                     if error_messages:
-                        result["_metadata"]["data_repairs"] = len(error_messages)
+                        result["_metadata"]["data_repairs"] = validation.total_messages
 
                     # calculation_methodがトップレベルにある場合は削除（_metadataに移動済み）
                     if "calculation_method" in result:
@@ -539,7 +608,7 @@ async def upload_file(
                 # 成功をログに記録
                 logger.log_upload(
                     filename=file.filename,
-                    file_size=len(file_content),
+                    file_size=file_size,
                     processing_time=processing_time,
                     result="success",
                     gpu_mode=gpu,
@@ -550,7 +619,7 @@ async def upload_file(
                 metrics_collector.record_upload(
                     success=True,
                     processing_time=processing_time,
-                    file_size=len(file_content)
+                    file_size=file_size
                 )
 
                 return result
@@ -564,13 +633,13 @@ async def upload_file(
                     error_type="processing_timeout",
                     details={
                         "timeout": "60秒",
-                        "file_size_mb": len(file_content) / (1024*1024)
+                        "file_size_mb": file_size / (1024*1024)
                     }
                 )
 
                 logger.log_upload(
                     filename=file.filename,
-                    file_size=len(file_content),
+                    file_size=file_size,
                     processing_time=processing_time,
                     result="timeout",
                     gpu_mode=gpu,
@@ -584,7 +653,7 @@ async def upload_file(
                     error_message="Processing timeout",
                     context={
                         "filename": file.filename,
-                        "file_size": len(file_content),
+                        "file_size": file_size,
                         "gpu_mode": gpu,
                         "client_ip": client_ip
                     }
@@ -593,7 +662,7 @@ async def upload_file(
                 metrics_collector.record_upload(
                     success=False,
                     processing_time=processing_time,
-                    file_size=len(file_content)
+                    file_size=file_size
                 )
 
                 raise HTTPException(status_code=504, detail=error_response)
@@ -604,12 +673,12 @@ async def upload_file(
                 error_response = ErrorHandler.format_user_error(
                     error_id=error_id,
                     error_type="insufficient_memory",
-                    details={"file_size_mb": len(file_content) / (1024*1024)}
+                    details={"file_size_mb": file_size / (1024*1024)}
                 )
 
                 logger.log_upload(
                     filename=file.filename,
-                    file_size=len(file_content),
+                    file_size=file_size,
                     processing_time=processing_time,
                     result="error",
                     gpu_mode=gpu,
@@ -623,7 +692,7 @@ async def upload_file(
                     error_message="Insufficient memory",
                     context={
                         "filename": file.filename,
-                        "file_size": len(file_content),
+                        "file_size": file_size,
                         "gpu_mode": gpu,
                         "client_ip": client_ip
                     }
@@ -632,7 +701,7 @@ async def upload_file(
                 metrics_collector.record_upload(
                     success=False,
                     processing_time=processing_time,
-                    file_size=len(file_content)
+                    file_size=file_size
                 )
 
                 raise HTTPException(status_code=503, detail=error_response)
@@ -656,7 +725,7 @@ async def upload_file(
 
             logger.log_upload(
                 filename=file.filename,
-                file_size=len(file_content),
+                file_size=file_size,
                 processing_time=processing_time,
                 result="error",
                 gpu_mode=gpu,
@@ -677,7 +746,7 @@ async def upload_file(
             metrics_collector.record_upload(
                 success=False,
                 processing_time=processing_time,
-                file_size=len(file_content)
+                file_size=file_size
             )
 
             raise HTTPException(status_code=507, detail=error_response)
@@ -710,7 +779,7 @@ async def upload_file(
 
         logger.log_upload(
             filename=file.filename if file else "unknown",
-            file_size=len(file_content) if 'file_content' in locals() else 0,
+            file_size=file_size if 'file_size' in locals() else 0,
             processing_time=processing_time,
             result="error",
             gpu_mode=gpu,
@@ -732,7 +801,7 @@ async def upload_file(
         metrics_collector.record_upload(
             success=False,
             processing_time=processing_time,
-            file_size=len(file_content) if 'file_content' in locals() else 0
+            file_size=file_size if 'file_size' in locals() else 0
         )
 
         raise HTTPException(status_code=500, detail=error_response)
@@ -745,7 +814,8 @@ async def compare_dual_files(
     file2: UploadFile = File(...),
     column: str = Form("inference"),
     type: str = Form("score"),
-    gpu: bool = Form(False)
+    gpu: bool = Form(False),
+    join_key: Optional[str] = Form(None)
 ) -> Dict[str, Any]:
     """
     2つのJSONLファイルの指定列を比較する
@@ -757,6 +827,7 @@ async def compare_dual_files(
         column: 比較する列名（デフォルト: inference）
         type: 出力タイプ（"score" または "file"）
         gpu: GPU使用フラグ
+        join_key: 行の対応付けに使うキー列（未指定の場合は行の位置で対応付け）
 
     Returns:
         比較結果（scoreまたはfile形式）
@@ -822,36 +893,21 @@ async def compare_dual_files(
                 )
                 raise HTTPException(status_code=400, detail=error_response)
 
-        # ファイルサイズの確認（100MB制限）
-        MAX_FILE_SIZE = 100 * 1024 * 1024  # 100MB
-
-        file1_content = await file1.read()
-        if len(file1_content) > MAX_FILE_SIZE:
-            error_id = ErrorHandler.generate_error_id()
-            error_response = ErrorHandler.format_user_error(
-                error_id=error_id,
-                error_type="file_validation",
-                details={
-                    "file": file1.filename,
-                    "file_size_mb": len(file1_content) / (1024*1024),
-                    "limit_mb": 100
-                }
-            )
-            raise HTTPException(status_code=413, detail=error_response)
-
-        file2_content = await file2.read()
-        if len(file2_content) > MAX_FILE_SIZE:
-            error_id = ErrorHandler.generate_error_id()
-            error_response = ErrorHandler.format_user_error(
-                error_id=error_id,
-                error_type="file_validation",
-                details={
-                    "file": file2.filename,
-                    "file_size_mb": len(file2_content) / (1024*1024),
-                    "limit_mb": 100
-                }
-            )
-            raise HTTPException(status_code=413, detail=error_response)
+        # ファイルサイズの確認（アップロードは一時ファイルに受信済みのため、内容は読み込まない）
+        for file in [file1, file2]:
+            file_size = get_upload_size(file)
+            if file_size > MAX_UPLOAD_SIZE:
+                error_id = ErrorHandler.generate_error_id()
+                error_response = ErrorHandler.format_user_error(
+                    error_id=error_id,
+                    error_type="file_validation",
+                    details={
+                        "file": file.filename,
+                        "file_size_mb": file_size / (1024*1024),
+                        "limit_mb": MAX_UPLOAD_SIZE // (1024*1024)
+                    }
+                )
+                raise HTTPException(status_code=413, detail=error_response)
 
         # 一時ファイルの作成
         temp_dir = tempfile.gettempdir()
@@ -860,82 +916,40 @@ async def compare_dual_files(
         temp_file1_path = os.path.join(temp_dir, f"json_compare_{unique_id1}.jsonl")
         temp_file2_path = os.path.join(temp_dir, f"json_compare_{unique_id2}.jsonl")
 
-        # ファイル内容をデコードして一時ファイルに保存
-        try:
-            content1 = file1_content.decode('utf-8')
-            content2 = file2_content.decode('utf-8')
-        except UnicodeDecodeError as e:
-            error_id = ErrorHandler.generate_error_id()
-            error_response = ErrorHandler.format_user_error(
-                error_id=error_id,
-                error_type="file_validation",
-                details={"encoding": "UTF-8エンコーディングが必要です"}
-            )
-            raise HTTPException(status_code=400, detail=error_response)
-
-        # まず生のコンテンツを一時ファイルに保存
-        with open(temp_file1_path, 'w', encoding='utf-8') as f:
-            f.write(content1)
-
-        with open(temp_file2_path, 'w', encoding='utf-8') as f:
-            f.write(content2)
-
-        # JSONLファイルのフォーマットを自動修正（マルチライン→シングルライン）
-        try:
-            fixed_path1 = auto_fix_jsonl_file(temp_file1_path)
-            if fixed_path1 != temp_file1_path:
-                temp_file1_path = fixed_path1
-                # 修正されたファイルの内容を読み込む
-                with open(fixed_path1, 'r', encoding='utf-8') as f:
-                    content1 = f.read()
-
-            fixed_path2 = auto_fix_jsonl_file(temp_file2_path)
-            if fixed_path2 != temp_file2_path:
-                temp_file2_path = fixed_path2
-                # 修正されたファイルの内容を読み込む
-                with open(fixed_path2, 'r', encoding='utf-8') as f:
-                    content2 = f.read()
-        except ValueError as format_error:
-            print(f"警告: JSONLフォーマット修正に失敗: {format_error}")
-
         # JSONLの検証と修復
-        repaired_data1, errors1, ok1 = ErrorHandler.validate_and_repair_jsonl(content1)
-        if not ok1:
-            error_id = ErrorHandler.generate_error_id()
-            error_response = ErrorHandler.format_user_error(
-                error_id=error_id,
-                error_type="file_validation",
-                details={
-                    "file": file1.filename,
-                    "errors": errors1[:5],
-                    "total_errors": len(errors1)
-                }
-            )
-            raise HTTPException(status_code=400, detail=error_response)
-
-        repaired_data2, errors2, ok2 = ErrorHandler.validate_and_repair_jsonl(content2)
-        if not ok2:
-            error_id = ErrorHandler.generate_error_id()
-            error_response = ErrorHandler.format_user_error(
-                error_id=error_id,
-                error_type="file_validation",
-                details={
-                    "file": file2.filename,
-                    "errors": errors2[:5],
-                    "total_errors": len(errors2)
-                }
-            )
-            raise HTTPException(status_code=400, detail=error_response)
+        # アップロードを1行ずつ読み、修復済みの行を1行1オブジェクト形式で一時ファイルに直接書き出す
+        loop = asyncio.get_event_loop()
+        validations = []
+        for file, temp_path in [(file1, temp_file1_path), (file2, temp_file2_path)]:
+            await file.seek(0)
+            try:
+                validation = await loop.run_in_executor(
+                    None, ErrorHandler.validate_and_repair_jsonl_stream, file.file, temp_path
+                )
+            except UnicodeDecodeError:
+                error_id = ErrorHandler.generate_error_id()
+                error_response = ErrorHandler.format_user_error(
+                    error_id=error_id,
+                    error_type="file_validation",
+                    details={"encoding": "UTF-8エンコーディングが必要です"}
+                )
+                raise HTTPException(status_code=400, detail=error_response)
 
-        # 検証済みデータを一時ファイルに保存（必要な場合）
-        if len(errors1) > 0 or len(errors2) > 0:
-            with open(temp_file1_path, 'w', encoding='utf-8') as f:
-                for item in repaired_data1:
-                    f.write(json.dumps(item, ensure_ascii=False) + '\n')
+            if not validation.ok:
+                error_id = ErrorHandler.generate_error_id()
+                error_response = ErrorHandler.format_user_error(
+                    error_id=error_id,
+                    error_type="file_validation",
+                    details={
+                        "file": file.filename,
+                        "errors": validation.messages[:5],
+                        "total_errors": validation.total_messages
+                    }
+                )
+                raise HTTPException(status_code=400, detail=error_response)
+            validations.append(validation)
 
-            with open(temp_file2_path, 'w', encoding='utf-8') as f:
-                for item in repaired_data2:
-                    f.write(json.dumps(item, ensure_ascii=False) + '\n')
+        repairs1, repairs2 = (validation.total_messages for validation in validations)
 
         # GPUモードの設定
         if gpu:
@@ -947,15 +961,16 @@ async def compare_dual_files(
         extractor = DualFileExtractor()
 
         # 処理を実行（タイムアウトなし - 大きなファイルに対応）
-        loop = asyncio.get_event_loop()
         result = await loop.run_in_executor(
             None,
-            extractor.compare_dual_files,
-            temp_file1_path,
-            temp_file2_path,
-            column,
-            type,
-            gpu
+            lambda: extractor.compare_dual_files(
+                temp_file1_path,
+                temp_file2_path,
+                column,
+                type,
+                gpu,
+                join_key=join_key or None
+            )
         )
 
         processing_time = time.time() - start_time
@@ -971,10 +986,10 @@ async def compare_dual_files(
             }
             result["_metadata"]["calculation_method"] = "embedding"  # 埋め込みベースの計算方法を明示
             result["_metadata"]["gpu_used"] = gpu
-            if errors1 or errors2:
+            if repairs1 or repairs2:
                 result["_metadata"]["data_repairs"] = {
-                    "file1": len(errors1),
-                    "file2": len(errors2)
+                    "file1": repairs1,
+                    "file2": repairs2
                 }
 
         # 成功をログに記録（システムメトリクスを記録）
@@ -1035,6 +1050,187 @@ async def compare_dual_files(
                     pass
 
 
+@app.post("/api/compare/multi")
+async def compare_multi_files(
+    request: Request,
+    reference: UploadFile = File(...),
+    candidates: List[UploadFile] = File(...),
+    column: str = Form("inference"),
+    type: str = Form("score"),
+    gpu: bool = Form(False)
+) -> Union[Dict[str, Any], List[Dict[str, Any]]]:
+    """
+    参照JSONLファイルの指定列を複数の候補JSONLファイルと比較する
+
+    Args:
+        request: FastAPIのRequestオブジェクト
+        reference: 参照JSONLファイル
+        candidates: 候補JSONLファイル（複数）
+        column: 比較する列名（デフォルト: inference）
+        type: 出力タイプ（"score" または "file"）
+        gpu: GPU使用フラグ
+
+    Returns:
+        候補ごとのスコア表（score）または行ごとの詳細（file）
+
+    Raises:
+        HTTPException: ファイルバリデーションエラー、処理エラーなど
+    """
+    start_time = time.time()
+    client_ip = request.client.host if request.client else None
+    temp_paths: List[str] = []
+
+    try:
+        if type not in ["score", "file"]:
+            raise HTTPException(
+                status_code=400,
+                detail={"error": "Invalid type parameter", "detail": "type must be 'score' or 'file'"}
+            )
+
+        uploads = [reference] + list(candidates)
+        for upload in uploads:
+            if not upload.filename or not upload.filename.lower().endswith('.jsonl'):
+                error_id = ErrorHandler.generate_error_id()
+                error_response = ErrorHandler.format_user_error(
+                    error_id=error_id,
+                    error_type="file_validation",
+                    details={"filename": upload.filename, "expected": ".jsonl"}
+                )
+                raise HTTPException(status_code=400, detail=error_response)
+
+        # ファイルサイズの確認（アップロードは一時ファイルに受信済みのため、内容は読み込まない）
+        for upload in uploads:
+            file_size = get_upload_size(upload)
+            if file_size > MAX_UPLOAD_SIZE:
+                error_id = ErrorHandler.generate_error_id()
+                error_response = ErrorHandler.format_user_error(
+                    error_id=error_id,
+                    error_type="file_validation",
+                    details={
+                        "file": upload.filename,
+                        "file_size_mb": file_size / (1024*1024),
+                        "limit_mb": MAX_UPLOAD_SIZE // (1024*1024)
+                    }
+                )
+                raise HTTPException(status_code=413, detail=error_response)
+
+        # JSONLの検証と修復
+        # アップロードを1行ずつ読み、修復済みの行を1行1オブジェクト形式で一時ファイルに直接書き出す
+        loop = asyncio.get_event_loop()
+        for upload in uploads:
+            temp_path = os.path.join(tempfile.gettempdir(), f"json_compare_{uuid.uuid4()}.jsonl")
+            temp_paths.append(temp_path)
+            await upload.seek(0)
+            try:
+                validation = await loop.run_in_executor(
+                    None, ErrorHandler.validate_and_repair_jsonl_stream, upload.file, temp_path
+                )
+            except UnicodeDecodeError:
+                error_id = ErrorHandler.generate_error_id()
+                error_response = ErrorHandler.format_user_error(
+                    error_id=error_id,
+                    error_type="file_validation",
+                    details={"file": upload.filename, "encoding": "UTF-8エンコーディングが必要です"}
+                )
+                raise HTTPException(status_code=400, detail=error_response)
+
+            if not validation.ok:
+                error_id = ErrorHandler.generate_error_id()
+                error_response = ErrorHandler.format_user_error(
+                    error_id=error_id,
+                    error_type="file_validation",
+                    details={
+                        "file": upload.filename,
+                        "errors": validation.messages[:5],
+                        "total_errors": validation.total_messages
+                    }
+                )
+                raise HTTPException(status_code=400, detail=error_response)
+
+        set_gpu_mode(gpu)
+        extractor = MultiFileExtractor()
+
+        try:
+            result = await loop.run_in_executor(
+                None,
+                lambda: extractor.compare_multi_files(temp_paths[0], temp_paths[1:], column, type, gpu)
+            )
+        except ValueError as e:
+            # 比較を始める前の列の検証エラー
+            error_id = ErrorHandler.generate_error_id()
+            error_response = ErrorHandler.format_user_error(
+                error_id=error_id,
+                error_type="file_validation",
+                details={"column": column, "error": str(e)}
+            )
+            raise HTTPException(status_code=400, detail=error_response)
+
+        processing_time = time.time() - start_time
+
+        # 一時ファイル名を元のファイル名に置き換える
+        if isinstance(result, dict):
+            names = {path: upload.filename for path, upload in zip(temp_paths, uploads)}
+            result["reference"] = reference.filename
+            for entry in result["candidates"]:
+                entry["file"] = names.get(entry["file"], entry["file"])
+            result["_metadata"]["source_files"] = {
+                "reference": reference.filename,
+                "candidates": [upload.filename for upload in candidates]
+            }
+            result["_metadata"]["processing_time"] = f"{processing_time:.2f}秒"
+            result["_metadata"]["calculation_method"] = "embedding"
+        else:
+            names = {path: upload.filename for path, upload in zip(temp_paths[1:], candidates)}
+            for row in result:
+                for entry in row["candidates"]:
+                    entry["file"] = names.get(entry["file"], entry["file"])
+
+        metrics_collector.record_upload(
+            success=True,
+            processing_time=processing_time,
+            file_size=sum(os.path.getsize(path) for path in temp_paths)
+        )
+
+        return result
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        error_id = ErrorHandler.generate_error_id()
+        error_response = ErrorHandler.format_user_error(
+            error_id=error_id,
+            error_type="processing_error",
+            details={"error": str(e)}
+        )
+        logger.log_error(
+            error_id=error_id,
+            error_type="multi_comparison_error",
+            error_message=str(e),
+            context={
+                "reference": reference.filename if reference else None,
+                "candidates": [upload.filename for upload in candidates],
+                "column": column,
+                "client_ip": client_ip
+            },
+            stack_trace=traceback.format_exc()
+        )
+        metrics_collector.record_upload(
+            success=False,
+            processing_time=time.time() - start_time,
+            file_size=0
+        )
+        raise HTTPException(status_code=500, detail=error_response)
+
+    finally:
+        # 一時ファイルのクリーンアップ
+        for temp_path in temp_paths:
+            if os.path.exists(temp_path):
+                try:
+                    os.remove(temp_path)
+                except OSError:
+                    pass
+
+
 @app.get("/ui", response_class=HTMLResponse)
 async def ui_form():
     """
@@ -1220,7 +1416,7 @@ async def health_check() -> HealthResponse:
     except:
         cli_available = False
 
-    # システムメトリクスをログに記録
+    # システムメトリクスをログに記録（バックグラウンドで取得済みの値を使うためブロックしない）
     logger.log_metrics()
 
     return HealthResponse(
@@ -1229,6 +1425,19 @@ async def health_check() -> HealthResponse:
     )
 
 
+@app.get("/ready")
+async def readiness_check():
+    """
+    レディネスチェックエンドポイント
+
+    埋め込みモデルのロードとウォームアップが終わるまでは503を返す。
+
+    Returns:
+        モデルの準備状態
+    """
+    return JSONResponse(status_code=200 if model_readiness["ready"] else 503, content=model_readiness)
+
+
 @app.get("/")
 async def root():
     """
@@ -1247,6 +1456,7 @@ async def root():
             "download_csv": "POST /download/csv",
             "ui": "GET /ui",
             "health": "GET /health",
+            "ready": "GET /ready",
             "metrics": "GET /metrics"
         }
     }
@@ -1266,6 +1476,12 @@ async def get_metrics():
     # 現在のメトリクスを返す
     return {
         "upload_metrics": metrics_collector.get_summary(),
+        "embedding_cache": get_embedding_cache().get_statistics(),
+        "llm_cache": get_llm_cache_statistics(),
+        "json_parsing": get_parse_statistics().get_statistics(),
+        "repair_cache": get_repair_cache().get_statistics(),
+        "job_queue": await app.state.job_queue.get_statistics() if hasattr(app.state, "job_queue") else None,
+        "system": get_system_sampler().get_statistics(),
         "timestamp": datetime.now().isoformat()
     }
 
@@ -1574,14 +1790,62 @@ async def get_task_progress(task_id: str):
         raise HTTPException(status_code=500, detail=str(e))
 
 
+def get_client_id(request: Request) -> str:
+    """ジョブキューの公平性の単位となるクライアントの識別子（X-Client-Idヘッダー、なければ接続元IP）"""
+    client_id = request.headers.get("X-Client-Id")
+    if client_id:
+        return client_id
+    return request.client.host if request.client else "anonymous"
+
+
+def _ensure_progress_task(task_id: str, file_path: str) -> None:
+    """再起動後に再実行するジョブの進捗タスクを作り直す"""
+    if progress_tracker.get_progress(task_id) is None:
+        with open(file_path, 'r', encoding='utf-8') as f:
+            total_lines = sum(1 for _ in f)
+        progress_tracker.create_task(total_items=total_lines, task_id=task_id)
+
+
+async def run_in_job_executor(job_id: str, func: Callable[..., Any], *args: Any) -> Any:
+    """ジョブの同期処理をジョブキューのエグゼキューターで実行
+
+    ジョブがキャンセルされた場合はshould_stopで処理をチャンクの合間に止めさせ、
+    処理が実際に止まるまで待ってからCancelledErrorを送出する（使用中の入力ファイルを
+    削除しないため）。プロセスエグゼキューターにはフラグを渡せないため、処理の完了を待つ。
+    シャットダウンでのキャンセルは待たない（再起動後に再実行する）。
+    """
+    queue = app.state.job_queue
+    should_stop = None
+    if queue.executor_kind == "thread":
+        should_stop = functools.partial(queue.is_cancelled, job_id)
+    future = asyncio.get_event_loop().run_in_executor(
+        queue.executor, functools.partial(func, *args, should_stop=should_stop)
+    )
+    try:
+        return await asyncio.shield(future)
+    except asyncio.CancelledError:
+        if queue.is_cancelled(job_id):
+            await asyncio.gather(future, return_exceptions=True)
+        raise
+
+
+def _raise_if_failed(task_id: str) -> None:
+    """比較処理が失敗していればジョブも失敗として記録されるよう例外を送出"""
+    progress = progress_tracker.get_progress(task_id)
+    if progress is not None and progress.status == "error":
+        raise RuntimeError(progress.error_message or "比較処理エラー")
+
+
 @app.post("/api/compare/async")
 async def compare_async(
+    request: Request,
     file: UploadFile = File(...),
     type: str = Form("score"),
     gpu: bool = Form(False),
-    use_llm: bool = Form(False)
+    use_llm: bool = Form(False),
+    priority: int = Form(0)
 ):
-    """非同期でファイル比較を実行し、タスクIDを返す"""
+    """非同期でファイル比較をジョブキューに登録し、タスクIDを返す"""
     try:
         # ファイルを一時保存
         with tempfile.NamedTemporaryFile(mode='wb', suffix='.jsonl', delete=False) as temp_file:
@@ -1596,16 +1860,26 @@ async def compare_async(
         # 進捗トラッカーにタスクを作成（タスクIDを取得）
         task_id = progress_tracker.create_task(total_items=total_lines)
 
-        # バックグラウンドで比較処理を開始
-        asyncio.create_task(
-            process_comparison_async(task_id, temp_file_path, type, gpu, use_llm)
-        )
+        # 再起動後に再開できるよう入力と設定を保存
+        temp_file_path = app.state.resumable_tasks.save(task_id, temp_file_path, {
+            "output_type": type,
+            "gpu": gpu,
+            "use_llm": use_llm
+        })
+
+        # ジョブキューに登録（ワーカーが空き次第バックグラウンドで実行）
+        await app.state.job_queue.submit("compare", {
+            "output_type": type,
+            "gpu": gpu,
+            "use_llm": use_llm
+        }, client_id=get_client_id(request), priority=priority, job_id=task_id)
 
         return {
             "task_id": task_id,
-            "message": "比較処理を開始しました",
+            "message": "比較処理を受け付けました",
             "total_items": total_lines,
-            "status": "processing"
+            "status": "queued",
+            "position": (await app.state.job_queue.get(task_id)).get("position")
         }
 
     except Exception as e:
@@ -1614,9 +1888,15 @@ async def compare_async(
         raise HTTPException(status_code=500, detail=f"非同期処理の開始に失敗しました: {str(e)}")
 
 
-async def process_comparison_async(task_id: str, file_path: str, output_type: str, gpu: bool, use_llm: bool = False):
-    """バックグラウンドでファイル比較を実行"""
+async def process_comparison_async(task_id: str, file_path: str, output_type: str, gpu: bool,
+                                   use_llm: bool = False, resume: bool = False):
+    """バックグラウンドでファイル比較を実行
+
+    LLM判定ではタスクごとのチェックポイントに処理済みの行を記録し、
+    resume=Trueの場合はチェックポイントから続きを処理する。
+    """
     start_time = time.time()
+    finished = False
 
     try:
         # GPU設定
@@ -1632,7 +1912,9 @@ async def process_comparison_async(task_id: str, file_path: str, output_type: st
                     "type": output_type,
                     "model": "qwen3-14b-awq",  # デフォルトモデル
                     "temperature": 0.2,
-                    "max_tokens": 64
+                    "max_tokens": 64,
+                    "checkpoint_file": app.state.resumable_tasks.checkpoint_path(task_id),
+                    "resume": resume
                 }
                 result = await process_jsonl_file_with_llm(file_path, config)
                 # 実際に使用された方法を判定（method_breakdownから）
@@ -1655,9 +1937,7 @@ async def process_comparison_async(task_id: str, file_path: str, output_type: st
                     result["calculation_method"] = actual_method
             else:
                 # 通常の埋め込みベース処理を実行
-                result = await asyncio.get_event_loop().run_in_executor(
-                    None, process_jsonl_file, file_path, output_type
-                )
+                result = await run_in_job_executor(task_id, process_jsonl_file, file_path, output_type)
 
         # メタデータを追加
         if isinstance(result, dict):
@@ -1683,6 +1963,7 @@ async def process_comparison_async(task_id: str, file_path: str, output_type: st
         duration = time.time() - start_time
         progress_tracker.complete_task(task_id, success=True, result_data=result)
         progress_tracker.log_task_completion(task_id, success=True, duration=duration)
+        finished = True
 
         # メトリクス記録
         progress_tracker.record_metrics(task_id, {
@@ -1699,24 +1980,57 @@ async def process_comparison_async(task_id: str, file_path: str, output_type: st
         progress_tracker.complete_task(task_id, success=False, error_message=error_message)
         progress_tracker.log_task_completion(task_id, success=False, duration=duration)
         progress_tracker.log_error(task_id, error_message, e)
+        finished = True
 
     finally:
-        # 一時ファイルをクリーンアップ
-        try:
-            os.unlink(file_path)
-        except:
-            pass
+        # 完了・キャンセルしたタスクの入力とチェックポイントをクリーンアップ
+        # （シャットダウンで止まった場合は再起動後の再開のために残す）
+        if finished or app.state.job_queue.is_cancelled(task_id):
+            app.state.resumable_tasks.remove(task_id)
+            try:
+                os.unlink(file_path)
+            except:
+                pass
+
+
+async def run_compare_job(job_id: str, params: Dict[str, Any], resume: bool) -> None:
+    """ジョブキューから1ファイル比較を実行"""
+    input_path = app.state.resumable_tasks.input_path(job_id)
+    _ensure_progress_task(job_id, input_path)
+    await process_comparison_async(
+        job_id,
+        input_path,
+        params.get("output_type", "score"),
+        params.get("gpu", False),
+        params.get("use_llm", False),
+        resume=resume
+    )
+    _raise_if_failed(job_id)
+
+
+async def start_job_queue():
+    """ジョブキューのワーカーを起動し、前回の起動時に完了しなかったジョブを再開"""
+    restored = await app.state.job_queue.start()
+    if restored:
+        print(f"未完了のジョブを{len(restored)}件再開します")
+
+
+async def stop_job_queue():
+    """ジョブキューのワーカーを停止（実行中のジョブは次回の起動時に再開）"""
+    await app.state.job_queue.stop()
 
 
 @app.post("/api/compare/dual/async")
 async def compare_dual_async(
+    request: Request,
     file1: UploadFile = File(...),
     file2: UploadFile = File(...),
     column: str = Form("inference"),
     output_type: str = Form("score"),
-    gpu: bool = Form(False)
+    gpu: bool = Form(False),
+    priority: int = Form(0)
 ):
-    """非同期で2ファイル比較を実行し、タスクIDを返す"""
+    """非同期で2ファイル比較をジョブキューに登録し、タスクIDを返す"""
     try:
         # ファイルを一時保存
         temp_files = []
@@ -1733,18 +2047,23 @@ async def compare_dual_async(
         # 進捗トラッカーにタスクを作成（タスクIDを取得）
         task_id = progress_tracker.create_task(total_items=total_lines)
 
-        # バックグラウンドで比較処理を開始
-        asyncio.create_task(
-            process_dual_comparison_async(
-                task_id, temp_files[0], temp_files[1], column, output_type, gpu
-            )
-        )
+        # 再起動後に再実行できるよう入力をストアに移す
+        app.state.resumable_tasks.save(task_id, temp_files[0], {"comparison_type": "dual_file"})
+        shutil.move(temp_files[1], dual_second_input_path(task_id))
+
+        # ジョブキューに登録（ワーカーが空き次第バックグラウンドで実行）
+        await app.state.job_queue.submit("compare_dual", {
+            "column": column,
+            "output_type": output_type,
+            "gpu": gpu
+        }, client_id=get_client_id(request), priority=priority, job_id=task_id)
 
         return {
             "task_id": task_id,
-            "message": "2ファイル比較処理を開始しました",
+            "message": "2ファイル比較処理を受け付けました",
             "total_items": total_lines,
-            "status": "processing"
+            "status": "queued",
+            "position": (await app.state.job_queue.get(task_id)).get("position")
         }
 
     except Exception as e:
@@ -1758,6 +2077,7 @@ async def process_dual_comparison_async(
 ):
     """バックグラウンドで2ファイル比較を実行"""
     start_time = time.time()
+    finished = False
 
     try:
         # GPU設定
@@ -1769,16 +2089,15 @@ async def process_dual_comparison_async(
 
         # tqdm出力をキャプチャして進捗更新
         with tqdm_interceptor.capture_tqdm(task_id, progress_tracker):
-            result = await asyncio.get_event_loop().run_in_executor(
-                None,
-                extractor.compare_dual_files,
-                file1_path, file2_path, column, output_type, gpu
+            result = await run_in_job_executor(
+                task_id, extractor.compare_dual_files, file1_path, file2_path, column, output_type, gpu
             )
 
         # 処理完了
         duration = time.time() - start_time
         progress_tracker.complete_task(task_id, success=True, result_data=result)
         progress_tracker.log_task_completion(task_id, success=True, duration=duration)
+        finished = True
 
         # メトリクス記録
         progress_tracker.record_metrics(task_id, {
@@ -1797,14 +2116,63 @@ async def process_dual_comparison_async(
         progress_tracker.complete_task(task_id, success=False, error_message=error_message)
         progress_tracker.log_task_completion(task_id, success=False, duration=duration)
         progress_tracker.log_error(task_id, error_message, e)
+        finished = True
 
     finally:
-        # 一時ファイルをクリーンアップ
-        for file_path in [file1_path, file2_path]:
-            try:
-                os.unlink(file_path)
-            except:
-                pass
+        # 入力ファイルをクリーンアップ（シャットダウンで止まった場合は再実行のために残す）
+        if finished or app.state.job_queue.is_cancelled(task_id):
+            app.state.resumable_tasks.remove(task_id)
+            for file_path in [file1_path, file2_path]:
+                try:
+                    os.unlink(file_path)
+                except:
+                    pass
+
+
+def dual_second_input_path(task_id: str) -> str:
+    """2ファイル比較ジョブの2つ目の入力ファイルのパス"""
+    return str(app.state.resumable_tasks.task_dir(task_id) / "input2.jsonl")
+
+
+async def run_compare_dual_job(job_id: str, params: Dict[str, Any], resume: bool) -> None:
+    """ジョブキューから2ファイル比較を実行"""
+    file1_path = app.state.resumable_tasks.input_path(job_id)
+    _ensure_progress_task(job_id, file1_path)
+    await process_dual_comparison_async(
+        job_id,
+        file1_path,
+        dual_second_input_path(job_id),
+        params.get("column", "inference"),
+        params.get("output_type", "score"),
+        params.get("gpu", False)
+    )
+    _raise_if_failed(job_id)
+
+
+@app.get("/api/jobs/{job_id}")
+async def get_job(job_id: str):
+    """ジョブの状態（待ち中の場合はキュー内の順番）を取得"""
+    job = await app.state.job_queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="ジョブが見つかりません")
+    job.pop("params", None)
+    return job
+
+
+@app.delete("/api/jobs/{job_id}")
+async def cancel_job(job_id: str):
+    """待ち中または実行中のジョブをキャンセル"""
+    if await app.state.job_queue.get(job_id) is None:
+        raise HTTPException(status_code=404, detail="ジョブが見つかりません")
+    if not await app.state.job_queue.cancel(job_id):
+        raise HTTPException(status_code=409, detail="ジョブは既に完了しています")
+
+    # 待ち中だったジョブの入力はここで片付ける
+    # （実行中のジョブは、処理が止まってから処理関数の終了時に片付ける）
+    if not app.state.job_queue.is_cancelled(job_id):
+        app.state.resumable_tasks.remove(job_id)
+    progress_tracker.complete_task(job_id, success=False, error_message="キャンセルされました")
+    return {"job_id": job_id, "status": "cancelled"}
 
 
 def main():
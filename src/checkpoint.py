@@ -0,0 +1,245 @@
+"""比較処理のチェックポイント
+
+長時間のJSONL比較（特にLLMモード）が途中で止まっても続きから再開できるよう、
+処理済みの行番号と結果をチェックポイントファイルに定期的に追記する。
+
+チェックポイントファイルはJSONLで、1行目がヘッダー（入力ファイルの指紋と設定）、
+2行目以降が "行番号と結果" のレコード。追記のみのため、書き込み途中で
+プロセスが落ちても最後の不完全な行を捨てるだけで読み直せる。
+
+APIの非同期タスク用に、入力ファイルとタスク設定をまとめて保存し
+サーバー再起動後に中断タスクを列挙するResumableTaskStoreも提供する。
+"""
+
+import hashlib
+import json
+import os
+import shutil
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+# チェックポイントファイルの形式バージョン
+CHECKPOINT_VERSION = 1
+
+# 既定のチェックポイント間隔（行数）
+DEFAULT_CHECKPOINT_INTERVAL = 50
+
+# 既定のチェックポイントの保存先（環境変数 JSON_COMPARE_CHECKPOINT_DIR で変更できる）
+DEFAULT_CHECKPOINT_DIR = os.path.join("~", ".cache", "json_compare", "checkpoints")
+
+
+class CheckpointMismatchError(ValueError):
+    """チェックポイントが入力ファイルまたは設定と一致しない"""
+    pass
+
+
+def default_checkpoint_path(file_path: str) -> str:
+    """入力ファイルに対応する既定のチェックポイントファイルパス
+
+    入力ファイルの横には置かず、キャッシュディレクトリに入力ファイルの絶対パスごとに作る。
+    """
+    directory = os.path.expanduser(os.environ.get("JSON_COMPARE_CHECKPOINT_DIR") or DEFAULT_CHECKPOINT_DIR)
+    digest = hashlib.sha256(os.path.abspath(file_path).encode("utf-8")).hexdigest()[:16]
+    return os.path.join(directory, f"{os.path.basename(file_path)}.{digest}.checkpoint.jsonl")
+
+
+def file_fingerprint(file_path: str) -> Dict[str, Any]:
+    """入力ファイルの指紋（サイズと内容のSHA-256）を計算"""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(block)
+    return {
+        "size": os.path.getsize(file_path),
+        "sha256": digest.hexdigest()
+    }
+
+
+class ComparisonCheckpoint:
+    """処理済み行の結果を追記するチェックポイント
+
+    Example:
+        checkpoint = ComparisonCheckpoint(default_checkpoint_path(path), path, {"method": "llm"})
+        done = checkpoint.load() if resume else {}
+        checkpoint.record({line_num: result.to_dict()})
+        ...
+        checkpoint.remove()
+    """
+
+    def __init__(self, checkpoint_path: str, input_path: str, options: Optional[Dict[str, Any]] = None):
+        """
+        Args:
+            checkpoint_path: チェックポイントファイルパス
+            input_path: 入力JSONLファイルパス
+            options: 結果に影響する設定（再開時に一致を確認する）
+        """
+        self.path = Path(checkpoint_path)
+        self.input_path = str(input_path)
+        self.options = options or {}
+        self._fingerprint: Optional[Dict[str, Any]] = None
+        self._started = False
+
+    @property
+    def fingerprint(self) -> Dict[str, Any]:
+        """入力ファイルの指紋（初回のみ計算）"""
+        if self._fingerprint is None:
+            self._fingerprint = file_fingerprint(self.input_path)
+        return self._fingerprint
+
+    def _header(self) -> Dict[str, Any]:
+        return {
+            "version": CHECKPOINT_VERSION,
+            "input": self.fingerprint,
+            "options": self.options
+        }
+
+    def exists(self) -> bool:
+        """チェックポイントファイルが存在するか"""
+        return self.path.exists()
+
+    def load(self) -> Dict[int, Dict[str, Any]]:
+        """処理済みの結果を読み込む
+
+        Returns:
+            行番号 -> 結果の辞書（チェックポイントがなければ空）
+
+        Raises:
+            CheckpointMismatchError: 入力ファイルまたは設定が記録時と異なる場合
+        """
+        if not self.path.exists():
+            return {}
+
+        completed: Dict[int, Dict[str, Any]] = {}
+        with open(self.path, 'r', encoding='utf-8') as f:
+            header_line = f.readline()
+            if not header_line.endswith('\n'):
+                return {}
+            header = json.loads(header_line)
+            if header.get("version") != CHECKPOINT_VERSION or header.get("input") != self.fingerprint:
+                raise CheckpointMismatchError(
+                    f"チェックポイントが入力ファイルと一致しません: {self.path}"
+                )
+            if header.get("options") != json.loads(json.dumps(self.options, default=str)):
+                raise CheckpointMismatchError(
+                    f"チェックポイントの設定が現在の設定と一致しません: {header.get('options')}"
+                )
+
+            for line in f:
+                # 書き込み途中で中断した最後の行は捨てる
+                if not line.endswith('\n'):
+                    break
+                entry = json.loads(line)
+                completed[int(entry["line"])] = entry["result"]
+
+        # 以降の追記は既存ファイルに続ける
+        self._started = True
+        return completed
+
+    def record(self, results: Dict[int, Dict[str, Any]]) -> None:
+        """処理済みの結果を追記してディスクに書き出す
+
+        Args:
+            results: 行番号 -> 結果の辞書
+        """
+        if not results:
+            return
+
+        lines = []
+        if not self._started:
+            # 最初の記録時にヘッダーを書いて以前のチェックポイントを置き換える
+            lines.append(json.dumps(self._header(), ensure_ascii=False, default=str))
+        lines.extend(
+            json.dumps({"line": line_num, "result": result}, ensure_ascii=False, default=str)
+            for line_num, result in results.items()
+        )
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.path, 'w' if not self._started else 'a', encoding='utf-8') as f:
+            f.write('\n'.join(lines) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+        self._started = True
+
+    def remove(self) -> None:
+        """チェックポイントファイルを削除（処理完了時）"""
+        try:
+            self.path.unlink()
+        except FileNotFoundError:
+            pass
+        self._started = False
+
+
+class ResumableTaskStore:
+    """サーバー再起動後に再開できるよう非同期タスクを保存するストア
+
+    ディレクトリ構成:
+        <root>/<task_id>/task.json         タスクの設定
+        <root>/<task_id>/input.jsonl       入力ファイル
+        <root>/<task_id>/checkpoint.jsonl  チェックポイント
+    """
+
+    def __init__(self, root_dir: str):
+        self.root_dir = Path(root_dir)
+
+    def task_dir(self, task_id: str) -> Path:
+        return self.root_dir / task_id
+
+    def input_path(self, task_id: str) -> str:
+        return str(self.task_dir(task_id) / "input.jsonl")
+
+    def checkpoint_path(self, task_id: str) -> str:
+        return str(self.task_dir(task_id) / "checkpoint.jsonl")
+
+    def save(self, task_id: str, source_path: str, params: Dict[str, Any]) -> str:
+        """入力ファイルをストアに移してタスクの設定を保存
+
+        Args:
+            task_id: タスクID
+            source_path: アップロードされた入力ファイル（移動される）
+            params: 再開時に処理関数へ渡す設定
+
+        Returns:
+            ストア内の入力ファイルパス
+        """
+        directory = self.task_dir(task_id)
+        directory.mkdir(parents=True, exist_ok=True)
+        input_path = self.input_path(task_id)
+        shutil.move(source_path, input_path)
+
+        # 入力を置いてから設定を書く（task.jsonがあれば再開可能）
+        temp_path = directory / "task.json.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump({"task_id": task_id, "params": params}, f, ensure_ascii=False)
+        os.replace(temp_path, directory / "task.json")
+        return input_path
+
+    def pending(self) -> List[Dict[str, Any]]:
+        """中断されたまま残っているタスクを列挙
+
+        Returns:
+            {"task_id", "params", "input_path", "checkpoint_path"} のリスト
+        """
+        if not self.root_dir.exists():
+            return []
+
+        tasks = []
+        for task_file in sorted(self.root_dir.glob("*/task.json")):
+            try:
+                with open(task_file, 'r', encoding='utf-8') as f:
+                    entry = json.load(f)
+            except (OSError, json.JSONDecodeError):
+                continue
+            task_id = entry["task_id"]
+            if not os.path.exists(self.input_path(task_id)):
+                continue
+            tasks.append({
+                "task_id": task_id,
+                "params": entry.get("params", {}),
+                "input_path": self.input_path(task_id),
+                "checkpoint_path": self.checkpoint_path(task_id)
+            })
+        return tasks
+
+    def remove(self, task_id: str) -> None:
+        """完了したタスクのファイルを削除"""
+        shutil.rmtree(self.task_dir(task_id), ignore_errors=True)
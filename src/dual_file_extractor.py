@@ -4,14 +4,14 @@ DualFileExtractor: 2つのJSONLファイルから指定列を抽出して比較
 
 import json
 import os
-import tempfile
-from typing import Dict, Any, List, Optional
-from pathlib import Path
-from tqdm import tqdm
+import sys
+from typing import Callable, Dict, Any, Iterator, List, Optional, Tuple
 
 from .logger import SystemLogger
 from .error_handler import ErrorHandler
-from .jsonl_formatter import auto_fix_jsonl_file
+from .jsonl_reader import ByteProgressBar, JSONLReader
+from .key_join import KeyJoin
+from .parallel_scoring import iter_scored_records, iter_scored_records_parallel, summarize_scored_rows
 
 
 class DualFileExtractor:
@@ -21,7 +21,6 @@ class DualFileExtractor:
         """初期化"""
         self.logger = SystemLogger()
         self.error_handler = ErrorHandler()
-        self.temp_files = []  # クリーンアップ用の一時ファイルリスト
 
     def compare_dual_files(
         self,
@@ -29,10 +28,18 @@ class DualFileExtractor:
         file2_path: str,
         column_name: str = "inference",
         output_type: str = "score",
-        use_gpu: bool = False
+        use_gpu: bool = False,
+        workers: int = 1,
+        on_result: Optional[Callable[[Dict[str, Any]], None]] = None,
+        join_key: Optional[str] = None,
+        should_stop: Optional[Callable[[], bool]] = None
     ) -> Dict[str, Any]:
         """
-        2つのJSONLファイルから指定列を抽出して比較
+        2つのJSONLファイルの指定列を1行ずつ並行して読み、そのまま比較
+
+        一時ファイルや列全体のリストは作らず、ファイルの大きさによらず
+        一定のメモリで処理する。join_keyを指定した場合は行の位置ではなく
+        キー列の値で行を対応付ける（KeyJoin）。
 
         Args:
             file1_path: 1つ目のJSONLファイルパス
@@ -40,51 +47,63 @@ class DualFileExtractor:
             column_name: 抽出する列名（デフォルト: inference）
             output_type: 出力タイプ（score/file）
             use_gpu: GPU使用フラグ
+            workers: 採点に使うプロセス数
+            on_result: fileタイプの各行の結果を採点し次第受け取るコールバック
+            join_key: 行の対応付けに使うキー列（Noneの場合は行の位置で対応付け）
+            should_stop: Trueを返したらチャンクの合間で採点を中止する関数（ジョブのキャンセル用）
 
         Returns:
             比較結果の辞書
         """
+        # ファイルと列の存在確認（フォーマットの修正・修復は読み込み時に1回で行う）
+        self._validate_files(file1_path, file2_path, column_name)
+
         try:
-            # JSONLファイルのフォーマットを自動修正
-            try:
-                fixed_file1_path = auto_fix_jsonl_file(file1_path)
-                fixed_file2_path = auto_fix_jsonl_file(file2_path)
-                # フォーマット修正後はバリデーション不要（既に正しい形式）
-                skip_validation = True
-            except ValueError as format_error:
-                print(f"警告: JSONLフォーマット修正に失敗: {format_error}")
-                # 修正に失敗した場合は元のファイルをそのまま使用
-                fixed_file1_path = file1_path
-                fixed_file2_path = file2_path
-                skip_validation = False
-
-            # バリデーション処理（フォーマット修正に失敗した場合のみ実行）
-            if not skip_validation:
-                self._validate_files(fixed_file1_path, fixed_file2_path, column_name)
-
-            print(f"ファイル1から'{column_name}'列を抽出中...")
-            column1_data = self._extract_column(fixed_file1_path, column_name, "ファイル1")
-
-            print(f"ファイル2から'{column_name}'列を抽出中...")
-            column2_data = self._extract_column(fixed_file2_path, column_name, "ファイル2")
-
-            # 行数の確認
-            len1, len2 = len(column1_data), len(column2_data)
-            if len1 != len2:
-                print(f"警告: ファイルの行数が異なります（{len1}行 vs {len2}行）。短い方に合わせます。")
-                min_len = min(len1, len2)
-                column1_data = column1_data[:min_len]
-                column2_data = column2_data[:min_len]
-
-            # 一時ファイルの作成
-            print("一時ファイルを作成中...")
-            temp_file_path = self._create_temp_file(column1_data, column2_data)
-
-            # 既存の比較機能を実行
-            print("比較処理を実行中...")
-            # __main__モジュールから関数をインポート
-            from .__main__ import process_jsonl_file
-            result = process_jsonl_file(temp_file_path, output_type)
+            def warn(line_num, message):
+                print(f"警告: {line_num}行目の{message}", file=sys.stderr)
+
+            reader1 = self._create_reader(file1_path)
+            reader2 = self._create_reader(file2_path)
+            counts = [0, 0]
+            join = None
+
+            def read_bytes():
+                return (reader1.position - reader1.start) + (reader2.position - reader2.start)
+
+            # 2つのファイルを並行して読み、(値1, 値2) のペアを直接採点に流す
+            print(f"ファイル1とファイル2の'{column_name}'列を比較中...", file=sys.stderr)
+            with ByteProgressBar(reader1.total_bytes + reader2.total_bytes, "比較処理中") as progress:
+                if join_key:
+                    join = KeyJoin(join_key, lambda data: self._column_value(data, column_name))
+                    records = self._iter_joined_pairs(join, reader1, reader2)
+                else:
+                    records = self._iter_column_pairs(reader1, reader2, column_name, counts)
+                if workers > 1:
+                    rows = iter_scored_records_parallel(
+                        records, output_type, workers, warn,
+                        lambda count: progress.advance(count, read_bytes())
+                    )
+                else:
+                    rows = iter_scored_records(
+                        records, output_type, warn,
+                        lambda count: progress.advance(count, read_bytes())
+                    )
+                result = summarize_scored_rows(rows, output_type, f"{file1_path} vs {file2_path}", on_result,
+                                               should_stop)
+
+            if join is not None:
+                # キーで対応付けられなかった行の報告
+                join_summary = join.summary()
+                rows_compared = join.matched
+                if join.unmatched[1] or join.unmatched[2]:
+                    print(f"警告: キー'{join_key}'で対応付けられない行があります"
+                          f"（ファイル1: {join.unmatched[1]}行, ファイル2: {join.unmatched[2]}行）", file=sys.stderr)
+            else:
+                # 行数の確認
+                len1, len2 = counts
+                rows_compared = min(len1, len2)
+                if len1 != len2:
+                    print(f"警告: ファイルの行数が異なります（{len1}行 vs {len2}行）。短い方に合わせました。", file=sys.stderr)
 
             # メタデータの追加（scoreタイプの場合のみ）
             if isinstance(result, dict):
@@ -94,12 +113,14 @@ class DualFileExtractor:
                         'file2': os.path.basename(file2_path)
                     },
                     'column_compared': column_name,
-                    'rows_compared': min(len1, len2),
+                    'rows_compared': rows_compared,
                     'gpu_used': use_gpu
                 }
+                if join is not None:
+                    result['_metadata']['join'] = join_summary
 
             # ログ記録
-            print(f"✅ 2ファイル比較完了 - 列: {column_name}, 行数: {min(len1, len2)}")
+            print(f"✅ 2ファイル比較完了 - 列: {column_name}, 行数: {rows_compared}", file=sys.stderr)
 
             return result
 
@@ -112,152 +133,133 @@ class DualFileExtractor:
             )
             raise Exception(f"比較処理に失敗しました（エラーID: {error_id}）: {str(e)}")
 
-        finally:
-            # 一時ファイルのクリーンアップ
-            self._cleanup_temp_files()
-
     def _validate_files(self, file1_path: str, file2_path: str, column_name: str):
         """
         ファイルと列の存在を検証
 
+        各ファイルの最初のレコードだけを読み、列名の誤りを全行の比較前に検出する。
+
         Args:
             file1_path: 1つ目のファイルパス
             file2_path: 2つ目のファイルパス
             column_name: 検証する列名
         """
         # ファイル存在確認
-        if not os.path.exists(file1_path):
-            raise FileNotFoundError(f"ファイル1が見つかりません: {file1_path}")
-
-        if not os.path.exists(file2_path):
-            raise FileNotFoundError(f"ファイル2が見つかりません: {file2_path}")
+        for file_path, file_num in [(file1_path, 1), (file2_path, 2)]:
+            if not os.path.exists(file_path):
+                raise FileNotFoundError(f"ファイル{file_num}が見つかりません: {file_path}")
 
-        # ファイル形式と列の確認
+        # 列の確認
         for file_path, file_num in [(file1_path, 1), (file2_path, 2)]:
-            try:
-                with open(file_path, 'r', encoding='utf-8') as f:
-                    first_line = f.readline().strip()
-                    if not first_line:
-                        raise ValueError(f"ファイル{file_num}が空です")
-
-                    # JSON形式の確認
-                    try:
-                        data = json.loads(first_line)
-                    except json.JSONDecodeError:
-                        # json-repairで修復を試みる
-                        repaired = self.error_handler.validate_and_repair_jsonl(first_line)
-                        if repaired:
-                            data = json.loads(repaired.split('\n')[0])
-                        else:
-                            raise ValueError(f"ファイル{file_num}がJSONL形式ではありません")
-
-                    # 列の存在確認
-                    if column_name not in data:
-                        available_columns = list(data.keys())
-                        raise ValueError(
-                            f"ファイル{file_num}に'{column_name}'列が存在しません。"
-                            f"利用可能な列: {', '.join(available_columns)}"
-                        )
-
-            except Exception as e:
-                if isinstance(e, (FileNotFoundError, ValueError)):
-                    raise
-                raise ValueError(f"ファイル{file_num}の読み込みエラー: {str(e)}")
-
-    def _extract_column(self, file_path: str, column_name: str, file_label: str = "ファイル") -> List[str]:
+            self._validate_column(file_path, f"ファイル{file_num}", column_name)
+
+    def _validate_column(self, file_path: str, label: str, column_name: str):
         """
-        JSONLファイルから指定列を抽出
+        ファイルの最初のレコードに列が存在するかを検証
 
-        Args:
-            file_path: JSONLファイルパス
-            column_name: 抽出する列名
-            file_label: 進捗表示用のラベル
+        読めない行の警告は本番の読み込みで出すため、ここでは出さない。
 
-        Returns:
-            抽出した値のリスト
-        """
-        extracted_data = []
-
-        # まずファイルの行数を取得
-        with open(file_path, 'r', encoding='utf-8') as f:
-            total_lines = sum(1 for _ in f)
-
-        # tqdmプログレスバー付きで処理
-        with open(file_path, 'r', encoding='utf-8') as f:
-            with tqdm(total=total_lines, desc=f"{file_label} 処理中", unit="行",
-                     ncols=120,
-                     bar_format='{desc}: {percentage:3.0f}%|{bar}| {n_fmt}/{total_fmt}行 [{elapsed}<{remaining}, {rate_fmt}]',
-                     miniters=1) as pbar:
-                for line_num, line in enumerate(f, 1):
-                    pbar.update(1)
-                    line = line.strip()
-                    if not line:
-                        continue
-
-                    try:
-                        data = json.loads(line)
-                    except json.JSONDecodeError:
-                        # json-repairで修復を試みる
-                        repaired = self.error_handler.validate_and_repair_jsonl(line)
-                        if repaired:
-                            data = json.loads(repaired.split('\n')[0])
-                        else:
-                            print(f"警告: 行{line_num}のJSON解析に失敗しました。スキップします。")
-                            continue
-
-                    # 列の値を取得
-                    value = data.get(column_name, "")
-
-                    # 値が辞書やリストの場合はJSON文字列に変換
-                    if isinstance(value, (dict, list)):
-                        value = json.dumps(value, ensure_ascii=False)
-                    elif not isinstance(value, str):
-                        value = str(value)
-
-                    extracted_data.append(value)
-
-        return extracted_data
-
-    def _create_temp_file(self, data1: List[str], data2: List[str]) -> str:
+        Args:
+            file_path: ファイルパス
+            label: エラーメッセージでのファイルの呼び名
+            column_name: 検証する列名
         """
-        2つのデータリストから一時ファイルを作成
+        records = iter(JSONLReader(file_path, repair=self._repair_line))
+        try:
+            first = next(records, None)
+        except (OSError, UnicodeDecodeError) as e:
+            raise ValueError(f"{label}の読み込みエラー: {str(e)}")
+        finally:
+            records.close()
+
+        if first is None:
+            raise ValueError(f"{label}が空です")
+
+        if not isinstance(first.data, dict) or column_name not in first.data:
+            available_columns = list(first.data.keys()) if isinstance(first.data, dict) else []
+            raise ValueError(
+                f"{label}に'{column_name}'列が存在しません。"
+                f"利用可能な列: {', '.join(available_columns)}"
+            )
+
+    def _repair_line(self, line: str, line_num: int):
+        """1行ずつ検証し、修復できればその値を返す（できなければNone）"""
+        success, data, _ = self.error_handler.validate_jsonl_line(line, line_num)
+        return data if success else None
+
+    def _create_reader(self, file_path: str) -> JSONLReader:
+        """読めない行を1行ずつ修復し、修復できなければスキップするリーダーを作成"""
+        def on_error(error):
+            print(f"警告: {file_path} の行{error.line_num}のJSON解析に失敗しました。スキップします。", file=sys.stderr)
+
+        return JSONLReader(file_path, repair=self._repair_line, on_error=on_error)
+
+    @staticmethod
+    def _column_value(data: Any, column_name: str) -> str:
+        """レコードから比較する列の値を文字列で取り出す"""
+        data = data if isinstance(data, dict) else {}
+        value = data.get(column_name, "")
+
+        # 値が辞書やリストの場合はJSON文字列に変換
+        if isinstance(value, (dict, list)):
+            value = json.dumps(value, ensure_ascii=False)
+        elif not isinstance(value, str):
+            value = str(value)
+        return value
+
+    def _iter_column_pairs(
+        self,
+        reader1: JSONLReader,
+        reader2: JSONLReader,
+        column_name: str,
+        counts: List[int]
+    ) -> Iterator[Tuple[int, Dict[str, str]]]:
+        """2つのファイルを1レコードずつ並行して読み、指定列のペアを返す
+
+        短い方のファイルが尽きたところでペアの生成を終え、長い方の残りは
+        件数を数えるためだけに読み進める（値は保持しない）。
 
         Args:
-            data1: 1つ目のデータリスト
-            data2: 2つ目のデータリスト
+            reader1: 1つ目のファイルのリーダー
+            reader2: 2つ目のファイルのリーダー
+            column_name: 比較する列名
+            counts: 各ファイルのレコード数を書き込むリスト [件数1, 件数2]
 
-        Returns:
-            作成した一時ファイルのパス
+        Yields:
+            (ペア番号, {"inference1": 値1, "inference2": 値2})
         """
-        # 一時ファイルの作成（削除は手動）
-        with tempfile.NamedTemporaryFile(
-            mode='w',
-            suffix='.jsonl',
-            delete=False,
-            encoding='utf-8'
-        ) as tmp:
-            temp_path = tmp.name
-            self.temp_files.append(temp_path)  # クリーンアップリストに追加
-
-            # データをinference1/inference2として書き込み
-            for val1, val2 in zip(data1, data2):
-                line = {
-                    "inference1": val1,
-                    "inference2": val2
-                }
-                tmp.write(json.dumps(line, ensure_ascii=False) + '\n')
-
-        print(f"一時ファイルを作成しました: {temp_path}")
-        return temp_path
-
-    def _cleanup_temp_files(self):
-        """作成した一時ファイルをすべて削除"""
-        for temp_file in self.temp_files:
-            try:
-                if os.path.exists(temp_file):
-                    os.remove(temp_file)
-                    print(f"一時ファイルを削除しました: {temp_file}")
-            except Exception as e:
-                print(f"警告: 一時ファイル削除失敗: {temp_file} - {str(e)}")
-
-        self.temp_files.clear()
\ No newline at end of file
+        def counted(reader, index):
+            for record in reader:
+                counts[index] += 1
+                yield record
+
+        records1 = counted(reader1, 0)
+        records2 = counted(reader2, 1)
+        for pair_num, (record1, record2) in enumerate(zip(records1, records2), 1):
+            yield pair_num, {
+                "inference1": self._column_value(record1.data, column_name),
+                "inference2": self._column_value(record2.data, column_name)
+            }
+
+        for _ in records1:
+            pass
+        for _ in records2:
+            pass
+
+    @staticmethod
+    def _iter_joined_pairs(
+        join: KeyJoin,
+        reader1: JSONLReader,
+        reader2: JSONLReader
+    ) -> Iterator[Tuple[int, Dict[str, Any]]]:
+        """2つのファイルをキー列で結合し、対応する行の列のペアを返す
+
+        Yields:
+            (ペア番号, {キー列: キーの値, "inference1": 値1, "inference2": 値2})
+        """
+        pairs = join.iter_pairs(
+            ((record.line_num, record.data) for record in reader1), reader1.total_bytes,
+            ((record.line_num, record.data) for record in reader2), reader2.total_bytes
+        )
+        for pair_num, (key, value1, value2) in enumerate(pairs, 1):
+            yield pair_num, {join.join_key: key, "inference1": value1, "inference2": value2}
@@ -1,19 +1,69 @@
 """日本語埋め込みベクトル処理モジュール"""
 
+from typing import List, Optional, Sequence
+
 import torch
 from transformers import AutoTokenizer, AutoModel
 import numpy as np
-from scipy.spatial.distance import cosine
+
+from .embedding_cache import EmbeddingCache, make_cache_key
+
+# ウォームアップで通すおおよそのトークン長（短文・一般的な文・長文・上限）
+WARMUP_TOKEN_LENGTHS = (16, 64, 128, 512)
+_WARMUP_SENTENCE = "これは埋め込みモデルのウォームアップ用の文章です。"
+
+
+def mean_pool(hidden_state: torch.Tensor, attention_mask: torch.Tensor) -> torch.Tensor:
+    """アテンションマスクを考慮した平均プーリング
+
+    パディング位置の隠れ状態は平均に含めない。モデル内部の計算は
+    バッチ構成で変わるため、結果がビット単位で一致するわけではない
+    （許容誤差はJapaneseEmbedding.encode_batchを参照）。
+
+    Args:
+        hidden_state: (batch, seq_len, hidden_size) の隠れ状態
+        attention_mask: (batch, seq_len) のアテンションマスク
+
+    Returns:
+        (batch, hidden_size) のプーリング結果
+    """
+    mask = attention_mask.unsqueeze(-1).to(hidden_state.dtype)
+    summed = (hidden_state * mask).sum(dim=1)
+    return summed / mask.sum(dim=1).clamp(min=1.0)
+
+
+def similarity_matrix(vectors1: np.ndarray, vectors2: np.ndarray) -> np.ndarray:
+    """L2正規化済みベクトル同士のコサイン類似度行列を計算
+
+    正規化済みなのでコサイン類似度は内積に等しく、全ペアを1回の行列積で
+    求められる。内積はfloat64で累積してからfloat32に丸めるので、
+    行列の形による累積順の違いはほぼ丸めで吸収される。入力ベクトル自体の
+    誤差（バッチ埋め込みによるもの）はそのまま結果に残る。
+
+    Args:
+        vectors1: (n, dim) の正規化済みベクトル
+        vectors2: (m, dim) の正規化済みベクトル
+
+    Returns:
+        (n, m) の類似度行列 (0-1, float32)
+    """
+    left = np.asarray(vectors1, dtype=np.float64)
+    right = np.asarray(vectors2, dtype=np.float64)
+    product = (left @ right.T).astype(np.float32)
+    return np.clip(product, 0.0, 1.0)
 
 
 class JapaneseEmbedding:
     """日本語埋め込みベクトルを使用した類似度計算クラス"""
 
-    def __init__(self, use_gpu: bool = False):
+    def __init__(self, use_gpu: bool = False, max_length: int = 512,
+                 cache: Optional[EmbeddingCache] = None):
         """ruri-v3-310mモデルの初期化
 
         Args:
             use_gpu: GPUを使用するかどうか (default: False)
+            max_length: トークン列の最大長 (default: 512)
+            cache: 埋め込みベクトルのキャッシュ (default: None)
         """
         # デバイス選択
         if use_gpu and torch.cuda.is_available():
@@ -22,44 +72,120 @@ class JapaneseEmbedding:
             self.device = torch.device("cpu")
 
         # モデルとトークナイザーのロード
-        model_name = "cl-nagoya/ruri-v3-310m"
-        self.tokenizer = AutoTokenizer.from_pretrained(model_name)
-        self.model = AutoModel.from_pretrained(model_name)
+        self.model_name = "cl-nagoya/ruri-v3-310m"
+        self.max_length = max_length
+        self.cache = cache
+        self.tokenizer = AutoTokenizer.from_pretrained(self.model_name)
+        self.model = AutoModel.from_pretrained(self.model_name)
         self.model.to(self.device)
         self.model.eval()
-    
+
+    def encode_batch(self, texts: List[str], batch_size: int = 32) -> np.ndarray:
+        """複数テキストをまとめて埋め込みベクトルに変換
+
+        トークン長でソートしてバケットに分け、各バケットはそのバケット内の
+        最大長までしかパディングしないため、短いテキストが長いテキストの
+        パディングに付き合わされることがない。
+
+        パディング量はバッチ構成で変わるため、1件ずつ埋め込んだ場合とは
+        ビット単位では一致しない。差はfloat32の丸め誤差程度で、
+        コサイン類似度の差は1e-6以下を許容範囲とする。
+
+        Args:
+            texts: 埋め込むテキストのリスト
+            batch_size: 1回のフォワードパスで処理するテキスト数 (default: 32)
+
+        Returns:
+            入力順に並んだL2正規化済みのfloat32行列 (len(texts), hidden_size)
+        """
+        if batch_size < 1:
+            raise ValueError("batch_size は 1 以上である必要があります")
+
+        if self.cache is None or not texts:
+            return self._encode_uncached(texts, batch_size)
+
+        # キャッシュ済みのベクトルを引き、未キャッシュのテキストだけを計算
+        keys = [make_cache_key(self.model_name, self.max_length, text) for text in texts]
+        vectors = self.cache.get_many(keys)
+
+        missing = {}
+        for key, text in zip(keys, texts):
+            if key not in vectors and key not in missing:
+                missing[key] = text
+        if missing:
+            computed = self._encode_uncached(list(missing.values()), batch_size)
+            new_vectors = {key: computed[i] for i, key in enumerate(missing.keys())}
+            self.cache.put_many(new_vectors)
+            vectors.update(new_vectors)
+
+        return np.vstack([vectors[key] for key in keys]).astype(np.float32, copy=False)
+
+    def _encode_uncached(self, texts: List[str], batch_size: int) -> np.ndarray:
+        """キャッシュを使わずにバケット化してフォワードパスを実行"""
+        hidden_size = self.model.config.hidden_size
+        if not texts:
+            return np.zeros((0, hidden_size), dtype=np.float32)
+
+        # パディングなしでトークナイズして長さを取得
+        encoded = self.tokenizer(list(texts), truncation=True, max_length=self.max_length)
+        input_ids = encoded["input_ids"]
+        order = sorted(range(len(texts)), key=lambda i: len(input_ids[i]))
+
+        embeddings = np.empty((len(texts), hidden_size), dtype=np.float32)
+
+        with torch.no_grad():
+            for start in range(0, len(order), batch_size):
+                bucket = order[start:start + batch_size]
+
+                # バケット内の最大長までパディング
+                features = self.tokenizer.pad(
+                    {key: [encoded[key][i] for i in bucket] for key in encoded.keys()},
+                    padding=True,
+                    return_tensors="pt"
+                )
+                features = {k: v.to(self.device) for k, v in features.items()}
+                outputs = self.model(**features)
+
+                # パディングトークンを除外して平均プーリング
+                pooled = mean_pool(outputs.last_hidden_state, features["attention_mask"])
+
+                # L2正規化
+                pooled = torch.nn.functional.normalize(pooled, p=2, dim=1)
+
+                embeddings[bucket] = pooled.cpu().numpy().astype(np.float32)
+
+        return embeddings
+
+    def warm_up(self, lengths: Sequence[int] = WARMUP_TOKEN_LENGTHS, batch_size: int = 32) -> None:
+        """典型的な長さのバケットでフォワードパスを実行してカーネルやメモリ確保を済ませる
+
+        キャッシュを通さないため、ダミーのテキストがキャッシュに残ることはない。
+
+        Args:
+            lengths: 通すおおよそのトークン長（max_lengthを超える分は切り詰められる）
+            batch_size: 1回のフォワードパスで処理するテキスト数 (default: 32)
+        """
+        for length in lengths:
+            repeat = max(1, length // len(_WARMUP_SENTENCE) + 1)
+            text = (_WARMUP_SENTENCE * repeat)[:max(1, length)]
+            self._encode_uncached([text] * batch_size, batch_size)
+
     def calculate_similarity(self, text1: str, text2: str) -> float:
         """2つのテキストのコサイン類似度を計算
-        
+
         Args:
             text1: 比較するテキスト1
             text2: 比較するテキスト2
-        
+
         Returns:
             コサイン類似度 (0-1)
         """
         # 空文字列の処理
         if not text1 or not text2:
             return 1.0 if text1 == text2 else 0.0
-        
-        # 埋め込みベクトルを取得
-        with torch.no_grad():
-            # テキスト1の埋め込み
-            inputs1 = self.tokenizer(text1, return_tensors="pt", 
-                                   padding=True, truncation=True, max_length=512)
-            inputs1 = {k: v.to(self.device) for k, v in inputs1.items()}
-            outputs1 = self.model(**inputs1)
-            embedding1 = outputs1.last_hidden_state.mean(dim=1).cpu().numpy()[0]
-            
-            # テキスト2の埋め込み
-            inputs2 = self.tokenizer(text2, return_tensors="pt",
-                                   padding=True, truncation=True, max_length=512)
-            inputs2 = {k: v.to(self.device) for k, v in inputs2.items()}
-            outputs2 = self.model(**inputs2)
-            embedding2 = outputs2.last_hidden_state.mean(dim=1).cpu().numpy()[0]
-        
-        # コサイン類似度計算
-        similarity = 1 - cosine(embedding1, embedding2)
-        
-        # 0-1の範囲に収める
-        return max(0.0, min(1.0, similarity))
\ No newline at end of file
+
+        # 2テキストを1回のフォワードパスで埋め込む
+        embeddings = self.encode_batch([text1, text2])
+
+        # 正規化済みなので内積がコサイン類似度（0-1に収める）
+        return float(similarity_matrix(embeddings[:1], embeddings[1:])[0, 0])
@@ -0,0 +1,365 @@
+"""埋め込みベクトルのコンテンツアドレス型キャッシュ
+
+(モデル名, max_length, テキストのハッシュ) をキーに、正規化済み埋め込みベクトルを
+2段階でキャッシュする。
+
+- メモリ層: プロセス内の上限付きLRU
+- ディスク層（任意）: float32のメモリマップ行列 + インデックスファイル。
+  複数のCLI実行やAPIワーカー間でベクトルを再利用できる。エントリ数には上限があり、
+  超えた場合は新しい方だけを残してコンパクションする。
+"""
+
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windowsではプロセス間ロックなし
+    fcntl = None
+
+
+def make_cache_key(model_name: str, max_length: int, text: str) -> str:
+    """キャッシュキーを生成
+
+    Args:
+        model_name: 埋め込みモデル名
+        max_length: トークナイズ時の最大長
+        text: 埋め込み対象のテキスト
+
+    Returns:
+        SHA-256の16進文字列
+    """
+    digest = hashlib.sha256()
+    digest.update(model_name.encode("utf-8"))
+    digest.update(b"\0")
+    digest.update(str(max_length).encode("ascii"))
+    digest.update(b"\0")
+    digest.update(text.encode("utf-8"))
+    return digest.hexdigest()
+
+
+class DiskVectorStore:
+    """メモリマップしたfloat32行列とインデックスファイルによる永続ベクトルストア
+
+    ディレクトリ構成:
+        meta.json          次元数・dtype・現在の世代
+        vectors.<世代>.f32  行優先のfloat32行列（追記のみ）
+        index.<世代>.tsv    "キー<TAB>行番号" の追記ログ
+        .lock              プロセス間の書き込みロック
+
+    計算したベクトルをそのままの精度で保存するため、キャッシュの有無でスコアは変わらない。
+    エントリ数がmax_entriesを超える書き込みでは、新しく追記された方の半分だけを
+    次の世代にコピーして古い世代を削除する。読み手はmeta.jsonの世代が変わったことで
+    インデックスを読み直す。
+    """
+
+    DTYPE = np.float32
+    DEFAULT_MAX_ENTRIES = 1000000
+    COPY_BLOCK_ROWS = 4096
+
+    def __init__(self, cache_dir: str, max_entries: int = DEFAULT_MAX_ENTRIES):
+        if max_entries < 1:
+            raise ValueError("max_entries は 1 以上である必要があります")
+
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.max_entries = max_entries
+
+        self._meta_path = self.cache_dir / "meta.json"
+        self._lock_path = self.cache_dir / ".lock"
+
+        self._lock = threading.RLock()
+        self._index: Dict[str, int] = {}
+        self._index_offset = 0
+        self._generation = 0
+        self._dim: Optional[int] = None
+        self._matrix: Optional[np.memmap] = None
+
+        self._refresh_index()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._index)
+
+    @property
+    def _vectors_path(self) -> Path:
+        return self.cache_dir / f"vectors.{self._generation}.f32"
+
+    @property
+    def _index_path(self) -> Path:
+        return self.cache_dir / f"index.{self._generation}.tsv"
+
+    def _file_lock(self):
+        """プロセス間の排他ロック用ファイルを開く"""
+        handle = open(self._lock_path, "a+")
+        if fcntl is not None:
+            fcntl.flock(handle.fileno(), fcntl.LOCK_EX)
+        return handle
+
+    def _read_meta(self) -> Optional[dict]:
+        """現在の世代のメタ情報を読む（未作成・旧形式の場合はNone）"""
+        try:
+            with open(self._meta_path, "r", encoding="utf-8") as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            return None
+        # float16で保存していた旧形式は読まずに、次の書き込みで作り直す
+        if meta.get("dtype") != "float32" or "generation" not in meta:
+            return None
+        return meta
+
+    def _refresh_index(self) -> None:
+        """他プロセスが追記したインデックスを取り込む（世代が変わっていれば読み直す）"""
+        meta = self._read_meta()
+        if meta is None:
+            return
+        if int(meta["generation"]) != self._generation:
+            self._generation = int(meta["generation"])
+            self._dim = int(meta["dim"])
+            self._index = {}
+            self._index_offset = 0
+            self._matrix = None
+        if not self._index_path.exists():
+            return
+        with open(self._index_path, "r", encoding="utf-8") as f:
+            f.seek(self._index_offset)
+            while True:
+                line = f.readline()
+                # 書き込み途中の行は次回に読む
+                if not line or not line.endswith("\n"):
+                    break
+                key, _, row = line.rstrip("\n").partition("\t")
+                if row:
+                    self._index[key] = int(row)
+                self._index_offset = f.tell()
+
+    def _row_count(self) -> int:
+        if self._dim is None or not self._vectors_path.exists():
+            return 0
+        return self._vectors_path.stat().st_size // (self._dim * np.dtype(self.DTYPE).itemsize)
+
+    def _ensure_mapped(self, row: int) -> None:
+        """指定行が読めるようにメモリマップを（必要なら張り直して）用意"""
+        if self._matrix is not None and row < self._matrix.shape[0]:
+            return
+        rows = self._row_count()
+        if rows == 0:
+            self._matrix = None
+            return
+        self._matrix = np.memmap(self._vectors_path, dtype=self.DTYPE, mode="r", shape=(rows, self._dim))
+
+    def get(self, key: str) -> Optional[np.ndarray]:
+        """キーに対応するベクトルを取得（float32で返す）"""
+        return self.get_many([key]).get(key)
+
+    def get_many(self, keys: List[str]) -> Dict[str, np.ndarray]:
+        """複数キーのベクトルをまとめて取得（float32で返す）"""
+        with self._lock:
+            # 未知のキーがあるときだけ他プロセスの追記を取り込む
+            if any(key not in self._index for key in keys):
+                self._refresh_index()
+
+            rows = {key: self._index[key] for key in keys if key in self._index}
+            if not rows:
+                return {}
+            self._ensure_mapped(max(rows.values()))
+            if self._matrix is None:
+                return {}
+            return {
+                key: np.array(self._matrix[row], dtype=np.float32)
+                for key, row in rows.items()
+                if row < self._matrix.shape[0]
+            }
+
+    def put_many(self, items: Dict[str, np.ndarray]) -> None:
+        """複数のベクトルをまとめて追記（上限を超える場合は先にコンパクション）"""
+        if not items:
+            return
+        with self._lock:
+            handle = self._file_lock()
+            try:
+                self._refresh_index()
+                pending = {k: v for k, v in items.items() if k not in self._index}
+                if not pending:
+                    return
+
+                dim = len(next(iter(pending.values())))
+                if self._dim is None:
+                    self._start_generation(dim, [])
+                elif dim != self._dim:
+                    raise ValueError(f"ベクトル次元が一致しません: {dim} != {self._dim}")
+                elif len(self._index) + len(pending) > self.max_entries:
+                    # 新しく追記された方から、追記分と合わせて上限の半分程度に収まるだけ残す
+                    keep = min(self.max_entries // 2, max(0, self.max_entries - len(pending)))
+                    newest = sorted(self._index, key=self._index.__getitem__)
+                    self._start_generation(dim, newest[len(newest) - keep:] if keep else [])
+
+                start_row = self._row_count()
+                keys = list(pending.keys())
+                block = np.vstack([pending[k] for k in keys]).astype(self.DTYPE)
+                with open(self._vectors_path, "ab") as f:
+                    f.write(block.tobytes())
+                    f.flush()
+                    os.fsync(f.fileno())
+
+                # ベクトルを書き終えてからインデックスを追記する
+                with open(self._index_path, "a", encoding="utf-8") as f:
+                    f.write("".join(f"{key}\t{start_row + i}\n" for i, key in enumerate(keys)))
+                self._refresh_index()
+            finally:
+                handle.close()
+
+    def _start_generation(self, dim: int, keep: List[str]) -> None:
+        """keepのベクトルだけをコピーした新しい世代に切り替え、古い世代を削除する
+
+        ファイルロックを取得した状態で呼ぶこと。
+        """
+        old_paths = [self._vectors_path, self._index_path,
+                     self.cache_dir / "vectors.f16", self.cache_dir / "index.tsv"]
+        rows = [self._index[key] for key in keep]
+        if rows:
+            self._ensure_mapped(max(rows))
+
+        generation = self._generation + 1
+        vectors_path = self.cache_dir / f"vectors.{generation}.f32"
+        index_path = self.cache_dir / f"index.{generation}.tsv"
+        with open(vectors_path, "wb") as f:
+            # 保持する件数が多くてもメモリに載せきらないようブロックごとにコピー
+            for i in range(0, len(rows), self.COPY_BLOCK_ROWS):
+                f.write(np.asarray(self._matrix[rows[i:i + self.COPY_BLOCK_ROWS]], dtype=self.DTYPE).tobytes())
+            f.flush()
+            os.fsync(f.fileno())
+        with open(index_path, "w", encoding="utf-8") as f:
+            f.write("".join(f"{key}\t{i}\n" for i, key in enumerate(keep)))
+
+        # meta.jsonを置き換えた時点で読み手が新しい世代に切り替わる
+        meta_tmp = self.cache_dir / "meta.json.tmp"
+        with open(meta_tmp, "w", encoding="utf-8") as f:
+            json.dump({"dim": dim, "dtype": "float32", "generation": generation}, f)
+        os.replace(meta_tmp, self._meta_path)
+
+        self._matrix = None
+        for path in old_paths:
+            if path not in (vectors_path, index_path):
+                try:
+                    path.unlink(missing_ok=True)
+                except OSError:
+                    # 他プロセスがマップ中で消せない場合（Windows）は残しておく
+                    pass
+
+        self._generation = generation
+        self._dim = dim
+        self._index = {key: i for i, key in enumerate(keep)}
+        self._index_offset = index_path.stat().st_size
+
+
+class EmbeddingCache:
+    """上限付きLRUメモリ層と任意のディスク層を持つ埋め込みキャッシュ"""
+
+    def __init__(self, max_entries: int = 100000, cache_dir: Optional[str] = None,
+                 max_disk_entries: int = DiskVectorStore.DEFAULT_MAX_ENTRIES):
+        """
+        Args:
+            max_entries: メモリ層に保持する最大エントリ数
+            cache_dir: ディスク層のディレクトリ（Noneの場合はメモリ層のみ）
+            max_disk_entries: ディスク層に保持する最大エントリ数
+        """
+        if max_entries < 1:
+            raise ValueError("max_entries は 1 以上である必要があります")
+
+        self.max_entries = max_entries
+        self.disk = DiskVectorStore(cache_dir, max_disk_entries) if cache_dir else None
+
+        self._memory: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._lock = threading.RLock()
+
+        # 統計
+        self._memory_hits = 0
+        self._disk_hits = 0
+        self._misses = 0
+        self._evictions = 0
+
+    def _remember(self, key: str, vector: np.ndarray) -> None:
+        """メモリ層に登録し、上限を超えた分をLRUで追い出す"""
+        self._memory[key] = vector
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+            self._evictions += 1
+
+    def get_many(self, keys: List[str]) -> Dict[str, np.ndarray]:
+        """キーのリストからキャッシュ済みのベクトルを取得
+
+        Args:
+            keys: キャッシュキーのリスト
+
+        Returns:
+            見つかったキー -> ベクトル の辞書（見つからないキーは含まない）
+        """
+        found = {}
+        memory_misses = []
+        with self._lock:
+            for key in dict.fromkeys(keys):
+                vector = self._memory.get(key)
+                if vector is not None:
+                    self._memory.move_to_end(key)
+                    self._memory_hits += 1
+                    found[key] = vector
+                else:
+                    memory_misses.append(key)
+
+            if memory_misses and self.disk is not None:
+                for key, vector in self.disk.get_many(memory_misses).items():
+                    self._disk_hits += 1
+                    self._remember(key, vector)
+                    found[key] = vector
+
+            self._misses += sum(1 for key in memory_misses if key not in found)
+        return found
+
+    def put_many(self, items: Dict[str, np.ndarray]) -> None:
+        """ベクトルをメモリ層（とディスク層）に保存"""
+        with self._lock:
+            for key, vector in items.items():
+                self._remember(key, vector)
+            if self.disk is not None:
+                self.disk.put_many(items)
+
+    def clear(self) -> None:
+        """メモリ層を空にする（ディスク層は保持）"""
+        with self._lock:
+            self._memory.clear()
+
+    def get_statistics(self) -> Dict[str, object]:
+        """ヒット/ミス/追い出しの統計を取得"""
+        with self._lock:
+            hits = self._memory_hits + self._disk_hits
+            total = hits + self._misses
+            return {
+                "hits": hits,
+                "memory_hits": self._memory_hits,
+                "disk_hits": self._disk_hits,
+                "misses": self._misses,
+                "evictions": self._evictions,
+                "hit_rate": hits / total if total > 0 else 0.0,
+                "memory_entries": len(self._memory),
+                "max_entries": self.max_entries,
+                "disk_entries": len(self.disk) if self.disk is not None else 0,
+                "max_disk_entries": self.disk.max_entries if self.disk is not None else 0,
+                "disk_enabled": self.disk is not None
+            }
+
+    def reset_statistics(self) -> None:
+        """統計をリセット"""
+        with self._lock:
+            self._memory_hits = 0
+            self._disk_hits = 0
+            self._misses = 0
+            self._evictions = 0
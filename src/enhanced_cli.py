@@ -11,9 +11,14 @@ import sys
 import logging
 from pathlib import Path
 from typing import Dict, List, Any, Optional, Tuple
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 
-from .similarity_strategy import create_similarity_calculator, SimilarityCalculator
+from .similarity_strategy import (
+    DEFAULT_CASCADE_BAND,
+    create_similarity_calculator,
+    SimilarityCalculator,
+    StrategyResult
+)
 from .enhanced_result_format import (
     EnhancedResult,
     ResultFormatter,
@@ -21,6 +26,10 @@ from .enhanced_result_format import (
     create_enhanced_result_from_strategy
 )
 from .dual_file_extractor import DualFileExtractor
+from .checkpoint import ComparisonCheckpoint, DEFAULT_CHECKPOINT_INTERVAL, default_checkpoint_path
+from .llm_batch import DEFAULT_MAX_CONCURRENCY, default_max_concurrency
+from .llm_cache import LLMResponseCache, default_llm_cache_path
+from .llm_client import default_hedge_ratio
 
 logger = logging.getLogger(__name__)
 
@@ -28,13 +37,18 @@ logger = logging.getLogger(__name__)
 @dataclass
 class CLIConfig:
     """CLI設定クラス"""
-    calculation_method: str = "auto"  # "auto", "embedding", "llm"
+    calculation_method: str = "auto"  # "auto", "embedding", "llm", "cascade"
+    cascade_band: Tuple[float, float] = DEFAULT_CASCADE_BAND  # cascadeでLLMに送る埋め込みスコアの範囲
     llm_enabled: bool = False
     use_gpu: bool = False
     prompt_file: Optional[str] = None
     model_name: Optional[str] = None
     temperature: float = 0.2
     max_tokens: int = 64
+    llm_concurrency: int = field(default_factory=default_max_concurrency)  # LLMへの同時リクエスト数の上限（1で順次処理）
+    llm_hedge_ratio: float = field(default_factory=default_hedge_ratio)  # 遅いリクエストのヘッジに使う割合（0で無効）
+    llm_cache: bool = True  # 同じリクエストにはLLM応答キャッシュの結果を使う
+    llm_pack_size: int = 1  # 1回のLLMリクエストでまとめて評価するペア数
     fallback_enabled: bool = True
     legacy_mode: bool = False
     verbose: bool = False
@@ -46,19 +60,39 @@ class CLIConfig:
     dual_file2: Optional[str] = None
     dual_column: str = "inference"
     strategy_method: Optional[str] = None
+    # チェックポイント（中断した処理の再開用）
+    resume: bool = False
+    checkpoint_file: Optional[str] = None
+    checkpoint_interval: int = DEFAULT_CHECKPOINT_INTERVAL
 
     def __post_init__(self):
         """設定値のバリデーション"""
-        valid_methods = ["auto", "embedding", "llm"]
+        valid_methods = ["auto", "embedding", "llm", "cascade"]
         if self.calculation_method not in valid_methods:
             raise ValueError(f"無効な計算方法: {self.calculation_method}")
 
+        low, high = self.cascade_band
+        if not 0.0 <= low <= high <= 1.0:
+            raise ValueError("cascade_bandは0.0 <= 下限 <= 上限 <= 1.0で指定してください")
+
         if not 0.0 <= self.temperature <= 1.0:
             raise ValueError("temperatureは0.0から1.0の範囲で指定してください")
 
         if self.max_tokens < 1:
             raise ValueError("max_tokensは1以上である必要があります")
 
+        if self.llm_concurrency < 1:
+            raise ValueError("llm_concurrencyは1以上である必要があります")
+
+        if not 0.0 <= self.llm_hedge_ratio <= 1.0:
+            raise ValueError("llm_hedge_ratioは0.0から1.0の範囲で指定してください")
+
+        if self.llm_pack_size < 1:
+            raise ValueError("llm_pack_sizeは1以上である必要があります")
+
+        if self.checkpoint_interval < 1:
+            raise ValueError("checkpoint_intervalは1以上である必要があります")
+
     def to_llm_config(self) -> Optional[Dict[str, Any]]:
         """LLM設定辞書を生成"""
         if not self.llm_enabled:
@@ -66,7 +100,10 @@ class CLIConfig:
 
         config = {
             "temperature": self.temperature,
-            "max_tokens": self.max_tokens
+            "max_tokens": self.max_tokens,
+            "max_concurrency": self.llm_concurrency,
+            "hedge_ratio": self.llm_hedge_ratio,
+            "cache_path": default_llm_cache_path() if self.llm_cache else None
         }
 
         if self.model_name:
@@ -106,6 +143,7 @@ class EnhancedCLI:
         # JSONLファイルの読み込みと解析
         json_pairs = []
         original_data = []
+        line_numbers = []
 
         path = Path(file_path)
         if not path.exists():
@@ -123,6 +161,7 @@ class EnhancedCLI:
 
                     json_pairs.append((inference1, inference2))
                     original_data.append(data)
+                    line_numbers.append(line_num)
 
                 except json.JSONDecodeError as e:
                     logger.warning(f"{line_num}行目のJSONパースエラー: {e}")
@@ -140,17 +179,76 @@ class EnhancedCLI:
                 "metadata": self.result_formatter.metadata_collector.collect_system_metadata()
             }
 
-        # バッチ類似度計算
-        strategy_results = await calculator.calculate_batch_similarity(
-            json_pairs,
-            method=config.calculation_method,
-            sequential=True,  # LLM使用時はレート制限対応
-            fallback_enabled=config.fallback_enabled
-        )
+        # チェックポイント（処理済みの行は結果を復元してスキップ）
+        # 埋め込みのみの計算は再実行が速いため、--resume / --checkpoint-file 指定時とLLMを使う場合だけ記録する
+        checkpoint = None
+        if config.resume or config.checkpoint_file or config.llm_enabled \
+                or config.calculation_method in ("llm", "cascade"):
+            checkpoint = ComparisonCheckpoint(
+                config.checkpoint_file or default_checkpoint_path(file_path),
+                file_path,
+                options={
+                    "calculation_method": config.calculation_method,
+                    **({"cascade_band": list(config.cascade_band)} if config.calculation_method == "cascade" else {}),
+                    "model_name": config.model_name,
+                    "prompt_file": config.prompt_file,
+                    "temperature": config.temperature,
+                    "max_tokens": config.max_tokens,
+                    "llm_pack_size": config.llm_pack_size
+                }
+            )
+        completed = checkpoint.load() if checkpoint is not None and config.resume else {}
+        if completed:
+            logger.info(f"チェックポイントから{len(completed)}件の結果を復元しました: {checkpoint.path}")
+
+        strategy_results: List[Optional[StrategyResult]] = [
+            StrategyResult(**completed[line_num]) if line_num in completed else None
+            for line_num in line_numbers
+        ]
+        pending = [i for i, result in enumerate(strategy_results) if result is None]
+
+        # この実行でのLLM応答キャッシュのヒット/ミスを出力に含める
+        response_cache = getattr(calculator, "response_cache", None)
+        cache_before = response_cache.get_statistics() if isinstance(response_cache, LLMResponseCache) else None
+
+        # バッチ類似度計算（完了した結果をcheckpoint_interval件たまるごとに記録）
+        unrecorded: Dict[int, Dict[str, Any]] = {}
+
+        def record_result(index: int, strategy_result: StrategyResult) -> None:
+            i = pending[index]
+            strategy_results[i] = strategy_result
+            if checkpoint is None:
+                return
+            unrecorded[line_numbers[i]] = strategy_result.to_dict()
+            if len(unrecorded) >= config.checkpoint_interval:
+                checkpoint.record(unrecorded)
+                unrecorded.clear()
+
+        try:
+            batch_results = await calculator.calculate_batch_similarity(
+                [json_pairs[i] for i in pending],
+                method=config.calculation_method,
+                sequential=config.llm_concurrency <= 1,  # 並列時は同時リクエスト数をAIMDで調整
+                fallback_enabled=config.fallback_enabled,
+                pack_size=config.llm_pack_size,
+                on_result=record_result
+            )
+        except BaseException:
+            # 例外やCtrl-Cで中断した場合も、間隔に満たない完了分を記録してから抜ける
+            if checkpoint is not None and unrecorded:
+                checkpoint.record(unrecorded)
+                unrecorded.clear()
+            raise
+        # コールバックで受け取らなかった結果を補う
+        for i, strategy_result in zip(pending, batch_results):
+            if strategy_results[i] is None:
+                strategy_results[i] = strategy_result
 
         # 拡張結果の作成
         enhanced_results = []
         for i, (strategy_result, original_row) in enumerate(zip(strategy_results, original_data)):
+            if strategy_result is None:
+                continue
             enhanced_result = create_enhanced_result_from_strategy(
                 strategy_result,
                 input_data={
@@ -161,8 +259,22 @@ class EnhancedCLI:
             )
             enhanced_results.append(enhanced_result)
 
+        # 全行を処理し終えたらチェックポイントは不要
+        if checkpoint is not None:
+            checkpoint.remove()
+
         # バッチ結果のフォーマット
-        return self.result_formatter.format_batch_results(enhanced_results, output_type)
+        result = self.result_formatter.format_batch_results(enhanced_results, output_type)
+        if cache_before is not None and "metadata" in result:
+            cache_after = response_cache.get_statistics()
+            hits = cache_after["hits"] - cache_before["hits"]
+            misses = cache_after["misses"] - cache_before["misses"]
+            result["metadata"]["llm_cache"] = {
+                "hits": hits,
+                "misses": misses,
+                "hit_rate": hits / (hits + misses) if hits + misses > 0 else 0.0
+            }
+        return result
 
     async def process_dual_files(
         self,
@@ -277,6 +389,58 @@ class EnhancedCLI:
             return self.result_formatter.format_score_output(enhanced_result)
 
 
+def _add_llm_options(parser: argparse.ArgumentParser, checkpoint: bool = True) -> None:
+    """LLM関連・出力・チェックポイントのオプションをパーサーに追加
+
+    Args:
+        parser: オプションを追加するパーサー
+        checkpoint: チェックポイントのオプションを追加するか（デュアルファイル処理は記録しない）
+    """
+    # LLM関連オプション
+    llm_group = parser.add_argument_group('LLM options', 'LLMベース類似度判定オプション（vLLM API対応）')
+    llm_group.add_argument('--llm', action='store_true', help='LLMベース判定を有効化')
+    llm_group.add_argument('--method', choices=['auto', 'embedding', 'llm', 'cascade'], default='auto',
+                          help='計算方法の選択 (default: auto)')
+    llm_group.add_argument('--prompt-file', help='プロンプトテンプレートファイルのパス')
+    llm_group.add_argument('--model', '--llm-model', dest='llm_model',
+                          help='使用するLLMモデル名 (default: qwen3-14b-awq)')
+    llm_group.add_argument('--temperature', type=float, default=0.2,
+                          help='LLM生成温度 (0.0-1.0, default: 0.2)')
+    llm_group.add_argument('--max-tokens', type=int, default=64,
+                          help='最大トークン数 (default: 64)')
+    llm_group.add_argument('--llm-concurrency', type=int, default=default_max_concurrency(),
+                          help=f'LLMへの同時リクエスト数の上限。応答時間と429に応じて自動調整、1で順次処理 (default: 環境変数 VLLM_MAX_CONCURRENCY または {DEFAULT_MAX_CONCURRENCY})')
+    llm_group.add_argument('--llm-hedge-ratio', type=float, default=default_hedge_ratio(),
+                          help='応答時間がp95を超えたリクエストに同じリクエストをもう1つ送る割合の上限。0で無効 (default: 環境変数 VLLM_HEDGE_RATIO または 0)')
+    llm_group.add_argument('--no-llm-cache', action='store_false', dest='llm_cache', default=True,
+                          help='LLM応答キャッシュを使わずに毎回vLLMへ問い合わせる')
+    llm_group.add_argument('--llm-pack-size', type=int, default=1,
+                          help='1回のLLMリクエストでまとめて評価するペア数。解析できなかったペアは1件ずつ再評価 (default: 1)')
+    llm_group.add_argument('--cascade-band', type=float, nargs=2, metavar=('LOW', 'HIGH'),
+                          default=list(DEFAULT_CASCADE_BAND),
+                          help=f'--method cascade でLLMに送る埋め込みスコアの範囲 (default: {DEFAULT_CASCADE_BAND[0]} {DEFAULT_CASCADE_BAND[1]})')
+    llm_group.add_argument('--no-fallback', action='store_false', dest='fallback_enabled',
+                          default=True, help='フォールバック機能を無効化')
+
+    # 出力オプション
+    output_group = parser.add_argument_group('Output options', '出力制御オプション')
+    output_group.add_argument('--legacy', action='store_true',
+                             help='レガシー互換出力フォーマット')
+    output_group.add_argument('--verbose', '-v', action='store_true', help='詳細ログ出力')
+
+    if not checkpoint:
+        return
+
+    # チェックポイントオプション
+    checkpoint_group = parser.add_argument_group('Checkpoint options', '中断した処理の再開オプション')
+    checkpoint_group.add_argument('--resume', action='store_true',
+                                  help='チェックポイントから処理済みの行をスキップして再開')
+    checkpoint_group.add_argument('--checkpoint-file',
+                                  help='チェックポイントファイルのパス (default: ~/.cache/json_compare/checkpoints/ 以下に入力ファイルごとに作成)')
+    checkpoint_group.add_argument('--checkpoint-interval', type=int, default=DEFAULT_CHECKPOINT_INTERVAL,
+                                  help=f'チェックポイントを記録する行数の間隔 (default: {DEFAULT_CHECKPOINT_INTERVAL})')
+
+
 def create_parser() -> argparse.ArgumentParser:
     """テスト互換性のための簡易パーサー作成関数"""
     return create_enhanced_argument_parser()
@@ -298,30 +462,7 @@ def create_enhanced_argument_parser() -> argparse.ArgumentParser:
     parser.add_argument('-o', '--output', help='出力ファイルパス')
     parser.add_argument('--gpu', action='store_true', help='GPUを使用する')
 
-    # LLM関連オプション
-    llm_group = parser.add_argument_group('LLM options', 'LLMベース類似度判定オプション（vLLM API対応）')
-    llm_group.add_argument('--llm', action='store_true',
-                          help='LLMベース判定を有効化')
-    llm_group.add_argument('--method', choices=['auto', 'embedding', 'llm'],
-                          default='auto',
-                          help='計算方法の選択 (default: auto)')
-    llm_group.add_argument('--prompt-file',
-                          help='プロンプトテンプレートファイルのパス')
-    llm_group.add_argument('--model', '--llm-model', dest='llm_model',
-                          help='使用するLLMモデル名 (default: qwen3-14b-awq)')
-    llm_group.add_argument('--temperature', type=float, default=0.2,
-                          help='LLM生成温度 (0.0-1.0, default: 0.2)')
-    llm_group.add_argument('--max-tokens', type=int, default=64,
-                          help='最大トークン数 (default: 64)')
-    llm_group.add_argument('--no-fallback', action='store_false', dest='fallback_enabled',
-                          default=True, help='フォールバック機能を無効化')
-
-    # 出力オプション
-    output_group = parser.add_argument_group('Output options', '出力制御オプション')
-    output_group.add_argument('--legacy', action='store_true',
-                             help='レガシー互換出力フォーマット')
-    output_group.add_argument('--verbose', '-v', action='store_true',
-                             help='詳細ログ出力')
+    _add_llm_options(parser)
 
     # デュアルファイル用の隠し引数（サブコマンドとしても使用可能）
     parser.add_argument('--dual', action='store_true', help=argparse.SUPPRESS)
@@ -344,25 +485,7 @@ def create_single_file_parser() -> argparse.ArgumentParser:
     parser.add_argument('-o', '--output', help='出力ファイルパス')
     parser.add_argument('--gpu', action='store_true', help='GPUを使用する')
 
-    # LLM関連オプション
-    llm_group = parser.add_argument_group('LLM options', 'LLMベース類似度判定オプション（vLLM API対応）')
-    llm_group.add_argument('--llm', action='store_true', help='LLMベース判定を有効化')
-    llm_group.add_argument('--method', choices=['auto', 'embedding', 'llm'], default='auto',
-                          help='計算方法の選択 (default: auto)')
-    llm_group.add_argument('--prompt-file', help='プロンプトテンプレートファイルのパス')
-    llm_group.add_argument('--model', '--llm-model', dest='llm_model', help='使用するLLMモデル名')
-    llm_group.add_argument('--temperature', type=float, default=0.2,
-                          help='LLM生成温度 (0.0-1.0, default: 0.2)')
-    llm_group.add_argument('--max-tokens', type=int, default=64,
-                          help='最大トークン数 (default: 64)')
-    llm_group.add_argument('--no-fallback', action='store_false', dest='fallback_enabled',
-                          default=True, help='フォールバック機能を無効化')
-
-    # 出力オプション
-    output_group = parser.add_argument_group('Output options', '出力制御オプション')
-    output_group.add_argument('--legacy', action='store_true',
-                             help='レガシー互換出力フォーマット')
-    output_group.add_argument('--verbose', '-v', action='store_true', help='詳細ログ出力')
+    _add_llm_options(parser)
 
     return parser
 
@@ -381,25 +504,7 @@ def create_dual_file_parser() -> argparse.ArgumentParser:
     parser.add_argument('-o', '--output', help='出力ファイルパス')
     parser.add_argument('--gpu', action='store_true', help='GPUを使用する')
 
-    # LLM関連オプション
-    llm_group = parser.add_argument_group('LLM options', 'LLMベース類似度判定オプション（vLLM API対応）')
-    llm_group.add_argument('--llm', action='store_true', help='LLMベース判定を有効化')
-    llm_group.add_argument('--method', choices=['auto', 'embedding', 'llm'], default='auto',
-                          help='計算方法の選択 (default: auto)')
-    llm_group.add_argument('--prompt-file', help='プロンプトテンプレートファイルのパス')
-    llm_group.add_argument('--model', '--llm-model', dest='llm_model', help='使用するLLMモデル名')
-    llm_group.add_argument('--temperature', type=float, default=0.2,
-                          help='LLM生成温度 (0.0-1.0, default: 0.2)')
-    llm_group.add_argument('--max-tokens', type=int, default=64,
-                          help='最大トークン数 (default: 64)')
-    llm_group.add_argument('--no-fallback', action='store_false', dest='fallback_enabled',
-                          default=True, help='フォールバック機能を無効化')
-
-    # 出力オプション
-    output_group = parser.add_argument_group('Output options', '出力制御オプション')
-    output_group.add_argument('--legacy', action='store_true',
-                             help='レガシー互換出力フォーマット')
-    output_group.add_argument('--verbose', '-v', action='store_true', help='詳細ログ出力')
+    _add_llm_options(parser, checkpoint=False)
 
     return parser
 
@@ -432,12 +537,17 @@ def parse_enhanced_args(args: List[str] = None) -> Tuple[argparse.Namespace, CLI
     # CLI設定の作成
     config = CLIConfig(
         calculation_method=getattr(parsed_args, 'method', 'auto'),
+        cascade_band=tuple(getattr(parsed_args, 'cascade_band', DEFAULT_CASCADE_BAND)),
         llm_enabled=getattr(parsed_args, 'llm', False),
         use_gpu=getattr(parsed_args, 'gpu', False),
         prompt_file=getattr(parsed_args, 'prompt_file', None),
         model_name=getattr(parsed_args, 'llm_model', None),
         temperature=getattr(parsed_args, 'temperature', 0.2),
         max_tokens=getattr(parsed_args, 'max_tokens', 64),
+        llm_concurrency=getattr(parsed_args, 'llm_concurrency', default_max_concurrency()),
+        llm_hedge_ratio=getattr(parsed_args, 'llm_hedge_ratio', default_hedge_ratio()),
+        llm_cache=getattr(parsed_args, 'llm_cache', True),
+        llm_pack_size=getattr(parsed_args, 'llm_pack_size', 1),
         fallback_enabled=getattr(parsed_args, 'fallback_enabled', True),
         legacy_mode=getattr(parsed_args, 'legacy', False),
         verbose=getattr(parsed_args, 'verbose', False),
@@ -448,7 +558,10 @@ def parse_enhanced_args(args: List[str] = None) -> Tuple[argparse.Namespace, CLI
         dual_file1=getattr(parsed_args, 'file1', None),
         dual_file2=getattr(parsed_args, 'file2', None),
         dual_column=getattr(parsed_args, 'column', 'inference'),
-        strategy_method=getattr(parsed_args, 'method', None)
+        strategy_method=getattr(parsed_args, 'method', None),
+        resume=getattr(parsed_args, 'resume', False),
+        checkpoint_file=getattr(parsed_args, 'checkpoint_file', None),
+        checkpoint_interval=getattr(parsed_args, 'checkpoint_interval', DEFAULT_CHECKPOINT_INTERVAL)
     )
 
     return parsed_args, config
@@ -466,9 +579,13 @@ async def create_similarity_calculator_from_args(config: CLIConfig) -> Similarit
     """
     llm_config = config.to_llm_config()
 
+    # カスケードの範囲はcascade方式のときだけ指定する
+    options = {"cascade_band": config.cascade_band} if config.calculation_method == "cascade" else {}
+
     return await create_similarity_calculator(
         use_gpu=config.use_gpu,
-        llm_config=llm_config
+        llm_config=llm_config,
+        **options
     )
 
 
@@ -546,7 +663,8 @@ JSON比較ツール - 拡張LLM対応版
     --verbose              詳細ログを有効化
 
 計算方法オプション:
-    --method {auto,embedding,llm}  計算方法を指定 (デフォルト: auto)
+    --method {auto,embedding,llm,cascade}  計算方法を指定 (デフォルト: auto)
+                            cascade: 全ペアを埋め込みで採点し、判定が微妙なペアだけLLMで採点
     --llm                   LLMモードを有効化
     --gpu                   GPU計算を使用
 
@@ -554,6 +672,11 @@ LLMオプション:
     --model MODEL           使用するLLMモデル名 (デフォルト: qwen3-14b-awq)
     --temperature TEMP      生成温度 0.0-1.0 (デフォルト: 0.2)
     --max-tokens TOKENS     最大トークン数 (デフォルト: 64)
+    --llm-concurrency N     LLMへの同時リクエスト数の上限 (デフォルト: VLLM_MAX_CONCURRENCY または 16、1で順次処理)
+    --llm-hedge-ratio R     遅いリクエストのヘッジに使う割合の上限 (デフォルト: VLLM_HEDGE_RATIO または 0=無効)
+    --no-llm-cache          LLM応答キャッシュを使わない (キャッシュ先: ~/.cache/json_compare/llm_responses.sqlite)
+    --llm-pack-size K       1回のLLMリクエストでまとめて評価するペア数 (デフォルト: 1)
+    --cascade-band LOW HIGH cascadeでLLMに送る埋め込みスコアの範囲 (デフォルト: 0.4 0.85)
     --prompt-file FILE      カスタムプロンプトファイル (.yaml)
 
 使用例:
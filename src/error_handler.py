@@ -1,14 +1,46 @@
 #!/usr/bin/env python3
 """エラーハンドリングとリカバリユーティリティ"""
 
+import ast
+import io
 import json
 import logging
 import traceback
 import uuid
-from typing import Dict, Any, Optional, List, Tuple
+from dataclasses import dataclass, field
+from typing import Dict, Any, BinaryIO, Callable, Iterator, Optional, List, Tuple
 from datetime import datetime
 from pathlib import Path
 
+from json_repair import repair_json
+
+from .json_parser import get_repair_cache
+from .jsonl_reader import JSONLReader
+from .system_monitor import get_system_sampler
+
+# validate_and_repair_jsonl_streamが保持する修復メッセージの最大件数
+MAX_REPORTED_MESSAGES = 100
+
+
+def _python_literal_to_json(text: str) -> str:
+    """Python literalの辞書をJSON文字列に変換（変換できなければ空文字列）"""
+    try:
+        data = ast.literal_eval(text)
+        if isinstance(data, dict):
+            return json.dumps(data, ensure_ascii=False)
+    except Exception:
+        pass
+    return ""
+
+
+@dataclass
+class StreamValidationResult:
+    """validate_and_repair_jsonl_streamの検証結果"""
+    records: int = 0  # 書き出したレコード数
+    messages: List[str] = field(default_factory=list)  # 修復の警告・エラーメッセージ（先頭のみ）
+    total_messages: int = 0  # 修復の警告・エラーメッセージの総数
+    ok: bool = True  # 検証に成功したか
+
 
 class ErrorHandler:
     """統合的なエラーハンドリングとリカバリ機能"""
@@ -36,27 +68,7 @@ class ErrorHandler:
             return False, None, f"行{line_number}: 空の行"
 
         try:
-            data = json.loads(line)
-
-            # inference1/inference2フィールドの存在確認
-            missing_fields = []
-            if "inference1" not in data:
-                missing_fields.append("inference1")
-            if "inference2" not in data:
-                missing_fields.append("inference2")
-
-            if missing_fields:
-                error_msg = f"行{line_number}: 必須フィールドが欠落: {', '.join(missing_fields)}"
-
-                # 自動修復を試みる
-                if "inference1" not in data:
-                    data["inference1"] = ""
-                if "inference2" not in data:
-                    data["inference2"] = ""
-
-                return True, data, f"{error_msg} (自動修復済み)"
-
-            return True, data, None
+            return ErrorHandler.check_required_fields(json.loads(line), line_number)
 
         except json.JSONDecodeError as e:
             # JSON修復を試みる
@@ -68,17 +80,98 @@ class ErrorHandler:
 
             # シングルクォートをダブルクォートに置換
             if "'" in repaired_line:
-                try:
-                    # Python literalとして評価し、JSONに変換
-                    import ast
-                    data = ast.literal_eval(repaired_line)
-                    if isinstance(data, dict):
-                        return True, data, f"行{line_number}: シングルクォートを修正"
-                except:
-                    pass
+                # Python literalとして評価し、JSONに変換（同じ行の変換結果は修復キャッシュで共有）
+                repaired = get_repair_cache().get_or_repair(
+                    repaired_line, _python_literal_to_json, kind="python_literal"
+                )
+                if repaired:
+                    return True, json.loads(repaired), f"行{line_number}: シングルクォートを修正"
 
             return False, None, f"行{line_number}: JSONパースエラー - {str(e)}"
 
+    @staticmethod
+    def check_required_fields(data: Any, line_number: int) -> Tuple[bool, Optional[Dict], Optional[str]]:
+        """
+        パース済みのレコードの必須フィールドを確認し、欠落していれば補う
+
+        Args:
+            data: パース済みのレコード
+            line_number: 行番号
+
+        Returns:
+            (成功フラグ, 修復済みデータ, エラーメッセージまたはNone)
+        """
+        # inference1/inference2フィールドの存在確認
+        missing_fields = []
+        if "inference1" not in data:
+            missing_fields.append("inference1")
+        if "inference2" not in data:
+            missing_fields.append("inference2")
+
+        if missing_fields:
+            error_msg = f"行{line_number}: 必須フィールドが欠落: {', '.join(missing_fields)}"
+
+            # 自動修復を試みる
+            if "inference1" not in data:
+                data["inference1"] = ""
+            if "inference2" not in data:
+                data["inference2"] = ""
+
+            return True, data, f"{error_msg} (自動修復済み)"
+
+        return True, data, None
+
+    @staticmethod
+    def iter_validated_jsonl(
+        stream: BinaryIO,
+        on_message: Callable[[str], None],
+        max_errors: int = 10
+    ) -> Iterator[Dict]:
+        """
+        JSONLストリームを1件ずつ検証・修復して返す
+
+        JSONLReaderで1回の読み込みのうちに検証するため、複数行にまたがる
+        JSONオブジェクトも一時ファイルを介さずに1件として読み出す。
+
+        Args:
+            stream: JSONLのバイナリストリーム
+            on_message: 修復の警告・エラーメッセージを受け取るコールバック
+            max_errors: 許容する最大エラー数
+
+        Yields:
+            検証・修復済みのレコード
+
+        Raises:
+            _TooManyErrors: エラーがmax_errors件に達した場合
+            UnicodeDecodeError: UTF-8として読めない行がある場合
+        """
+        critical_errors = 0
+
+        def accept(success: bool, data: Optional[Dict], error_msg: Optional[str]) -> Optional[Dict]:
+            nonlocal critical_errors
+            if success and data:
+                if error_msg:  # 修復済みの警告
+                    on_message(f"⚠️ {error_msg}")
+                return data
+
+            critical_errors += 1
+            on_message(f"❌ {error_msg}")
+            if critical_errors >= max_errors:
+                raise _TooManyErrors()
+            return None
+
+        def repair(line: str, line_number: int) -> Optional[Dict]:
+            # JSONとして読めない行はvalidate_jsonl_lineで修復を試みる
+            return accept(*ErrorHandler.validate_jsonl_line(line, line_number))
+
+        for record in JSONLReader.from_stream(stream, repair=repair):
+            if record.repaired:
+                yield record.data
+                continue
+            data = accept(*ErrorHandler.check_required_fields(record.data, record.line_num))
+            if data is not None:
+                yield data
+
     @staticmethod
     def validate_and_repair_jsonl(content: str, max_errors: int = 10) -> Tuple[List[Dict], List[str], bool]:
         """
@@ -91,28 +184,16 @@ class ErrorHandler:
         Returns:
             (修復済みデータのリスト, エラーメッセージのリスト, 成功フラグ)
         """
-        lines = content.strip().split('\n')
         repaired_data = []
         error_messages = []
-        critical_errors = 0
-
-        for i, line in enumerate(lines, 1):
-            if not line.strip():
-                continue
-
-            success, data, error_msg = ErrorHandler.validate_jsonl_line(line, i)
 
-            if success and data:
+        try:
+            stream = io.BytesIO(content.encode('utf-8'))
+            for data in ErrorHandler.iter_validated_jsonl(stream, error_messages.append, max_errors):
                 repaired_data.append(data)
-                if error_msg:  # 修復済みの警告
-                    error_messages.append(f"⚠️ {error_msg}")
-            else:
-                critical_errors += 1
-                error_messages.append(f"❌ {error_msg}")
-
-                if critical_errors >= max_errors:
-                    error_messages.append(f"エラーが{max_errors}件を超えたため処理を中止")
-                    return repaired_data, error_messages, False
+        except _TooManyErrors:
+            error_messages.append(f"エラーが{max_errors}件を超えたため処理を中止")
+            return repaired_data, error_messages, False
 
         # 最低限のデータが必要
         if len(repaired_data) == 0:
@@ -121,6 +202,50 @@ class ErrorHandler:
 
         return repaired_data, error_messages, True
 
+    @staticmethod
+    def validate_and_repair_jsonl_stream(stream: BinaryIO, output_path: str,
+                                         max_errors: int = 10) -> "StreamValidationResult":
+        """
+        JSONLストリームを検証・修復しながら1行1オブジェクト形式でファイルに書き出す
+
+        アップロード全体や修復済みデータのリストをメモリに保持しないため、
+        メモリ使用量は入力の大きさによらず1行（複数行オブジェクトなら1件）分に収まる。
+
+        Args:
+            stream: JSONLのバイナリストリーム
+            output_path: 修復済みJSONLの出力先
+            max_errors: 許容する最大エラー数
+
+        Returns:
+            検証結果（メッセージは先頭MAX_REPORTED_MESSAGES件のみ保持）
+
+        Raises:
+            UnicodeDecodeError: UTF-8として読めない行がある場合
+        """
+        result = StreamValidationResult()
+
+        def on_message(message: str) -> None:
+            result.total_messages += 1
+            if len(result.messages) < MAX_REPORTED_MESSAGES:
+                result.messages.append(message)
+
+        with open(output_path, 'w', encoding='utf-8') as output:
+            try:
+                for data in ErrorHandler.iter_validated_jsonl(stream, on_message, max_errors):
+                    output.write(json.dumps(data, ensure_ascii=False) + '\n')
+                    result.records += 1
+            except _TooManyErrors:
+                result.messages.append(f"エラーが{max_errors}件を超えたため処理を中止")
+                result.ok = False
+                return result
+
+        # 最低限のデータが必要
+        if result.records == 0:
+            result.messages.append("有効なデータが1件もありません")
+            result.ok = False
+
+        return result
+
     @staticmethod
     def format_user_error(error_id: str, error_type: str, details: Dict[str, Any]) -> Dict[str, Any]:
         """
@@ -186,29 +311,32 @@ class ErrorHandler:
         """
         システムリソースをチェック
 
+        バックグラウンドのサンプラーが取得した最新のスナップショットで判定する。
+
         Returns:
             (正常フラグ, エラーメッセージまたはNone)
         """
-        import psutil
+        snapshot = get_system_sampler().snapshot
 
         # メモリチェック（利用可能メモリが500MB未満の場合エラー）
-        memory = psutil.virtual_memory()
-        if memory.available < 500 * 1024 * 1024:  # 500MB
-            return False, f"メモリ不足: 利用可能 {memory.available / (1024*1024):.0f}MB"
+        if snapshot.memory_available < 500 * 1024 * 1024:  # 500MB
+            return False, f"メモリ不足: 利用可能 {snapshot.memory_available / (1024*1024):.0f}MB"
 
         # ディスク容量チェック（利用可能容量が100MB未満の場合エラー）
-        disk = psutil.disk_usage('/')
-        if disk.free < 100 * 1024 * 1024:  # 100MB
-            return False, f"ディスク容量不足: 利用可能 {disk.free / (1024*1024):.0f}MB"
+        if snapshot.disk_free < 100 * 1024 * 1024:  # 100MB
+            return False, f"ディスク容量不足: 利用可能 {snapshot.disk_free / (1024*1024):.0f}MB"
 
         # CPU使用率チェック（90%以上の場合警告）
-        cpu_percent = psutil.cpu_percent(interval=0.1)
-        if cpu_percent > 90:
-            return True, f"CPU高負荷: {cpu_percent:.0f}%"
+        if snapshot.cpu_percent > 90:
+            return True, f"CPU高負荷: {snapshot.cpu_percent:.0f}%"
 
         return True, None
 
 
+class _TooManyErrors(Exception):
+    """validate_and_repair_jsonlでエラー数が上限に達したときに読み込みを打ち切るための例外"""
+
+
 class JsonRepair:
     """JSON修復ユーティリティ"""
 
@@ -223,10 +351,9 @@ class JsonRepair:
         Returns:
             修復済みのdict、または修復不可能な場合None
         """
-        # json_repairライブラリを使用
+        # json_repairライブラリを使用（同じ文字列の修復結果は修復キャッシュで共有）
         try:
-            from json_repair import repair_json
-            return repair_json(json_str)
+            return get_repair_cache().get_or_repair(json_str, repair_json)
         except:
             # フォールバック: 基本的な修復を試みる
             json_str = json_str.strip()
@@ -0,0 +1,350 @@
+"""非同期比較ジョブのキューとワーカープール
+
+/api/compare/async などの非同期エンドポイントが受け付けた比較処理を、
+SQLiteに永続化したジョブとして順番に実行する。
+
+- 同時に実行するジョブ数はワーカー数で制限し、それを超えたジョブはキューで待つ
+- 次に実行するジョブは 優先度（小さいほど優先）→ 実行中のジョブが少ないクライアント
+  → 最後にジョブを始めてから長く待っているクライアント → 受付順 で選ぶ
+  （1つのクライアントが大量に投入しても他のクライアントのジョブは後回しにならない）
+- サーバーの再起動時には未完了のジョブをキューに戻す（実行中だったジョブはresume=Trueで再実行）
+- 待ち中・実行中のジョブはキャンセルできる
+- SQLiteの読み書きはイベントループを止めないよう既定のエグゼキューターで行う
+"""
+
+import asyncio
+import functools
+import json
+import math
+import multiprocessing
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from collections import deque
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+JOB_STATUSES = ("queued", "running", "completed", "failed", "cancelled")
+FINISHED_STATUSES = ("completed", "failed", "cancelled")
+JOB_EXECUTORS = ("thread", "process")
+
+# 待ち時間・実行時間の統計に使う直近のジョブ数
+STATISTICS_WINDOW = 1000
+
+# ジョブの処理関数: (ジョブID, パラメータ, 中断したジョブの再実行か) -> None
+JobHandler = Callable[[str, Dict[str, Any], bool], Awaitable[Any]]
+
+
+class JobStore:
+    """ジョブの状態を保存するSQLiteストア（メソッドは同期のため、JobQueueはエグゼキューターから呼ぶ）"""
+
+    def __init__(self, db_path: str):
+        """
+        Args:
+            db_path: SQLiteデータベースファイルのパス
+        """
+        self.db_path = db_path
+        directory = os.path.dirname(db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS jobs (
+                job_id TEXT PRIMARY KEY,
+                kind TEXT NOT NULL,
+                client_id TEXT NOT NULL,
+                priority INTEGER NOT NULL,
+                status TEXT NOT NULL,
+                params TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                started_at REAL,
+                finished_at REAL,
+                error TEXT
+            )
+            """
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, created_at)")
+
+    @staticmethod
+    def _to_dict(row: sqlite3.Row) -> Dict[str, Any]:
+        job = dict(row)
+        job["params"] = json.loads(job["params"])
+        return job
+
+    def add(self, job_id: str, kind: str, client_id: str, priority: int, params: Dict[str, Any]) -> Dict[str, Any]:
+        """待ち状態のジョブを追加"""
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO jobs (job_id, kind, client_id, priority, status, params, created_at) "
+                "VALUES (?, ?, ?, ?, 'queued', ?, ?)",
+                (job_id, kind, client_id, priority, json.dumps(params, ensure_ascii=False), time.time())
+            )
+        return self.get(job_id)
+
+    def update(self, job_id: str, **fields: Any) -> None:
+        """ジョブの列を更新（status, started_at, finished_at, error）"""
+        columns = ", ".join(f"{name} = ?" for name in fields)
+        with self._lock:
+            self._conn.execute(f"UPDATE jobs SET {columns} WHERE job_id = ?", (*fields.values(), job_id))
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+        return self._to_dict(row) if row is not None else None
+
+    def unfinished(self) -> List[Dict[str, Any]]:
+        """待ち中・実行中のジョブを受付順に列挙"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT * FROM jobs WHERE status IN ('queued', 'running') ORDER BY created_at"
+            ).fetchall()
+        return [self._to_dict(row) for row in rows]
+
+    def count_by_status(self) -> Dict[str, int]:
+        with self._lock:
+            rows = self._conn.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall()
+        counts = dict.fromkeys(JOB_STATUSES, 0)
+        counts.update({status: count for status, count in rows})
+        return counts
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+def _percentile(values: List[float], ratio: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, math.ceil(ratio * len(ordered)) - 1)]
+
+
+class JobQueue:
+    """優先度とクライアント間の公平性を考慮したジョブキューとワーカープール
+
+    Example:
+        queue = JobQueue(JobStore("jobs.db"), workers=2)
+        queue.register("compare", run_comparison)
+        await queue.start()
+        job = await queue.submit("compare", {"input_path": path}, client_id="10.0.0.1")
+    """
+
+    def __init__(self, store: JobStore, workers: int = 2, executor: str = "thread"):
+        """
+        Args:
+            store: ジョブの状態を保存するストア
+            workers: 同時に実行するジョブの最大数
+            executor: 処理関数がCPU処理に使うエグゼキューター（thread/process）
+        """
+        if workers < 1:
+            raise ValueError("workersは1以上で指定してください")
+        if executor not in JOB_EXECUTORS:
+            raise ValueError(f"不明なエグゼキューターです: {executor}（{', '.join(JOB_EXECUTORS)}のいずれか）")
+
+        self.store = store
+        self.workers = workers
+        self.executor_kind = executor
+        self._executor: Optional[Executor] = None
+        self._handlers: Dict[str, JobHandler] = {}
+
+        # スケジューリングの状態（イベントループ内でのみ変更する）
+        self._queued: Dict[str, Dict[str, Any]] = {}
+        self._running: Dict[str, asyncio.Task] = {}
+        self._running_clients: Dict[str, str] = {}
+        self._last_served: Dict[str, float] = {}
+        self._cancelled: set = set()
+        self._condition: Optional[asyncio.Condition] = None
+        self._worker_tasks: List[asyncio.Task] = []
+
+        # 統計
+        self._wait_times: deque = deque(maxlen=STATISTICS_WINDOW)
+        self._run_times: deque = deque(maxlen=STATISTICS_WINDOW)
+
+    @property
+    def executor(self) -> Executor:
+        """処理関数がrun_in_executorに渡すエグゼキューター（ワーカー数で上限を設ける）"""
+        if self._executor is None:
+            if self.executor_kind == "process":
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers, mp_context=multiprocessing.get_context("spawn")
+                )
+            else:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="json_compare_job")
+        return self._executor
+
+    def register(self, kind: str, handler: JobHandler) -> None:
+        """ジョブの種類に処理関数を登録"""
+        self._handlers[kind] = handler
+
+    async def start(self) -> List[Dict[str, Any]]:
+        """ワーカーを起動し、前回の起動時に完了しなかったジョブをキューに戻す
+
+        Returns:
+            キューに戻したジョブのリスト
+        """
+        self._condition = asyncio.Condition()
+        restored = []
+        for job in await self._call_store(self.store.unfinished):
+            job["resume"] = job["status"] == "running"
+            await self._call_store(self.store.update, job["job_id"], status="queued")
+            job["status"] = "queued"
+            self._queued[job["job_id"]] = job
+            restored.append(job)
+
+        self._worker_tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        return restored
+
+    async def stop(self) -> None:
+        """ワーカーを止める（実行中のジョブは次回の起動時に再実行される）"""
+        for task in self._worker_tasks:
+            task.cancel()
+        await asyncio.gather(*self._worker_tasks, return_exceptions=True)
+        self._worker_tasks = []
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    async def submit(self, kind: str, params: Dict[str, Any], client_id: str = "anonymous",
+                     priority: int = 0, job_id: Optional[str] = None) -> Dict[str, Any]:
+        """ジョブを受け付けてキューに入れる
+
+        Args:
+            kind: ジョブの種類（registerで登録した名前）
+            params: 処理関数に渡すパラメータ（JSONにできる値）
+            client_id: 公平性の単位となるクライアントの識別子
+            priority: 優先度（小さいほど先に実行）
+            job_id: ジョブID（省略時は生成）
+
+        Returns:
+            受け付けたジョブ
+        """
+        if kind not in self._handlers:
+            raise ValueError(f"未登録のジョブの種類です: {kind}")
+        job = await self._call_store(self.store.add, job_id or str(uuid.uuid4()), kind, client_id, priority, params)
+        job["resume"] = False
+        self._queued[job["job_id"]] = job
+        self._notify()
+        return job
+
+    async def cancel(self, job_id: str) -> bool:
+        """待ち中または実行中のジョブをキャンセル
+
+        実行中のジョブは処理関数のコルーチンをキャンセルする。エグゼキューターで
+        実行中の同期処理は途中では止まらないため、処理関数はis_cancelledを確認して
+        処理を止め、止まったのを待ってから入力を片付けること。
+
+        Returns:
+            キャンセルした場合True（見つからない・完了済みの場合False）
+        """
+        if job_id in self._queued:
+            del self._queued[job_id]
+            await self._call_store(self.store.update, job_id, status="cancelled", finished_at=time.time())
+            return True
+        task = self._running.get(job_id)
+        if task is not None:
+            self._cancelled.add(job_id)
+            task.cancel()
+            return True
+        return False
+
+    def is_cancelled(self, job_id: str) -> bool:
+        """実行中のジョブにキャンセルが要求されたか（エグゼキューターのスレッドから呼んでもよい）"""
+        return job_id in self._cancelled
+
+    async def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """ジョブの状態（待ち中の場合はキュー内の順番positionを含む）"""
+        job = await self._call_store(self.store.get, job_id)
+        if job is not None and job_id in self._queued:
+            order = sorted(self._queued.values(), key=self._queue_order)
+            job["position"] = next(i for i, queued in enumerate(order, 1) if queued["job_id"] == job_id)
+        return job
+
+    async def get_statistics(self) -> Dict[str, Any]:
+        """キューの深さ・実行中の数・待ち時間などの統計"""
+        now = time.time()
+        waiting = [now - job["created_at"] for job in self._queued.values()]
+        wait_times = list(self._wait_times)
+        run_times = list(self._run_times)
+        return {
+            "workers": self.workers,
+            "executor": self.executor_kind,
+            "queue_depth": len(self._queued),
+            "running": len(self._running),
+            "clients_waiting": len({job["client_id"] for job in self._queued.values()}),
+            "oldest_wait_seconds": max(waiting, default=0.0),
+            "wait_seconds": {
+                "average": sum(wait_times) / len(wait_times) if wait_times else 0.0,
+                "p95": _percentile(wait_times, 0.95),
+                "max": max(wait_times, default=0.0)
+            },
+            "run_seconds": {
+                "average": sum(run_times) / len(run_times) if run_times else 0.0,
+                "p95": _percentile(run_times, 0.95)
+            },
+            "jobs": await self._call_store(self.store.count_by_status)
+        }
+
+    @staticmethod
+    async def _call_store(method: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+        """JobStoreのメソッドをイベントループの外（既定のエグゼキューター）で実行"""
+        return await asyncio.get_running_loop().run_in_executor(None, functools.partial(method, *args, **kwargs))
+
+    def _notify(self) -> None:
+        if self._condition is None:
+            return
+
+        async def notify():
+            async with self._condition:
+                self._condition.notify()
+
+        asyncio.get_running_loop().create_task(notify())
+
+    def _queue_order(self, job: Dict[str, Any]) -> tuple:
+        client = job["client_id"]
+        running = sum(1 for running_client in self._running_clients.values() if running_client == client)
+        return job["priority"], running, self._last_served.get(client, 0.0), job["created_at"]
+
+    def _take_next(self) -> Dict[str, Any]:
+        job = min(self._queued.values(), key=self._queue_order)
+        del self._queued[job["job_id"]]
+        return job
+
+    async def _worker(self) -> None:
+        while True:
+            async with self._condition:
+                await self._condition.wait_for(lambda: bool(self._queued))
+                job = self._take_next()
+            await self._run(job)
+
+    async def _run(self, job: Dict[str, Any]) -> None:
+        job_id = job["job_id"]
+        started_at = time.time()
+        self._wait_times.append(started_at - job["created_at"])
+        self._last_served[job["client_id"]] = started_at
+        self._running_clients[job_id] = job["client_id"]
+        await self._call_store(self.store.update, job_id, status="running", started_at=started_at)
+
+        task = asyncio.create_task(self._handlers[job["kind"]](job_id, job["params"], job.get("resume", False)))
+        self._running[job_id] = task
+        try:
+            await task
+            await self._call_store(self.store.update, job_id, status="completed", finished_at=time.time())
+        except asyncio.CancelledError:
+            if job_id not in self._cancelled:
+                # ワーカー自体の停止（シャットダウン）: runningのまま残し、次回の起動時に再実行する
+                task.cancel()
+                raise
+            await self._call_store(self.store.update, job_id, status="cancelled", finished_at=time.time())
+        except Exception as e:
+            await self._call_store(self.store.update, job_id, status="failed", finished_at=time.time(), error=str(e))
+        finally:
+            self._running.pop(job_id, None)
+            self._running_clients.pop(job_id, None)
+            self._cancelled.discard(job_id)
+            self._run_times.append(time.time() - started_at)
@@ -0,0 +1,289 @@
+"""JSONパーサーの切り替えと段階的なパース
+
+JSONLの各行とinference列の値のパースに使う。orjsonがインストールされていれば
+それを使い（`pip install json_compare[fast]`）、なければ標準のjsonを使う。
+環境変数 JSON_COMPARE_JSON_BACKEND（orjson/json）で明示的に選択できる。
+
+値のパースは安い順に次の段階を試し、どの段階で処理したかを数える。
+
+- fast: 選択したバックエンドでそのままパースできた
+- stdlib: 標準のjsonでのみパースできた（NaNや64ビットを超える整数など）
+- repaired: json_repairで修復してパースできた
+- text: JSONではないプレーンテキスト
+- empty: 空文字列
+
+修復は高コストなため、同じ文字列の修復結果を内容のハッシュをキーに
+上限付きのキャッシュ（RepairCache）で共有する。LLMの出力が同じ形で
+途中切れしている行が多い場合に、修復のやり直しを避けられる。
+"""
+
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, Tuple, Union
+
+from json_repair import repair_json
+
+try:
+    import orjson
+except ImportError:  # orjsonは任意の依存関係
+    orjson = None
+
+JSON_BACKENDS = ("orjson", "json")
+
+# パースの段階（安い順）
+PARSE_TIERS = ("fast", "stdlib", "repaired", "text", "empty")
+
+# 修復してもJSONにならない値を表す内部マーカー
+_NOT_JSON = object()
+
+
+def _default_backend() -> str:
+    """環境変数またはインストール状況から既定のバックエンドを決める"""
+    name = os.environ.get("JSON_COMPARE_JSON_BACKEND")
+    if name in JSON_BACKENDS and (name != "orjson" or orjson is not None):
+        return name
+    return "orjson" if orjson is not None else "json"
+
+
+_backend = _default_backend()
+
+
+def set_json_backend(name: str):
+    """JSONパーサーのバックエンドを設定
+
+    Args:
+        name: "orjson" または "json"
+    """
+    global _backend
+    if name not in JSON_BACKENDS:
+        raise ValueError(f"不明なJSONバックエンドです: {name}（{', '.join(JSON_BACKENDS)}のいずれか）")
+    if name == "orjson" and orjson is None:
+        raise ValueError("orjsonがインストールされていません")
+    _backend = name
+
+
+def get_json_backend() -> str:
+    """現在のJSONパーサーのバックエンドを取得"""
+    return _backend
+
+
+def loads(text: Union[str, bytes]) -> Any:
+    """JSON文字列をパース（json.loadsの代わりに使う）
+
+    orjsonが受け付けない入力（NaNなど）は標準のjsonでパースし直すため、
+    結果とエラーの型（json.JSONDecodeError）は標準のjsonと同じになる。
+    """
+    if _backend == "orjson":
+        try:
+            return orjson.loads(text)
+        except orjson.JSONDecodeError:
+            pass
+    return json.loads(text)
+
+
+class ParseStatistics:
+    """パースの段階ごとの処理件数"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counts = dict.fromkeys(PARSE_TIERS, 0)
+
+    def record(self, tier: str):
+        with self._lock:
+            self._counts[tier] += 1
+
+    def reset(self):
+        with self._lock:
+            self._counts = dict.fromkeys(PARSE_TIERS, 0)
+
+    def get_statistics(self) -> Dict[str, Any]:
+        """段階ごとの件数と割合を取得"""
+        with self._lock:
+            counts = dict(self._counts)
+        total = sum(counts.values())
+        return {
+            "backend": _backend,
+            "total": total,
+            "tiers": counts,
+            "fast_path_rate": counts["fast"] / total if total else 0.0
+        }
+
+
+_statistics = ParseStatistics()
+
+
+def get_parse_statistics() -> ParseStatistics:
+    """プロセス内で共有するパース統計を取得"""
+    return _statistics
+
+
+class RepairCache:
+    """修復結果の上限付きLRUキャッシュ
+
+    キーは (修復の種類, 入力文字列のハッシュ)、値は修復後の文字列（修復できなければ空文字列）。
+    値は不変の文字列なので、呼び出し側がパース結果を変更しても共有に影響しない。
+    """
+
+    def __init__(self, max_entries: int = 10000):
+        """
+        Args:
+            max_entries: 保持する修復結果の最大件数
+        """
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Tuple[str, bytes], str]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _key(kind: str, text: str) -> Tuple[str, bytes]:
+        return kind, hashlib.blake2b(text.encode("utf-8", "surrogatepass"), digest_size=16).digest()
+
+    def get_or_repair(self, text: str, repair: Callable[[str], str], kind: str = "json_repair") -> str:
+        """キャッシュ済みの修復結果を返し、なければ修復して保存
+
+        Args:
+            text: 修復する文字列
+            repair: 修復関数（文字列 -> 修復後の文字列、修復できなければ空文字列）
+            kind: 修復の種類（修復関数ごとに別のキーにする）
+
+        Returns:
+            修復後の文字列
+        """
+        key = self._key(kind, text)
+        with self._lock:
+            repaired = self._entries.get(key)
+            if repaired is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return repaired
+            self.misses += 1
+
+        repaired = repair(text)
+        with self._lock:
+            self._entries[key] = repaired
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return repaired
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def get_statistics(self) -> Dict[str, Any]:
+        """キャッシュの統計（hitsが修復を省略できた件数）"""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "repairs_avoided": self.hits,
+                "hit_rate": self.hits / total if total else 0.0
+            }
+
+
+_repair_cache: Optional[RepairCache] = None
+
+
+def configure_repair_cache(max_entries: int = 10000) -> RepairCache:
+    """CLI・DualFileExtractor・APIで共有する修復キャッシュを設定
+
+    Args:
+        max_entries: 保持する修復結果の最大件数
+
+    Returns:
+        設定したRepairCache
+    """
+    global _repair_cache
+    _repair_cache = RepairCache(max_entries=max_entries)
+    return _repair_cache
+
+
+def get_repair_cache() -> RepairCache:
+    """共有の修復キャッシュを取得（未設定なら環境変数の件数で作成）"""
+    if _repair_cache is None:
+        return configure_repair_cache(int(os.environ.get("JSON_COMPARE_REPAIR_CACHE_SIZE", "10000")))
+    return _repair_cache
+
+
+def _repair_json_text(text: str) -> str:
+    """json_repairで修復（失敗時は空文字列）"""
+    try:
+        return repair_json(text) or ""
+    except Exception:
+        return ""
+
+
+def cached_repair_json(text: str) -> str:
+    """json_repairのrepair_jsonを修復キャッシュ経由で呼ぶ
+
+    Args:
+        text: 修復するJSON文字列
+
+    Returns:
+        修復後のJSON文字列（修復できなければ空文字列）
+    """
+    return get_repair_cache().get_or_repair(text, _repair_json_text)
+
+
+def looks_like_json(text: str) -> bool:
+    """修復を試す価値があるかを安く判定
+
+    json_repairは波括弧・角括弧を含まない文字列を修復できない（空文字列になる）ため、
+    それらを含まないテキストは修復せずにプレーンテキストとして扱う。
+    """
+    return "{" in text or "[" in text
+
+
+def _repair(text: str) -> Any:
+    """json_repairで修復してパース（JSONにならなければ_NOT_JSON）"""
+    repaired = cached_repair_json(text)
+    if not repaired:
+        return _NOT_JSON
+    try:
+        return json.loads(repaired)
+    except ValueError:
+        return _NOT_JSON
+
+
+def parse_value(text: str) -> Tuple[Any, str]:
+    """値を段階的にパースし、処理した段階と一緒に返す
+
+    Args:
+        text: JSON文字列またはプレーンテキスト
+
+    Returns:
+        (パース結果, 段階)。プレーンテキストは{"text": 値}、空文字列はNone
+    """
+    if _backend == "orjson":
+        try:
+            return orjson.loads(text), "fast"
+        except (orjson.JSONDecodeError, TypeError):
+            pass
+        try:
+            return json.loads(text), "stdlib"
+        except (ValueError, TypeError):
+            pass
+    else:
+        try:
+            return json.loads(text), "fast"
+        except (ValueError, TypeError):
+            pass
+
+    if not isinstance(text, str) or not text.strip():
+        return None, "empty"
+
+    if looks_like_json(text):
+        value = _repair(text)
+        if value is not _NOT_JSON:
+            return value, "repaired"
+
+    return {"text": text.strip()}, "text"
@@ -6,11 +6,14 @@ JSONLファイルフォーマット修正ユーティリティ
 
 import json
 import os
+import sys
 import tempfile
 from pathlib import Path
-from typing import Optional, Tuple, List
+from typing import Callable, Optional, Tuple, List
 import shutil
 
+from .jsonl_reader import JSONLError, JSONLReader
+
 
 class JSONLFormatter:
     """JSONLファイルのフォーマットを修正するクラス"""
@@ -26,14 +29,13 @@ class JSONLFormatter:
         Returns:
             正しいフォーマットの場合True
         """
+        def stop(error):
+            raise _FormatIrregular()
+
         try:
-            with open(file_path, 'r', encoding='utf-8') as f:
-                for line_num, line in enumerate(f, 1):
-                    if line.strip():  # 空行はスキップ
-                        try:
-                            json.loads(line)
-                        except json.JSONDecodeError:
-                            return False
+            for record in JSONLReader(file_path, on_error=stop):
+                if record.line_count > 1:
+                    return False
             return True
         except Exception:
             return False
@@ -49,93 +51,128 @@ class JSONLFormatter:
         Returns:
             JSONオブジェクトのリスト
         """
-        json_objects = []
-        current_obj = ""
-        brace_count = 0
-
-        with open(file_path, 'r', encoding='utf-8') as f:
-            for line in f:
-                current_obj += line
-
-                # ブレースカウントで完全なJSONオブジェクトを検出
-                brace_count += line.count('{') - line.count('}')
-
-                if brace_count == 0 and current_obj.strip():
-                    try:
-                        # JSONオブジェクトとしてパース
-                        obj = json.loads(current_obj)
-                        json_objects.append(obj)
-                        current_obj = ""
-                    except json.JSONDecodeError:
-                        # 複数の単一行JSONが混在している可能性
-                        for single_line in current_obj.strip().split('\n'):
-                            if single_line.strip():
-                                try:
-                                    obj = json.loads(single_line)
-                                    json_objects.append(obj)
-                                except:
-                                    pass
-                        current_obj = ""
-
-        return json_objects
+        return [record.data for record in JSONLReader(file_path)]
 
     @classmethod
-    def fix_format(cls, file_path: str, in_place: bool = False) -> Tuple[bool, str]:
+    def fix_format(cls, file_path: str, in_place: bool = False,
+                   on_error: Optional[Callable[[JSONLError], None]] = None) -> Tuple[bool, str]:
         """
         JSONLファイルのフォーマットを修正
 
+        ファイルは1回だけ読む。最初に修正が必要な箇所が見つかった時点で、
+        それまでの（正しい）部分をそのままコピーして出力を開始する。
+
         Args:
             file_path: 修正するファイルのパス
             in_place: 元のファイルを直接修正するか
+            on_error: 読めずに取り除いた行を受け取るコールバック
 
         Returns:
             (成功/失敗, 修正後のファイルパス or エラーメッセージ)
         """
+        output_path = None
         try:
             input_file = Path(file_path)
 
             if not input_file.exists():
                 return False, f"ファイルが存在しません: {file_path}"
 
+            errors = []
+
+            def record_error(error):
+                errors.append(error)
+                if on_error is not None:
+                    on_error(error)
+
+            reader = JSONLReader(file_path, on_error=record_error)
+            output = None
+            record_count = 0
+
+            try:
+                for record in reader:
+                    record_count += 1
+                    irregular_at = errors[0].start if errors else None
+                    if irregular_at is None and record.line_count > 1:
+                        irregular_at = record.start
+                    errors.clear()
+
+                    if output is None:
+                        if irregular_at is None:
+                            continue
+                        # 修正が必要な箇所の直前までをそのままコピー
+                        output_path = cls._create_output_path(input_file, in_place)
+                        output = open(output_path, 'wb')
+                        cls._copy_prefix(file_path, output, irregular_at)
+
+                    # 1行ずつ書き込み
+                    json_line = json.dumps(record.data, ensure_ascii=False, separators=(',', ':'))
+                    output.write((json_line + '\n').encode('utf-8'))
+
+                if output is None and errors:
+                    # 末尾だけが読めない場合
+                    output_path = cls._create_output_path(input_file, in_place)
+                    output = open(output_path, 'wb')
+                    cls._copy_prefix(file_path, output, errors[0].start)
+            finally:
+                if output is not None:
+                    output.close()
+
             # すでに正しいフォーマットの場合はそのまま返す
-            if cls.check_format(file_path):
+            if output is None:
                 return True, file_path
 
-            # JSONオブジェクトをパース
-            json_objects = cls.parse_multiline_json(file_path)
-
-            if not json_objects:
+            if record_count == 0:
+                os.remove(output_path)
                 return False, "有効なJSONオブジェクトが見つかりません"
 
             if in_place:
-                # バックアップを作成
+                # バックアップを作成してから置き換える
                 backup_path = input_file.with_suffix('.jsonl.bak')
                 shutil.copy2(file_path, backup_path)
-                output_path = file_path
-            else:
-                # 一時ファイルに出力
-                temp_fd, output_path = tempfile.mkstemp(suffix='.jsonl')
-                os.close(temp_fd)
-
-            # 1行ずつ書き込み
-            with open(output_path, 'w', encoding='utf-8') as f:
-                for obj in json_objects:
-                    json_line = json.dumps(obj, ensure_ascii=False, separators=(',', ':'))
-                    f.write(json_line + '\n')
+                os.replace(output_path, file_path)
+                return True, file_path
 
             return True, output_path
 
         except Exception as e:
+            if output_path and os.path.exists(output_path):
+                os.remove(output_path)
             return False, str(e)
 
+    @staticmethod
+    def _create_output_path(input_file: Path, in_place: bool) -> str:
+        """修正結果の出力先を作成"""
+        if in_place:
+            # 元のファイルと同じディレクトリに書いてから置き換える
+            temp_fd, output_path = tempfile.mkstemp(suffix='.jsonl', dir=str(input_file.parent))
+        else:
+            # 一時ファイルに出力
+            temp_fd, output_path = tempfile.mkstemp(suffix='.jsonl')
+        os.close(temp_fd)
+        return output_path
+
+    @staticmethod
+    def _copy_prefix(file_path: str, output, length: int) -> None:
+        """ファイル先頭からlengthバイトをそのまま出力にコピー"""
+        with open(file_path, 'rb') as src:
+            remaining = length
+            while remaining > 0:
+                block = src.read(min(remaining, 1 << 20))
+                if not block:
+                    break
+                remaining -= len(block)
+                output.write(block)
+
     @classmethod
-    def ensure_valid_format(cls, file_path: str) -> str:
+    def ensure_valid_format(cls, file_path: str,
+                            on_error: Optional[Callable[[JSONLError], None]] = None) -> str:
         """
         JSONLファイルが正しいフォーマットであることを保証
         必要に応じて修正した一時ファイルを返す
 
         Args:
             file_path: 確認/修正するファイルのパス
+            on_error: 読めずに取り除いた行を受け取るコールバック
 
         Returns:
             正しいフォーマットのファイルパス（元のファイルまたは修正後の一時ファイル）
@@ -143,27 +180,32 @@ class JSONLFormatter:
         Raises:
             ValueError: ファイルの修正に失敗した場合
         """
-        # すでに正しいフォーマットならそのまま返す
-        if cls.check_format(file_path):
-            return file_path
-
-        # フォーマット修正が必要
-        print(f"JSONLファイルのフォーマットを修正中: {os.path.basename(file_path)}")
-        success, result = cls.fix_format(file_path, in_place=False)
+        # 確認と修正を1回の読み込みで行う
+        success, result = cls.fix_format(file_path, in_place=False, on_error=on_error)
 
         if not success:
             raise ValueError(f"JSONLファイルの修正に失敗: {result}")
 
-        print(f"✅ フォーマット修正完了")
+        # すでに正しいフォーマットならそのまま返す
+        if result == file_path:
+            return file_path
+
+        print(f"JSONLファイルのフォーマットを修正中: {os.path.basename(file_path)}", file=sys.stderr)
+        print(f"✅ フォーマット修正完了", file=sys.stderr)
         return result
 
 
-def auto_fix_jsonl_file(file_path: str) -> str:
+class _FormatIrregular(Exception):
+    """check_formatで修正が必要な箇所を見つけたときに読み込みを打ち切るための例外"""
+
+
+def auto_fix_jsonl_file(file_path: str, on_error: Optional[Callable[[JSONLError], None]] = None) -> str:
     """
     JSONLファイルを自動的に修正して返す便利関数
 
     Args:
         file_path: 処理対象のJSONLファイルパス
+        on_error: 読めずに取り除いた行を受け取るコールバック
 
     Returns:
         正しいフォーマットのファイルパス
@@ -171,4 +213,4 @@ def auto_fix_jsonl_file(file_path: str) -> str:
     Raises:
         ValueError: ファイルの修正に失敗した場合
     """
-    return JSONLFormatter.ensure_valid_format(file_path)
\ No newline at end of file
+    return JSONLFormatter.ensure_valid_format(file_path, on_error)
\ No newline at end of file
@@ -0,0 +1,332 @@
+"""ストリーミングJSONLリーダー
+
+JSONLファイルを1回の読み込みで検証・修復しながらレコードを順に返す。
+CLI・JSONLFormatter・DualFileExtractorで共有し、行数を数えるための
+事前の全件読み込みを不要にする。進捗はバイト位置から推定する。
+"""
+
+import contextlib
+import io
+import json
+import os
+import re
+from dataclasses import dataclass
+from typing import Any, BinaryIO, Callable, Iterator, List, Optional, Tuple
+
+from tqdm import tqdm
+
+from .json_parser import loads
+
+# 複数行オブジェクトとして連結する上限（超えたら閉じていないブレースとみなして1行ずつ読み直す）
+MAX_MULTILINE_LINES = 10000
+MAX_MULTILINE_BYTES = 16 * 1024 * 1024
+
+# CLI共通のプログレスバー形式（TqdmInterceptorが "n/total行" を解析する）
+PROGRESS_BAR_FORMAT = '{desc}: {percentage:3.0f}%|{bar}| {n_fmt}/{total_fmt}行 [{elapsed}<{remaining}, {rate_fmt}]'
+
+
+@dataclass
+class JSONLRecord:
+    """JSONLファイルから読み出した1レコード"""
+    line_num: int  # レコードの開始行番号（読み出し開始位置からの1始まり）
+    data: Any  # パース済みの値
+    start: int  # 開始バイト位置
+    end: int  # 終了バイト位置（次の読み出し位置）
+    line_count: int = 1  # レコードがまたがる物理行数
+    repaired: bool = False  # 修復して読み出したか
+
+
+@dataclass
+class JSONLError:
+    """読み出せなかった行"""
+    line_num: int
+    text: str
+    error: Exception
+    start: int
+    end: int
+
+
+class BraceScanner:
+    """文字列リテラルの中を除いて波括弧の深さを数える逐次スキャナー
+
+    行を順に渡すと、それまでの深さを返す。"{不完全" のような文字列の中の
+    波括弧やエスケープされた引用符は数えない。JSONの文字列は改行を含まないため、
+    閉じられていない引用符（途中で切れた行）は行末で文字列の外に戻す。
+    """
+
+    _TOKENS = re.compile(r'[{}"\\]')
+
+    def __init__(self):
+        self.depth = 0
+
+    def feed(self, text: str) -> int:
+        """1行分のテキストを読み進めて現在の深さを返す"""
+        in_string = False
+        skip_to = 0
+        for match in self._TOKENS.finditer(text):
+            pos = match.start()
+            if pos < skip_to:
+                continue
+            token = match.group()
+            if in_string:
+                if token == '\\':
+                    skip_to = pos + 2
+                elif token == '"':
+                    in_string = False
+            elif token == '"':
+                in_string = True
+            elif token == '{':
+                self.depth += 1
+            elif token == '}':
+                self.depth -= 1
+        return self.depth
+
+
+class JSONLReader:
+    """JSONLファイルを1パスで読み出すリーダー
+
+    1行1オブジェクトの行はそのままパースする。パースできない行が開きブレースで
+    終わっていない場合は、ブレースの対応が取れるまで後続行と連結して
+    複数行にまたがるオブジェクトとして読む（ブレースは文字列の外のものだけを
+    BraceScannerで数える）。連結中にインデントのない行が単独で読めた場合や
+    MAX_MULTILINE_LINES / MAX_MULTILINE_BYTES を超えた場合は、ブレースが
+    閉じていないとみなして連結をやめ、それまでの行を1行ずつ読み直す。
+    それでも読めない行は修復関数に渡し、修復もできなければon_errorに通知して読み飛ばす。
+
+    Example:
+        reader = JSONLReader(path)
+        for record in reader:
+            print(record.line_num, record.data, reader.position)
+    """
+
+    def __init__(
+        self,
+        file_path: str,
+        start: int = 0,
+        end: Optional[int] = None,
+        repair: Optional[Callable[[str, int], Optional[Any]]] = None,
+        on_error: Optional[Callable[[JSONLError], None]] = None
+    ):
+        """
+        Args:
+            file_path: JSONLファイルパス
+            start: 読み出し開始バイト位置（行頭であること）
+            end: 読み出し終了バイト位置（Noneの場合はファイル末尾）
+            repair: 読めない行を修復する関数 (行テキスト, 行番号) -> 値またはNone
+            on_error: 読めなかった行を受け取るコールバック
+        """
+        self.file_path = str(file_path)
+        self.stream: Optional[BinaryIO] = None
+        self.start = start
+        self.end = end
+        self.repair = repair
+        self.on_error = on_error
+
+        # 読み出し状況
+        self.lines_read = 0
+        self.position = start
+
+    @classmethod
+    def from_stream(
+        cls,
+        stream: BinaryIO,
+        repair: Optional[Callable[[str, int], Optional[Any]]] = None,
+        on_error: Optional[Callable[[JSONLError], None]] = None
+    ) -> "JSONLReader":
+        """バイナリストリーム（アップロードされたファイルなど）を読み出すリーダーを作成
+
+        ストリームは先頭から1行ずつ読み、読み終わっても閉じない。
+
+        Args:
+            stream: シーク可能なバイナリストリーム
+            repair: 読めない行を修復する関数 (行テキスト, 行番号) -> 値またはNone
+            on_error: 読めなかった行を受け取るコールバック
+
+        Returns:
+            streamを読み出すJSONLReader
+        """
+        reader = cls("<stream>", repair=repair, on_error=on_error)
+        reader.stream = stream
+        return reader
+
+    @classmethod
+    def from_bytes(
+        cls,
+        data: bytes,
+        repair: Optional[Callable[[str, int], Optional[Any]]] = None,
+        on_error: Optional[Callable[[JSONLError], None]] = None
+    ) -> "JSONLReader":
+        """メモリ上のJSONLデータを一時ファイルに書き出さずに読み出すリーダーを作成"""
+        return cls.from_stream(io.BytesIO(data), repair=repair, on_error=on_error)
+
+    @property
+    def total_bytes(self) -> int:
+        """読み出し範囲のバイト数"""
+        if self.end is not None:
+            end = self.end
+        elif self.stream is not None:
+            position = self.stream.tell()
+            end = self.stream.seek(0, os.SEEK_END)
+            self.stream.seek(position)
+        else:
+            end = os.path.getsize(self.file_path)
+        return max(0, end - self.start)
+
+    def _open(self):
+        if self.stream is not None:
+            return contextlib.nullcontext(self.stream)
+        return open(self.file_path, 'rb')
+
+    def __iter__(self) -> Iterator[JSONLRecord]:
+        buffer: List[Tuple[int, str, int, int]] = []
+        buffer_bytes = 0
+        scanner = BraceScanner()
+
+        with self._open() as f:
+            f.seek(self.start)
+            self.position = self.start
+            self.lines_read = 0
+
+            while self.end is None or self.position < self.end:
+                raw = f.readline()
+                if not raw:
+                    break
+                line_start = self.position
+                self.position += len(raw)
+                self.lines_read += 1
+                text = raw.decode('utf-8')
+                line = (self.lines_read, text, line_start, self.position)
+
+                if buffer:
+                    # 複数行オブジェクトの途中
+                    record = self._parse_unindented(line)
+                    if record is not None:
+                        # 新しいレコードが始まっている（前のブレースは閉じていない）
+                        yield from self._each_line(buffer)
+                        buffer = []
+                        yield record
+                        continue
+                    buffer.append(line)
+                    buffer_bytes += len(raw)
+                    if scanner.feed(text) <= 0:
+                        yield from self._flush(buffer)
+                        buffer = []
+                    elif len(buffer) >= MAX_MULTILINE_LINES or buffer_bytes >= MAX_MULTILINE_BYTES:
+                        yield from self._each_line(buffer)
+                        buffer = []
+                    continue
+
+                if not text.strip():
+                    continue
+
+                try:
+                    yield JSONLRecord(self.lines_read, loads(text), line_start, self.position)
+                    continue
+                except json.JSONDecodeError as e:
+                    error = e
+
+                scanner = BraceScanner()
+                if scanner.feed(text) > 0:
+                    # 複数行にまたがるオブジェクトの開始
+                    buffer = [line]
+                    buffer_bytes = len(raw)
+                else:
+                    yield from self._recover(line, error)
+
+            if buffer:
+                yield from self._flush(buffer)
+
+    def _flush(self, buffer: List[Tuple[int, str, int, int]]) -> Iterator[JSONLRecord]:
+        """連結した複数行をオブジェクトとして読む（読めなければ1行ずつ読む）"""
+        joined = ''.join(text for _, text, _, _ in buffer)
+        try:
+            data = loads(joined)
+        except json.JSONDecodeError:
+            # 複数の単一行JSONが混在している可能性
+            yield from self._each_line(buffer)
+            return
+
+        yield JSONLRecord(buffer[0][0], data, buffer[0][2], buffer[-1][3], line_count=len(buffer))
+
+    def _each_line(self, buffer: List[Tuple[int, str, int, int]]) -> Iterator[JSONLRecord]:
+        """連結をやめた行を1行ずつ読む"""
+        for line in buffer:
+            if not line[1].strip():
+                continue
+            try:
+                yield JSONLRecord(line[0], loads(line[1]), line[2], line[3])
+            except json.JSONDecodeError as e:
+                yield from self._recover(line, e)
+
+    @staticmethod
+    def _parse_unindented(line: Tuple[int, str, int, int]) -> Optional[JSONLRecord]:
+        """インデントのない行が単独でオブジェクトとして読めればレコードにする"""
+        line_num, text, start, end = line
+        if not text.startswith('{'):
+            return None
+        try:
+            data = loads(text)
+        except json.JSONDecodeError:
+            return None
+        if not isinstance(data, dict):
+            return None
+        return JSONLRecord(line_num, data, start, end)
+
+    def _recover(self, line: Tuple[int, str, int, int], error: Exception) -> Iterator[JSONLRecord]:
+        """読めない行を修復する（できなければon_errorに通知）"""
+        line_num, text, start, end = line
+        if self.repair is not None:
+            data = self.repair(text, line_num)
+            if data is not None:
+                yield JSONLRecord(line_num, data, start, end, repaired=True)
+                return
+        if self.on_error is not None:
+            self.on_error(JSONLError(line_num, text, error, start, end))
+
+
+class ByteProgressBar:
+    """バイト位置から総行数を推定して表示するプログレスバー
+
+    行数を数えるための事前の読み込みを行わず、読み出し済みのバイト数と行数から
+    総行数を見積もって表示する。完了時には実際の行数に揃える。
+    """
+
+    def __init__(self, total_bytes: int, desc: str):
+        """
+        Args:
+            total_bytes: 読み出すバイト数
+            desc: プログレスバーの説明
+        """
+        self.total_bytes = total_bytes
+        self.pbar = tqdm(total=1 if total_bytes > 0 else 0, desc=desc, unit="行",
+                         ncols=120,
+                         bar_format=PROGRESS_BAR_FORMAT,
+                         miniters=1)
+
+    def advance(self, count: int, position: int) -> None:
+        """進捗を進める
+
+        Args:
+            count: 処理した行数
+            position: 読み出し済みのバイト数
+        """
+        done = self.pbar.n + count
+        if position >= self.total_bytes:
+            estimate = done
+        else:
+            estimate = max(done + 1, round(done * self.total_bytes / max(position, 1)))
+        self.pbar.total = estimate
+        self.pbar.update(count)
+
+    def close(self) -> None:
+        """実際の行数に揃えて終了"""
+        self.pbar.total = self.pbar.n
+        self.pbar.refresh()
+        self.pbar.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
@@ -0,0 +1,229 @@
+"""キー列による2ファイルの結合
+
+dualコマンドで2つのJSONLファイルの行を、行の位置ではなく指定したキー列
+（例: id）の値で対応付ける。
+
+- 小さい方のファイルがメモリ上限に収まる場合: ハッシュ結合
+  （小さい方を辞書に読み込み、大きい方を1行ずつ照合する）
+- 収まらない場合: 外部ソートマージ結合
+  （両ファイルをキー順に整列した一時ファイルのランに書き出し、
+  ランをマージしながら突き合わせる。メモリ使用量はランの大きさで決まる）
+
+同じキーが複数回現れる場合は、出現順に1対1で対応付ける。
+対応相手のない行は件数と先頭のサンプルを報告する。
+"""
+
+import heapq
+import json
+import os
+import tempfile
+from collections import deque
+from itertools import groupby
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+# ハッシュ結合に使うメモリの上限（これを超える場合は外部ソートマージ結合）
+JOIN_MEMORY_LIMIT = int(os.environ.get("JSON_COMPARE_JOIN_MEMORY_MB", "512")) * 1024 * 1024
+
+# 報告する未対応行のサンプル数
+UNMATCHED_SAMPLE_LIMIT = 100
+
+# 1エントリあたりのPythonオブジェクトのおおよそのオーバーヘッド（バイト）
+_ENTRY_OVERHEAD = 200
+
+# 結合キーのない行（どの行とも対応しない）
+_MISSING_KEY = None
+
+# 結合結果の1組: (キーの値, ファイル1の列の値, ファイル2の列の値)
+JoinedPair = Tuple[Any, str, str]
+
+
+def canonical_join_key(value: Any) -> str:
+    """結合キーの値を比較・整列用の文字列にする（1と"1"は区別する）"""
+    return json.dumps(value, ensure_ascii=False, sort_keys=True)
+
+
+class KeyJoin:
+    """キー列による2ファイルの結合
+
+    Example:
+        join = KeyJoin("id", value_of)
+        for key, value1, value2 in join.iter_pairs(records1, size1, records2, size2):
+            ...
+        print(join.summary())
+    """
+
+    def __init__(
+        self,
+        join_key: str,
+        value_of: Callable[[Any], str],
+        memory_limit: Optional[int] = None,
+        temp_dir: Optional[str] = None
+    ):
+        """
+        Args:
+            join_key: 結合に使うキー列の名前
+            value_of: レコードから比較する列の値を取り出す関数
+            memory_limit: ハッシュ結合・ソートのランに使うメモリの上限（バイト）
+            temp_dir: 外部ソートのランを書き出すディレクトリ
+        """
+        self.join_key = join_key
+        self.value_of = value_of
+        self.memory_limit = memory_limit if memory_limit is not None else JOIN_MEMORY_LIMIT
+        self.temp_dir = temp_dir
+
+        # 結合結果
+        self.method: Optional[str] = None
+        self.matched = 0
+        self.unmatched = {1: 0, 2: 0}
+        self.unmatched_samples: Dict[int, List[Dict[str, Any]]] = {1: [], 2: []}
+        self.spilled_runs = 0
+
+    def _entries(self, records: Iterable[Tuple[int, Any]], side: int) -> Iterator[Tuple[str, int, Any, str]]:
+        """レコードを (正規化キー, 行番号, キーの値, 列の値) にする（キーのない行は未対応）"""
+        for line_num, data in records:
+            if not isinstance(data, dict) or self.join_key not in data:
+                self._unmatched(side, line_num, _MISSING_KEY)
+                continue
+            key = data[self.join_key]
+            yield canonical_join_key(key), line_num, key, self.value_of(data)
+
+    def _unmatched(self, side: int, line_num: int, key: Any) -> None:
+        self.unmatched[side] += 1
+        if len(self.unmatched_samples[side]) < UNMATCHED_SAMPLE_LIMIT:
+            self.unmatched_samples[side].append({"line": line_num, "key": key})
+
+    def iter_pairs(
+        self,
+        records1: Iterable[Tuple[int, Any]],
+        size1: int,
+        records2: Iterable[Tuple[int, Any]],
+        size2: int
+    ) -> Iterator[JoinedPair]:
+        """キーが一致する行の組を返す
+
+        Args:
+            records1: ファイル1の (行番号, パース済みの値)
+            size1: ファイル1のバイト数（結合方式の選択に使う）
+            records2: ファイル2の (行番号, パース済みの値)
+            size2: ファイル2のバイト数
+
+        Yields:
+            (キーの値, ファイル1の列の値, ファイル2の列の値)
+            ハッシュ結合では大きい方のファイルの行順、ソートマージ結合ではキー順
+        """
+        if min(size1, size2) <= self.memory_limit:
+            self.method = "hash"
+            if size2 <= size1:
+                yield from self._hash_join(records2, 2, records1, 1)
+            else:
+                yield from self._hash_join(records1, 1, records2, 2)
+        else:
+            self.method = "sort_merge"
+            yield from self._sort_merge_join(records1, records2)
+
+    def _hash_join(self, build_records, build_side: int, probe_records, probe_side: int) -> Iterator[JoinedPair]:
+        """小さい方を辞書に読み込み、大きい方を1行ずつ照合する"""
+        table: Dict[str, deque] = {}
+        for canonical, line_num, key, value in self._entries(build_records, build_side):
+            table.setdefault(canonical, deque()).append((line_num, key, value))
+
+        for canonical, line_num, key, value in self._entries(probe_records, probe_side):
+            candidates = table.get(canonical)
+            if not candidates:
+                self._unmatched(probe_side, line_num, key)
+                continue
+            _, _, build_value = candidates.popleft()
+            self.matched += 1
+            yield (key, build_value, value) if build_side == 1 else (key, value, build_value)
+
+        # 照合されずに残った行は未対応
+        for candidates in table.values():
+            for line_num, key, _ in candidates:
+                self._unmatched(build_side, line_num, key)
+
+    def _sort_merge_join(self, records1, records2) -> Iterator[JoinedPair]:
+        """両ファイルをキー順のランに書き出し、マージしながら突き合わせる"""
+        with tempfile.TemporaryDirectory(prefix="json_compare_join_", dir=self.temp_dir) as work_dir:
+            runs1 = self._write_sorted_runs(self._entries(records1, 1), work_dir, "1")
+            runs2 = self._write_sorted_runs(self._entries(records2, 2), work_dir, "2")
+
+            groups1 = groupby(self._merge_runs(runs1), key=lambda entry: entry[0])
+            groups2 = groupby(self._merge_runs(runs2), key=lambda entry: entry[0])
+            group1 = next(groups1, None)
+            group2 = next(groups2, None)
+
+            while group1 is not None or group2 is not None:
+                if group2 is None or (group1 is not None and group1[0] < group2[0]):
+                    for _, line_num, key, _ in group1[1]:
+                        self._unmatched(1, line_num, key)
+                    group1 = next(groups1, None)
+                elif group1 is None or group2[0] < group1[0]:
+                    for _, line_num, key, _ in group2[1]:
+                        self._unmatched(2, line_num, key)
+                    group2 = next(groups2, None)
+                else:
+                    # 同じキーの行同士を出現順に対応付ける
+                    entries1 = list(group1[1])
+                    entries2 = list(group2[1])
+                    for entry1, entry2 in zip(entries1, entries2):
+                        self.matched += 1
+                        yield entry1[2], entry1[3], entry2[3]
+                    for _, line_num, key, _ in entries1[len(entries2):]:
+                        self._unmatched(1, line_num, key)
+                    for _, line_num, key, _ in entries2[len(entries1):]:
+                        self._unmatched(2, line_num, key)
+                    group1 = next(groups1, None)
+                    group2 = next(groups2, None)
+
+    def _write_sorted_runs(self, entries: Iterator[Tuple[str, int, Any, str]], work_dir: str,
+                           prefix: str) -> List[str]:
+        """エントリをメモリ上限ごとに整列してランのファイルに書き出す"""
+        runs = []
+        buffer = []
+        buffered_bytes = 0
+
+        def spill():
+            # 行番号は入力順なので、(キー, 行番号) で整列すれば同じキーは出現順になる
+            buffer.sort(key=lambda entry: (entry[0], entry[1]))
+            path = os.path.join(work_dir, f"run{prefix}_{len(runs)}.jsonl")
+            with open(path, 'w', encoding='utf-8') as f:
+                for entry in buffer:
+                    f.write(json.dumps(entry, ensure_ascii=False) + '\n')
+            runs.append(path)
+            self.spilled_runs += 1
+
+        for entry in entries:
+            buffer.append(entry)
+            buffered_bytes += len(entry[0]) + len(entry[3]) + _ENTRY_OVERHEAD
+            if buffered_bytes >= self.memory_limit:
+                spill()
+                buffer = []
+                buffered_bytes = 0
+        if buffer:
+            spill()
+        return runs
+
+    @staticmethod
+    def _merge_runs(runs: List[str]) -> Iterator[Tuple[str, int, Any, str]]:
+        """ランをキー順にマージ（各ランから1行ずつしか読まない）"""
+        def read_run(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    yield tuple(json.loads(line))
+
+        return heapq.merge(*(read_run(path) for path in runs), key=lambda entry: (entry[0], entry[1]))
+
+    def summary(self) -> Dict[str, Any]:
+        """結合結果の概要（結合方式・対応数・未対応数とサンプル）"""
+        return {
+            "join_key": self.join_key,
+            "method": self.method,
+            "matched": self.matched,
+            "unmatched_file1": self.unmatched[1],
+            "unmatched_file2": self.unmatched[2],
+            "spilled_runs": self.spilled_runs,
+            "unmatched_samples": {
+                "file1": self.unmatched_samples[1],
+                "file2": self.unmatched_samples[2]
+            }
+        }
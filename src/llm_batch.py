@@ -0,0 +1,204 @@
+"""LLMリクエストの同時実行数制御
+
+vLLMサーバーは複数のリクエストをまとめてバッチ推論できるため、1件ずつ順番に送ると
+サーバーの処理能力を使い切れない。一方で上限なしに送るとキューが伸びて応答時間が悪化し、
+429（レート制限）が返るようになる。
+
+AdaptiveConcurrencyLimiterは同時実行数の上限をAIMD（加算的増加・乗算的減少）で調整する。
+
+- 応答時間が無負荷時（観測した最短の応答時間）の latency_tolerance 倍以内なら、
+  上限を1往復あたりおよそ1ずつ増やす
+- それを超えた場合や429が返った場合は、上限を decrease_factor 倍に減らす
+  （同じ混雑で何度も減らさないよう、減少は直近の応答時間に1回まで）
+"""
+
+import asyncio
+import os
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence, TypeVar
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+# 無負荷時の応答時間を推定するために保持する直近の応答時間の数
+LATENCY_WINDOW = 200
+
+# LLMへの同時リクエスト数の上限の既定値
+DEFAULT_MAX_CONCURRENCY = 16
+
+
+def default_max_concurrency() -> int:
+    """同時リクエスト数の上限の既定値（環境変数 VLLM_MAX_CONCURRENCY で変更できる）"""
+    return int(os.environ.get("VLLM_MAX_CONCURRENCY") or DEFAULT_MAX_CONCURRENCY)
+
+
+class AdaptiveConcurrencyLimiter:
+    """応答時間と429に応じて同時実行数の上限を調整するリミッター
+
+    Example:
+        limiter = AdaptiveConcurrencyLimiter(max_limit=64)
+        async with limiter.slot():
+            start = time.monotonic()
+            response = await client.post(...)
+            limiter.record_latency(time.monotonic() - start)
+    """
+
+    def __init__(self, initial: int = 8, min_limit: int = 1, max_limit: int = 64,
+                 latency_tolerance: float = 2.0, decrease_factor: float = 0.5):
+        """
+        Args:
+            initial: 同時実行数の初期上限
+            min_limit: 同時実行数の下限
+            max_limit: 同時実行数の上限の最大値
+            latency_tolerance: 無負荷時の応答時間の何倍までを混雑していないとみなすか
+            decrease_factor: 混雑時に上限に掛ける係数（0より大きく1未満）
+        """
+        if not 1 <= min_limit <= max_limit:
+            raise ValueError("min_limit と max_limit は 1 <= min_limit <= max_limit で指定してください")
+        if not 0 < decrease_factor < 1:
+            raise ValueError("decrease_factor は 0 より大きく 1 未満である必要があります")
+        if latency_tolerance < 1:
+            raise ValueError("latency_tolerance は 1 以上である必要があります")
+
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.latency_tolerance = latency_tolerance
+        self.decrease_factor = decrease_factor
+        self._limit = float(min(max(initial, min_limit), max_limit))
+
+        self.in_flight = 0
+        self._condition: Optional[asyncio.Condition] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._latencies: deque = deque(maxlen=LATENCY_WINDOW)
+        self._last_decrease = 0.0
+
+        # 統計
+        self.peak_in_flight = 0
+        self.increases = 0
+        self.decreases = 0
+        self.overloads = 0
+
+    @property
+    def limit(self) -> int:
+        """現在の同時実行数の上限"""
+        return int(self._limit)
+
+    @property
+    def baseline_latency(self) -> Optional[float]:
+        """無負荷時の応答時間の推定値（直近で観測した最短の応答時間）"""
+        return min(self._latencies) if self._latencies else None
+
+    def _get_condition(self) -> asyncio.Condition:
+        # CLIはファイルごとにイベントループを作り直すため、ループが変わったら作り直す
+        loop = asyncio.get_running_loop()
+        if self._condition is None or self._loop is not loop:
+            self._condition = asyncio.Condition()
+            self._loop = loop
+        return self._condition
+
+    async def acquire(self) -> None:
+        """空きができるまで待って実行枠を1つ確保"""
+        condition = self._get_condition()
+        async with condition:
+            await condition.wait_for(lambda: self.in_flight < self.limit)
+            self.in_flight += 1
+            self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+
+    async def release(self) -> None:
+        """実行枠を返す"""
+        condition = self._get_condition()
+        async with condition:
+            self.in_flight -= 1
+            condition.notify_all()
+
+    @asynccontextmanager
+    async def slot(self):
+        """実行枠を確保して処理し、終わったら返すコンテキストマネージャー"""
+        await self.acquire()
+        try:
+            yield
+        finally:
+            await self.release()
+
+    def record_latency(self, seconds: float) -> None:
+        """成功したリクエストの応答時間を記録して上限を調整"""
+        self._latencies.append(seconds)
+        if seconds <= self.baseline_latency * self.latency_tolerance:
+            # 加算的増加: 上限の数だけ成功するとおよそ1増える
+            if self._limit < self.max_limit:
+                self._limit = min(self.max_limit, self._limit + 1.0 / self._limit)
+                self.increases += 1
+        else:
+            self._decrease(seconds)
+
+    def record_overload(self) -> None:
+        """429（レート制限）などサーバーの過負荷を記録して上限を減らす"""
+        self.overloads += 1
+        self._decrease(self._latencies[-1] if self._latencies else 0.0)
+
+    def _decrease(self, latency: float) -> None:
+        # 同じ混雑に対して減少を重ねないよう、前回の減少から1往復分は減らさない
+        now = time.monotonic()
+        if now - self._last_decrease < latency:
+            return
+        self._last_decrease = now
+        self._limit = max(float(self.min_limit), self._limit * self.decrease_factor)
+        self.decreases += 1
+
+    def get_statistics(self) -> Dict[str, Any]:
+        """上限・同時実行数・調整回数の統計"""
+        return {
+            "limit": self.limit,
+            "min_limit": self.min_limit,
+            "max_limit": self.max_limit,
+            "in_flight": self.in_flight,
+            "peak_in_flight": self.peak_in_flight,
+            "baseline_latency": self.baseline_latency,
+            "increases": self.increases,
+            "decreases": self.decreases,
+            "overloads": self.overloads
+        }
+
+
+async def run_bounded(
+    items: Sequence[T],
+    func: Callable[[T], Awaitable[R]],
+    limiter: AdaptiveConcurrencyLimiter,
+    on_done: Optional[Callable[[int, Any], None]] = None
+) -> List[Any]:
+    """リミッターの上限以内の同時実行数でfuncを全要素に適用
+
+    同時に存在するタスクはリミッターの上限の最大値までに抑え、
+    結果は完了順ではなく入力順に並べて返す。
+
+    Args:
+        items: 処理する要素
+        func: 1要素を処理するコルーチン関数
+        limiter: 同時実行数を制御するリミッター
+        on_done: 要素の処理が終わるたびに (インデックス, 結果または例外) で呼ぶコールバック（完了順）
+
+    Returns:
+        入力順の結果のリスト（失敗した要素は例外オブジェクト）
+    """
+    results: List[Any] = [None] * len(items)
+    next_index = 0
+
+    async def worker():
+        nonlocal next_index
+        while True:
+            async with limiter.slot():
+                if next_index >= len(items):
+                    return
+                index = next_index
+                next_index += 1
+                try:
+                    results[index] = await func(items[index])
+                except Exception as e:
+                    results[index] = e
+                if on_done is not None:
+                    on_done(index, results[index])
+
+    await asyncio.gather(*(worker() for _ in range(min(limiter.max_limit, len(items)))))
+    return results
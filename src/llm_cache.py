@@ -0,0 +1,233 @@
+"""LLM応答の永続キャッシュ
+
+同じモデル・同じメッセージ・同じ生成パラメータのリクエストにはvLLMへ送らず保存済みの応答を返す。
+データを少し直して評価をやり直すときに、変わっていないペアの推論を省ける。
+
+- キー: リクエストボディ（モデル名、展開済みのメッセージ、temperature、max_tokens など）のSHA-256
+- 保存先: SQLite（WAL）。複数のCLI実行やAPIワーカー間で共有できる
+- 有効期限（TTL）を過ぎた応答は使わずに削除する
+- 件数が上限を超えたら最後に使われた時刻が古いものから削除する
+  （件数は挿入・削除のたびに数え直さず、プロセス内で増減を追跡する）
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Optional
+
+# 既定のキャッシュファイル（環境変数 LLM_CACHE_PATH で変更できる）
+DEFAULT_LLM_CACHE_PATH = os.path.join("~", ".cache", "json_compare", "llm_responses.sqlite")
+
+# 既定の最大件数
+DEFAULT_LLM_CACHE_SIZE = 100000
+
+# 上限を超えたときに上限からさらに削除しておく件数の割合
+# （件数の数え直しと削除を挿入ごとではなく、上限の1%を挿入するごとにまとめて行う）
+EVICTION_HEADROOM = 0.01
+
+
+def default_llm_cache_path() -> str:
+    """既定のキャッシュファイルのパス"""
+    return os.path.expanduser(os.environ.get("LLM_CACHE_PATH") or DEFAULT_LLM_CACHE_PATH)
+
+
+def make_llm_cache_key(request_data: Dict[str, Any]) -> str:
+    """キャッシュキーを生成
+
+    Args:
+        request_data: chat/completions に送るリクエストボディ
+
+    Returns:
+        SHA-256の16進文字列
+    """
+    body = json.dumps(request_data, ensure_ascii=False, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(body.encode("utf-8")).hexdigest()
+
+
+class LLMResponseCache:
+    """TTLと件数上限を持つSQLiteのLLM応答キャッシュ"""
+
+    def __init__(self, db_path: str, ttl: Optional[float] = None, max_entries: int = DEFAULT_LLM_CACHE_SIZE):
+        """
+        Args:
+            db_path: SQLiteデータベースファイルのパス
+            ttl: 応答の有効期限（秒、Noneの場合は無期限）
+            max_entries: 保持する最大件数
+        """
+        if ttl is not None and ttl <= 0:
+            raise ValueError("ttl は正の値で指定してください")
+        if max_entries < 1:
+            raise ValueError("max_entries は 1 以上である必要があります")
+
+        self.db_path = db_path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        directory = os.path.dirname(db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                response TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                accessed_at REAL NOT NULL
+            )
+            """
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed_at)")
+
+        # 保存件数（他のプロセスの追加分は削除時に数え直して反映する）
+        self._count = self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+
+        # 統計
+        self._hits = 0
+        self._misses = 0
+        self._expired = 0
+        self._evictions = 0
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """キーに対応する応答を取得
+
+        Args:
+            key: make_llm_cache_key で生成したキー
+
+        Returns:
+            保存済みのAPIレスポンス（見つからないか期限切れの場合はNone）
+        """
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT response, created_at FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is not None and self.ttl is not None and now - row[1] > self.ttl:
+                self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self._expired += 1
+                self._count -= 1
+                row = None
+            if row is None:
+                self._misses += 1
+                return None
+            self._conn.execute("UPDATE responses SET accessed_at = ? WHERE key = ?", (now, key))
+            self._hits += 1
+        return json.loads(row[0])
+
+    def put(self, key: str, response: Dict[str, Any]) -> None:
+        """応答を保存し、上限を超えた分を古い順に削除"""
+        now = time.time()
+        body = json.dumps(response, ensure_ascii=False)
+        with self._lock:
+            inserted = self._conn.execute(
+                "INSERT OR IGNORE INTO responses (key, response, created_at, accessed_at) VALUES (?, ?, ?, ?)",
+                (key, body, now, now)
+            ).rowcount
+            if not inserted:
+                self._conn.execute(
+                    "UPDATE responses SET response = ?, created_at = ?, accessed_at = ? WHERE key = ?",
+                    (body, now, now, key)
+                )
+                return
+            self._count += 1
+            if self._count > self.max_entries:
+                self._evict()
+
+    def _evict(self) -> None:
+        # 他のプロセスが追加した分も含めて数え直し、上限より少し下まで古い順に削除
+        count = self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+        excess = count - self.max_entries
+        if excess > 0:
+            excess += int(self.max_entries * EVICTION_HEADROOM)
+            deleted = self._conn.execute(
+                "DELETE FROM responses WHERE key IN "
+                "(SELECT key FROM responses ORDER BY accessed_at LIMIT ?)",
+                (excess,)
+            ).rowcount
+            self._evictions += deleted
+            count -= deleted
+        self._count = count
+
+    def purge_expired(self) -> int:
+        """期限切れの応答をまとめて削除
+
+        Returns:
+            削除した件数
+        """
+        if self.ttl is None:
+            return 0
+        with self._lock:
+            deleted = self._conn.execute(
+                "DELETE FROM responses WHERE created_at < ?", (time.time() - self.ttl,)
+            ).rowcount
+            self._expired += deleted
+            self._count -= deleted
+        return deleted
+
+    def clear(self) -> None:
+        """保存済みの応答をすべて削除"""
+        with self._lock:
+            self._conn.execute("DELETE FROM responses")
+            self._count = 0
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    def get_statistics(self) -> Dict[str, Any]:
+        """ヒット/ミス/削除の統計を取得"""
+        entries = len(self)
+        with self._lock:
+            total = self._hits + self._misses
+            return {
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_rate": self._hits / total if total > 0 else 0.0,
+                "expired": self._expired,
+                "evictions": self._evictions,
+                "entries": entries,
+                "max_entries": self.max_entries,
+                "ttl": self.ttl,
+                "path": self.db_path
+            }
+
+
+_caches: Dict[str, LLMResponseCache] = {}
+_caches_lock = threading.Lock()
+
+
+def get_llm_cache_statistics() -> Dict[str, Dict[str, Any]]:
+    """このプロセスで開いている共有キャッシュの統計（パスごと）"""
+    with _caches_lock:
+        caches = list(_caches.items())
+    return {path: cache.get_statistics() for path, cache in caches}
+
+
+def get_llm_response_cache(db_path: Optional[str] = None) -> LLMResponseCache:
+    """パスごとに共有するLLM応答キャッシュを取得
+
+    新しく開く場合は環境変数 LLM_CACHE_TTL（秒）/ LLM_CACHE_SIZE から設定する。
+
+    Args:
+        db_path: SQLiteデータベースファイルのパス（Noneの場合は既定のパス）
+    """
+    path = os.path.abspath(os.path.expanduser(db_path or default_llm_cache_path()))
+    with _caches_lock:
+        cache = _caches.get(path)
+        if cache is None:
+            ttl = os.environ.get("LLM_CACHE_TTL")
+            cache = LLMResponseCache(
+                path,
+                ttl=float(ttl) if ttl else None,
+                max_entries=int(os.environ.get("LLM_CACHE_SIZE", str(DEFAULT_LLM_CACHE_SIZE)))
+            )
+            _caches[path] = cache
+        return cache
@@ -9,15 +9,31 @@ import asyncio
 import os
 import time
 import logging
+import math
 import uuid
+from collections import deque
 from typing import Dict, List, Optional, Any, Union, Callable
 from dataclasses import dataclass, field
 from functools import wraps
 import json
 from tqdm import tqdm
 
+from .llm_batch import DEFAULT_MAX_CONCURRENCY, AdaptiveConcurrencyLimiter, default_max_concurrency
+from .llm_cache import LLMResponseCache, get_llm_response_cache, make_llm_cache_key
+
 logger = logging.getLogger(__name__)
 
+# この秒数を超えても応答がない場合に進捗を表示する
+PROGRESS_NOTICE_DELAY = 5.0
+
+# ヘッジの遅延（p95）を推定し始めるまでに必要な応答時間の数
+HEDGE_MIN_SAMPLES = 20
+
+
+def default_hedge_ratio() -> float:
+    """ヘッジに使うリクエスト数の割合の既定値（環境変数 VLLM_HEDGE_RATIO、未指定で0=無効）"""
+    return float(os.getenv('VLLM_HEDGE_RATIO', '0'))
+
 # メトリクス収集のための遅延インポート
 try:
     from .llm_metrics import LLMMetricsCollector
@@ -42,6 +58,9 @@ class LLMConfig:
     max_retries: int = 3
     retry_delay: float = 1.0
     backoff_factor: float = 2.0
+    max_concurrency: int = DEFAULT_MAX_CONCURRENCY
+    hedge_ratio: float = 0.0  # ヘッジ（予備のリクエスト）に使うリクエスト数の割合（0で無効）
+    cache_path: Optional[str] = None  # 応答キャッシュのSQLiteファイル（Noneでキャッシュしない）
 
     def __post_init__(self):
         """設定値のバリデーション"""
@@ -51,6 +70,10 @@ class LLMConfig:
             raise ValueError("max_tokens は 1 以上である必要があります")
         if self.timeout < 1:
             raise ValueError("timeout は 1 秒以上である必要があります")
+        if self.max_concurrency < 1:
+            raise ValueError("max_concurrency は 1 以上である必要があります")
+        if not 0.0 <= self.hedge_ratio <= 1.0:
+            raise ValueError("hedge_ratio は 0.0 から 1.0 の間である必要があります")
 
     @classmethod
     def from_environment(cls) -> 'LLMConfig':
@@ -61,7 +84,10 @@ class LLMConfig:
             temperature=float(os.getenv('VLLM_TEMPERATURE', str(cls.temperature))),
             max_tokens=int(os.getenv('VLLM_MAX_TOKENS', str(cls.max_tokens))),
             timeout=float(os.getenv('VLLM_TIMEOUT', str(cls.timeout))),
-            auth_token=os.getenv('VLLM_AUTH_TOKEN', cls.auth_token)
+            auth_token=os.getenv('VLLM_AUTH_TOKEN', cls.auth_token),
+            max_concurrency=default_max_concurrency(),
+            hedge_ratio=default_hedge_ratio(),
+            cache_path=os.getenv('LLM_CACHE_PATH') or cls.cache_path
         )
 
     def to_dict(self) -> Dict[str, Any]:
@@ -121,25 +147,94 @@ class LLMResponse:
         )
 
 
+class RequestHedger:
+    """遅いリクエストに予備のリクエスト（ヘッジ）を送るかを決める
+
+    応答時間がp95を超えたリクエストにだけ同じリクエストをもう1つ送り、先に返った方を使う。
+    ヘッジの数はリクエスト数の ratio 倍までに抑えるため、サーバーの負荷はその割合しか増えない。
+    """
+
+    def __init__(self, ratio: float, window: int = 1000):
+        """
+        Args:
+            ratio: ヘッジに使えるリクエスト数の割合（例: 0.05で5%）
+            window: p95の推定に使う直近の応答時間の数
+        """
+        self.ratio = ratio
+        self._latencies: deque = deque(maxlen=window)
+        self.requests = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+
+    def record_request(self) -> None:
+        self.requests += 1
+
+    def record_latency(self, seconds: float) -> None:
+        self._latencies.append(seconds)
+
+    def hedge_delay(self) -> Optional[float]:
+        """ヘッジを送るまでの待ち時間（直近の応答時間のp95）。推定できない場合None"""
+        if self.ratio <= 0 or len(self._latencies) < HEDGE_MIN_SAMPLES:
+            return None
+        ordered = sorted(self._latencies)
+        return ordered[min(len(ordered) - 1, math.ceil(0.95 * len(ordered)) - 1)]
+
+    def try_acquire(self) -> bool:
+        """予算内ならヘッジを1つ確保"""
+        if self.hedges + 1 > self.ratio * self.requests:
+            return False
+        self.hedges += 1
+        return True
+
+    def get_statistics(self) -> Dict[str, Any]:
+        return {
+            "ratio": self.ratio,
+            "requests": self.requests,
+            "hedges": self.hedges,
+            "hedge_wins": self.hedge_wins,
+            "hedge_rate": self.hedges / self.requests if self.requests else 0.0,
+            "delay": self.hedge_delay()
+        }
+
+
 class LLMClient:
     """vLLM APIクライアント"""
 
-    def __init__(self, config: Optional[LLMConfig] = None, metrics_collector: Optional[Any] = None):
+    def __init__(self, config: Optional[LLMConfig] = None, metrics_collector: Optional[Any] = None,
+                 response_cache: Optional[LLMResponseCache] = None):
         """
         LLMクライアントを初期化
 
         Args:
             config: クライアント設定
             metrics_collector: メトリクス収集インスタンス
+            response_cache: 応答キャッシュ（Noneの場合はconfig.cache_pathから開く）
         """
         self.config = config or LLMConfig()
         self._client: Optional[httpx.AsyncClient] = None
         self.metrics_collector = metrics_collector
+        self._response_cache = response_cache
 
         # Task 2.2: 連続失敗時のフォールバック管理
         self.consecutive_failures = 0
         self.should_fallback_to_embedding = False
 
+        # バッチ処理の同時リクエスト数（応答時間と429に応じて上限を調整）
+        self.concurrency_limiter = AdaptiveConcurrencyLimiter(
+            initial=min(8, self.config.max_concurrency),
+            max_limit=self.config.max_concurrency
+        )
+
+        # 遅いリクエストのヘッジ（hedge_ratioが0の場合は送らない）
+        self.hedger = RequestHedger(self.config.hedge_ratio)
+
+    @property
+    def response_cache(self) -> Optional[LLMResponseCache]:
+        """応答キャッシュ（無効な場合はNone）"""
+        if self._response_cache is None and self.config.cache_path:
+            self._response_cache = get_llm_response_cache(self.config.cache_path)
+        return self._response_cache
+
     async def __aenter__(self):
         """非同期コンテキストマネージャーの開始"""
         await self._ensure_client()
@@ -205,6 +300,72 @@ class LLMClient:
 
         raise last_exception
 
+    async def _post(self, request_data: Dict[str, Any]) -> httpx.Response:
+        """チャット補完APIに1回POSTする（接続エラー・タイムアウトはリトライ）"""
+        return await self._retry_with_backoff(
+            self._client.post,
+            self.config.api_url,
+            json=request_data,
+            headers=self._get_headers()
+        )
+
+    async def _post_with_progress(self, request_data: Dict[str, Any]) -> httpx.Response:
+        """POSTの完了を待つ（遅い場合は同じリクエストを送り直さずに進捗を表示）
+
+        ヘッジが有効な場合は、応答時間がp95を超えた時点で予算内なら同じリクエストを
+        もう1つ送り、先に成功した方を返してもう一方はキャンセルする。
+        """
+        start = time.monotonic()
+        primary = asyncio.ensure_future(self._post(request_data))
+        pending = {primary}
+        hedge = None
+        hedge_delay = self.hedger.hedge_delay()
+        progress = None
+        last_error: Optional[BaseException] = None
+        self.hedger.record_request()
+
+        try:
+            while True:
+                # 次に確認する時刻: 進捗表示の開始（表示中は1秒ごと）とヘッジの送信
+                elapsed = time.monotonic() - start
+                wake_at = PROGRESS_NOTICE_DELAY if progress is None else elapsed + 1.0
+                if hedge is None and hedge_delay is not None:
+                    wake_at = min(wake_at, hedge_delay)
+                done, pending = await asyncio.wait(
+                    pending, timeout=max(0.0, wake_at - elapsed), return_when=asyncio.FIRST_COMPLETED
+                )
+
+                for task in done:
+                    if task.exception() is None:
+                        if task is hedge:
+                            self.hedger.hedge_wins += 1
+                        self.hedger.record_latency(time.monotonic() - start)
+                        if progress is not None:
+                            logger.info("LLM処理完了")
+                        return task.result()
+                    last_error = task.exception()
+                if not pending:
+                    raise last_error
+
+                elapsed = time.monotonic() - start
+                if progress is None and elapsed >= PROGRESS_NOTICE_DELAY:
+                    # Task 2.2: 5秒以上の応答時間でプログレスバー表示（Requirement 6.2）
+                    logger.info("LLM処理中... (5秒以上かかっています)")
+                    progress = tqdm(desc="LLM処理中", unit="秒", leave=False)
+                elif progress is not None:
+                    progress.update(1)
+
+                if (hedge is None and hedge_delay is not None and elapsed >= hedge_delay
+                        and self.hedger.try_acquire()):
+                    hedge = asyncio.ensure_future(self._post(request_data))
+                    pending.add(hedge)
+        finally:
+            # 負けた方（またはキャンセルされた呼び出し元）のリクエストを止める
+            for task in pending:
+                task.cancel()
+            if progress is not None:
+                progress.close()
+
     async def chat_completion(
         self,
         messages: List[ChatMessage],
@@ -231,6 +392,23 @@ class LLMClient:
 
         await self._ensure_client()
 
+        # リクエストボディを構築
+        request_data = self.config.to_dict()
+        request_data["messages"] = [msg.to_dict() for msg in messages]
+        request_data.update(kwargs)
+
+        # 同じリクエストの応答が保存済みならvLLMに送らない
+        # （SQLiteの読み書きはイベントループを止めないよう別スレッドで行う）
+        cache = self.response_cache
+        cache_key = None
+        if cache is not None:
+            cache_key = make_llm_cache_key(request_data)
+            cached = await asyncio.get_running_loop().run_in_executor(None, cache.get, cache_key)
+            if self.metrics_collector:
+                self.metrics_collector.record_cache_lookup(hit=cached is not None)
+            if cached is not None:
+                return LLMResponse.from_api_response(cached)
+
         # メトリクス記録用のリクエストID生成
         request_id = str(uuid.uuid4())
 
@@ -238,47 +416,17 @@ class LLMClient:
         if self.metrics_collector:
             self.metrics_collector.start_api_call(request_id=request_id, model_name=self.config.model)
 
-        # リクエストボディを構築
-        request_data = self.config.to_dict()
-        request_data["messages"] = [msg.to_dict() for msg in messages]
-        request_data.update(kwargs)
-
         try:
-            # Task 2.2: 5秒以上の応答時間でプログレスバー表示（Requirement 6.2）
+            # 応答時間の計測（5秒以上かかる場合は_post_with_progressが進捗を表示）
             start_time = time.time()
 
-            # プログレスバー付きAPI呼び出しを作成
-            async def api_call_with_progress():
-                response_task = self._retry_with_backoff(
-                    self._client.post,
-                    self.config.api_url,
-                    json=request_data,
-                    headers=self._get_headers()
-                )
-
-                # 5秒待機してから応答をチェック
-                try:
-                    return await asyncio.wait_for(response_task, timeout=5.0)
-                except asyncio.TimeoutError:
-                    # 5秒を超えた場合はログを出力
-                    logger.info("LLM処理中... (5秒以上かかっています)")
-
-                    # 新しいタスクを作成（再利用問題を回避）
-                    new_response_task = self._retry_with_backoff(
-                        self._client.post,
-                        self.config.api_url,
-                        json=request_data,
-                        headers=self._get_headers()
-                    )
-                    try:
-                        response = await new_response_task
-                        logger.info("LLM処理完了")
-                        return response
-                    except Exception as e:
-                        logger.error(f"LLM処理エラー: {e}")
-                        raise
+            response = await self._post_with_progress(request_data)
 
-            response = await api_call_with_progress()
+            # 同時リクエスト数の上限を応答時間と過負荷に応じて調整
+            if response.status_code == 429:
+                self.concurrency_limiter.record_overload()
+            elif response.status_code == 200:
+                self.concurrency_limiter.record_latency(time.time() - start_time)
 
             # ステータスコードチェック
             if response.status_code != 200:
@@ -302,6 +450,8 @@ class LLMClient:
             # レスポンスをパース
             response_data = response.json()
             llm_response = LLMResponse.from_api_response(response_data)
+            if cache_key is not None:
+                await asyncio.get_running_loop().run_in_executor(None, cache.put, cache_key, response_data)
 
             # メトリクス記録（成功）
             if self.metrics_collector:
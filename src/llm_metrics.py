@@ -72,6 +72,10 @@ class LLMMetricsCollector:
         # 統計情報
         self._lock = threading.Lock()
 
+        # 応答キャッシュのヒット/ミス
+        self._cache_hits = 0
+        self._cache_misses = 0
+
         # システムロガーとの統合
         self._logger = SystemLogger()
 
@@ -152,6 +156,24 @@ class LLMMetricsCollector:
 
             self._completed_calls.append(record)
 
+    def record_cache_lookup(self, hit: bool) -> None:
+        """応答キャッシュの参照結果記録"""
+        with self._lock:
+            if hit:
+                self._cache_hits += 1
+            else:
+                self._cache_misses += 1
+
+    def get_cache_statistics(self) -> Dict[str, Any]:
+        """応答キャッシュ統計情報取得"""
+        with self._lock:
+            lookups = self._cache_hits + self._cache_misses
+            return {
+                "cache_hits": self._cache_hits,
+                "cache_misses": self._cache_misses,
+                "cache_hit_rate": (self._cache_hits / lookups) * 100 if lookups > 0 else 0.0
+            }
+
     def get_api_statistics(self) -> Dict[str, Any]:
         """API統計情報取得"""
         with self._lock:
@@ -271,7 +293,8 @@ class LLMMetricsCollector:
             "statistics": self.get_statistics(),
             "api_statistics": self.get_api_statistics(),
             "model_statistics": self.get_model_statistics(),
-            "error_statistics": self.get_error_statistics()
+            "error_statistics": self.get_error_statistics(),
+            "cache_statistics": self.get_cache_statistics()
         }
 
         with open(metrics_file, 'w', encoding='utf-8') as f:
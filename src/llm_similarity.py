@@ -8,15 +8,29 @@ import asyncio
 import re
 import time
 import logging
-from typing import Dict, List, Optional, Any, Tuple, Union
+from typing import Callable, Dict, List, Optional, Any, Tuple, Union
 from dataclasses import dataclass, field
 from pathlib import Path
 
+from .llm_batch import AdaptiveConcurrencyLimiter, run_bounded
 from .llm_client import LLMClient, LLMConfig, ChatMessage, LLMResponse, LLMClientError
 from .prompt_template import PromptTemplate, PromptTemplateError
+from .score_parser import ScoreParser
 
 logger = logging.getLogger(__name__)
 
+# 複数ペアをまとめて評価するユーザープロンプト（テンプレートに prompts.packed_user がない場合に使用）
+BUILTIN_PACKED_USER_PROMPT = """以下の{count}組のテキストペアについて、それぞれ類似度を評価してください。
+
+{pairs}
+
+ペアごとに、番号順に以下の形式で回答してください：
+
+**ペア**: [ペア番号]
+**スコア**: [0.0-1.0の数値]
+**カテゴリ**: [完全一致/非常に類似/類似/やや類似/低い類似度]
+**理由**: [判定の根拠を1文で説明]"""
+
 
 class LLMSimilarityError(Exception):
     """LLM類似度計算関連のエラー"""
@@ -35,6 +49,7 @@ class SimilarityResult:
     confidence: float = 0.0
     raw_response: str = ""
     tokens_used: int = 0
+    pack_size: int = 1  # 1回のリクエストでまとめて評価したペア数
 
     def to_dict(self) -> Dict[str, Any]:
         """辞書形式に変換"""
@@ -57,7 +72,8 @@ class LLMSimilarity:
         self,
         llm_client: Optional[LLMClient] = None,
         prompt_template: Optional[PromptTemplate] = None,
-        default_template_path: str = "prompts/default_similarity.yaml"
+        default_template_path: str = "prompts/default_similarity.yaml",
+        metrics_collector: Optional[Any] = None
     ):
         """
         LLMSimilarityインスタンスを初期化
@@ -66,8 +82,9 @@ class LLMSimilarity:
             llm_client: LLMクライアント
             prompt_template: プロンプトテンプレート
             default_template_path: デフォルトテンプレートのパス
+            metrics_collector: llm_client未指定時に作成するクライアントに渡すメトリクス収集インスタンス
         """
-        self.llm_client = llm_client or LLMClient()
+        self.llm_client = llm_client or LLMClient(metrics_collector=metrics_collector)
         self.prompt_template = prompt_template or PromptTemplate()
         self.default_template_path = default_template_path
         self.current_template: Optional[Dict[str, Any]] = None
@@ -88,6 +105,12 @@ class LLMSimilarity:
         # テキスト長制限
         self.max_text_length = 10000
 
+        # まとめて評価したレスポンスの解析
+        self.score_parser = ScoreParser()
+
+        # クライアントが同時実行数のリミッターを持たない場合に使うリミッター
+        self._default_limiter: Optional[AdaptiveConcurrencyLimiter] = None
+
     async def __aenter__(self):
         """非同期コンテキストマネージャーの開始"""
         await self._load_default_template()
@@ -180,6 +203,39 @@ class LLMSimilarity:
 
         return messages
 
+    def _build_packed_messages(self, text_pairs: List[Tuple[str, str]]) -> List[ChatMessage]:
+        """複数ペアをまとめて評価するチャットメッセージを構築"""
+        if not self.current_template:
+            self.current_template = self._get_builtin_template()
+
+        prompts = self.current_template.get("prompts", {})
+
+        messages = []
+
+        # システムプロンプト
+        if "system" in prompts:
+            messages.append(ChatMessage(
+                role="system",
+                content=prompts["system"]
+            ))
+
+        # ユーザープロンプト（番号付きのペアを展開）
+        pairs = "\n\n".join(
+            f"### ペア{number}\nテキスト1:\n{text1}\n\nテキスト2:\n{text2}"
+            for number, (text1, text2) in enumerate(text_pairs, 1)
+        )
+        rendered_prompt = self.prompt_template.render(
+            prompts.get("packed_user", BUILTIN_PACKED_USER_PROMPT),
+            {"count": len(text_pairs), "pairs": pairs}
+        )
+
+        messages.append(ChatMessage(
+            role="user",
+            content=rendered_prompt
+        ))
+
+        return messages
+
     def _parse_llm_response(self, response: LLMResponse) -> SimilarityResult:
         """LLMレスポンスを解析してSimilarityResultに変換"""
         content = response.content
@@ -287,28 +343,180 @@ class LLMSimilarity:
                 raise
             raise LLMSimilarityError(f"LLM推論に失敗しました: {e}")
 
+    async def calculate_packed_similarity(
+        self,
+        text_pairs: List[Tuple[str, str]],
+        model_config: Optional[Dict[str, Any]] = None
+    ) -> List[Union[SimilarityResult, Exception]]:
+        """
+        複数のテキストペアを1回のLLM呼び出しでまとめて評価
+
+        レスポンスから解析できなかったペアと入力が不正なペアは、
+        calculate_similarity で1件ずつ計算し直す。
+
+        Args:
+            text_pairs: テキストペアのリスト
+            model_config: モデル設定のオーバーライド
+
+        Returns:
+            入力順の類似度計算結果のリスト（計算し直しても失敗したペアは例外オブジェクト）
+        """
+        start_time = time.time()
+        results: List[Any] = [None] * len(text_pairs)
+
+        packed = []
+        for i, (text1, text2) in enumerate(text_pairs):
+            try:
+                self._validate_texts(text1, text2)
+                packed.append(i)
+            except LLMSimilarityError:
+                pass
+
+        if len(packed) > 1:
+            if not self.current_template:
+                await self._load_default_template()
+
+            kwargs = {}
+            if model_config:
+                kwargs.update(model_config)
+            elif self.current_template.get("parameters"):
+                kwargs.update(self.current_template["parameters"])
+
+            # 回答はペア数に比例して長くなるため、1ペアあたりの最大トークン数をペア数倍する
+            max_tokens = kwargs.get("max_tokens") or getattr(getattr(self.llm_client, "config", None), "max_tokens", 64)
+            kwargs["max_tokens"] = max_tokens * len(packed)
+
+            try:
+                messages = self._build_packed_messages([text_pairs[i] for i in packed])
+                response = await self.llm_client.chat_completion(messages, **kwargs)
+                parsed = self.score_parser.parse_packed_response(response.content, len(packed))
+            except Exception as e:
+                logger.warning(f"{len(packed)}ペアのまとめての評価に失敗、1件ずつ計算し直します: {e}")
+                self._update_stats(success=False, processing_time=time.time() - start_time)
+            else:
+                processing_time = time.time() - start_time
+                self._update_stats(success=True, processing_time=processing_time, model=response.model)
+                for i, score in zip(packed, parsed):
+                    if score is None:
+                        continue
+                    results[i] = SimilarityResult(
+                        score=score.score,
+                        category=score.category,
+                        reason=score.reason,
+                        method="llm",
+                        model_used=response.model,
+                        processing_time=processing_time / len(packed),
+                        confidence=score.confidence,
+                        raw_response=score.raw_response,
+                        tokens_used=response.total_tokens // len(packed),
+                        pack_size=len(packed)
+                    )
+
+        # 解析できなかったペアを1件ずつ計算し直す
+        retried = [i for i, result in enumerate(results) if result is None]
+        if retried and len(packed) > 1:
+            logger.info(f"{len(retried)}/{len(text_pairs)}ペアを1件ずつ計算し直します")
+        for i in retried:
+            try:
+                results[i] = await self.calculate_similarity(*text_pairs[i], model_config)
+            except Exception as e:
+                results[i] = e
+
+        return results
+
+    async def calculate_packed_batch(
+        self,
+        text_pairs: List[Tuple[str, str]],
+        pack_size: int,
+        sequential: bool = False,
+        model_config: Optional[Dict[str, Any]] = None,
+        on_result: Optional[Callable[[int, Union[SimilarityResult, Exception]], None]] = None
+    ) -> List[Union[SimilarityResult, Exception]]:
+        """
+        テキストペアをpack_size件ずつまとめて評価
+
+        Args:
+            text_pairs: テキストペアのリスト
+            pack_size: 1回のLLM呼び出しでまとめて評価するペア数
+            sequential: 順次処理するかどうか（Falseの場合はconcurrency_limiterで
+                同時リクエスト数を制御しながら並列処理）
+            model_config: モデル設定
+            on_result: まとめた呼び出しが終わるたびに、含まれる各ペアについて
+                (ペアのインデックス, 結果) で呼ぶコールバック
+
+        Returns:
+            入力順の類似度計算結果のリスト（失敗したペアは例外オブジェクト）
+        """
+        if pack_size < 1:
+            raise ValueError("pack_size は 1 以上である必要があります")
+
+        packs = [text_pairs[i:i + pack_size] for i in range(0, len(text_pairs), pack_size)]
+        results: List[Any] = [None] * len(text_pairs)
+
+        def finish_pack(pack_index: int, pack_result: Any) -> None:
+            start = pack_index * pack_size
+            for offset in range(len(packs[pack_index])):
+                result = pack_result if isinstance(pack_result, Exception) else pack_result[offset]
+                results[start + offset] = result
+                if on_result is not None:
+                    on_result(start + offset, result)
+
+        if sequential:
+            for pack_index, pack in enumerate(packs):
+                finish_pack(pack_index, await self.calculate_packed_similarity(pack, model_config))
+        else:
+            await run_bounded(
+                packs,
+                lambda pack: self.calculate_packed_similarity(pack, model_config),
+                self.concurrency_limiter,
+                on_done=finish_pack
+            )
+        return results
+
+    @property
+    def concurrency_limiter(self) -> AdaptiveConcurrencyLimiter:
+        """並列処理の同時リクエスト数を制御するリミッター（LLMクライアントと共有）"""
+        limiter = getattr(self.llm_client, "concurrency_limiter", None)
+        if isinstance(limiter, AdaptiveConcurrencyLimiter):
+            return limiter
+        if self._default_limiter is None:
+            self._default_limiter = AdaptiveConcurrencyLimiter()
+        return self._default_limiter
+
     async def calculate_batch_similarity(
         self,
         text_pairs: List[Tuple[str, str]],
         sequential: bool = True,
         delay_between_requests: float = 0.0,
-        model_config: Optional[Dict[str, Any]] = None
+        model_config: Optional[Dict[str, Any]] = None,
+        pack_size: int = 1
     ) -> List[SimilarityResult]:
         """
         複数のテキストペアの類似度を一括計算
 
         Args:
             text_pairs: テキストペアのリスト
-            sequential: 順次処理するかどうか（レート制限対応）
-            delay_between_requests: リクエスト間の遅延時間（秒）
+            sequential: 順次処理するかどうか（Falseの場合は同時リクエスト数を
+                concurrency_limiterで制御しながら並列処理）
+            delay_between_requests: リクエスト間の遅延時間（秒、順次処理時のみ）
             model_config: モデル設定
+            pack_size: 1回のLLM呼び出しでまとめて評価するペア数（1の場合は1件ずつ）
 
         Returns:
             類似度計算結果のリスト
         """
         results = []
 
-        if sequential:
+        if pack_size > 1:
+            # まとめて評価（解析できなかったペアは1件ずつ計算し直す）
+            results = [
+                SimilarityResult(score=0.0, method="error", reason=str(result))
+                if isinstance(result, Exception) else result
+                for result in await self.calculate_packed_batch(
+                    text_pairs, pack_size, sequential=sequential, model_config=model_config
+                )
+            ]
+        elif sequential:
             # 順次処理
             for i, (text1, text2) in enumerate(text_pairs):
                 try:
@@ -328,12 +536,12 @@ class LLMSimilarity:
                         reason=str(e)
                     ))
         else:
-            # 並列処理
-            tasks = [
-                self.calculate_similarity(text1, text2, model_config)
-                for text1, text2 in text_pairs
-            ]
-            results = await asyncio.gather(*tasks, return_exceptions=True)
+            # 並列処理（同時リクエスト数を制限し、結果は入力順）
+            results = await run_bounded(
+                text_pairs,
+                lambda pair: self.calculate_similarity(pair[0], pair[1], model_config),
+                self.concurrency_limiter
+            )
 
             # 例外をエラー結果に変換
             processed_results = []
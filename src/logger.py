@@ -9,7 +9,8 @@ import time
 from datetime import datetime
 from pathlib import Path
 from typing import Dict, Any, Optional
-import psutil
+
+from .system_monitor import get_system_sampler
 
 
 class SystemLogger:
@@ -143,47 +144,13 @@ class SystemLogger:
         self.error_logger.error(json.dumps(log_entry))
 
     def log_metrics(self):
-        """システムメトリクスをログに記録"""
-        try:
-            # CPU使用率
-            cpu_percent = psutil.cpu_percent(interval=1)
-            cpu_count = psutil.cpu_count()
-
-            # メモリ使用状況
-            memory = psutil.virtual_memory()
-            memory_percent = memory.percent
-            memory_available_gb = memory.available / (1024 ** 3)
-
-            # ディスク使用状況
-            disk = psutil.disk_usage('/')
-            disk_percent = disk.percent
-            disk_free_gb = disk.free / (1024 ** 3)
-
-            # プロセス情報
-            process = psutil.Process()
-            process_memory_mb = process.memory_info().rss / (1024 ** 2)
-            process_threads = process.num_threads()
-
-            metrics = {
-                "timestamp": datetime.now().isoformat(),
-                "cpu": {
-                    "percent": cpu_percent,
-                    "count": cpu_count
-                },
-                "memory": {
-                    "percent": memory_percent,
-                    "available_gb": round(memory_available_gb, 2)
-                },
-                "disk": {
-                    "percent": disk_percent,
-                    "free_gb": round(disk_free_gb, 2)
-                },
-                "process": {
-                    "memory_mb": round(process_memory_mb, 2),
-                    "threads": process_threads
-                }
-            }
+        """システムメトリクスをログに記録
 
+        バックグラウンドのサンプラーが取得した最新のスナップショットを記録するため、
+        CPU使用率の計測で待たされることはない。
+        """
+        try:
+            metrics = get_system_sampler().snapshot.to_metrics()
             self.metrics_logger.info(json.dumps(metrics))
 
         except Exception as e:
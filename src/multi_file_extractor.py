@@ -0,0 +1,207 @@
+"""MultiFileExtractor: 1つの参照ファイルを複数の候補ファイルと比較する機能
+
+参照ファイル（正解データ）と複数のモデル出力を行の位置で対応付け、
+参照ファイルを1回だけ読みながら全候補ファイルを1行ずつ足並みをそろえて読み進める。
+候補ファイルの読み込みはスレッドに分けず1スレッドで順に行う（処理時間の大半は
+埋め込みで、読み込みを並列化しても短縮されないため）。
+参照側の値は行ごとに1回だけパースし、SCORING_CHUNK_SIZE行分の
+全候補とのペアをまとめて埋め込むため、参照側の文字列は候補の数だけ
+重複して埋め込まれない（埋め込み量は文字列の種類数に比例する）。
+"""
+
+import os
+import sys
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from .dual_file_extractor import DualFileExtractor
+from .jsonl_reader import ByteProgressBar
+from .parallel_scoring import SCORING_CHUNK_SIZE, RunningScores, summarize_scores
+from .similarity import get_embedding_cache, repair_and_parse_json, score_parsed_pairs
+
+
+class MultiFileExtractor(DualFileExtractor):
+    """参照ファイルの指定列を複数の候補ファイルの同じ列と比較するクラス"""
+
+    def compare_multi_files(
+        self,
+        reference_path: str,
+        candidate_paths: List[str],
+        column_name: str = "inference",
+        output_type: str = "score",
+        use_gpu: bool = False,
+        on_result: Optional[Callable[[Dict[str, Any]], None]] = None
+    ) -> Any:
+        """
+        参照ファイルと複数の候補ファイルを1回の読み込みで比較
+
+        Args:
+            reference_path: 参照JSONLファイルパス
+            candidate_paths: 候補JSONLファイルパスのリスト
+            column_name: 比較する列名（デフォルト: inference）
+            output_type: 出力タイプ（score/file）
+            use_gpu: GPU使用フラグ
+            on_result: fileタイプの各行の結果を採点し次第受け取るコールバック
+
+        Returns:
+            scoreタイプ: 候補ごとのスコア表を含む辞書
+            fileタイプ: 参照ファイルの行ごとの詳細リスト（on_result指定時は空リスト）
+        """
+        if not candidate_paths:
+            raise ValueError("候補ファイルを1つ以上指定してください")
+        if not os.path.exists(reference_path):
+            raise FileNotFoundError(f"参照ファイルが見つかりません: {reference_path}")
+        for num, path in enumerate(candidate_paths, 1):
+            if not os.path.exists(path):
+                raise FileNotFoundError(f"候補ファイル{num}が見つかりません: {path}")
+
+        # 列の存在確認（列名の誤りを全行の比較前に検出する）
+        self._validate_column(reference_path, "参照ファイル", column_name)
+        for num, path in enumerate(candidate_paths, 1):
+            self._validate_column(path, f"候補ファイル{num}", column_name)
+
+        try:
+            reference_reader = self._create_reader(reference_path)
+            candidate_readers = [self._create_reader(path) for path in candidate_paths]
+            readers = [reference_reader] + candidate_readers
+            totals = [RunningScores() for _ in candidate_paths]
+            candidate_counts = [0] * len(candidate_paths)
+            file_results = []
+            cache_before = get_embedding_cache().get_statistics()
+
+            def emit(rows):
+                # 候補ごとに逐次集計し、fileタイプの行は溜めるか即座に渡す
+                for row_num, reference_value, scored in rows:
+                    entries = []
+                    for k, (candidate_value, row) in enumerate(scored):
+                        if candidate_value is None:
+                            continue
+                        totals[k].add(row)
+                        if output_type == "file" and row is not None:
+                            entries.append({
+                                "file": candidate_paths[k],
+                                column_name: candidate_value,
+                                "similarity_score": row[0],
+                                "similarity_details": {
+                                    "field_match_ratio": row[1],
+                                    "value_similarity": row[2]
+                                }
+                            })
+                    if output_type == "file":
+                        result = {"line": row_num, column_name: reference_value, "candidates": entries}
+                        if on_result is not None:
+                            on_result(result)
+                        else:
+                            file_results.append(result)
+
+            print(f"参照ファイルと{len(candidate_paths)}個の候補ファイルの'{column_name}'列を比較中...", file=sys.stderr)
+            with ByteProgressBar(sum(reader.total_bytes for reader in readers), "比較処理中") as progress:
+                candidate_records = [iter(reader) for reader in candidate_readers]
+                chunk = []
+                reference_count = 0
+
+                for row_num, record in enumerate(reference_reader, 1):
+                    reference_count = row_num
+                    candidates = []
+                    for k, records in enumerate(candidate_records):
+                        candidate = next(records, None)
+                        if candidate is not None:
+                            candidate_counts[k] += 1
+                        candidates.append(None if candidate is None else self._column_value(candidate.data, column_name))
+                    chunk.append((row_num, self._column_value(record.data, column_name), candidates))
+
+                    if len(chunk) >= SCORING_CHUNK_SIZE:
+                        emit(self._score_chunk(chunk))
+                        progress.advance(len(chunk), sum(r.position - r.start for r in readers))
+                        chunk = []
+
+                emit(self._score_chunk(chunk))
+                progress.advance(len(chunk), sum(r.position - r.start for r in readers))
+
+                # 参照ファイルより長い候補ファイルの残りは件数だけ数える
+                for k, records in enumerate(candidate_records):
+                    candidate_counts[k] += sum(1 for _ in records)
+
+            for k, count in enumerate(candidate_counts):
+                if count != reference_count:
+                    print(f"警告: 候補ファイル{k + 1}の行数が参照ファイルと異なります"
+                          f"（{reference_count}行 vs {count}行）。短い方に合わせました。", file=sys.stderr)
+
+            print(f"✅ 複数ファイル比較完了 - 列: {column_name}, 参照行数: {reference_count}, "
+                  f"候補数: {len(candidate_paths)}", file=sys.stderr)
+
+            if output_type == "file":
+                return file_results
+
+            cache_after = get_embedding_cache().get_statistics()
+            return {
+                "reference": reference_path,
+                "reference_lines": reference_count,
+                "candidates": [summarize_scores(total, path) for total, path in zip(totals, candidate_paths)],
+                "_metadata": {
+                    "source_files": {
+                        "reference": os.path.basename(reference_path),
+                        "candidates": [os.path.basename(path) for path in candidate_paths]
+                    },
+                    "column_compared": column_name,
+                    "gpu_used": use_gpu,
+                    "embedding_cache": {
+                        "hits": cache_after["hits"] - cache_before["hits"],
+                        "misses": cache_after["misses"] - cache_before["misses"]
+                    }
+                }
+            }
+
+        except Exception as e:
+            error_id = self.error_handler.generate_error_id()
+            self.logger.log_error(
+                error_id,
+                'multi_file_comparison_error',
+                str(e)
+            )
+            raise Exception(f"比較処理に失敗しました（エラーID: {error_id}）: {str(e)}")
+
+    @staticmethod
+    def _score_chunk(
+        chunk: List[Tuple[int, str, List[Optional[str]]]]
+    ) -> List[Tuple[int, str, List[Tuple[Optional[str], Optional[tuple]]]]]:
+        """参照側の値を1回だけパースし、チャンク内の全候補とのペアをまとめて採点
+
+        Args:
+            chunk: (行番号, 参照側の値, 候補ごとの値（行がなければNone）) のリスト
+
+        Returns:
+            (行番号, 参照側の値, 候補ごとの (値, (スコア, フィールド名一致率, 値類似度) またはNone)) のリスト
+        """
+        parsed = []
+        positions = []
+        for i, (_, reference_value, candidates) in enumerate(chunk):
+            reference = repair_and_parse_json(reference_value)
+            for k, candidate_value in enumerate(candidates):
+                if candidate_value is not None:
+                    parsed.append((reference, repair_and_parse_json(candidate_value)))
+                    positions.append((i, k))
+
+        try:
+            scored = score_parsed_pairs(parsed)
+        except Exception:
+            # どこかのペアで失敗した場合はペア単位で採点し直し、失敗したペアだけをスキップ
+            scored = []
+            for (i, k), pair in zip(positions, parsed):
+                try:
+                    scored.append(score_parsed_pairs([pair])[0])
+                except Exception as e:
+                    print(f"警告: {chunk[i][0]}行目の候補ファイル{k + 1}の処理エラー: {e}", file=sys.stderr)
+                    scored.append(None)
+
+        rows = [[(value, None) for value in candidates] for _, _, candidates in chunk]
+        for (i, k), result in zip(positions, scored):
+            if result is None:
+                continue
+            score, details = result
+            rows[i][k] = (chunk[i][2][k], (
+                float(score),
+                float(details.get("field_match_ratio", 0)),
+                float(details.get("value_similarity", 0))
+            ))
+
+        return [(row_num, reference_value, rows[i]) for i, (row_num, reference_value, _) in enumerate(chunk)]
@@ -0,0 +1,478 @@
+"""JSONL採点の実行モジュール
+
+行ごとの採点処理と逐次集計（単一プロセス/マルチプロセス共通）と、
+入力ファイルを行境界に揃えたバイト範囲のシャードに分割してプロセスプールで
+採点するマルチプロセス実行を提供する。各ワーカーはプール初期化時に
+埋め込みモデルを1回だけロードし、結果は元の行順に結合する。
+ファイルを介さないレコードのストリームも、投入量を抑えながら
+プロセスプールで採点できる。
+"""
+
+import multiprocessing
+import os
+from collections import deque
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from .embedding_cache import DiskVectorStore
+from .jsonl_reader import JSONLError, JSONLReader
+from .similarity import (
+    calculate_json_similarity,
+    calculate_json_similarity_batch,
+    configure_embedding_cache,
+    get_embedding_cache,
+    get_embedding_model,
+    get_gpu_mode,
+    get_list_matching,
+    set_gpu_mode,
+    set_list_matching
+)
+
+# 埋め込みをまとめて計算する行数の単位
+SCORING_CHUNK_SIZE = 64
+
+# ワーカーあたりのシャード数（進捗の粒度と負荷分散のため複数に分ける）
+SHARDS_PER_WORKER = 4
+
+# 1シャードの最大バイト数（ワーカーが一度に保持する結果の量を抑える）
+MAX_SHARD_BYTES = 16 * 1024 * 1024
+
+# レコードのストリームをワーカーに渡す単位（チャンク数）
+CHUNKS_PER_TASK = 4
+
+# ワーカーあたりの同時投入タスク数（先読みするレコード数の上限を決める）
+TASKS_IN_FLIGHT_PER_WORKER = 2
+
+# 採点結果の1行分: (スコア, フィールド名一致率, 値類似度, fileタイプ用の行データ)
+ScoredRow = Tuple[float, float, float, Optional[Dict[str, Any]]]
+
+
+class ScoringCancelled(Exception):
+    """should_stopの要求で採点を中止した"""
+
+
+class RunningScores:
+    """採点結果の逐次集計
+
+    行順に加算していくため、全件のリストを作ってから合計した場合と同じ値になる。
+    """
+
+    def __init__(self):
+        self.total_lines = 0
+        self.count = 0
+        self.score_sum = 0.0
+        self.field_match_sum = 0.0
+        self.value_similarity_sum = 0.0
+
+    def add(self, row: Optional[ScoredRow]) -> None:
+        """1レコード分の採点結果を加算（採点できなかったレコードはNone）"""
+        self.total_lines += 1
+        if row is None:
+            return
+        self.count += 1
+        self.score_sum += row[0]
+        self.field_match_sum += row[1]
+        self.value_similarity_sum += row[2]
+
+    def averages(self) -> Tuple[float, float, float]:
+        """(平均スコア, 平均フィールド名一致率, 平均値類似度) を返す"""
+        if self.count == 0:
+            return 0.0, 0.0, 0.0
+        return (
+            self.score_sum / self.count,
+            self.field_match_sum / self.count,
+            self.value_similarity_sum / self.count
+        )
+
+
+def summarize_scored_rows(rows: Iterable[Optional[ScoredRow]], output_type: str, file_label: str,
+                          on_result: Optional[Callable[[Dict[str, Any]], None]] = None,
+                          should_stop: Optional[Callable[[], bool]] = None,
+                          parse_errors: Optional["ParseErrorCounter"] = None) -> Any:
+    """採点結果を逐次集計して出力形式にまとめる
+
+    Args:
+        rows: 入力順の採点結果（採点できなかったレコードはNone）
+        output_type: 出力タイプ (score/file)
+        file_label: scoreタイプの出力の "file" に入れる値
+        on_result: fileタイプの各行の結果を採点し次第受け取るコールバック
+        should_stop: Trueを返したら次の行（チャンク）を採点する前に中止する関数
+        parse_errors: rowsに現れないパースエラー行の件数（total_linesに含める）
+
+    Returns:
+        scoreタイプ: 全体平均の辞書
+        fileタイプ: 各行の詳細リスト（on_result指定時は空リスト）
+
+    Raises:
+        ScoringCancelled: should_stopで中止した場合
+    """
+    totals = RunningScores()
+    file_results = []
+    if should_stop is not None:
+        rows = _stop_when_requested(rows, should_stop)
+
+    # 平均は逐次加算で求め、fileタイプの行は溜めるか即座に渡す
+    for row in rows:
+        totals.add(row)
+        if output_type == "file" and row is not None:
+            if on_result is not None:
+                on_result(row[3])
+            else:
+                file_results.append(row[3])
+
+    # 読めなかった行も採点できなかった行として総行数に数える
+    if parse_errors is not None:
+        totals.total_lines += parse_errors.count
+
+    # scoreタイプの場合は全体平均を返す
+    if output_type == "score":
+        return summarize_scores(totals, file_label)
+    else:
+        # fileタイプの場合は詳細リストを返す
+        return file_results
+
+
+def _stop_when_requested(rows: Iterable[Optional[ScoredRow]],
+                         should_stop: Callable[[], bool]) -> Iterator[Optional[ScoredRow]]:
+    """行を取り出す前にshould_stopを確認する（採点は遅延評価のため、次のチャンクの採点前に止まる）"""
+    iterator = iter(rows)
+    while True:
+        if should_stop():
+            raise ScoringCancelled("採点を中止しました")
+        try:
+            row = next(iterator)
+        except StopIteration:
+            return
+        yield row
+
+
+def summarize_scores(totals: RunningScores, file_label: str) -> Dict[str, Any]:
+    """逐次集計した採点結果をscoreタイプの出力にまとめる
+
+    Args:
+        totals: 逐次集計の結果
+        file_label: 出力の "file" に入れる値
+
+    Returns:
+        全体平均の辞書
+    """
+    if totals.count:
+        avg_score, avg_field_match, avg_value_sim = totals.averages()
+
+        meaning = "完全一致" if avg_score >= 0.99 else \
+                 "非常に類似" if avg_score >= 0.8 else \
+                 "類似" if avg_score >= 0.6 else \
+                 "やや類似" if avg_score >= 0.4 else \
+                 "低い類似度"
+
+        return {
+            "file": file_label,
+            "total_lines": totals.total_lines,
+            "score": round(avg_score, 4),
+            "meaning": meaning,
+            "calculation_method": "embedding",  # 埋め込みベースの計算方法
+            "json": {
+                "field_match_ratio": round(avg_field_match, 4),
+                "value_similarity": round(avg_value_sim, 4),
+                "final_score": round(avg_score, 4)
+            }
+        }
+    else:
+        return {
+            "file": file_label,
+            "total_lines": 0,
+            "score": 0.0,
+            "meaning": "データなし",
+            "json": {
+                "field_match_ratio": 0.0,
+                "value_similarity": 0.0,
+                "final_score": 0.0
+            }
+        }
+
+
+def iter_scored_records(
+    records: Iterable[Tuple[int, Any]],
+    output_type: str,
+    warn: Callable[[int, str], None],
+    progress: Optional[Callable[[int], Any]] = None
+) -> Iterator[Optional[ScoredRow]]:
+    """パース済みの各レコードのinference1とinference2を採点
+
+    SCORING_CHUNK_SIZE件ずつまとめて採点し、採点し終えたチャンクから順に返す。
+
+    Args:
+        records: (行番号, パース済みの値) のイテラブル
+        output_type: 出力タイプ (score/file)
+        warn: 行単位の警告を受け取るコールバック (行番号, メッセージ)
+        progress: 処理済み行数を受け取るコールバック
+
+    Yields:
+        入力順の採点結果（採点できなかったレコードはNone）
+    """
+    chunk = []
+
+    for line_num, data in records:
+        try:
+            # inference1とinference2を取得
+            pair = (data.get('inference1', '{}'), data.get('inference2', '{}'))
+        except Exception as e:
+            warn(line_num, f"処理エラー: {e}")
+            yield from _score_chunk(chunk, output_type, warn, progress)
+            chunk = []
+            if progress is not None:
+                progress(1)
+            yield None
+            continue
+
+        chunk.append((line_num, data, pair))
+
+        if len(chunk) >= SCORING_CHUNK_SIZE:
+            yield from _score_chunk(chunk, output_type, warn, progress)
+            chunk = []
+
+    yield from _score_chunk(chunk, output_type, warn, progress)
+
+
+class ParseErrorCounter:
+    """JSONLReaderのon_errorに渡す、パースエラーを行単位の警告にしつつ件数を数えるコールバック"""
+
+    def __init__(self, warn: Callable[[int, str], None]):
+        self.warn = warn
+        self.count = 0
+
+    def __call__(self, error: JSONLError) -> None:
+        self.count += 1
+        self.warn(error.line_num, f"JSONパースエラー: {error.error}")
+
+
+def _score_chunk(chunk: list, output_type: str, warn: Callable[[int, str], None],
+                 progress: Optional[Callable[[int], Any]] = None) -> List[Optional[ScoredRow]]:
+    """チャンク内の行をまとめて採点"""
+    if not chunk:
+        return []
+
+    pairs = [pair for _, _, pair in chunk]
+
+    try:
+        # 2段階採点: チャンク全体の文字列を一括で埋め込んでから採点
+        chunk_results = calculate_json_similarity_batch(pairs)
+    except Exception:
+        # どこかの行で失敗した場合は行単位で採点し直し、失敗行だけをスキップ
+        chunk_results = []
+        for line_num, _, (inference1, inference2) in chunk:
+            try:
+                chunk_results.append(calculate_json_similarity(inference1, inference2))
+            except Exception as e:
+                warn(line_num, f"処理エラー: {e}")
+                chunk_results.append(None)
+
+    rows = []
+    for (_, data, _), scored in zip(chunk, chunk_results):
+        if scored is None:
+            rows.append(None)
+            continue
+        score, details = scored
+        field_match_ratio = float(details.get("field_match_ratio", 0))
+        value_similarity = float(details.get("value_similarity", 0))
+
+        # fileタイプの場合は詳細を保存
+        result = None
+        if output_type == "file":
+            result = data.copy()
+            result['similarity_score'] = float(score)
+            result['similarity_details'] = {
+                "field_match_ratio": field_match_ratio,
+                "value_similarity": value_similarity
+            }
+        rows.append((float(score), field_match_ratio, value_similarity, result))
+
+    if progress is not None:
+        progress(len(chunk))
+    return rows
+
+
+def plan_byte_shards(file_path: str, num_shards: int) -> List[Tuple[int, int]]:
+    """ファイルを行境界に揃えたバイト範囲に分割
+
+    Args:
+        file_path: JSONLファイルパス
+        num_shards: 分割数の目安
+
+    Returns:
+        (開始バイト, 終了バイト) のリスト（空のシャードは含まない）
+    """
+    size = os.path.getsize(file_path)
+    if size == 0:
+        return []
+
+    num_shards = max(1, num_shards)
+    boundaries = [0]
+    with open(file_path, 'rb') as f:
+        for k in range(1, num_shards):
+            target = size * k // num_shards
+            if target <= boundaries[-1]:
+                continue
+            # 境界の直前から次の改行まで読み進め、行の先頭に揃える
+            f.seek(target - 1)
+            f.readline()
+            position = f.tell()
+            if position > boundaries[-1] and position < size:
+                boundaries.append(position)
+    boundaries.append(size)
+
+    return list(zip(boundaries[:-1], boundaries[1:]))
+
+
+def _init_worker(use_gpu: bool, cache_dir: Optional[str], max_disk_entries: int,
+                 list_matching: str, num_threads: int) -> None:
+    """ワーカープロセスの初期化（設定を引き継ぎ、モデルを1回だけロード）"""
+    import torch
+
+    torch.set_num_threads(num_threads)
+    set_gpu_mode(use_gpu)
+    set_list_matching(list_matching)
+    if cache_dir:
+        configure_embedding_cache(cache_dir=cache_dir, max_disk_entries=max_disk_entries)
+    get_embedding_model()
+
+
+def _score_shard(task: Tuple[str, int, int, str]) -> Dict[str, Any]:
+    """ワーカーでシャード1つを採点"""
+    file_path, start, end, output_type = task
+    warnings = []
+
+    def warn(line_num, message):
+        warnings.append((line_num, message))
+
+    parse_errors = ParseErrorCounter(warn)
+    reader = JSONLReader(file_path, start=start, end=end, on_error=parse_errors)
+    rows = list(iter_scored_records(((r.line_num, r.data) for r in reader), output_type, warn))
+    # 読めなかった行は採点できなかった行（None）として返し、総行数に含める
+    rows.extend([None] * parse_errors.count)
+    return {
+        "physical_lines": reader.lines_read,
+        "rows": rows,
+        "warnings": warnings
+    }
+
+
+def _score_record_block(task: Tuple[List[Tuple[int, Any]], str]) -> Dict[str, Any]:
+    """ワーカーでレコードのまとまり1つを採点"""
+    records, output_type = task
+    warnings = []
+
+    def warn(line_num, message):
+        warnings.append((line_num, message))
+
+    return {
+        "rows": list(iter_scored_records(records, output_type, warn)),
+        "warnings": warnings
+    }
+
+
+def _worker_initargs(workers: int) -> tuple:
+    """親プロセスの設定をワーカーに引き継ぐための初期化引数"""
+    cache = get_embedding_cache()
+    cache_dir = str(cache.disk.cache_dir) if cache.disk is not None else None
+    max_disk_entries = cache.disk.max_entries if cache.disk is not None else DiskVectorStore.DEFAULT_MAX_ENTRIES
+    num_threads = max(1, (os.cpu_count() or 1) // workers)
+    return get_gpu_mode(), cache_dir, max_disk_entries, get_list_matching(), num_threads
+
+
+def iter_scored_records_parallel(
+    records: Iterable[Tuple[int, Any]],
+    output_type: str,
+    workers: int,
+    warn: Callable[[int, str], None],
+    progress: Optional[Callable[[int], Any]] = None
+) -> Iterator[Optional[ScoredRow]]:
+    """パース済みレコードのストリームをプロセスプールで採点
+
+    レコードをまとまりごとにワーカーへ投入し、投入済みで未回収のまとまりが
+    ワーカー数 x TASKS_IN_FLIGHT_PER_WORKER を超えないようにするため、
+    入力の大きさによらず保持するレコード数は一定に収まる。
+
+    Args:
+        records: (行番号, パース済みの値) のイテラブル
+        output_type: 出力タイプ (score/file)
+        workers: ワーカープロセス数
+        warn: 行単位の警告を受け取るコールバック (行番号, メッセージ)
+        progress: 処理済み行数を受け取るコールバック
+
+    Yields:
+        入力順の採点結果（採点できなかったレコードはNone）
+    """
+    block_size = SCORING_CHUNK_SIZE * CHUNKS_PER_TASK
+    max_in_flight = workers * TASKS_IN_FLIGHT_PER_WORKER
+
+    context = multiprocessing.get_context("spawn")
+    with context.Pool(processes=workers, initializer=_init_worker,
+                      initargs=_worker_initargs(workers)) as pool:
+        pending = deque()
+
+        def collect():
+            # 最も古いまとまりの結果を待って返す（投入順に回収するため行順が保たれる）
+            block = pending.popleft().get()
+            for line_num, message in block["warnings"]:
+                warn(line_num, message)
+            if progress is not None:
+                progress(len(block["rows"]))
+            return block["rows"]
+
+        block = []
+        for record in records:
+            block.append(record)
+            if len(block) >= block_size:
+                pending.append(pool.apply_async(_score_record_block, ((block, output_type),)))
+                block = []
+                if len(pending) >= max_in_flight:
+                    yield from collect()
+        if block:
+            pending.append(pool.apply_async(_score_record_block, ((block, output_type),)))
+        while pending:
+            yield from collect()
+
+
+def iter_scored_file_parallel(
+    file_path: str,
+    output_type: str,
+    workers: int,
+    warn: Callable[[int, str], None],
+    progress: Optional[Callable[[int, int], Any]] = None
+) -> Iterator[Optional[ScoredRow]]:
+    """JSONLファイルをプロセスプールで採点
+
+    Args:
+        file_path: JSONLファイルパス
+        output_type: 出力タイプ (score/file)
+        workers: ワーカープロセス数
+        warn: 行単位の警告を受け取るコールバック (ファイル全体での行番号, メッセージ)
+        progress: 進捗を受け取るコールバック (処理済み行数, 処理済みバイト数)
+
+    Yields:
+        元の行順の採点結果（採点できなかったレコードはNone）
+    """
+    # メモリ使用量を抑えるため、シャードの大きさにも上限を設ける
+    size = os.path.getsize(file_path)
+    num_shards = max(workers * SHARDS_PER_WORKER, -(-size // MAX_SHARD_BYTES))
+    shards = plan_byte_shards(file_path, num_shards)
+    if not shards:
+        return
+
+    # 親プロセスの設定をワーカーに引き継ぐ
+    initargs = _worker_initargs(workers)
+
+    line_offset = 0
+    tasks = [(file_path, start, end, output_type) for start, end in shards]
+
+    # CUDAやtorchのスレッドと安全に共存できるようspawnで起動する
+    context = multiprocessing.get_context("spawn")
+    with context.Pool(processes=min(workers, len(shards)), initializer=_init_worker, initargs=initargs) as pool:
+        # imapは投入順に結果を返すため、そのまま返せば元の行順になる
+        for (_, end), shard in zip(shards, pool.imap(_score_shard, tasks)):
+            for line_num, message in shard["warnings"]:
+                warn(line_offset + line_num, message)
+            line_offset += shard["physical_lines"]
+            yield from shard["rows"]
+            if progress is not None:
+                progress(len(shard["rows"]), end)
@@ -77,17 +77,18 @@ class ProgressTracker:
             console_handler.setFormatter(formatter)
             self.logger.addHandler(console_handler)
 
-    def create_task(self, total_items: int) -> str:
+    def create_task(self, total_items: int, task_id: Optional[str] = None) -> str:
         """Create a new task and return its unique ID.
 
         Args:
             total_items: Total number of items to process
+            task_id: Existing task ID to reuse (e.g. when resuming an interrupted task)
 
         Returns:
             Unique task ID
         """
         # Generate unique task ID
-        task_id = str(uuid.uuid4())
+        task_id = task_id or str(uuid.uuid4())
 
         # Create task data
         task_data = TaskData(
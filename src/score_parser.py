@@ -90,6 +90,7 @@ class ScoreParser:
             "score_pattern": r"\*\*スコア\*\*[：:]\s*([-]?[0-9.０-９．]+)",
             "category_pattern": r"\*\*カテゴリ\*\*[：:]\s*([^\n]+)",
             "reason_pattern": r"\*\*理由\*\*[：:]\s*(.+?)(?=\n\S|$)",
+            "pair_pattern": r"\*\*ペア\*\*[：:]\s*\[?([0-9０-９]+)",
             "percentage_pattern": r"([-]?[0-9.０-９．]+)%",
             "number_pattern": r"([-]?[0-9.０-９．]+)"
         }
@@ -340,6 +341,58 @@ class ScoreParser:
                 logger.error(f"解析失敗: {e}")
             raise
 
+    def parse_packed_response(self, response_text: str, count: int) -> List[Optional[ParsedScore]]:
+        """
+        複数ペアをまとめて評価したLLMレスポンスをペアごとに解析
+
+        レスポンスを "**ペア**: 番号" で始まるブロックに分け、各ブロックの **スコア** を抽出する。
+        ペアを取り違えないよう、1件ずつの解析と違ってスコアの推定は行わない。
+
+        Args:
+            response_text: LLMからのレスポンステキスト
+            count: プロンプトに含めたペアの数
+
+        Returns:
+            ペア番号順の解析結果のリスト（ブロックやスコアが見つからない、
+            または番号が重複したペアはNone）
+        """
+        normalized_text = self._normalize_japanese_numbers(response_text)
+        markers = list(self.patterns["pair_pattern"].finditer(normalized_text))
+
+        blocks: Dict[int, Optional[str]] = {}
+        for i, marker in enumerate(markers):
+            number = int(marker.group(1))
+            end = markers[i + 1].start() if i + 1 < len(markers) else len(normalized_text)
+            # 同じ番号が複数回現れた場合はどちらが正しいか判断できないため使わない
+            blocks[number] = None if number in blocks else normalized_text[marker.end():end]
+
+        results: List[Optional[ParsedScore]] = []
+        for number in range(1, count + 1):
+            self.stats["total_parsed"] += 1
+            block = blocks.get(number)
+            score_match = self.patterns["score_pattern"].search(block) if block else None
+            try:
+                score = float(score_match.group(1)) if score_match else None
+            except ValueError:
+                score = None
+            if score is None:
+                self.stats["failed_parsed"] += 1
+                results.append(None)
+                continue
+
+            category = self._extract_category(block)
+            reason_match = self.patterns["reason_pattern"].search(block)
+            results.append(ParsedScore(
+                score=max(0.0, min(1.0, score)),
+                category=category or self.infer_category_from_score(score),
+                reason=reason_match.group(1).strip() if reason_match else "",
+                confidence=self._calculate_confidence(block, True, bool(category), bool(reason_match)),
+                raw_response=block.strip()
+            ))
+            self.stats["successful_parsed"] += 1
+
+        return results
+
     def parse_batch_responses(self, responses: List[str], skip_errors: bool = False) -> List[ParsedScore]:
         """
         複数のレスポンスを一括解析
@@ -1,17 +1,32 @@
 """JSON類似度計算のメインモジュール"""
 
-import json
-from typing import Any
-from json_repair import repair_json
+import math
+import os
+import threading
+import time
+from collections import deque
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
 
-from .embedding import JapaneseEmbedding
+import numpy as np
+
+from .embedding import WARMUP_TOKEN_LENGTHS, JapaneseEmbedding, similarity_matrix
+from .embedding_cache import DiskVectorStore, EmbeddingCache
+from .json_parser import get_parse_statistics, parse_value
 from .utils import is_numeric, to_numeric
 
 
 # グローバルで埋め込みモデルを保持（初期化コストを削減）
 _embedding_model = None
+_embedding_model_lock = threading.Lock()
 _use_gpu = False
 
+# 埋め込みキャッシュ（CLI・APIで共有）
+_embedding_cache = None
+
+# リスト要素のマッチング方式
+LIST_MATCHING_METHODS = ("greedy", "hungarian")
+_list_matching = "greedy"
+
 
 def set_gpu_mode(use_gpu: bool):
     """GPU使用モードを設定"""
@@ -19,14 +34,95 @@ def set_gpu_mode(use_gpu: bool):
     _use_gpu = use_gpu
 
 
+def get_gpu_mode() -> bool:
+    """現在のGPU使用モードを取得"""
+    return _use_gpu
+
+
+def set_list_matching(method: str):
+    """リスト要素のマッチング方式を設定
+
+    Args:
+        method: "greedy"（類似度の高いペアから貪欲に確定）または
+            "hungarian"（類似度の総和が最大になる最適割当）
+    """
+    global _list_matching
+    if method not in LIST_MATCHING_METHODS:
+        raise ValueError(f"未対応のマッチング方式です: {method}")
+    _list_matching = method
+
+
+def get_list_matching() -> str:
+    """現在のリスト要素のマッチング方式を取得"""
+    return _list_matching
+
+
+def configure_embedding_cache(cache_dir: Optional[str] = None, max_entries: int = 100000,
+                              max_disk_entries: int = DiskVectorStore.DEFAULT_MAX_ENTRIES) -> EmbeddingCache:
+    """共有する埋め込みキャッシュを設定
+
+    Args:
+        cache_dir: ディスク層のディレクトリ（Noneの場合はメモリ層のみ）
+        max_entries: メモリ層の最大エントリ数
+        max_disk_entries: ディスク層の最大エントリ数（超えるとコンパクション）
+
+    Returns:
+        設定したキャッシュ
+    """
+    global _embedding_cache
+    _embedding_cache = EmbeddingCache(max_entries=max_entries, cache_dir=cache_dir,
+                                      max_disk_entries=max_disk_entries)
+    if _embedding_model is not None:
+        _embedding_model.cache = _embedding_cache
+    return _embedding_cache
+
+
+def get_embedding_cache() -> EmbeddingCache:
+    """共有埋め込みキャッシュを取得
+
+    未設定の場合は環境変数 EMBEDDING_CACHE_DIR / EMBEDDING_CACHE_SIZE /
+    EMBEDDING_DISK_CACHE_SIZE から作成する。
+    """
+    if _embedding_cache is None:
+        return configure_embedding_cache(
+            cache_dir=os.environ.get("EMBEDDING_CACHE_DIR") or None,
+            max_entries=int(os.environ.get("EMBEDDING_CACHE_SIZE", "100000")),
+            max_disk_entries=int(os.environ.get("EMBEDDING_DISK_CACHE_SIZE",
+                                                str(DiskVectorStore.DEFAULT_MAX_ENTRIES)))
+        )
+    return _embedding_cache
+
+
 def get_embedding_model():
     """埋め込みモデルのシングルトンインスタンスを取得"""
     global _embedding_model
     if _embedding_model is None:
-        _embedding_model = JapaneseEmbedding(use_gpu=_use_gpu)
+        # 起動時のプリロードとリクエストが同時にロードしないようにする
+        with _embedding_model_lock:
+            if _embedding_model is None:
+                _embedding_model = JapaneseEmbedding(use_gpu=_use_gpu, cache=get_embedding_cache())
     return _embedding_model
 
 
+def warm_up_embedding_model(lengths: Iterable[int] = WARMUP_TOKEN_LENGTHS) -> Dict[str, float]:
+    """埋め込みモデルをロードし、典型的な長さのテキストでウォームアップする
+
+    Args:
+        lengths: ウォームアップで通すおおよそのトークン長
+
+    Returns:
+        {"load_seconds", "warmup_seconds"} の所要時間
+    """
+    start = time.time()
+    model = get_embedding_model()
+    loaded = time.time()
+    model.warm_up(tuple(lengths))
+    return {
+        "load_seconds": loaded - start,
+        "warmup_seconds": time.time() - loaded
+    }
+
+
 def calculate_json_similarity(json1: str, json2: str) -> tuple:
     """2つのJSON文字列の類似度を計算
 
@@ -37,10 +133,51 @@ def calculate_json_similarity(json1: str, json2: str) -> tuple:
     Returns:
         タプル: (類似度 (0-1), 詳細情報の辞書)
     """
+    return calculate_json_similarity_batch([(json1, json2)])[0]
+
+
+def calculate_json_similarity_batch(pairs: List[Tuple[str, str]]) -> List[tuple]:
+    """複数のJSON文字列ペアの類似度を2段階で計算
+
+    1. 全ペアをパースし、埋め込みが必要な文字列リーフを重複なく収集
+    2. 収集した文字列を1回のバッチで埋め込み、ベクトル表を使ってA×Bを計算
+
+    Args:
+        pairs: (JSON文字列1, JSON文字列2) のリスト
+
+    Returns:
+        入力順の (類似度 (0-1), 詳細情報の辞書) のリスト
+    """
     # JSON修復とパース
-    dict1 = repair_and_parse_json(json1)
-    dict2 = repair_and_parse_json(json2)
+    parsed = [(repair_and_parse_json(json1), repair_and_parse_json(json2)) for json1, json2 in pairs]
+    return score_parsed_pairs(parsed)
+
+
+def score_parsed_pairs(parsed: List[Tuple[Any, Any]]) -> List[tuple]:
+    """パース済みの値のペアの類似度を2段階で計算
+
+    同じパース済みの値を複数のペアで共有してもよい（参照側を1回だけ
+    パースして複数の候補と比較する場合など）。
+
+    Args:
+        parsed: (パース済みの値1, パース済みの値2) のリスト（修復できなかった値はNone）
+
+    Returns:
+        入力順の (類似度 (0-1), 詳細情報の辞書) のリスト
+    """
+    # フェーズ1: 埋め込みが必要な文字列を収集して一括で埋め込む
+    texts: Set[str] = set()
+    for dict1, dict2 in parsed:
+        if isinstance(dict1, dict) and isinstance(dict2, dict):
+            collect_embedding_texts(dict1, dict2, texts)
+    vectors = embed_texts(texts)
+
+    # フェーズ2: ベクトル表を参照してスコアを計算
+    return [_score_parsed_pair(dict1, dict2, vectors) for dict1, dict2 in parsed]
+
 
+def _score_parsed_pair(dict1: Any, dict2: Any, vectors: Optional[Dict[str, np.ndarray]] = None) -> tuple:
+    """パース済みの2値からA×Bの類似度と詳細情報を計算"""
     # いずれかが修復できなければ0を返す
     if dict1 is None or dict2 is None:
         return 0.0, {"field_match_ratio": 0.0, "value_similarity": 0.0}
@@ -49,7 +186,7 @@ def calculate_json_similarity(json1: str, json2: str) -> tuple:
     field_match_ratio = calculate_field_match_ratio(dict1, dict2)
 
     # フィールド値類似度（B）
-    field_similarity = calculate_field_similarity(dict1, dict2)
+    field_similarity = calculate_field_similarity(dict1, dict2, vectors)
 
     # A × B を類似度とする
     score = field_match_ratio * field_similarity
@@ -66,27 +203,18 @@ def calculate_json_similarity(json1: str, json2: str) -> tuple:
 def repair_and_parse_json(json_str: str) -> dict | None:
     """JSON文字列を修復してパース、プレーンテキストの場合は特別処理
 
+    パースは安い順（高速パーサー → 標準json → json_repair）に試し、
+    波括弧・角括弧を含まないテキストは修復せずにプレーンテキストとして扱う。
+
     Args:
         json_str: JSON文字列またはプレーンテキスト
 
     Returns:
         パースされた辞書、プレーンテキストの場合は{"text": 値}形式、失敗時はNone
     """
-    try:
-        # まず通常のパースを試みる
-        return json.loads(json_str)
-    except:
-        try:
-            # 失敗したらjson_repairで修復
-            repaired = repair_json(json_str)
-            return json.loads(repaired)
-        except:
-            # JSON修復も失敗した場合、プレーンテキストとして扱う
-            # 空文字列でない場合は、textフィールドに格納した辞書として返す
-            if json_str and json_str.strip():
-                return {"text": json_str.strip()}
-            # 空文字列の場合はNone
-            return None
+    value, tier = parse_value(json_str)
+    get_parse_statistics().record(tier)
+    return value
 
 
 def calculate_field_match_ratio(dict1: dict, dict2: dict) -> float:
@@ -118,12 +246,14 @@ def calculate_field_match_ratio(dict1: dict, dict2: dict) -> float:
     return len(common_keys) / max_keys if max_keys > 0 else 0.0
 
 
-def calculate_field_similarity(dict1: dict, dict2: dict) -> float:
+def calculate_field_similarity(dict1: dict, dict2: dict,
+                               vectors: Optional[Dict[str, np.ndarray]] = None) -> float:
     """共通フィールドの値の類似度を計算（B）
     
     Args:
         dict1: 辞書1
         dict2: 辞書2
+        vectors: 事前計算済みの埋め込みベクトル表（テキスト -> 正規化ベクトル）
     
     Returns:
         フィールド値類似度 (0-1)
@@ -140,19 +270,20 @@ def calculate_field_similarity(dict1: dict, dict2: dict) -> float:
     # 各フィールドの類似度を計算
     total_similarity = 0.0
     for key in common_keys:
-        similarity = compare_values(dict1[key], dict2[key])
+        similarity = compare_values(dict1[key], dict2[key], vectors)
         total_similarity += similarity
     
     # 共通フィールド数で正規化
     return total_similarity / len(common_keys)
 
 
-def compare_values(val1: Any, val2: Any) -> float:
+def compare_values(val1: Any, val2: Any, vectors: Optional[Dict[str, np.ndarray]] = None) -> float:
     """2つの値の類似度を比較
     
     Args:
         val1: 値1
         val2: 値2
+        vectors: 事前計算済みの埋め込みベクトル表（テキスト -> 正規化ベクトル）
     
     Returns:
         類似度 (0-1)
@@ -171,13 +302,13 @@ def compare_values(val1: Any, val2: Any) -> float:
     
     # リストの場合
     if isinstance(val1, list) and isinstance(val2, list):
-        return compare_lists(val1, val2)
+        return compare_lists(val1, val2, vectors)
     
     # 辞書（オブジェクト）の場合は再帰的に処理
     if isinstance(val1, dict) and isinstance(val2, dict):
         # 再帰的に類似度計算
         field_match = calculate_field_match_ratio(val1, val2)
-        field_sim = calculate_field_similarity(val1, val2)
+        field_sim = calculate_field_similarity(val1, val2, vectors)
         return field_match * field_sim
     
     # 数値の比較
@@ -191,16 +322,20 @@ def compare_values(val1: Any, val2: Any) -> float:
             return 0.1
     
     # その他の場合は埋め込みベクトルで類似度計算
+    text1, text2 = str(val1), str(val2)
+    if vectors is not None and text1 in vectors and text2 in vectors:
+        return vector_similarity(vectors[text1], vectors[text2])
     embedding = get_embedding_model()
-    return embedding.calculate_similarity(str(val1), str(val2))
+    return embedding.calculate_similarity(text1, text2)
 
 
-def compare_lists(list1: list, list2: list) -> float:
+def compare_lists(list1: list, list2: list, vectors: Optional[Dict[str, np.ndarray]] = None) -> float:
     """リストの類似度を比較
     
     Args:
         list1: リスト1
         list2: リスト2
+        vectors: 事前計算済みの埋め込みベクトル表（テキスト -> 正規化ベクトル）
     
     Returns:
         類似度 (0-1)
@@ -213,57 +348,281 @@ def compare_lists(list1: list, list2: list) -> float:
     if len(list1) == 0 or len(list2) == 0:
         return 0.0
     
-    # リストのコピーを作成（破壊的変更を避ける）
-    remaining1 = list1.copy()
-    remaining2 = list2.copy()
+    # Step 1: 完全一致を除外（コピー上で処理し、破壊的変更を避ける）
+    remaining1, remaining2 = _remove_exact_matches(list1, list2)
+    matched_count = len(list1) - len(remaining1)
+    similarity_sum = float(matched_count)
     
-    similarity_sum = 0.0
-    matched_count = 0
+    # Step 2: 残った要素の類似度行列を作り、行列上でマッチング
+    if remaining1 and remaining2:
+        matrix = list_similarity_matrix(remaining1, remaining2, vectors)
+        pairs = match_similarity_matrix(matrix, _list_matching)
+        for i, j in pairs:
+            similarity_sum += float(matrix[i, j])
+        matched_count += len(pairs)
+        matched1 = {i for i, _ in pairs}
+        matched2 = {j for _, j in pairs}
+        remaining1 = [item for i, item in enumerate(remaining1) if i not in matched1]
+        remaining2 = [item for j, item in enumerate(remaining2) if j not in matched2]
+    
+    # 長い方のリスト長
+    max_length = max(len(list1), len(list2))
     
-    # Step 1: 完全一致を除外
+    # マッチしなかった要素がある場合
+    unmatched_count = len(remaining1) + len(remaining2)
+    if unmatched_count > 0:
+        # 残った要素数+1で割る
+        return similarity_sum / (unmatched_count + 1)
+    else:
+        # 全てマッチした場合
+        return similarity_sum / max_length
+
+
+def list_similarity_matrix(items1: list, items2: list,
+                           vectors: Optional[Dict[str, np.ndarray]] = None) -> np.ndarray:
+    """完全一致を除いた残りのリスト要素同士の類似度行列を作成
+
+    埋め込みで比較される要素のペアは、要素ごとに1回だけ埋め込んだベクトルの
+    行列積でまとめて計算する。ネストしたリスト・辞書や数値のペアは
+    compare_valuesで個別に計算する。
+
+    Args:
+        items1: 要素のリスト1（items2と完全一致する要素を含まないこと）
+        items2: 要素のリスト2
+        vectors: 事前計算済みの埋め込みベクトル表（テキスト -> 正規化ベクトル）
+
+    Returns:
+        (len(items1), len(items2)) の類似度行列 (0-1)
+    """
+    matrix = np.zeros((len(items1), len(items2)), dtype=np.float64)
+    kinds1 = [_value_kind(item) for item in items1]
+    kinds2 = [_value_kind(item) for item in items2]
+    texts1 = [str(item) for item in items1]
+    texts2 = [str(item) for item in items2]
+
+    # 埋め込みで比較されるセルと、それ以外のセルを振り分ける
+    embed_mask = np.zeros(matrix.shape, dtype=bool)
+    for i, kind1 in enumerate(kinds1):
+        for j, kind2 in enumerate(kinds2):
+            if _reaches_embedding(kind1, kind2) and texts1[i] and texts2[j]:
+                embed_mask[i, j] = True
+            else:
+                matrix[i, j] = compare_values(items1[i], items2[j], vectors)
+
+    if embed_mask.any():
+        rows = np.flatnonzero(embed_mask.any(axis=1))
+        cols = np.flatnonzero(embed_mask.any(axis=0))
+
+        # 表にないテキストはまとめて1回で埋め込む
+        table = dict(vectors) if vectors is not None else {}
+        needed = [texts1[i] for i in rows] + [texts2[j] for j in cols]
+        table.update(embed_texts(text for text in needed if text not in table))
+
+        left = np.vstack([table[texts1[i]] for i in rows])
+        right = np.vstack([table[texts2[j]] for j in cols])
+        block = similarity_matrix(left, right)
+
+        sub_mask = embed_mask[np.ix_(rows, cols)]
+        sub_matrix = matrix[np.ix_(rows, cols)]
+        sub_matrix[sub_mask] = block[sub_mask]
+        matrix[np.ix_(rows, cols)] = sub_matrix
+
+    return matrix
+
+
+def match_similarity_matrix(matrix: np.ndarray, method: str = "greedy") -> List[Tuple[int, int]]:
+    """類似度行列上で行と列を1対1にマッチング
+
+    Args:
+        matrix: 類似度行列
+        method: "greedy" または "hungarian"
+
+    Returns:
+        マッチした (行, 列) のリスト（確定した順）
+    """
+    n_rows, n_cols = matrix.shape
+    if n_rows == 0 or n_cols == 0:
+        return []
+
+    if method == "hungarian":
+        from scipy.optimize import linear_sum_assignment
+        rows, cols = linear_sum_assignment(matrix, maximize=True)
+        return [(int(i), int(j)) for i, j in zip(rows, cols)]
+
+    if method != "greedy":
+        raise ValueError(f"未対応のマッチング方式です: {method}")
+
+    # 類似度の降順に確定する。同値の場合は行優先で先に現れるペアを選ぶ
+    # （残り全体から最大値を探し直す従来の貪欲法と同じ結果になる）
+    order = np.argsort(-matrix, axis=None, kind="stable")
+    used_rows = np.zeros(n_rows, dtype=bool)
+    used_cols = np.zeros(n_cols, dtype=bool)
+    pairs = []
+    limit = min(n_rows, n_cols)
+    for flat in order:
+        i, j = divmod(int(flat), n_cols)
+        if used_rows[i] or used_cols[j]:
+            continue
+        used_rows[i] = True
+        used_cols[j] = True
+        pairs.append((i, j))
+        if len(pairs) == limit:
+            break
+    return pairs
+
+
+def _value_kind(value: Any) -> str:
+    """compare_valuesの分岐判定に使う値の種別"""
+    if value is None:
+        return "null"
+    if isinstance(value, list):
+        return "list"
+    if isinstance(value, dict):
+        return "dict"
+    if is_numeric(value):
+        return "numeric"
+    return "text"
+
+
+def _reaches_embedding(kind1: str, kind2: str) -> bool:
+    """完全一致しない2値のcompare_valuesが埋め込み比較に到達するか"""
+    if kind1 == "null" or kind2 == "null":
+        return False
+    if kind1 == kind2 and kind1 in ("list", "dict", "numeric"):
+        return False
+    return True
+
+
+def collect_embedding_texts(val1: Any, val2: Any, texts: Set[str]) -> None:
+    """compare_valuesが埋め込みを必要とする文字列を収集
+
+    compare_values / compare_lists と同じ分岐をたどり、埋め込みベクトルでの
+    比較に到達する値の文字列表現だけをtextsに追加する。
+
+    Args:
+        val1: 値1
+        val2: 値2
+        texts: 収集先の集合
+    """
+    # 完全一致・nullは埋め込み不要
+    if val1 == val2 or val1 is None or val2 is None:
+        return
+
+    # リストの場合は完全一致を除いた残りの全組み合わせ
+    if isinstance(val1, list) and isinstance(val2, list):
+        remaining1, remaining2 = _remove_exact_matches(val1, val2)
+        for item1 in remaining1:
+            for item2 in remaining2:
+                collect_embedding_texts(item1, item2, texts)
+        return
+
+    # 辞書の場合は共通フィールドを再帰的に
+    if isinstance(val1, dict) and isinstance(val2, dict):
+        for key in set(val1.keys()) & set(val2.keys()):
+            collect_embedding_texts(val1[key], val2[key], texts)
+        return
+
+    # 数値同士は埋め込み不要
+    if is_numeric(val1) and is_numeric(val2):
+        return
+
+    text1, text2 = str(val1), str(val2)
+    # 空文字列は埋め込みを使わずに判定される
+    if text1 and text2:
+        texts.add(text1)
+        texts.add(text2)
+
+
+def embed_texts(texts: Iterable[str]) -> Dict[str, np.ndarray]:
+    """テキスト集合を一括で埋め込み、ベクトル表を作成
+
+    Args:
+        texts: 埋め込むテキスト
+
+    Returns:
+        テキスト -> 正規化済み埋め込みベクトル の辞書
+    """
+    unique_texts = list(dict.fromkeys(texts))
+    if not unique_texts:
+        return {}
+
+    matrix = get_embedding_model().encode_batch(unique_texts)
+    return {text: matrix[i] for i, text in enumerate(unique_texts)}
+
+
+def vector_similarity(vec1: np.ndarray, vec2: np.ndarray) -> float:
+    """正規化済みベクトル同士のコサイン類似度を0-1に収めて返す"""
+    return float(similarity_matrix(vec1[np.newaxis, :], vec2[np.newaxis, :])[0, 0])
+
+
+def _remove_exact_matches(list1: list, list2: list) -> Tuple[list, list]:
+    """2つのリストから完全一致する要素を取り除いた残りを返す
+
+    list1の要素を先頭から順に、list2の中でまだ使われていない最も左の
+    等しい要素と対にして取り除く。等価な値が同じキーになる正規化キーで
+    list2をバケット化するため、要素数に対して線形時間で処理できる。
+    """
+    try:
+        keys2 = [_canonical_key(item) for item in list2]
+        buckets: Dict[Any, deque] = {}
+        for j, key in enumerate(keys2):
+            buckets.setdefault(key, deque()).append(j)
+
+        matched2 = set()
+        remaining1 = []
+        for item in list1:
+            bucket = buckets.get(_canonical_key(item))
+            if bucket:
+                matched2.add(bucket.popleft())
+            else:
+                remaining1.append(item)
+    except TypeError:
+        # 正規化キーを作れない値（NaNなど）が含まれる場合は逐次比較する
+        return _remove_exact_matches_slow(list1, list2)
+
+    remaining2 = [item for j, item in enumerate(list2) if j not in matched2]
+    return remaining1, remaining2
+
+
+def _canonical_key(value: Any) -> Any:
+    """==で等しい値同士が等しくなるハッシュ可能な正規化キー
+
+    数値は1 == 1.0 == Trueと同じ規則で等しくなるようそのまま使い、
+    辞書はキー順に依存しないようfrozensetにする。
+    """
+    if value is None:
+        return ("null",)
+    if isinstance(value, str):
+        return ("str", value)
+    if isinstance(value, (bool, int)):
+        return ("num", value)
+    if isinstance(value, float):
+        if math.isnan(value):
+            # NaNは自身とも等しくないためキーにできない
+            raise TypeError("NaNは正規化キーにできません")
+        return ("num", value)
+    if isinstance(value, list):
+        return ("list", tuple(_canonical_key(item) for item in value))
+    if isinstance(value, dict):
+        return ("dict", frozenset((key, _canonical_key(item)) for key, item in value.items()))
+    raise TypeError(f"正規化キーにできない型です: {type(value).__name__}")
+
+
+def _remove_exact_matches_slow(list1: list, list2: list) -> Tuple[list, list]:
+    """_remove_exact_matchesの逐次比較版（正規化キーを作れない値用）"""
+    remaining1 = list1.copy()
+    remaining2 = list2.copy()
+
     i = 0
     while i < len(remaining1):
         found = False
         for j in range(len(remaining2)):
             if remaining1[i] == remaining2[j]:
-                similarity_sum += 1.0
-                matched_count += 1
                 remaining1.pop(i)
                 remaining2.pop(j)
                 found = True
                 break
         if not found:
             i += 1
-    
-    # Step 2: 残った要素で類似度計算
-    while remaining1 and remaining2:
-        best_similarity = 0.0
-        best_i = 0
-        best_j = 0
-        
-        # 最も類似度の高いペアを探す
-        for i in range(len(remaining1)):
-            for j in range(len(remaining2)):
-                sim = compare_values(remaining1[i], remaining2[j])
-                if sim > best_similarity:
-                    best_similarity = sim
-                    best_i = i
-                    best_j = j
-        
-        # 最も類似度の高いペアを除外
-        similarity_sum += best_similarity
-        matched_count += 1
-        remaining1.pop(best_i)
-        remaining2.pop(best_j)
-    
-    # 長い方のリスト長
-    max_length = max(len(list1), len(list2))
-    
-    # マッチしなかった要素がある場合
-    unmatched_count = len(remaining1) + len(remaining2)
-    if unmatched_count > 0:
-        # 残った要素数+1で割る
-        return similarity_sum / (unmatched_count + 1)
-    else:
-        # 全てマッチした場合
-        return similarity_sum / max_length
\ No newline at end of file
+
+    return remaining1, remaining2
@@ -7,15 +7,23 @@ Strategyパターンを使用して埋め込みベースとLLMベースの類似
 import asyncio
 import time
 import logging
-from typing import Dict, List, Optional, Any, Tuple, Union
+from typing import Callable, Dict, List, Optional, Any, Tuple, Union
 from dataclasses import dataclass, field
 from abc import ABC, abstractmethod
 
 from . import similarity
+from .llm_batch import AdaptiveConcurrencyLimiter, run_bounded
+from .llm_cache import LLMResponseCache
 from .llm_similarity import LLMSimilarity, SimilarityResult as LLMResult, LLMSimilarityError
 
 logger = logging.getLogger(__name__)
 
+# カスケード方式でLLMに送る埋め込みスコアの範囲（この範囲外のペアは埋め込みスコアで確定）
+DEFAULT_CASCADE_BAND = (0.4, 0.85)
+
+# 一括計算で各ペアの結果が確定するたびに (ペアのインデックス, 結果) で呼ぶコールバック
+ResultCallback = Callable[[int, "StrategyResult"], None]
+
 
 class StrategyError(Exception):
     """戦略パターン関連のエラー"""
@@ -109,6 +117,38 @@ class EmbeddingSimilarityStrategy(SimilarityStrategy):
             logger.error(f"埋め込みベース類似度計算に失敗: {e}")
             raise StrategyError(f"埋め込みベース計算に失敗しました: {e}")
 
+    async def calculate_batch_similarity(self, json_pairs: List[Tuple[str, str]]) -> List[StrategyResult]:
+        """
+        埋め込みベースで複数ペアの類似度をまとめて計算（文字列の埋め込みは1回のバッチで行う）
+
+        Args:
+            json_pairs: JSONペアのリスト
+
+        Returns:
+            入力順の計算結果のリスト
+
+        Raises:
+            StrategyError: 計算に失敗した場合
+        """
+        start_time = time.time()
+
+        try:
+            scored = similarity.calculate_json_similarity_batch(json_pairs)
+        except Exception as e:
+            logger.error(f"埋め込みベース類似度計算に失敗: {e}")
+            raise StrategyError(f"埋め込みベース計算に失敗しました: {e}")
+
+        processing_time = (time.time() - start_time) / max(len(json_pairs), 1)
+        return [
+            StrategyResult(
+                score=score,
+                method="embedding",
+                processing_time=processing_time,
+                metadata=details
+            )
+            for score, details in scored
+        ]
+
 
 class LLMSimilarityStrategy(SimilarityStrategy):
     """LLMベース類似度計算戦略"""
@@ -141,23 +181,72 @@ class LLMSimilarityStrategy(SimilarityStrategy):
             llm_result = await self.llm_similarity.calculate_similarity(json1, json2)
 
             # LLMResultをStrategyResultに変換
-            return StrategyResult(
-                score=llm_result.score,
-                method="llm",
-                processing_time=llm_result.processing_time,
-                metadata={
-                    "category": llm_result.category,
-                    "reason": llm_result.reason,
-                    "model_used": llm_result.model_used,
-                    "confidence": llm_result.confidence,
-                    "tokens_used": llm_result.tokens_used
-                }
-            )
+            return self._to_strategy_result(llm_result)
 
         except Exception as e:
             logger.error(f"LLMベース類似度計算に失敗: {e}")
             raise StrategyError(f"LLMベース計算に失敗しました: {e}")
 
+    async def calculate_packed_batch(
+        self,
+        json_pairs: List[Tuple[str, str]],
+        pack_size: int,
+        sequential: bool = False,
+        on_result: Optional[Callable[[int, Union[StrategyResult, StrategyError]], None]] = None
+    ) -> List[Union[StrategyResult, StrategyError]]:
+        """
+        pack_size件ずつ1回のLLM呼び出しにまとめて類似度を計算
+
+        Args:
+            json_pairs: JSONペアのリスト
+            pack_size: 1回のLLM呼び出しでまとめて評価するペア数
+            sequential: 順次処理するかどうか
+            on_result: まとめた呼び出しが終わるたびに (ペアのインデックス, 結果) で呼ぶコールバック
+
+        Returns:
+            入力順の計算結果のリスト（失敗したペアはStrategyErrorオブジェクト）
+        """
+        converted: Dict[int, Union[StrategyResult, StrategyError]] = {}
+
+        def finish(index: int, result: Any) -> None:
+            converted[index] = self._convert_packed_result(result)
+            if on_result is not None:
+                on_result(index, converted[index])
+
+        llm_results = await self.llm_similarity.calculate_packed_batch(
+            json_pairs, pack_size, sequential=sequential, on_result=finish
+        )
+        return [
+            converted[i] if i in converted else self._convert_packed_result(result)
+            for i, result in enumerate(llm_results)
+        ]
+
+    def _convert_packed_result(self, result: Any) -> Union[StrategyResult, StrategyError]:
+        """まとめて評価した結果をStrategyResult（失敗はStrategyError）に変換"""
+        if isinstance(result, Exception):
+            return StrategyError(f"LLMベース計算に失敗しました: {result}")
+        return self._to_strategy_result(result)
+
+    @staticmethod
+    def _to_strategy_result(llm_result: LLMResult) -> StrategyResult:
+        """LLMResultをStrategyResultに変換"""
+        metadata = {
+            "category": llm_result.category,
+            "reason": llm_result.reason,
+            "model_used": llm_result.model_used,
+            "confidence": llm_result.confidence,
+            "tokens_used": llm_result.tokens_used
+        }
+        if llm_result.pack_size > 1:
+            metadata["pack_size"] = llm_result.pack_size
+
+        return StrategyResult(
+            score=llm_result.score,
+            method="llm",
+            processing_time=llm_result.processing_time,
+            metadata=metadata
+        )
+
 
 class SimilarityCalculator:
     """類似度計算機（戦略パターンのコンテキスト）"""
@@ -165,7 +254,8 @@ class SimilarityCalculator:
     def __init__(
         self,
         embedding_strategy: Optional[EmbeddingSimilarityStrategy] = None,
-        llm_strategy: Optional[LLMSimilarityStrategy] = None
+        llm_strategy: Optional[LLMSimilarityStrategy] = None,
+        cascade_band: Tuple[float, float] = DEFAULT_CASCADE_BAND
     ):
         """
         初期化
@@ -173,9 +263,15 @@ class SimilarityCalculator:
         Args:
             embedding_strategy: 埋め込み戦略
             llm_strategy: LLM戦略
+            cascade_band: カスケード方式でLLMに送る埋め込みスコアの範囲 (下限, 上限)
         """
+        low, high = cascade_band
+        if not 0.0 <= low <= high <= 1.0:
+            raise ValueError("cascade_band は 0.0 <= 下限 <= 上限 <= 1.0 で指定してください")
+
         self.embedding_strategy = embedding_strategy or EmbeddingSimilarityStrategy()
         self.llm_strategy = llm_strategy or LLMSimilarityStrategy()
+        self.cascade_band = (low, high)
 
         # 統計情報
         self._stats = {
@@ -187,6 +283,27 @@ class SimilarityCalculator:
             "total_processing_time": 0.0
         }
 
+        # LLM戦略がリミッターを持たない場合に使うリミッター
+        self._default_limiter: Optional[AdaptiveConcurrencyLimiter] = None
+
+    @property
+    def concurrency_limiter(self) -> AdaptiveConcurrencyLimiter:
+        """並列処理の同時実行数を制御するリミッター（LLMクライアントと共有）"""
+        llm_similarity = getattr(self.llm_strategy, "llm_similarity", None)
+        limiter = getattr(llm_similarity, "concurrency_limiter", None)
+        if isinstance(limiter, AdaptiveConcurrencyLimiter):
+            return limiter
+        if self._default_limiter is None:
+            self._default_limiter = AdaptiveConcurrencyLimiter()
+        return self._default_limiter
+
+    @property
+    def response_cache(self) -> Optional[LLMResponseCache]:
+        """LLMクライアントの応答キャッシュ（無効な場合はNone）"""
+        llm_similarity = getattr(self.llm_strategy, "llm_similarity", None)
+        cache = getattr(getattr(llm_similarity, "llm_client", None), "response_cache", None)
+        return cache if isinstance(cache, LLMResponseCache) else None
+
     async def __aenter__(self):
         """非同期コンテキストマネージャーの開始"""
         return self
@@ -198,7 +315,7 @@ class SimilarityCalculator:
 
     def _validate_method(self, method: str):
         """計算方法の妥当性を検証"""
-        valid_methods = ["embedding", "llm", "auto"]
+        valid_methods = ["embedding", "llm", "auto", "cascade"]
         if method not in valid_methods:
             raise StrategyError(f"サポートされていない計算方法: {method}")
 
@@ -245,7 +362,7 @@ class SimilarityCalculator:
         Args:
             json1: JSON文字列1
             json2: JSON文字列2
-            method: 計算方法（"embedding", "llm", "auto"）
+            method: 計算方法（"embedding", "llm", "auto", "cascade"）
             fallback_enabled: フォールバック有効フラグ
             **kwargs: 各戦略に渡す追加パラメータ
 
@@ -256,6 +373,15 @@ class SimilarityCalculator:
             StrategyError: 計算に失敗した場合
         """
         self._validate_method(method)
+
+        if method == "cascade":
+            result = (await self._calculate_cascade_batch(
+                [(json1, json2)], sequential=True, fallback_enabled=fallback_enabled, pack_size=1
+            ))[0]
+            if result.method == "error":
+                raise StrategyError(result.metadata["error"])
+            return result
+
         self._stats["total_calculations"] += 1
 
         start_time = time.time()
@@ -326,6 +452,8 @@ class SimilarityCalculator:
         method: str = "auto",
         sequential: bool = True,
         fallback_enabled: bool = True,
+        pack_size: int = 1,
+        on_result: Optional[ResultCallback] = None,
         **kwargs
     ) -> List[StrategyResult]:
         """
@@ -334,57 +462,253 @@ class SimilarityCalculator:
         Args:
             json_pairs: JSONペアのリスト
             method: 計算方法
-            sequential: 順次処理するかどうか
+            sequential: 順次処理するかどうか（Falseの場合はLLMクライアントの
+                同時リクエスト数の上限以内で並列処理）
             fallback_enabled: フォールバック有効フラグ
+            pack_size: LLMで計算するペアを1回の呼び出しでまとめて評価する数（1の場合は1件ずつ）
+            on_result: 各ペアの結果が確定するたびに (ペアのインデックス, 結果) で呼ぶコールバック
+                （完了順。全ペアの完了を待たずにチェックポイントを記録するために使う）
             **kwargs: 各戦略に渡す追加パラメータ
 
         Returns:
             計算結果のリスト
         """
-        results = []
+        results: List[Optional[StrategyResult]] = [None] * len(json_pairs)
+
+        def emit(index: int, result: StrategyResult) -> None:
+            results[index] = result
+            if on_result is not None:
+                on_result(index, result)
+
+        if method == "cascade":
+            await self._calculate_cascade_batch(json_pairs, sequential, fallback_enabled, pack_size, emit)
+            return results
+
+        if pack_size > 1 and method != "embedding":
+            self._validate_method(method)
+            await self._calculate_packed_batch(json_pairs, method, sequential, fallback_enabled, pack_size, emit)
+            return results
+
+        async def calculate(index: int) -> None:
+            json1, json2 = json_pairs[index]
+            try:
+                result = await self.calculate_similarity(
+                    json1, json2, method=method, fallback_enabled=fallback_enabled, **kwargs
+                )
+            except Exception as e:
+                logger.error(f"ペア {index+1} の処理に失敗: {e}")
+                # エラーが発生してもcontinue
+                result = StrategyResult(
+                    score=0.0,
+                    method="error",
+                    metadata={"error": str(e)}
+                )
+            emit(index, result)
 
         if sequential:
             # 順次処理
-            for i, (json1, json2) in enumerate(json_pairs):
+            for index in range(len(json_pairs)):
+                await calculate(index)
+        else:
+            # 並列処理（同時リクエスト数を制限し、完了したペアから結果を確定）
+            await run_bounded(range(len(json_pairs)), calculate, self.concurrency_limiter)
+
+        return results
+
+    async def _calculate_packed_batch(
+        self,
+        json_pairs: List[Tuple[str, str]],
+        method: str,
+        sequential: bool,
+        fallback_enabled: bool,
+        pack_size: int,
+        emit: Optional[ResultCallback] = None
+    ) -> List[StrategyResult]:
+        """LLMで計算するペアをpack_size件ずつまとめて評価し、残りは埋め込みで計算"""
+        results: List[Optional[StrategyResult]] = [None] * len(json_pairs)
+
+        async def finish(index: int, calculation) -> None:
+            try:
+                result = await calculation
+            except Exception as e:
+                logger.error(f"ペア {index+1} の処理に失敗: {e}")
+                result = StrategyResult(
+                    score=0.0,
+                    method="error",
+                    metadata={"error": str(e)}
+                )
+            results[index] = result
+            if emit is not None:
+                emit(index, result)
+
+        llm_indices = []
+        for i, (json1, json2) in enumerate(json_pairs):
+            if method == "llm" or self._should_use_llm_for_auto(json1, json2):
+                llm_indices.append(i)
+            else:
+                await finish(i, self.calculate_similarity(json1, json2, method="embedding"))
+
+        def on_llm_result(position: int, llm_result: Union[StrategyResult, StrategyError]) -> None:
+            # 成功した結果はまとめた呼び出しが終わった時点で確定（失敗のフォールバックは後でまとめて）
+            if isinstance(llm_result, Exception):
+                return
+            index = llm_indices[position]
+            results[index] = self._record_llm_result(llm_result)
+            if emit is not None:
+                emit(index, llm_result)
+
+        llm_results = await self.llm_strategy.calculate_packed_batch(
+            [json_pairs[i] for i in llm_indices], pack_size, sequential=sequential, on_result=on_llm_result
+        )
+
+        for index, llm_result in zip(llm_indices, llm_results):
+            if results[index] is None:
+                await finish(index, self._finish_llm_result(llm_result, *json_pairs[index], fallback_enabled))
+        return results
+
+    async def _calculate_cascade_batch(
+        self,
+        json_pairs: List[Tuple[str, str]],
+        sequential: bool,
+        fallback_enabled: bool,
+        pack_size: int,
+        emit: Optional[ResultCallback] = None
+    ) -> List[StrategyResult]:
+        """
+        カスケード方式で一括計算
+
+        全ペアの埋め込みスコアをまとめて計算し、スコアがcascade_bandの範囲内（判定が
+        微妙な）ペアだけをLLMで計算し直す。どちらで確定したかはmetadataの
+        "cascade_tier"（"embedding" / "llm" / "embedding_fallback"）に記録する。
+        埋め込みスコアで確定したペアはLLMの完了を待たずにemitに渡す。
+        """
+        if not json_pairs:
+            return []
+
+        results: List[Optional[StrategyResult]] = [None] * len(json_pairs)
+
+        def settle(index: int, result: StrategyResult) -> None:
+            results[index] = result
+            self._stats["total_calculations"] += 1
+            self._stats["total_processing_time"] += result.processing_time
+            if result.method == "llm":
+                self._stats["llm_used"] += 1
+            elif result.method == "error":
+                self._stats["failed_calculations"] += 1
+            else:
+                self._stats["embedding_used"] += 1
+                if result.method == "embedding_fallback":
+                    self._stats["fallback_used"] += 1
+            if emit is not None:
+                emit(index, result)
+
+        try:
+            embedding_results = await self.embedding_strategy.calculate_batch_similarity(json_pairs)
+        except Exception as e:
+            logger.error(f"カスケードの埋め込み計算に失敗: {e}")
+            for i in range(len(json_pairs)):
+                settle(i, StrategyResult(score=0.0, method="error", metadata={"error": str(e)}))
+            return results
+
+        low, high = self.cascade_band
+        uncertain = []
+        for i, result in enumerate(embedding_results):
+            result.metadata["cascade_tier"] = "embedding"
+            result.metadata["embedding_score"] = result.score
+            if low <= result.score <= high:
+                uncertain.append(i)
+        logger.info(f"カスケード: {len(uncertain)}/{len(json_pairs)}ペアをLLMで計算します")
+
+        uncertain_set = set(uncertain)
+        for i, result in enumerate(embedding_results):
+            if i not in uncertain_set:
+                settle(i, result)
+
+        def finish_llm(position: int, llm_result: Union[StrategyResult, Exception]) -> None:
+            i = uncertain[position]
+            embedding_result = embedding_results[i]
+            if not isinstance(llm_result, Exception):
+                llm_result.metadata["cascade_tier"] = "llm"
+                llm_result.metadata["embedding_score"] = embedding_result.score
+                settle(i, llm_result)
+            elif fallback_enabled:
+                logger.warning(f"LLM計算に失敗、埋め込みスコアを使用: {llm_result}")
+                embedding_result.method = "embedding_fallback"
+                embedding_result.metadata["cascade_tier"] = "embedding_fallback"
+                settle(i, embedding_result)
+            else:
+                settle(i, StrategyResult(
+                    score=0.0,
+                    method="error",
+                    metadata={"error": str(llm_result), "embedding_score": embedding_result.score}
+                ))
+
+        uncertain_pairs = [json_pairs[i] for i in uncertain]
+        if pack_size > 1:
+            llm_results = await self.llm_strategy.calculate_packed_batch(
+                uncertain_pairs, pack_size, sequential=sequential, on_result=finish_llm
+            )
+        elif sequential:
+            llm_results = []
+            for position, (json1, json2) in enumerate(uncertain_pairs):
                 try:
-                    result = await self.calculate_similarity(
-                        json1, json2, method=method, fallback_enabled=fallback_enabled, **kwargs
-                    )
-                    results.append(result)
+                    llm_result = await self.llm_strategy.calculate_similarity(json1, json2)
                 except Exception as e:
-                    logger.error(f"ペア {i+1} の処理に失敗: {e}")
-                    # エラーが発生してもcontinue
-                    error_result = StrategyResult(
-                        score=0.0,
-                        method="error",
-                        metadata={"error": str(e)}
-                    )
-                    results.append(error_result)
-
+                    llm_result = e
+                llm_results.append(llm_result)
+                finish_llm(position, llm_result)
         else:
-            # 並列処理
-            tasks = [
-                self.calculate_similarity(
-                    json1, json2, method=method, fallback_enabled=fallback_enabled, **kwargs
-                )
-                for json1, json2 in json_pairs
-            ]
-            batch_results = await asyncio.gather(*tasks, return_exceptions=True)
-
-            # 例外をエラー結果に変換
-            for result in batch_results:
-                if isinstance(result, Exception):
-                    error_result = StrategyResult(
-                        score=0.0,
-                        method="error",
-                        metadata={"error": str(result)}
-                    )
-                    results.append(error_result)
-                else:
-                    results.append(result)
+            llm_results = await run_bounded(
+                uncertain_pairs,
+                lambda pair: self.llm_strategy.calculate_similarity(pair[0], pair[1]),
+                self.concurrency_limiter,
+                on_done=finish_llm
+            )
+
+        # コールバックを呼ばずに結果をまとめて返した場合はここで確定
+        for position, llm_result in enumerate(llm_results):
+            if results[uncertain[position]] is None:
+                finish_llm(position, llm_result)
 
         return results
 
+    def _record_llm_result(self, result: StrategyResult) -> StrategyResult:
+        """成功したLLMの結果を統計に加える"""
+        self._stats["total_calculations"] += 1
+        self._stats["llm_used"] += 1
+        self._stats["total_processing_time"] += result.processing_time
+        return result
+
+    async def _finish_llm_result(
+        self,
+        result: Union[StrategyResult, StrategyError],
+        json1: str,
+        json2: str,
+        fallback_enabled: bool
+    ) -> StrategyResult:
+        """まとめて評価したLLMの結果を集計し、失敗していれば埋め込みにフォールバック"""
+        if not isinstance(result, Exception):
+            return self._record_llm_result(result)
+
+        self._stats["total_calculations"] += 1
+        if not fallback_enabled:
+            self._stats["failed_calculations"] += 1
+            raise result
+
+        logger.warning(f"LLM計算に失敗、埋め込みモードにフォールバック: {result}")
+        try:
+            fallback_result = await self.embedding_strategy.calculate_similarity(json1, json2)
+        except Exception as fallback_error:
+            logger.error(f"フォールバックも失敗: {fallback_error}")
+            self._stats["failed_calculations"] += 1
+            raise StrategyError(f"全ての計算方法が失敗しました: {fallback_error}")
+
+        fallback_result.method = "embedding_fallback"
+        self._stats["embedding_used"] += 1
+        self._stats["fallback_used"] += 1
+        self._stats["total_processing_time"] += fallback_result.processing_time
+        return fallback_result
+
     def get_statistics(self) -> Dict[str, Any]:
         """統計情報を取得"""
         total = self._stats["total_calculations"]
@@ -417,7 +741,9 @@ class SimilarityCalculator:
 # ファクトリー関数
 async def create_similarity_calculator(
     use_gpu: bool = False,
-    llm_config: Optional[Dict[str, Any]] = None
+    llm_config: Optional[Dict[str, Any]] = None,
+    cascade_band: Tuple[float, float] = DEFAULT_CASCADE_BAND,
+    metrics_collector: Optional[Any] = None
 ) -> SimilarityCalculator:
     """
     SimilarityCalculatorのファクトリー関数
@@ -425,6 +751,9 @@ async def create_similarity_calculator(
     Args:
         use_gpu: 埋め込み計算でGPU使用するかどうか
         llm_config: LLM設定
+        cascade_band: カスケード方式でLLMに送る埋め込みスコアの範囲
+        metrics_collector: LLMクライアントに渡すメトリクス収集インスタンス
+            （API呼び出しと応答キャッシュのヒット/ミスを記録する）
 
     Returns:
         初期化されたSimilarityCalculator
@@ -435,7 +764,7 @@ async def create_similarity_calculator(
     if llm_config:
         from .llm_client import LLMConfig, LLMClient
         client_config = LLMConfig(**llm_config)
-        llm_client = LLMClient(client_config)
+        llm_client = LLMClient(client_config, metrics_collector=metrics_collector)
         llm_similarity = LLMSimilarity(llm_client=llm_client)
         llm_strategy = LLMSimilarityStrategy(llm_similarity=llm_similarity)
     else:
@@ -443,7 +772,8 @@ async def create_similarity_calculator(
 
     return SimilarityCalculator(
         embedding_strategy=embedding_strategy,
-        llm_strategy=llm_strategy
+        llm_strategy=llm_strategy,
+        cascade_band=cascade_band
     )
 
 
@@ -462,5 +792,6 @@ async def create_similarity_calculator_from_args(config) -> SimilarityCalculator
 
     return await create_similarity_calculator(
         use_gpu=use_gpu,
-        llm_config=llm_config
+        llm_config=llm_config,
+        cascade_band=getattr(config, 'cascade_band', DEFAULT_CASCADE_BAND)
     )
\ No newline at end of file
@@ -0,0 +1,181 @@
+"""システムメトリクスのバックグラウンドサンプリング
+
+CPU・メモリ・ディスクの使用状況を一定間隔で取得して最新のスナップショットを保持する。
+/healthやアップロード時のリソースチェックはスナップショットを読むだけなので、
+psutil.cpu_percent(interval=...) のようにイベントループを止めることがない。
+
+スナップショットは不変オブジェクトで、更新は参照の差し替えだけで行うため読み取りにロックは不要。
+"""
+
+import asyncio
+import os
+import time
+from dataclasses import asdict, dataclass
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+import psutil
+
+
+@dataclass(frozen=True)
+class SystemSnapshot:
+    """ある時点のシステムリソースの使用状況"""
+    sampled_at: float
+    cpu_percent: float
+    cpu_count: int
+    memory_percent: float
+    memory_available: int
+    disk_percent: float
+    disk_free: int
+    process_memory: int
+    process_threads: int
+
+    @property
+    def age(self) -> float:
+        """取得してからの経過秒数"""
+        return time.time() - self.sampled_at
+
+    def to_metrics(self) -> Dict[str, Any]:
+        """メトリクスログの形式に変換"""
+        return {
+            "timestamp": datetime.fromtimestamp(self.sampled_at).isoformat(),
+            "cpu": {
+                "percent": self.cpu_percent,
+                "count": self.cpu_count
+            },
+            "memory": {
+                "percent": self.memory_percent,
+                "available_gb": round(self.memory_available / (1024 ** 3), 2)
+            },
+            "disk": {
+                "percent": self.disk_percent,
+                "free_gb": round(self.disk_free / (1024 ** 3), 2)
+            },
+            "process": {
+                "memory_mb": round(self.process_memory / (1024 ** 2), 2),
+                "threads": self.process_threads
+            }
+        }
+
+
+class SystemMetricsSampler:
+    """システムメトリクスを一定間隔で取得するサンプラー
+
+    Example:
+        sampler = SystemMetricsSampler(interval=5.0)
+        await sampler.start()
+        snapshot = sampler.snapshot  # ブロックしない
+    """
+
+    def __init__(self, interval: float = 5.0, disk_path: str = "/"):
+        """
+        Args:
+            interval: 取得間隔（秒）
+            disk_path: 使用状況を調べるディスクのパス
+        """
+        if interval <= 0:
+            raise ValueError("intervalは正の値で指定してください")
+        self.interval = interval
+        self.disk_path = disk_path
+        self._process = psutil.Process()
+        self._snapshot: Optional[SystemSnapshot] = None
+        self._task: Optional[asyncio.Task] = None
+        self.samples = 0
+
+        # cpu_percent(interval=None)は前回の呼び出しからの使用率を返すため、基準点を作っておく
+        psutil.cpu_percent(interval=None)
+
+    def sample(self) -> SystemSnapshot:
+        """現在の使用状況を取得してスナップショットを更新"""
+        memory = psutil.virtual_memory()
+        disk = psutil.disk_usage(self.disk_path)
+        with self._process.oneshot():
+            process_memory = self._process.memory_info().rss
+            process_threads = self._process.num_threads()
+
+        snapshot = SystemSnapshot(
+            sampled_at=time.time(),
+            cpu_percent=psutil.cpu_percent(interval=None),
+            cpu_count=psutil.cpu_count(),
+            memory_percent=memory.percent,
+            memory_available=memory.available,
+            disk_percent=disk.percent,
+            disk_free=disk.free,
+            process_memory=process_memory,
+            process_threads=process_threads
+        )
+        self._snapshot = snapshot
+        self.samples += 1
+        return snapshot
+
+    @property
+    def snapshot(self) -> SystemSnapshot:
+        """最新のスナップショット
+
+        バックグラウンドで取得していない場合（CLIなど）や古くなった場合はその場で取得する。
+        """
+        snapshot = self._snapshot
+        if snapshot is None or (self._task is None and snapshot.age > self.interval):
+            snapshot = self.sample()
+        return snapshot
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    async def start(self) -> None:
+        """バックグラウンドでの取得を開始"""
+        if self.running:
+            return
+        await asyncio.to_thread(self.sample)
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """バックグラウンドでの取得を停止"""
+        if self._task is None:
+            return
+        self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+        self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await asyncio.to_thread(self.sample)
+            except Exception:
+                # 一時的な取得失敗では前回のスナップショットを使い続ける
+                pass
+
+    def get_statistics(self) -> Dict[str, Any]:
+        """最新のスナップショットと取得状況"""
+        snapshot = self.snapshot
+        return {
+            **asdict(snapshot),
+            "age_seconds": snapshot.age,
+            "interval": self.interval,
+            "samples": self.samples,
+            "background": self.running
+        }
+
+
+_sampler: Optional[SystemMetricsSampler] = None
+
+
+def configure_system_sampler(interval: float = 5.0, disk_path: str = "/") -> SystemMetricsSampler:
+    """共有するシステムメトリクスサンプラーを設定"""
+    global _sampler
+    _sampler = SystemMetricsSampler(interval=interval, disk_path=disk_path)
+    return _sampler
+
+
+def get_system_sampler() -> SystemMetricsSampler:
+    """共有システムメトリクスサンプラーを取得
+
+    未設定の場合は環境変数 JSON_COMPARE_METRICS_INTERVAL（秒）から作成する。
+    """
+    if _sampler is None:
+        return configure_system_sampler(
+            interval=float(os.environ.get("JSON_COMPARE_METRICS_INTERVAL", "5"))
+        )
+    return _sampler
@@ -0,0 +1,114 @@
+"""
+APIの起動時プリロードと/readyのテスト
+
+実モデルの代わりにウォームアップ呼び出しを記録するダミーを差し込む。
+"""
+
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import threading
+from pathlib import Path
+
+import pytest
+
+# プロジェクトルートをパスに追加
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src import api, similarity
+
+
+class FakeModel:
+    """warm_upが呼ばれるまで待機できるダミーの埋め込みモデル"""
+
+    def __init__(self):
+        self.release = threading.Event()
+        self.warmed_lengths = None
+
+    def warm_up(self, lengths):
+        self.release.wait(timeout=5)
+        self.warmed_lengths = lengths
+
+
+@pytest.fixture
+def fake_model(monkeypatch, tmp_path):
+    model = FakeModel()
+    monkeypatch.setattr(similarity, "_embedding_model", model)
+    monkeypatch.setenv("JSON_COMPARE_TASK_DIR", str(tmp_path / "tasks"))
+    monkeypatch.delenv("JSON_COMPARE_JOB_DB", raising=False)
+    monkeypatch.setattr(api, "model_readiness", {"status": "not_started", "ready": False})
+    return model
+
+
+async def check_ready():
+    response = await api.readiness_check()
+    return response.status_code, json.loads(response.body)
+
+
+class TestReadiness:
+    """/readyのテストクラス"""
+
+    def test_ready_after_warm_up(self, fake_model, monkeypatch):
+        """ウォームアップが終わるまで503、終わったら200を返すこと"""
+        monkeypatch.setattr(api, "PRELOAD_MODEL", True)
+
+        async def scenario():
+            async with api.lifespan(api.app):
+                await asyncio.sleep(0)
+                before = await check_ready()
+                fake_model.release.set()
+                for _ in range(100):
+                    if api.model_readiness["ready"]:
+                        break
+                    await asyncio.sleep(0.01)
+                after = await check_ready()
+            return before, after
+
+        before, after = asyncio.run(scenario())
+
+        assert before == (503, {"status": "loading", "ready": False, "started_at": before[1]["started_at"]})
+        assert after[0] == 200
+        assert after[1]["status"] == "ready"
+        assert "warmup_seconds" in after[1]
+        assert fake_model.warmed_lengths == similarity.WARMUP_TOKEN_LENGTHS
+
+    def test_preload_disabled(self, fake_model, monkeypatch):
+        """プリロードを無効にした場合はすぐに準備完了とすること"""
+        monkeypatch.setattr(api, "PRELOAD_MODEL", False)
+
+        async def scenario():
+            async with api.lifespan(api.app):
+                return await check_ready()
+
+        assert asyncio.run(scenario()) == (200, {"status": "lazy", "ready": True})
+        assert fake_model.warmed_lengths is None
+
+
+class TestJobQueueLifecycle:
+    """タスクの保存先とジョブキューの作成時期のテストクラス"""
+
+    def test_import_creates_nothing(self, tmp_path):
+        """src.apiをインポートしただけではタスクの保存先もデータベースも作らないこと"""
+        task_dir = tmp_path / "tasks"
+        env = dict(os.environ, JSON_COMPARE_TASK_DIR=str(task_dir))
+        env.pop("JSON_COMPARE_JOB_DB", None)
+        subprocess.run([sys.executable, "-c", "import src.api"], check=True, env=env,
+                       cwd=str(Path(__file__).parent.parent))
+
+        assert not task_dir.exists()
+
+    def test_lifespan_creates_queue_on_app_state(self, fake_model, monkeypatch, tmp_path):
+        """起動時にジョブキューを作ってapp.stateに置き、登録済みの処理関数で受け付けること"""
+        monkeypatch.setattr(api, "PRELOAD_MODEL", False)
+
+        async def scenario():
+            async with api.lifespan(api.app):
+                return api.app.state.job_queue, api.app.state.resumable_tasks
+
+        queue, tasks = asyncio.run(scenario())
+
+        assert (tmp_path / "tasks" / "jobs.db").exists()
+        assert tasks.root_dir == tmp_path / "tasks"
+        assert set(queue._handlers) == {"compare", "compare_dual"}
@@ -0,0 +1,176 @@
+"""
+APIのアップロード検証（ストリーム処理）のテスト
+
+採点処理はダミーに差し替え、検証済みの一時ファイルの内容とエラー応答だけを確認する。
+"""
+
+import asyncio
+import io
+import json
+import sys
+from pathlib import Path
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+from fastapi import HTTPException, UploadFile
+
+# プロジェクトルートをパスに追加
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src import api, similarity
+
+
+REQUEST = SimpleNamespace(client=None)
+
+
+class FakeEmbedding:
+    """文字ごとのハッシュから決定的なベクトルを作るダミー埋め込みモデル"""
+
+    def encode_batch(self, texts, batch_size: int = 32) -> np.ndarray:
+        vectors = np.zeros((len(texts), 16), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for pos, char in enumerate(text):
+                vectors[row, (ord(char) * 7 + pos) % 16] += 1.0
+        return vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-6)
+
+
+def upload(name, content):
+    return UploadFile(file=io.BytesIO(content), filename=name)
+
+
+@pytest.fixture(autouse=True)
+def resources_ok(monkeypatch):
+    monkeypatch.setattr(api.ErrorHandler, "check_system_resources", staticmethod(lambda: (True, None)))
+
+
+@pytest.fixture
+def scored_files(monkeypatch):
+    """採点処理に渡された一時ファイルの内容を記録する"""
+    received = []
+
+    def fake_process(path, output_type):
+        with open(path, encoding="utf-8") as f:
+            received.append([json.loads(line) for line in f])
+        return {"summary": {"total_lines": len(received[-1])}}
+
+    monkeypatch.setattr(api, "process_jsonl_file", fake_process)
+    return received
+
+
+MULTILINE = (
+    '{"inference1": "{\\"a\\": 1}", "inference2": "{\\"a\\": 2}"}\n'
+    '{\n'
+    '  "inference1": "{閉じていない",\n'
+    '  "inference2": "}"\n'
+    '}\n'
+    '{"inference1": "x"}\n'
+)
+
+
+class TestSingleUploadStreaming:
+    """/api/compare/singleのテストクラス"""
+
+    def test_multiline_upload_is_validated_and_normalized(self, scored_files):
+        """複数行オブジェクトを含むアップロードを1行1オブジェクト形式で採点に渡すこと"""
+        result = asyncio.run(api.upload_file(REQUEST, upload("input.jsonl", MULTILINE.encode("utf-8")), "score", False))
+
+        assert scored_files == [[
+            {"inference1": '{"a": 1}', "inference2": '{"a": 2}'},
+            {"inference1": "{閉じていない", "inference2": "}"},
+            {"inference1": "x", "inference2": ""}
+        ]]
+        assert result["_metadata"]["data_repairs"] == 1
+
+    def test_invalid_utf8(self, scored_files):
+        with pytest.raises(HTTPException) as excinfo:
+            asyncio.run(api.upload_file(REQUEST, upload("input.jsonl", b'{"inference1": "\xff"}\n'), "score", False))
+
+        assert excinfo.value.status_code == 400
+        assert excinfo.value.detail["details"] == {"encoding": "UTF-8エンコーディングが必要です"}
+        assert scored_files == []
+
+    def test_size_limit(self, scored_files, monkeypatch):
+        """上限サイズを超えるアップロードは413"""
+        monkeypatch.setattr(api, "MAX_UPLOAD_SIZE", 10)
+
+        with pytest.raises(HTTPException) as excinfo:
+            asyncio.run(api.upload_file(REQUEST, upload("input.jsonl", MULTILINE.encode("utf-8")), "score", False))
+
+        assert excinfo.value.status_code == 413
+        assert scored_files == []
+
+
+class TestDualUploadStreaming:
+    """/api/compare/dualのテストクラス"""
+
+    def test_validation_error_names_file(self):
+        """検証に失敗したファイル名をエラー応答に含めること"""
+        with pytest.raises(HTTPException) as excinfo:
+            asyncio.run(api.compare_dual_files(
+                REQUEST, upload("a.jsonl", MULTILINE.encode("utf-8")), upload("b.jsonl", b"not json\n"),
+                "inference", "score", False, None
+            ))
+
+        assert excinfo.value.status_code == 400
+        details = excinfo.value.detail["details"]
+        assert details["file"] == "b.jsonl"
+        assert details["errors"][-1] == "有効なデータが1件もありません"
+
+
+class TestMultiUploadStreaming:
+    """/api/compare/multiのテストクラス"""
+
+    @pytest.fixture
+    def compared(self, monkeypatch):
+        """比較処理に渡された一時ファイルの内容を記録する（埋め込みはダミー）"""
+        received = []
+        original = api.MultiFileExtractor.compare_multi_files
+
+        def recording_compare(self, reference_path, candidate_paths, *args):
+            for path in [reference_path] + candidate_paths:
+                with open(path, encoding="utf-8") as f:
+                    received.append([json.loads(line) for line in f])
+            return original(self, reference_path, candidate_paths, *args)
+
+        monkeypatch.setattr(similarity, "_embedding_model", FakeEmbedding())
+        monkeypatch.setattr(api.MultiFileExtractor, "compare_multi_files", recording_compare)
+        return received
+
+    def run(self, reference, candidates, column="inference"):
+        return asyncio.run(api.compare_multi_files(REQUEST, reference, candidates, column, "score", False))
+
+    def test_uploads_are_validated_and_normalized(self, compared):
+        """参照と全候補を検証・修復し、1行1オブジェクト形式で比較に渡すこと"""
+        result = self.run(upload("ref.jsonl", b'{\n  "inference": "a"\n}\n'),
+                 [upload("c1.jsonl", b'{"inference": "b"}\n'), upload("c2.jsonl", b"{'inference': 'c'}\n")])
+
+        assert [[row["inference"] for row in rows] for rows in compared] == [["a"], ["b"], ["c"]]
+        assert [entry["file"] for entry in result["candidates"]] == ["c1.jsonl", "c2.jsonl"]
+
+    def test_size_limit_applies_to_candidates(self, compared, monkeypatch):
+        """上限サイズを超える候補ファイルは413"""
+        monkeypatch.setattr(api, "MAX_UPLOAD_SIZE", 30)
+
+        with pytest.raises(HTTPException) as excinfo:
+            self.run(upload("ref.jsonl", b'{"inference": "a"}\n'),
+                     [upload("c1.jsonl", b'{"inference": "' + b"b" * 40 + b'"}\n')])
+
+        assert excinfo.value.status_code == 413
+        assert excinfo.value.detail["details"]["file"] == "c1.jsonl"
+        assert compared == []
+
+    def test_invalid_utf8_candidate(self, compared):
+        with pytest.raises(HTTPException) as excinfo:
+            self.run(upload("ref.jsonl", b'{"inference": "a"}\n'), [upload("c1.jsonl", b'{"inference": "\xff"}\n')])
+
+        assert excinfo.value.status_code == 400
+        assert excinfo.value.detail["details"]["file"] == "c1.jsonl"
+
+    def test_missing_column_is_400(self, compared):
+        """候補ファイルに列がなければ比較を始めずに400"""
+        with pytest.raises(HTTPException) as excinfo:
+            self.run(upload("ref.jsonl", b'{"inference": "a"}\n'), [upload("c1.jsonl", b'{"output": "b"}\n')])
+
+        assert excinfo.value.status_code == 400
+        assert "候補ファイル1に'inference'列が存在しません" in excinfo.value.detail["details"]["error"]
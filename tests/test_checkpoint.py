@@ -0,0 +1,249 @@
+"""
+checkpointモジュールとEnhancedCLIの再開処理のテスト
+"""
+
+import asyncio
+import json
+import sys
+from pathlib import Path
+from unittest.mock import patch
+
+import pytest
+
+# プロジェクトルートをパスに追加
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.checkpoint import (
+    CheckpointMismatchError,
+    ComparisonCheckpoint,
+    ResumableTaskStore,
+    default_checkpoint_path
+)
+from src.enhanced_cli import CLIConfig, EnhancedCLI, parse_enhanced_args
+from src.similarity_strategy import StrategyResult
+
+
+@pytest.fixture(autouse=True)
+def checkpoint_dir(tmp_path, monkeypatch):
+    """既定のチェックポイントの保存先を一時ディレクトリにする"""
+    directory = tmp_path / "checkpoints"
+    monkeypatch.setenv("JSON_COMPARE_CHECKPOINT_DIR", str(directory))
+    return directory
+
+
+@pytest.fixture
+def input_file(tmp_path):
+    """10行の入力ファイル（3行目は空行）"""
+    lines = []
+    for i in range(10):
+        if i == 2:
+            lines.append("")
+        else:
+            lines.append(json.dumps({
+                "id": i,
+                "inference1": json.dumps({"v": i}),
+                "inference2": json.dumps({"v": i % 3})
+            }))
+    path = tmp_path / "input.jsonl"
+    path.write_text("\n".join(lines) + "\n", encoding="utf-8")
+    return path
+
+
+class FakeCalculator:
+    """呼び出されたペアを記録し、fail_after件目以降でerrorを送出する計算機"""
+
+    def __init__(self, fail_after=None, error=None):
+        self.calls = []
+        self.batches = 0
+        self.fail_after = fail_after
+        self.error = error or RuntimeError("vLLM restarted")
+
+    async def calculate_batch_similarity(self, json_pairs, method="auto", sequential=True,
+                                         fallback_enabled=True, on_result=None, **kwargs):
+        self.batches += 1
+        results = []
+        for index, (json1, json2) in enumerate(json_pairs):
+            if self.fail_after is not None and len(self.calls) >= self.fail_after:
+                raise self.error
+            self.calls.append(json1)
+            value = json.loads(json1)["v"]
+            results.append(StrategyResult(score=value / 10, method="llm", metadata={"v": value}))
+            if on_result is not None:
+                on_result(index, results[-1])
+        return results
+
+
+def run_single_file(path, config, calculator):
+    with patch('src.enhanced_cli.create_similarity_calculator_from_args') as mock_create:
+        mock_create.return_value = calculator
+        return asyncio.run(EnhancedCLI().process_single_file(str(path), config, "file"))
+
+
+class TestComparisonCheckpoint:
+    """ComparisonCheckpointのテストクラス"""
+
+    def test_record_and_load(self, input_file, tmp_path):
+        """記録した結果を読み込めること"""
+        path = tmp_path / "cp.jsonl"
+        checkpoint = ComparisonCheckpoint(str(path), str(input_file), {"method": "llm"})
+        checkpoint.record({1: {"score": 0.5}})
+        checkpoint.record({2: {"score": 0.7}})
+
+        loaded = ComparisonCheckpoint(str(path), str(input_file), {"method": "llm"}).load()
+
+        assert loaded == {1: {"score": 0.5}, 2: {"score": 0.7}}
+
+    def test_truncated_last_line_is_ignored(self, input_file, tmp_path):
+        """書き込み途中で中断した最後の行を無視すること"""
+        path = tmp_path / "cp.jsonl"
+        ComparisonCheckpoint(str(path), str(input_file)).record({1: {"score": 0.5}})
+        with open(path, "a", encoding="utf-8") as f:
+            f.write('{"line": 2, "res')
+
+        assert ComparisonCheckpoint(str(path), str(input_file)).load() == {1: {"score": 0.5}}
+
+    def test_changed_input_is_rejected(self, input_file, tmp_path):
+        """入力ファイルが変わっていればCheckpointMismatchError"""
+        path = tmp_path / "cp.jsonl"
+        ComparisonCheckpoint(str(path), str(input_file)).record({1: {"score": 0.5}})
+        with open(input_file, "a", encoding="utf-8") as f:
+            f.write('{"inference1": "{}", "inference2": "{}"}\n')
+
+        with pytest.raises(CheckpointMismatchError):
+            ComparisonCheckpoint(str(path), str(input_file)).load()
+
+    def test_changed_options_are_rejected(self, input_file, tmp_path):
+        """設定が変わっていればCheckpointMismatchError"""
+        path = tmp_path / "cp.jsonl"
+        ComparisonCheckpoint(str(path), str(input_file), {"method": "llm"}).record({1: {"score": 0.5}})
+
+        with pytest.raises(CheckpointMismatchError):
+            ComparisonCheckpoint(str(path), str(input_file), {"method": "embedding"}).load()
+
+    def test_missing_checkpoint(self, input_file, tmp_path):
+        """チェックポイントがなければ空"""
+        assert ComparisonCheckpoint(str(tmp_path / "none.jsonl"), str(input_file)).load() == {}
+
+    def test_default_path_is_in_checkpoint_dir(self, input_file, checkpoint_dir, tmp_path):
+        """既定のパスは入力ファイルの横ではなくチェックポイント用ディレクトリ内で、入力ファイルごとに異なること"""
+        path = Path(default_checkpoint_path(str(input_file)))
+
+        assert path.parent == checkpoint_dir
+        assert path.name.startswith("input.jsonl.")
+        assert default_checkpoint_path(str(tmp_path / "other" / "input.jsonl")) != str(path)
+
+
+class TestResumableTaskStore:
+    """ResumableTaskStoreのテストクラス"""
+
+    def test_save_pending_remove(self, tmp_path):
+        """保存したタスクが列挙され、削除後は列挙されないこと"""
+        upload = tmp_path / "upload.jsonl"
+        upload.write_text('{"a": 1}\n', encoding="utf-8")
+        store = ResumableTaskStore(str(tmp_path / "tasks"))
+
+        input_path = store.save("task-1", str(upload), {"output_type": "file", "use_llm": True})
+
+        assert not upload.exists()
+        assert Path(input_path).read_text(encoding="utf-8") == '{"a": 1}\n'
+        pending = store.pending()
+        assert [task["task_id"] for task in pending] == ["task-1"]
+        assert pending[0]["params"] == {"output_type": "file", "use_llm": True}
+
+        store.remove("task-1")
+        assert store.pending() == []
+
+
+class TestEnhancedCLIResume:
+    """EnhancedCLIの再開処理のテストクラス"""
+
+    def test_resume_skips_completed_lines(self, input_file):
+        """中断後に--resumeで再実行すると処理済みの行を計算しないこと"""
+        config = CLIConfig(calculation_method="llm", checkpoint_interval=3)
+
+        with pytest.raises(RuntimeError):
+            run_single_file(input_file, config, FakeCalculator(fail_after=7))
+        assert Path(default_checkpoint_path(str(input_file))).exists()
+
+        calculator = FakeCalculator()
+        resumed = run_single_file(input_file, CLIConfig(calculation_method="llm", checkpoint_interval=3, resume=True),
+                                  calculator)
+        expected = run_single_file(input_file, CLIConfig(calculation_method="llm"), FakeCalculator())
+
+        # 中断時に間隔に満たない完了分も記録するので、完了した7件は再計算しない
+        assert len(calculator.calls) == 2
+        assert resumed["summary"]["average_score"] == expected["summary"]["average_score"]
+        assert [(r["id"], r["similarity_score"]) for r in resumed["detailed_results"]] == \
+            [(r["id"], r["similarity_score"]) for r in expected["detailed_results"]]
+        assert not Path(default_checkpoint_path(str(input_file))).exists()
+
+    def test_without_resume_starts_over(self, input_file):
+        """--resumeなしでは既存のチェックポイントを使わないこと"""
+        config = CLIConfig(calculation_method="llm", checkpoint_interval=3)
+        with pytest.raises(RuntimeError):
+            run_single_file(input_file, config, FakeCalculator(fail_after=4))
+
+        calculator = FakeCalculator()
+        run_single_file(input_file, config, calculator)
+
+        assert len(calculator.calls) == 9
+
+    def test_checkpoint_does_not_split_the_batch(self, input_file, tmp_path):
+        """チェックポイントの間隔ごとに計算を区切らず、1回の一括計算の途中で記録すること"""
+        checkpoint_file = tmp_path / "cp.jsonl"
+        config = CLIConfig(calculation_method="llm", checkpoint_interval=2, checkpoint_file=str(checkpoint_file))
+        calculator = FakeCalculator(fail_after=5)
+
+        with pytest.raises(RuntimeError):
+            run_single_file(input_file, config, calculator)
+
+        assert calculator.batches == 1
+        checkpoint = ComparisonCheckpoint(str(checkpoint_file), str(input_file), {})
+        # 2件ごとの記録に加え、中断時に残りの1件を記録する
+        assert len(checkpoint.path.read_text(encoding="utf-8").splitlines()) == 1 + 5
+
+    def test_interrupt_records_unflushed_results(self, input_file):
+        """Ctrl-Cで中断した場合も、間隔に満たない完了分を記録すること"""
+        config = CLIConfig(calculation_method="llm", checkpoint_interval=100)
+        with pytest.raises(KeyboardInterrupt):
+            run_single_file(input_file, config, FakeCalculator(fail_after=4, error=KeyboardInterrupt()))
+
+        calculator = FakeCalculator()
+        run_single_file(input_file, CLIConfig(calculation_method="llm", checkpoint_interval=100, resume=True),
+                        calculator)
+
+        assert len(calculator.calls) == 9 - 4
+
+    def test_embedding_run_writes_no_checkpoint(self, input_file, checkpoint_dir):
+        """埋め込みのみの計算ではチェックポイントを作らないこと"""
+        config = CLIConfig(calculation_method="embedding", checkpoint_interval=1)
+
+        with pytest.raises(RuntimeError):
+            run_single_file(input_file, config, FakeCalculator(fail_after=4))
+
+        assert not checkpoint_dir.exists()
+        assert sorted(p.name for p in input_file.parent.iterdir()) == ["input.jsonl"]
+
+    def test_short_run_writes_no_checkpoint(self, input_file, checkpoint_dir):
+        """チェックポイントの間隔に満たずに完了した場合はファイルを書かないこと"""
+        run_single_file(input_file, CLIConfig(calculation_method="llm"), FakeCalculator())
+
+        assert not checkpoint_dir.exists()
+
+    def test_resume_with_different_pack_size_is_rejected(self, input_file):
+        """llm_pack_sizeが異なる設定では再開しないこと"""
+        with pytest.raises(RuntimeError):
+            run_single_file(input_file, CLIConfig(calculation_method="llm", checkpoint_interval=3),
+                            FakeCalculator(fail_after=7))
+
+        with pytest.raises(CheckpointMismatchError):
+            run_single_file(input_file,
+                            CLIConfig(calculation_method="llm", checkpoint_interval=3, llm_pack_size=4, resume=True),
+                            FakeCalculator())
+
+    def test_parse_resume_options(self):
+        """--resumeと--checkpoint-fileがCLIConfigに反映されること"""
+        _, config = parse_enhanced_args(["input.jsonl", "--resume", "--checkpoint-file", "cp.jsonl"])
+
+        assert config.resume is True
+        assert config.checkpoint_file == "cp.jsonl"
@@ -12,6 +12,7 @@ from pathlib import Path
 # プロジェクトルートをパスに追加
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
+from src import similarity
 from src.dual_file_extractor import DualFileExtractor
 
 
@@ -216,5 +217,115 @@ class TestDualFileExtractor:
             os.unlink(sample_file2)
 
 
+class FakeEmbedding:
+    """文字ごとのハッシュから決定的なベクトルを作るダミー埋め込みモデル"""
+
+    def encode_batch(self, texts, batch_size: int = 32):
+        import numpy as np
+
+        vectors = np.zeros((len(texts), 16), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for pos, char in enumerate(text):
+                vectors[row, (ord(char) * 7 + pos) % 16] += 1.0
+        return vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-6)
+
+
+class TestStreamingDualComparison:
+    """2ファイルの並行読み込みによる比較のテストクラス"""
+
+    @pytest.fixture(autouse=True)
+    def fake_model(self, monkeypatch):
+        monkeypatch.setattr(similarity, "_embedding_model", FakeEmbedding())
+
+    @staticmethod
+    def write_jsonl(path, rows):
+        path.write_text("".join(json.dumps(row, ensure_ascii=False) + "\n" for row in rows), encoding="utf-8")
+        return str(path)
+
+    def test_matches_pair_file(self, tmp_path):
+        """inference1/inference2のペアファイルを採点した場合と同じ結果になること"""
+        from src.__main__ import process_jsonl_file
+
+        values1 = [{"name": f"商品{i}", "tags": ["a", f"t{i % 3}"]} for i in range(100)]
+        values2 = [{"name": f"商品{i % 7}", "tags": [f"t{i % 5}"]} for i in range(100)]
+        file1 = self.write_jsonl(tmp_path / "a.jsonl", [{"id": i, "inference": v} for i, v in enumerate(values1)])
+        file2 = self.write_jsonl(tmp_path / "b.jsonl", [{"id": i, "inference": v} for i, v in enumerate(values2)])
+        pairs = self.write_jsonl(tmp_path / "pairs.jsonl", [
+            {"inference1": json.dumps(v1, ensure_ascii=False), "inference2": json.dumps(v2, ensure_ascii=False)}
+            for v1, v2 in zip(values1, values2)
+        ])
+
+        result = DualFileExtractor().compare_dual_files(file1, file2, output_type="file")
+
+        assert result == process_jsonl_file(pairs, "file")
+
+    def test_missing_column_is_rejected_before_scoring(self, tmp_path, monkeypatch):
+        """存在しない列を指定した場合は採点を始める前にValueErrorになること"""
+        from src import dual_file_extractor
+
+        file1 = self.write_jsonl(tmp_path / "a.jsonl", [{"inference": "テキスト"}])
+        file2 = self.write_jsonl(tmp_path / "b.jsonl", [{"inference": "テキスト"}])
+        monkeypatch.setattr(dual_file_extractor, "iter_scored_records",
+                            lambda *args: pytest.fail("採点が実行された"))
+
+        with pytest.raises(ValueError, match="ファイル1に'output'列が存在しません。利用可能な列: inference"):
+            DualFileExtractor().compare_dual_files(file1, file2, column_name="output")
+
+    def test_column_check_skips_leading_blank_lines(self, tmp_path):
+        """先頭の空行を飛ばして最初のレコードで列を確認すること"""
+        file1 = tmp_path / "a.jsonl"
+        file1.write_text('\n{"inference": "テキスト"}\n', encoding="utf-8")
+        file2 = self.write_jsonl(tmp_path / "b.jsonl", [{"inference": "テキスト"}])
+
+        result = DualFileExtractor().compare_dual_files(str(file1), file2, output_type="score")
+
+        assert result["_metadata"]["rows_compared"] == 1
+
+    def test_different_lengths_use_shorter(self, tmp_path, capsys):
+        """行数が異なる場合は短い方に合わせ、両方の件数を警告すること"""
+        file1 = self.write_jsonl(tmp_path / "a.jsonl", [{"inference": f"テキスト{i}"} for i in range(5)])
+        file2 = self.write_jsonl(tmp_path / "b.jsonl", [{"inference": f"テキスト{i}"} for i in range(3)])
+
+        result = DualFileExtractor().compare_dual_files(file1, file2, output_type="score")
+
+        assert result["total_lines"] == 3
+        assert result["_metadata"]["rows_compared"] == 3
+        # 警告や進捗は標準エラーに出し、標準出力（--ndjsonのストリーム）を汚さない
+        captured = capsys.readouterr()
+        assert "5行 vs 3行" in captured.err
+        assert captured.out == ""
+
+    def test_join_key_pairs_reordered_rows(self, tmp_path):
+        """--join-key指定時は並び順の異なる行をキーで対応付け、未対応行を報告すること"""
+        file1 = self.write_jsonl(tmp_path / "a.jsonl", [{"id": i, "inference": f"テキスト{i}"} for i in range(5)])
+        file2 = self.write_jsonl(tmp_path / "b.jsonl", [{"id": i, "inference": f"テキスト{i}"} for i in [4, 2, 0, 3, 9]])
+
+        result = DualFileExtractor().compare_dual_files(file1, file2, output_type="score", join_key="id")
+
+        assert result["score"] == 1.0
+        assert result["total_lines"] == 4
+        join = result["_metadata"]["join"]
+        assert join["method"] == "hash"
+        assert join["unmatched_file1"] == 1
+        assert join["unmatched_file2"] == 1
+        assert join["unmatched_samples"]["file1"] == [{"line": 2, "key": 1}]
+        assert join["unmatched_samples"]["file2"] == [{"line": 5, "key": 9}]
+
+    def test_no_temp_files(self, tmp_path, monkeypatch):
+        """一時ファイルを作らないこと"""
+        import tempfile as tempfile_module
+
+        def fail(*args, **kwargs):
+            raise AssertionError("一時ファイルが作成されました")
+
+        monkeypatch.setattr(tempfile_module, "NamedTemporaryFile", fail)
+        file1 = self.write_jsonl(tmp_path / "a.jsonl", [{"inference": "同じ"}])
+        file2 = self.write_jsonl(tmp_path / "b.jsonl", [{"inference": "同じ"}])
+
+        result = DualFileExtractor().compare_dual_files(file1, file2)
+
+        assert result["score"] == 1.0
+
+
 if __name__ == "__main__":
     pytest.main([__file__, "-v"])
\ No newline at end of file
@@ -0,0 +1,219 @@
+"""
+JapaneseEmbeddingのバッチ埋め込みテスト
+
+実モデルの代わりに小さなダミーのトークナイザー/モデルを差し込み、
+バケット化・パディング・正規化の挙動だけを検証する。
+"""
+
+import sys
+from pathlib import Path
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+import torch
+from transformers import BertConfig, BertModel
+
+# プロジェクトルートをパスに追加
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.embedding import JapaneseEmbedding, mean_pool, similarity_matrix
+
+
+class DummyTokenizer:
+    """文字コードをそのままトークンIDにするトークナイザー"""
+
+    def __init__(self):
+        self.pad_calls = []
+
+    def __call__(self, texts, truncation=True, max_length=512):
+        input_ids = [[ord(c) % 97 + 1 for c in text][:max_length] for text in texts]
+        return {
+            "input_ids": input_ids,
+            "attention_mask": [[1] * len(ids) for ids in input_ids]
+        }
+
+    def pad(self, features, padding=True, return_tensors="pt"):
+        max_len = max(len(ids) for ids in features["input_ids"])
+        self.pad_calls.append((len(features["input_ids"]), max_len))
+        padded = {}
+        for key, rows in features.items():
+            padded[key] = torch.tensor([row + [0] * (max_len - len(row)) for row in rows])
+        return padded
+
+
+class DummyModel(torch.nn.Module):
+    """トークンごとの埋め込みをそのままlast_hidden_stateとして返すモデル"""
+
+    def __init__(self, hidden_size: int = 8):
+        super().__init__()
+        torch.manual_seed(0)
+        self.config = SimpleNamespace(hidden_size=hidden_size)
+        self.embed = torch.nn.Embedding(128, hidden_size)
+
+    def forward(self, input_ids, attention_mask):
+        return SimpleNamespace(last_hidden_state=self.embed(input_ids))
+
+
+@pytest.fixture
+def embedding():
+    """ダミーモデルを差し込んだJapaneseEmbedding"""
+    instance = JapaneseEmbedding.__new__(JapaneseEmbedding)
+    instance.device = torch.device("cpu")
+    instance.model_name = "dummy"
+    instance.max_length = 512
+    instance.cache = None
+    instance.tokenizer = DummyTokenizer()
+    instance.model = DummyModel()
+    instance.model.eval()
+    return instance
+
+
+class TestEncodeBatch:
+    """encode_batchのテストクラス"""
+
+    def test_returns_normalized_float32_matrix(self, embedding):
+        """入力順の正規化済みfloat32行列を返すこと"""
+        result = embedding.encode_batch(["あ", "いいい", "うう"])
+
+        assert result.shape == (3, 8)
+        assert result.dtype == np.float32
+        np.testing.assert_allclose(np.linalg.norm(result, axis=1), 1.0, rtol=1e-5)
+
+    def test_empty_input(self, embedding):
+        """空リストは空行列を返すこと"""
+        result = embedding.encode_batch([])
+        assert result.shape == (0, 8)
+
+    def test_padding_does_not_change_vectors(self, embedding):
+        """バッチ内のパディングがベクトルに影響しないこと"""
+        texts = ["短い", "これはかなり長いテキストです", "中くらいの文"]
+        batched = embedding.encode_batch(texts, batch_size=3)
+        single = np.vstack([embedding.encode_batch([t], batch_size=1) for t in texts])
+
+        np.testing.assert_allclose(batched, single, rtol=1e-5, atol=1e-6)
+
+    def test_buckets_are_length_sorted(self, embedding):
+        """長さ順にバケット化され、各バケットはその最大長までしかパディングしないこと"""
+        texts = ["a" * 10, "b", "c" * 5, "d" * 2]
+        embedding.encode_batch(texts, batch_size=2)
+
+        assert embedding.tokenizer.pad_calls == [(2, 2), (2, 10)]
+
+    def test_invalid_batch_size(self, embedding):
+        """batch_sizeが0以下ならValueError"""
+        with pytest.raises(ValueError):
+            embedding.encode_batch(["a"], batch_size=0)
+
+
+class TestBucketedPaddingTolerance:
+    """実際のTransformer構成でのバケット化の誤差のテストクラス"""
+
+    def test_similarity_within_tolerance_of_single_encoding(self, embedding):
+        """長さの違うテキストをまとめて埋め込んでも、類似度の差が1e-6以下に収まること"""
+        torch.manual_seed(0)
+        embedding.model = BertModel(BertConfig(
+            vocab_size=128, hidden_size=64, num_hidden_layers=2, num_attention_heads=4,
+            intermediate_size=128, max_position_embeddings=256
+        )).eval()
+        rng = np.random.default_rng(0)
+        texts = ["".join(chr(0x3042 + int(c)) for c in rng.integers(0, 80, size=int(n)))
+                 for n in rng.integers(1, 200, size=40)]
+
+        batched = embedding.encode_batch(texts, batch_size=16)
+        single = np.vstack([embedding.encode_batch([t], batch_size=1) for t in texts])
+
+        np.testing.assert_allclose(similarity_matrix(batched, batched),
+                                   similarity_matrix(single, single), rtol=0, atol=1e-6)
+
+
+class TestCalculateSimilarity:
+    """calculate_similarityのテストクラス"""
+
+    def test_identical_texts(self, embedding):
+        """同一テキストは1.0"""
+        assert embedding.calculate_similarity("同じ", "同じ") == pytest.approx(1.0, abs=1e-6)
+
+    def test_empty_strings(self, embedding):
+        """空文字列の扱いは従来通り"""
+        assert embedding.calculate_similarity("", "") == 1.0
+        assert embedding.calculate_similarity("", "a") == 0.0
+
+    def test_matches_encode_batch(self, embedding):
+        """encode_batch経由の内積と一致すること"""
+        vectors = embedding.encode_batch(["りんご", "みかん"])
+        expected = max(0.0, min(1.0, float(np.dot(vectors[0], vectors[1]))))
+
+        assert embedding.calculate_similarity("りんご", "みかん") == pytest.approx(expected)
+
+
+class TestEncodeBatchWithCache:
+    """キャッシュ付きencode_batchのテストクラス"""
+
+    def test_cached_texts_skip_forward_pass(self, embedding):
+        """キャッシュ済みテキストはフォワードパスを通らないこと"""
+        from src.embedding_cache import EmbeddingCache
+
+        embedding.cache = EmbeddingCache(max_entries=100)
+        first = embedding.encode_batch(["公共政策", "広告", "公共政策"])
+        calls_after_first = len(embedding.tokenizer.pad_calls)
+
+        second = embedding.encode_batch(["広告", "公共政策"])
+
+        assert len(embedding.tokenizer.pad_calls) == calls_after_first
+        np.testing.assert_array_equal(second[0], first[1])
+        np.testing.assert_array_equal(second[1], first[0])
+        stats = embedding.cache.get_statistics()
+        assert stats["hits"] == 2
+        assert stats["misses"] == 2
+
+
+class TestWarmUp:
+    """warm_upのテストクラス"""
+
+    def test_runs_each_length_bucket_without_caching(self, embedding):
+        """長さごとにフォワードパスを実行し、キャッシュには何も書かないこと"""
+        from src.embedding_cache import EmbeddingCache
+
+        embedding.cache = EmbeddingCache(max_entries=100)
+        embedding.warm_up(lengths=(4, 64), batch_size=8)
+
+        assert embedding.tokenizer.pad_calls == [(8, 4), (8, 64)]
+        assert embedding.cache.get_statistics()["memory_entries"] == 0
+
+
+class TestMeanPool:
+    """mean_poolのテストクラス"""
+
+    def test_ignores_padding(self):
+        """パディング位置の値が結果に影響しないこと"""
+        hidden = torch.tensor([[[1.0, 2.0], [3.0, 4.0], [100.0, 100.0]]])
+        mask = torch.tensor([[1, 1, 0]])
+
+        pooled = mean_pool(hidden, mask)
+
+        assert pooled.tolist() == [[2.0, 3.0]]
+
+
+class TestSimilarityMatrix:
+    """similarity_matrixのテストクラス"""
+
+    def test_independent_of_batch_composition(self):
+        """同じベクトルなら、行列全体で計算しても1ペアずつ計算しても同じ値になること"""
+        rng = np.random.default_rng(0)
+        vectors = rng.normal(size=(12, 64)).astype(np.float32)
+        vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+
+        full = similarity_matrix(vectors[:5], vectors[5:])
+        for i in range(5):
+            for j in range(7):
+                single = similarity_matrix(vectors[i:i + 1], vectors[5 + j:6 + j])[0, 0]
+                assert single == full[i, j]
+
+    def test_clipped_to_unit_range(self):
+        """負の類似度は0に、1を超える値は1に収めること"""
+        vectors = np.array([[1.0, 0.0], [-1.0, 0.0]], dtype=np.float32)
+        result = similarity_matrix(vectors, vectors)
+
+        assert result.dtype == np.float32
+        assert result.tolist() == [[1.0, 0.0], [0.0, 1.0]]
@@ -0,0 +1,163 @@
+"""
+埋め込みキャッシュのテスト
+"""
+
+import sys
+import tempfile
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+# プロジェクトルートをパスに追加
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.embedding_cache import EmbeddingCache, DiskVectorStore, make_cache_key
+
+
+def _unit(values):
+    vec = np.asarray(values, dtype=np.float32)
+    return vec / np.linalg.norm(vec)
+
+
+class TestMakeCacheKey:
+    """make_cache_keyのテストクラス"""
+
+    def test_key_depends_on_all_parts(self):
+        """モデル名・max_length・テキストのいずれが違ってもキーが変わること"""
+        base = make_cache_key("model", 512, "公共政策")
+        assert base == make_cache_key("model", 512, "公共政策")
+        assert base != make_cache_key("other", 512, "公共政策")
+        assert base != make_cache_key("model", 256, "公共政策")
+        assert base != make_cache_key("model", 512, "広告")
+
+
+class TestMemoryTier:
+    """メモリ層のテストクラス"""
+
+    def test_hit_and_miss_counters(self):
+        """ヒット/ミスが記録されること"""
+        cache = EmbeddingCache(max_entries=10)
+        cache.put_many({"a": _unit([1, 0]), "b": _unit([0, 1])})
+
+        found = cache.get_many(["a", "b", "c"])
+
+        assert set(found) == {"a", "b"}
+        stats = cache.get_statistics()
+        assert stats["memory_hits"] == 2
+        assert stats["misses"] == 1
+        assert stats["disk_enabled"] is False
+
+    def test_lru_eviction(self):
+        """上限を超えると最も古く使われたものから追い出されること"""
+        cache = EmbeddingCache(max_entries=2)
+        cache.put_many({"a": _unit([1, 0])})
+        cache.put_many({"b": _unit([0, 1])})
+        cache.get_many(["a"])  # aを最近使用に
+        cache.put_many({"c": _unit([1, 1])})
+
+        assert set(cache.get_many(["a", "b", "c"])) == {"a", "c"}
+        assert cache.get_statistics()["evictions"] == 1
+
+    def test_invalid_max_entries(self):
+        """max_entriesが0以下ならValueError"""
+        with pytest.raises(ValueError):
+            EmbeddingCache(max_entries=0)
+
+
+class TestDiskTier:
+    """ディスク層のテストクラス"""
+
+    def test_vectors_shared_across_instances(self):
+        """別インスタンス（別プロセス相当）から書き込んだベクトルを読めること"""
+        with tempfile.TemporaryDirectory() as tmp:
+            writer = EmbeddingCache(max_entries=10, cache_dir=tmp)
+            vector = _unit([0.3, 0.4, 0.5, 0.6])
+            writer.put_many({"k": vector})
+
+            reader = EmbeddingCache(max_entries=10, cache_dir=tmp)
+            found = reader.get_many(["k"])
+
+            assert reader.get_statistics()["disk_hits"] == 1
+            assert found["k"].dtype == np.float32
+            np.testing.assert_allclose(found["k"], vector, atol=1e-3)
+
+    def test_reader_sees_later_appends(self):
+        """開いた後に他のインスタンスが追記した分も読めること"""
+        with tempfile.TemporaryDirectory() as tmp:
+            reader = DiskVectorStore(tmp)
+            writer = DiskVectorStore(tmp)
+
+            writer.put_many({"a": _unit([1, 0, 0])})
+            assert reader.get("a") is not None
+
+            writer.put_many({"b": _unit([0, 1, 0])})
+            np.testing.assert_allclose(reader.get("b"), _unit([0, 1, 0]), atol=1e-3)
+            assert len(reader) == 2
+
+    def test_duplicate_keys_are_not_appended_twice(self):
+        """同じキーは二重に追記されないこと"""
+        with tempfile.TemporaryDirectory() as tmp:
+            store = DiskVectorStore(tmp)
+            store.put_many({"a": _unit([1, 0])})
+            store.put_many({"a": _unit([1, 0])})
+
+            assert len(store) == 1
+            assert (Path(tmp) / "vectors.1.f32").stat().st_size == 2 * 4
+
+    def test_dimension_mismatch(self):
+        """次元が異なるベクトルはValueError"""
+        with tempfile.TemporaryDirectory() as tmp:
+            store = DiskVectorStore(tmp)
+            store.put_many({"a": _unit([1, 0])})
+            with pytest.raises(ValueError):
+                store.put_many({"b": _unit([1, 0, 0])})
+
+
+    def test_roundtrip_keeps_full_precision(self):
+        """ディスク層から読み出したベクトルが書き込んだベクトルとビット単位で一致すること"""
+        with tempfile.TemporaryDirectory() as tmp:
+            vector = _unit([0.1, 0.2, 0.3, 0.4])
+            EmbeddingCache(max_entries=10, cache_dir=tmp).put_many({"k": vector})
+
+            reloaded = EmbeddingCache(max_entries=10, cache_dir=tmp).get_many(["k"])["k"]
+            np.testing.assert_array_equal(reloaded, vector)
+
+    def test_compaction_keeps_newest_entries(self):
+        """上限を超えると新しい方だけを残した世代に切り替え、古い世代のファイルを消すこと"""
+        with tempfile.TemporaryDirectory() as tmp:
+            store = DiskVectorStore(tmp, max_entries=4)
+            reader = DiskVectorStore(tmp, max_entries=4)
+            for i in range(4):
+                store.put_many({f"k{i}": _unit([1, i])})
+            assert reader.get("k0") is not None
+
+            store.put_many({"k4": _unit([1, 4])})
+
+            assert set(store._index) == {"k2", "k3", "k4"}
+            assert sorted(p.name for p in Path(tmp).glob("vectors.*")) == ["vectors.2.f32"]
+            # 他のインスタンスも未知のキーを引いた時点で新しい世代を読み直す
+            np.testing.assert_array_equal(reader.get("k4"), _unit([1, 4]))
+            np.testing.assert_array_equal(reader.get("k3"), _unit([1, 3]))
+            assert reader.get("k0") is None
+
+    def test_legacy_float16_store_is_replaced(self):
+        """float16で保存していた旧形式のディレクトリは読まずに作り直すこと"""
+        with tempfile.TemporaryDirectory() as tmp:
+            (Path(tmp) / "meta.json").write_text('{"dim": 2, "dtype": "float16"}', encoding="utf-8")
+            (Path(tmp) / "vectors.f16").write_bytes(np.zeros(2, dtype=np.float16).tobytes())
+            (Path(tmp) / "index.tsv").write_text("a\t0\n", encoding="utf-8")
+
+            store = DiskVectorStore(tmp)
+            assert store.get("a") is None
+
+            store.put_many({"b": _unit([0, 1])})
+            assert not (Path(tmp) / "vectors.f16").exists()
+            assert not (Path(tmp) / "index.tsv").exists()
+            np.testing.assert_array_equal(DiskVectorStore(tmp).get("b"), _unit([0, 1]))
+
+    def test_invalid_max_entries(self):
+        """max_entriesが0以下ならValueError"""
+        with tempfile.TemporaryDirectory() as tmp:
+            with pytest.raises(ValueError):
+                DiskVectorStore(tmp, max_entries=0)
@@ -12,7 +12,10 @@ from src.enhanced_cli import (
     EnhancedCLI,
     CLIConfig,
     parse_enhanced_args,
-    create_similarity_calculator_from_args
+    create_dual_file_parser,
+    create_enhanced_argument_parser,
+    create_similarity_calculator_from_args,
+    create_single_file_parser
 )
 
 
@@ -286,6 +289,48 @@ class TestCLIArgParsing:
         with pytest.raises(ValueError, match="temperatureは0.0から1.0"):
             parse_enhanced_args(args)
 
+    def test_parse_enhanced_args_cascade(self):
+        """カスケード方式の引数解析のテスト"""
+        parsed_args, config = parse_enhanced_args(["input.jsonl", "--method", "cascade"])
+        assert config.calculation_method == "cascade"
+        assert config.cascade_band == (0.4, 0.85)
+
+        parsed_args, config = parse_enhanced_args(
+            ["input.jsonl", "--method", "cascade", "--cascade-band", "0.3", "0.9"]
+        )
+        assert config.cascade_band == (0.3, 0.9)
+
+        with pytest.raises(ValueError, match="cascade_band"):
+            parse_enhanced_args(["input.jsonl", "--method", "cascade", "--cascade-band", "0.9", "0.3"])
+
+    @pytest.mark.parametrize("create, positional", [
+        (create_enhanced_argument_parser, ["input.jsonl"]),
+        (create_single_file_parser, ["input.jsonl"]),
+        (create_dual_file_parser, ["file1.jsonl", "file2.jsonl"]),
+    ])
+    def test_all_parsers_accept_llm_options(self, create, positional):
+        """3つのパーサーが同じLLMオプションを受け付けること"""
+        parsed = create().parse_args(positional + [
+            "--llm-concurrency", "4", "--llm-hedge-ratio", "0.1", "--no-llm-cache",
+            "--llm-pack-size", "3", "--cascade-band", "0.3", "0.9"
+        ])
+
+        assert parsed.llm_concurrency == 4
+        assert parsed.llm_hedge_ratio == 0.1
+        assert parsed.llm_cache is False
+        assert parsed.llm_pack_size == 3
+        assert parsed.cascade_band == [0.3, 0.9]
+
+    def test_checkpoint_options_only_for_single_file(self):
+        """チェックポイントのオプションは単一ファイルのパーサーだけが受け付けること"""
+        for create in (create_enhanced_argument_parser, create_single_file_parser):
+            parsed = create().parse_args(["input.jsonl", "--resume", "--checkpoint-interval", "10"])
+            assert parsed.resume is True
+            assert parsed.checkpoint_interval == 10
+
+        with pytest.raises(SystemExit):
+            create_dual_file_parser().parse_args(["file1.jsonl", "file2.jsonl", "--resume"])
+
 
 class TestSimilarityCalculatorFactory:
     """類似度計算機ファクトリーのテスト"""
@@ -330,6 +375,31 @@ class TestSimilarityCalculatorFactory:
             assert call_args.kwargs["llm_config"]["temperature"] == 0.3
             assert call_args.kwargs["llm_config"]["max_tokens"] == 128
 
+    @pytest.mark.asyncio
+    async def test_create_calculator_with_hedging(self, monkeypatch):
+        """ヘッジの割合がCLI設定からLLMクライアントまで渡ることのテスト"""
+        monkeypatch.delenv("VLLM_HEDGE_RATIO", raising=False)
+        parsed_args, config = parse_enhanced_args(["input.jsonl", "--llm", "--method", "llm"])
+        calculator = await create_similarity_calculator_from_args(config)
+        assert calculator.llm_strategy.llm_similarity.llm_client.hedger.ratio == 0.0
+
+        parsed_args, config = parse_enhanced_args(
+            ["input.jsonl", "--llm", "--method", "llm", "--llm-hedge-ratio", "0.1"]
+        )
+        calculator = await create_similarity_calculator_from_args(config)
+        client = calculator.llm_strategy.llm_similarity.llm_client
+        assert client.config.hedge_ratio == 0.1
+        assert client.hedger.ratio == 0.1
+
+        # 環境変数はオプション未指定時の既定値になる
+        monkeypatch.setenv("VLLM_HEDGE_RATIO", "0.05")
+        parsed_args, config = parse_enhanced_args(["input.jsonl", "--llm", "--method", "llm"])
+        calculator = await create_similarity_calculator_from_args(config)
+        assert calculator.llm_strategy.llm_similarity.llm_client.hedger.ratio == 0.05
+
+        with pytest.raises(ValueError, match="llm_hedge_ratio"):
+            parse_enhanced_args(["input.jsonl", "--llm", "--llm-hedge-ratio", "1.5"])
+
 
 class TestCLIIntegration:
     """CLI統合テスト"""
@@ -0,0 +1,297 @@
+"""
+job_queueモジュールのテスト
+"""
+
+import asyncio
+import io
+import sys
+import threading
+import time
+from pathlib import Path
+from types import SimpleNamespace
+
+import pytest
+from fastapi import UploadFile
+
+# プロジェクトルートをパスに追加
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src import api
+from src.checkpoint import ResumableTaskStore
+from src.job_queue import JobQueue, JobStore
+from src.parallel_scoring import ScoringCancelled
+
+
+class Recorder:
+    """実行順と同時実行数を記録するダミーの処理関数"""
+
+    def __init__(self):
+        self.started = []
+        self.resumed = []
+        self.active = 0
+        self.max_active = 0
+        self.release = asyncio.Event()
+
+    async def __call__(self, job_id, params, resume):
+        self.started.append(params["name"])
+        if resume:
+            self.resumed.append(params["name"])
+        self.active += 1
+        self.max_active = max(self.max_active, self.active)
+        try:
+            await self.release.wait()
+            if params.get("fail"):
+                raise RuntimeError("失敗しました")
+        finally:
+            self.active -= 1
+
+
+async def settle():
+    # ストアの読み書きはエグゼキューターで行うため、実時間で少し待つ
+    for _ in range(50):
+        await asyncio.sleep(0.01)
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    return str(tmp_path / "jobs.db")
+
+
+def make_queue(db_path, workers=1):
+    queue = JobQueue(JobStore(db_path), workers=workers)
+    recorder = Recorder()
+    queue.register("compare", recorder)
+    return queue, recorder
+
+
+class TestScheduling:
+    """スケジューリングのテストクラス"""
+
+    def test_bounded_concurrency(self, db_path):
+        """ワーカー数を超えて同時に実行しないこと"""
+        async def scenario():
+            queue, recorder = make_queue(db_path, workers=2)
+            await queue.start()
+            jobs = [await queue.submit("compare", {"name": f"job{i}"}) for i in range(5)]
+            await settle()
+            assert recorder.active == 2
+            assert (await queue.get_statistics())["queue_depth"] == 3
+
+            recorder.release.set()
+            await settle()
+            await queue.stop()
+            return recorder, [(await queue.get(job["job_id"]))["status"] for job in jobs]
+
+        recorder, statuses = asyncio.run(scenario())
+        assert recorder.max_active == 2
+        assert statuses == ["completed"] * 5
+
+    def test_fairness_between_clients(self, db_path):
+        """大量に投入したクライアントがいても他のクライアントのジョブを交互に実行すること"""
+        async def scenario():
+            queue, recorder = make_queue(db_path)
+            for i in range(3):
+                await queue.submit("compare", {"name": f"a{i}"}, client_id="a")
+            for i in range(2):
+                await queue.submit("compare", {"name": f"b{i}"}, client_id="b")
+            recorder.release.set()
+            await queue.start()
+            await settle()
+            await queue.stop()
+            return recorder.started
+
+        assert asyncio.run(scenario()) == ["a0", "b0", "a1", "b1", "a2"]
+
+    def test_priority(self, db_path):
+        """優先度の値が小さいジョブを先に実行すること"""
+        async def scenario():
+            queue, recorder = make_queue(db_path)
+            await queue.submit("compare", {"name": "normal"})
+            queued = await queue.submit("compare", {"name": "urgent"}, priority=-1)
+            assert (await queue.get(queued["job_id"]))["position"] == 1
+            recorder.release.set()
+            await queue.start()
+            await settle()
+            await queue.stop()
+            return recorder.started
+
+        assert asyncio.run(scenario()) == ["urgent", "normal"]
+
+    def test_failed_job(self, db_path):
+        async def scenario():
+            queue, recorder = make_queue(db_path)
+            recorder.release.set()
+            await queue.start()
+            job = await queue.submit("compare", {"name": "x", "fail": True})
+            await settle()
+            await queue.stop()
+            return await queue.get(job["job_id"])
+
+        job = asyncio.run(scenario())
+        assert job["status"] == "failed"
+        assert job["error"] == "失敗しました"
+
+    def test_unknown_kind(self, db_path):
+        queue, _ = make_queue(db_path)
+        with pytest.raises(ValueError):
+            asyncio.run(queue.submit("unknown", {}))
+
+
+class TestCancel:
+    """キャンセルのテストクラス"""
+
+    def test_cancel_queued_and_running(self, db_path):
+        async def scenario():
+            queue, recorder = make_queue(db_path)
+            await queue.start()
+            running = await queue.submit("compare", {"name": "running"})
+            queued = await queue.submit("compare", {"name": "queued"})
+            await settle()
+
+            assert await queue.cancel(queued["job_id"])
+            assert await queue.cancel(running["job_id"])
+            await settle()
+            statuses = ((await queue.get(running["job_id"]))["status"], (await queue.get(queued["job_id"]))["status"])
+            assert not await queue.cancel(running["job_id"])
+            await queue.stop()
+            return recorder.started, statuses
+
+        started, statuses = asyncio.run(scenario())
+        assert started == ["running"]
+        assert statuses == ("cancelled", "cancelled")
+
+
+class TestPersistence:
+    """再起動時の再開のテストクラス"""
+
+    def test_unfinished_jobs_resume_after_restart(self, db_path):
+        """停止時に実行中・待ち中だったジョブを次の起動時に実行すること"""
+        async def first_run():
+            queue, recorder = make_queue(db_path)
+            await queue.start()
+            await queue.submit("compare", {"name": "running"})
+            await queue.submit("compare", {"name": "queued"})
+            await settle()
+            await queue.stop()
+            return recorder.started
+
+        async def second_run():
+            queue, recorder = make_queue(db_path)
+            recorder.release.set()
+            restored = await queue.start()
+            await settle()
+            await queue.stop()
+            return [job["params"]["name"] for job in restored], recorder, await queue.get_statistics()
+
+        assert asyncio.run(first_run()) == ["running"]
+        restored, recorder, stats = asyncio.run(second_run())
+
+        assert restored == ["running", "queued"]
+        assert recorder.started == ["running", "queued"]
+        assert recorder.resumed == ["running"]
+        assert stats["jobs"]["completed"] == 2
+        assert stats["queue_depth"] == 0
+
+
+class TestStatistics:
+    """統計のテストクラス"""
+
+    def test_statistics(self, db_path):
+        async def scenario():
+            queue, recorder = make_queue(db_path)
+            await queue.start()
+            for i in range(3):
+                await queue.submit("compare", {"name": f"job{i}"}, client_id=f"client{i}")
+            await settle()
+            waiting = await queue.get_statistics()
+            recorder.release.set()
+            await settle()
+            await queue.stop()
+            return waiting, await queue.get_statistics()
+
+        waiting, done = asyncio.run(scenario())
+        assert waiting["running"] == 1
+        assert waiting["queue_depth"] == 2
+        assert waiting["clients_waiting"] == 2
+        assert waiting["jobs"]["queued"] == 2
+        assert done["jobs"]["completed"] == 3
+        assert done["wait_seconds"]["max"] >= done["wait_seconds"]["average"] >= 0
+
+    def test_invalid_configuration(self, db_path):
+        with pytest.raises(ValueError):
+            JobQueue(JobStore(db_path), workers=0)
+        with pytest.raises(ValueError):
+            JobQueue(JobStore(db_path), executor="cluster")
+
+
+class TestJobEndpoints:
+    """ジョブキューを使う非同期APIのテストクラス"""
+
+    def test_submit_get_cancel(self, db_path, tmp_path, monkeypatch):
+        queue = JobQueue(JobStore(db_path))
+        queue.register("compare", api.run_compare_job)
+        monkeypatch.setattr(api.app.state, "job_queue", queue, raising=False)
+        monkeypatch.setattr(api.app.state, "resumable_tasks", ResumableTaskStore(str(tmp_path / "tasks")), raising=False)
+        request = SimpleNamespace(headers={"X-Client-Id": "team-a"}, client=None)
+        content = b'{"inference1": "a", "inference2": "b"}\n'
+
+        async def scenario():
+            # ワーカーを起動していないのでジョブは待ち状態のまま
+            response = await api.compare_async(request, UploadFile(file=io.BytesIO(content), filename="a.jsonl"),
+                                               "score", False, False, 0)
+            job = await api.get_job(response["task_id"])
+            cancelled = await api.cancel_job(response["task_id"])
+            return response, job, cancelled
+
+        response, job, cancelled = asyncio.run(scenario())
+
+        assert response["status"] == "queued"
+        assert response["position"] == 1
+        assert job["client_id"] == "team-a"
+        assert job["status"] == "queued"
+        assert cancelled["status"] == "cancelled"
+        assert asyncio.run(queue.get(response["task_id"]))["status"] == "cancelled"
+        assert not (tmp_path / "tasks" / response["task_id"]).exists()
+        assert api.progress_tracker.get_progress(response["task_id"]).status == "error"
+
+    def test_cancel_running_job_removes_input_after_it_stops(self, db_path, tmp_path, monkeypatch):
+        """実行中のジョブのキャンセルでは、処理がshould_stopで止まってから入力を削除すること"""
+        queue = JobQueue(JobStore(db_path))
+        queue.register("compare", api.run_compare_job)
+        monkeypatch.setattr(api.app.state, "job_queue", queue, raising=False)
+        monkeypatch.setattr(api.app.state, "resumable_tasks", ResumableTaskStore(str(tmp_path / "tasks")), raising=False)
+        request = SimpleNamespace(headers={}, client=None)
+        content = b'{"inference1": "a", "inference2": "b"}\n'
+        started = threading.Event()
+        seen = {}
+
+        def slow_process(path, output_type, should_stop=None):
+            started.set()
+            while not should_stop():
+                time.sleep(0.01)
+            seen["input_exists"] = Path(path).exists()
+            raise ScoringCancelled("採点を中止しました")
+
+        monkeypatch.setattr(api, "process_jsonl_file", slow_process)
+
+        async def scenario():
+            await queue.start()
+            response = await api.compare_async(request, UploadFile(file=io.BytesIO(content), filename="a.jsonl"),
+                                               "score", False, False, 0)
+            task_id = response["task_id"]
+            while not started.is_set():
+                await asyncio.sleep(0.01)
+            await api.cancel_job(task_id)
+            for _ in range(200):
+                job = await queue.get(task_id)
+                if job["status"] == "cancelled":
+                    break
+                await asyncio.sleep(0.01)
+            await queue.stop()
+            return task_id, job
+
+        task_id, job = asyncio.run(scenario())
+
+        assert seen == {"input_exists": True}
+        assert job["status"] == "cancelled"
+        assert not (tmp_path / "tasks" / task_id).exists()
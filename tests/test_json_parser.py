@@ -0,0 +1,158 @@
+"""
+json_parserモジュールのテスト
+"""
+
+import json
+import sys
+from pathlib import Path
+
+import pytest
+
+# プロジェクトルートをパスに追加
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src import json_parser
+from src.error_handler import ErrorHandler, JsonRepair
+from src.json_parser import ParseStatistics, RepairCache, loads, parse_value, set_json_backend
+from src.similarity import repair_and_parse_json
+
+BACKENDS = ["json"] + (["orjson"] if json_parser.orjson is not None else [])
+
+
+@pytest.fixture(params=BACKENDS)
+def backend(request):
+    previous = json_parser.get_json_backend()
+    set_json_backend(request.param)
+    yield request.param
+    set_json_backend(previous)
+
+
+class TestParseValue:
+    """parse_valueのテストクラス"""
+
+    @pytest.mark.parametrize("text,expected,tier", [
+        ('{"a": [1, 2.5, "カテゴリ"]}', {"a": [1, 2.5, "カテゴリ"]}, "fast"),
+        ('{"a": 1', {"a": 1}, "repaired"),
+        ("{a: 1}", {"a": 1}, "repaired"),
+        ("hello world", {"text": "hello world"}, "text"),
+        ("  カテゴリ  ", {"text": "カテゴリ"}, "text"),
+        ("", None, "empty"),
+        ("   ", None, "empty"),
+    ])
+    def test_tiers(self, backend, text, expected, tier):
+        """各段階で期待どおりの値を返すこと"""
+        assert parse_value(text) == (expected, tier)
+
+    def test_stdlib_only_values(self, backend):
+        """orjsonが受け付けない値は標準のjsonでパースすること"""
+        value, tier = parse_value('{"a": NaN, "b": 123456789012345678901234567890}')
+
+        assert value["b"] == 123456789012345678901234567890
+        assert tier == ("stdlib" if backend == "orjson" else "fast")
+
+    @pytest.mark.parametrize("text", ["hello world", "123abc", '"abc', "true story", "- item"])
+    def test_plain_text_is_not_repaired(self, monkeypatch, text):
+        """括弧を含まないテキストはjson_repairを呼ばないこと"""
+        def fail(_):
+            raise AssertionError("repair_json should not be called")
+        monkeypatch.setattr(json_parser, "repair_json", fail)
+
+        assert parse_value(text) == ({"text": text}, "text")
+
+    @pytest.mark.parametrize("text", ["hello world", "123abc", '"abc', "true story", "- item"])
+    def test_classification_matches_repair(self, text):
+        """括弧を含まないテキストはjson_repairでもJSONにならないこと（分類の前提）"""
+        assert json_parser._repair(text) is json_parser._NOT_JSON
+
+
+class TestLoads:
+    """loadsのテストクラス"""
+
+    def test_same_result_as_stdlib(self, backend):
+        text = '{"id": 1, "inference1": "{\\"a\\": 1}", "x": [true, null, -1.5e3]}'
+        assert loads(text) == json.loads(text)
+
+    def test_same_error_as_stdlib(self, backend):
+        with pytest.raises(json.JSONDecodeError):
+            loads('{"a": 1')
+
+
+class TestParseStatistics:
+    """パース統計のテストクラス"""
+
+    def test_repair_and_parse_json_records_tiers(self, monkeypatch):
+        """repair_and_parse_jsonが処理した段階を数えること"""
+        stats = ParseStatistics()
+        monkeypatch.setattr(json_parser, "_statistics", stats)
+
+        for text in ['{"a": 1}', '{"b": 2}', '{"a": 1', "plain", ""]:
+            repair_and_parse_json(text)
+
+        result = stats.get_statistics()
+        assert result["total"] == 5
+        assert result["tiers"]["fast"] == 2
+        assert result["tiers"]["repaired"] == 1
+        assert result["tiers"]["text"] == 1
+        assert result["tiers"]["empty"] == 1
+        assert result["fast_path_rate"] == pytest.approx(0.4)
+
+    def test_unknown_backend(self):
+        with pytest.raises(ValueError):
+            set_json_backend("simdjson")
+
+
+class TestRepairCache:
+    """RepairCacheのテストクラス"""
+
+    @pytest.fixture
+    def cache(self, monkeypatch):
+        cache = RepairCache(max_entries=100)
+        monkeypatch.setattr(json_parser, "_repair_cache", cache)
+        return cache
+
+    def test_identical_repairs_run_once(self, cache, monkeypatch):
+        """同じ文字列の修復は1回だけ実行すること"""
+        calls = []
+
+        def counting_repair(text):
+            calls.append(text)
+            return json_parser.repair_json(text)
+        monkeypatch.setattr(json_parser, "_repair_json_text", counting_repair)
+
+        results = [repair_and_parse_json('{"category": "A", "reason": "途中で') for _ in range(5)]
+
+        assert len(calls) == 1
+        assert all(result == results[0] for result in results)
+        stats = cache.get_statistics()
+        assert stats["repairs_avoided"] == 4
+        assert stats["hit_rate"] == pytest.approx(0.8)
+
+    def test_results_are_not_shared_objects(self, cache):
+        """呼び出し側がパース結果を変更しても次の結果に影響しないこと"""
+        first = repair_and_parse_json('{"a": [1, 2')
+        first["a"].append(3)
+
+        assert repair_and_parse_json('{"a": [1, 2') == {"a": [1, 2]}
+
+    def test_bounded(self):
+        """上限を超えると古い修復結果から捨てること"""
+        small = RepairCache(max_entries=3)
+        for i in range(5):
+            small.get_or_repair(f"text{i}", str.upper)
+
+        assert small.get_statistics()["entries"] == 3
+        small.get_or_repair("text4", str.upper)
+        small.get_or_repair("text0", str.upper)
+        assert small.hits == 1
+        assert small.misses == 6
+
+    def test_shared_with_error_handler(self, cache):
+        """ErrorHandlerとJsonRepairの修復も同じキャッシュを使うこと"""
+        line = "{'inference1': 'a', 'inference2': 'b'},"
+        for i in range(3):
+            assert ErrorHandler.validate_jsonl_line(line, i)[1] == {"inference1": "a", "inference2": "b"}
+        JsonRepair.repair_json_string('{"a": 1')
+        repair_and_parse_json('{"a": 1')
+
+        assert cache.hits == 3
+        assert cache.misses == 2
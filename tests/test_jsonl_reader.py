@@ -0,0 +1,266 @@
+"""
+JSONLReader / BraceScanner / ByteProgressBar / JSONLFormatterのテスト
+"""
+
+import io
+import json
+import sys
+from pathlib import Path
+
+import pytest
+
+# プロジェクトルートをパスに追加
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.error_handler import ErrorHandler
+from src.jsonl_formatter import JSONLFormatter
+from src import jsonl_reader
+from src.jsonl_reader import BraceScanner, ByteProgressBar, JSONLReader
+
+
+def write(tmp_path, text, name="input.jsonl"):
+    path = tmp_path / name
+    path.write_text(text, encoding="utf-8")
+    return str(path)
+
+
+MIXED = (
+    '{"id": 1}\n'
+    '\n'
+    '{\n'
+    '  "id": 2,\n'
+    '  "nested": {"a": 1}\n'
+    '}\n'
+    'not json\n'
+    '{"id": 3}\n'
+)
+
+
+class TestJSONLReader:
+    """JSONLReaderのテストクラス"""
+
+    def test_single_and_multiline_records(self, tmp_path):
+        """1行オブジェクトと複数行オブジェクトを順に返すこと"""
+        errors = []
+        reader = JSONLReader(write(tmp_path, MIXED), on_error=errors.append)
+        records = list(reader)
+
+        assert [r.data.get("id") for r in records] == [1, 2, 3]
+        assert [r.line_num for r in records] == [1, 3, 8]
+        assert [r.line_count for r in records] == [1, 4, 1]
+        assert [e.line_num for e in errors] == [7]
+        assert reader.lines_read == 8
+        assert reader.position == len(MIXED.encode("utf-8"))
+
+    def test_repair(self, tmp_path):
+        """修復関数で読めた行は修復済みとして返すこと"""
+        path = write(tmp_path, '{"id": 1}\n{"id": 2,}\n')
+        reader = JSONLReader(path, repair=lambda text, n: {"id": n, "fixed": True})
+        records = list(reader)
+
+        assert [r.repaired for r in records] == [False, True]
+        assert records[1].data == {"id": 2, "fixed": True}
+
+    def test_byte_range(self, tmp_path):
+        """指定したバイト範囲の行だけを読むこと"""
+        text = '{"id": 1}\n{"id": 2}\n{"id": 3}\n'
+        path = write(tmp_path, text)
+        start = text.index('{"id": 2}')
+        end = text.index('{"id": 3}')
+
+        reader = JSONLReader(path, start=start, end=end)
+        assert [r.data["id"] for r in reader] == [2]
+        assert reader.total_bytes == end - start
+
+    def test_unterminated_multiline(self, tmp_path):
+        """閉じていない複数行オブジェクトは1行ずつ読み直すこと"""
+        errors = []
+        path = write(tmp_path, '{"id": 1}\n{\n"id": 2\n')
+        records = list(JSONLReader(path, on_error=errors.append))
+
+        assert [r.data for r in records] == [{"id": 1}]
+        assert [e.line_num for e in errors] == [2, 3]
+
+    def test_unclosed_brace_resyncs_on_next_record(self, tmp_path):
+        """閉じていないブレースの後も、単独で読める行から読み直すこと"""
+        errors = []
+        text = (
+            '{"id": 1, "text": "切れた行\n'
+            '{"id": 2}\n'
+            '{\n'
+            '  "id": 3,\n'
+            '  "items": [\n'
+            '    {"a": 1}\n'
+            '  ]\n'
+            '}\n'
+        )
+        records = list(JSONLReader(write(tmp_path, text), on_error=errors.append))
+
+        assert [r.data["id"] for r in records] == [2, 3]
+        assert [r.line_count for r in records] == [1, 6]
+        assert [e.line_num for e in errors] == [1]
+
+    def test_multiline_buffer_is_capped(self, tmp_path, monkeypatch):
+        """連結する行数が上限を超えたら1行ずつ読み直し、後続の複数行オブジェクトを読むこと"""
+        monkeypatch.setattr(jsonl_reader, "MAX_MULTILINE_LINES", 3)
+        errors = []
+        text = '{"broken": [\n  1,\n  2,\n  3,\n{\n  "id": 2\n}\n'
+        records = list(JSONLReader(write(tmp_path, text), on_error=errors.append))
+
+        assert [r.data for r in records] == [{"id": 2}]
+        assert records[0].line_num == 5
+        assert [e.line_num for e in errors] == [1, 2, 3, 4]
+
+    def test_braces_inside_strings(self, tmp_path):
+        """文字列の中の波括弧で複数行オブジェクトの終わりを誤判定しないこと"""
+        text = (
+            '{\n'
+            '  "inference1": "}閉じ括弧が先",\n'
+            '  "inference2": "{\\"escaped\\": \\"}\\"}"\n'
+            '}\n'
+            '{"id": 2}\n'
+        )
+        records = list(JSONLReader(write(tmp_path, text)))
+
+        assert [r.line_count for r in records] == [4, 1]
+        assert records[0].data["inference1"] == "}閉じ括弧が先"
+        assert json.loads(records[0].data["inference2"]) == {"escaped": "}"}
+
+    def test_from_bytes(self):
+        """メモリ上のデータをファイルと同じように読むこと"""
+        reader = JSONLReader.from_bytes(MIXED.encode("utf-8"))
+
+        assert [r.data.get("id") for r in reader] == [1, 2, 3]
+        assert reader.total_bytes == len(MIXED.encode("utf-8"))
+
+
+class TestBraceScanner:
+    """BraceScannerのテストクラス"""
+
+    @pytest.mark.parametrize("lines,depth", [
+        (['{"a": {'], 2),
+        (['{"a": "{{{"}'], 0),
+        (['{"a": "\\"}"'], 1),
+        (['{"a": "\\\\"}'], 0),
+        (['{', '"a": "途中で切れた', '}'], 0),
+    ])
+    def test_depth(self, lines, depth):
+        scanner = BraceScanner()
+        for line in lines:
+            result = scanner.feed(line)
+        assert result == depth
+
+
+class TestValidateAndRepairJsonl:
+    """ErrorHandler.validate_and_repair_jsonlのテストクラス"""
+
+    def test_multiline_objects_in_one_pass(self):
+        """複数行にまたがるオブジェクトを1件として検証すること"""
+        content = (
+            '{"inference1": "a", "inference2": "b"}\n'
+            '{\n'
+            '  "inference1": "{x",\n'
+            '  "inference2": "}}"\n'
+            '}\n'
+            "{'inference1': 'c', 'inference2': 'd'}\n"
+            'not json\n'
+        )
+
+        data, messages, ok = ErrorHandler.validate_and_repair_jsonl(content)
+
+        assert ok is True
+        assert data == [
+            {"inference1": "a", "inference2": "b"},
+            {"inference1": "{x", "inference2": "}}"},
+            {"inference1": "c", "inference2": "d"}
+        ]
+        assert messages[0] == "⚠️ 行6: シングルクォートを修正"
+        assert messages[1].startswith("❌ 行7: JSONパースエラー")
+
+    def test_stops_after_max_errors(self):
+        """エラーが上限に達したら読み込みを打ち切ること"""
+        data, messages, ok = ErrorHandler.validate_and_repair_jsonl("x\n" * 100, max_errors=3)
+
+        assert ok is False
+        assert data == []
+        assert len(messages) == 4
+        assert messages[-1] == "エラーが3件を超えたため処理を中止"
+
+    def test_stream_writes_repaired_records(self, tmp_path):
+        """ストリームの検証結果を1行1オブジェクト形式で書き出し、メッセージ数を数えること"""
+        content = "\n".join(['{"inference1": "a"}'] * 150 + ['{', '"inference1": "b",', '"inference2": "c"', '}'])
+        output = tmp_path / "out.jsonl"
+
+        result = ErrorHandler.validate_and_repair_jsonl_stream(io.BytesIO(content.encode("utf-8")), str(output))
+
+        assert result.ok is True
+        assert result.records == 151
+        assert result.total_messages == 150
+        assert len(result.messages) == 100
+        lines = output.read_text(encoding="utf-8").splitlines()
+        assert json.loads(lines[0]) == {"inference1": "a", "inference2": ""}
+        assert json.loads(lines[-1]) == {"inference1": "b", "inference2": "c"}
+
+    def test_stream_rejects_invalid_utf8(self, tmp_path):
+        with pytest.raises(UnicodeDecodeError):
+            ErrorHandler.validate_and_repair_jsonl_stream(io.BytesIO(b'{"a": "\xff"}\n'), str(tmp_path / "out.jsonl"))
+
+
+class TestByteProgressBar:
+    """ByteProgressBarのテストクラス"""
+
+    def test_estimates_total_from_bytes(self):
+        """読み出したバイト数の割合から総行数を推定し、終了時に実数に揃えること"""
+        with ByteProgressBar(1000, "テスト") as progress:
+            progress.advance(10, 250)
+            assert progress.pbar.total == 40
+            progress.advance(30, 1000)
+            assert progress.pbar.total == 40
+        assert progress.pbar.n == 40
+
+
+class TestJSONLFormatter:
+    """JSONLFormatterのテストクラス"""
+
+    def test_valid_file_returned_as_is(self, tmp_path):
+        """正しいフォーマットのファイルはそのまま返すこと"""
+        path = write(tmp_path, '{"a": 1}\n\n{"b": 2}\n')
+
+        assert JSONLFormatter.check_format(path) is True
+        assert JSONLFormatter.fix_format(path) == (True, path)
+
+    def test_fix_multiline(self, tmp_path):
+        """複数行オブジェクトを1行に直し、前後の行を保つこと"""
+        path = write(tmp_path, MIXED)
+
+        assert JSONLFormatter.check_format(path) is False
+        success, fixed = JSONLFormatter.fix_format(path)
+
+        assert success and fixed != path
+        lines = Path(fixed).read_text(encoding="utf-8").splitlines()
+        parsed = [json.loads(line) for line in lines if line.strip()]
+        assert parsed == [{"id": 1}, {"id": 2, "nested": {"a": 1}}, {"id": 3}]
+        assert JSONLFormatter.check_format(fixed) is True
+
+    def test_fix_in_place(self, tmp_path):
+        """in_placeの場合はバックアップを作って元のファイルを置き換えること"""
+        path = write(tmp_path, '{\n"a": 1\n}\n')
+
+        success, fixed = JSONLFormatter.fix_format(path, in_place=True)
+
+        assert success and fixed == path
+        assert Path(path).read_text(encoding="utf-8") == '{"a":1}\n'
+        assert Path(path).with_suffix('.jsonl.bak').exists()
+
+    def test_no_valid_objects(self, tmp_path):
+        """有効なオブジェクトがなければ失敗を返すこと"""
+        path = write(tmp_path, 'not json\nstill not\n')
+
+        success, message = JSONLFormatter.fix_format(path)
+        assert success is False
+        assert "有効なJSONオブジェクト" in message
+
+    def test_parse_multiline_json(self, tmp_path):
+        """parse_multiline_jsonは全オブジェクトを返すこと"""
+        path = write(tmp_path, MIXED)
+        assert [obj["id"] for obj in JSONLFormatter.parse_multiline_json(path)] == [1, 2, 3]
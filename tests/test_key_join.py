@@ -0,0 +1,90 @@
+"""
+key_joinモジュールのテスト
+"""
+
+import random
+import sys
+from pathlib import Path
+
+import pytest
+
+# プロジェクトルートをパスに追加
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src import key_join
+from src.key_join import KeyJoin
+
+
+def value_of(data):
+    return str(data.get("inference", ""))
+
+
+def records(rows):
+    return [(line_num, row) for line_num, row in enumerate(rows, 1)]
+
+
+@pytest.fixture
+def shuffled_rows():
+    """キーの順序が異なり、片側にしかないキーを含む2つの行リスト"""
+    rng = random.Random(0)
+    rows1 = [{"id": i, "inference": f"a{i}"} for i in range(200)]
+    rows2 = [{"id": i, "inference": f"b{i}"} for i in range(50, 260)]
+    rng.shuffle(rows1)
+    rng.shuffle(rows2)
+    return rows1, rows2
+
+
+class TestKeyJoin:
+    """KeyJoinのテストクラス"""
+
+    def test_hash_join_pairs_by_key(self, shuffled_rows):
+        """行の位置ではなくキーで対応付けること"""
+        rows1, rows2 = shuffled_rows
+        join = KeyJoin("id", value_of)
+
+        pairs = list(join.iter_pairs(records(rows1), 100, records(rows2), 200))
+
+        assert join.method == "hash"
+        assert len(pairs) == 150
+        assert all(v1 == f"a{key}" and v2 == f"b{key}" for key, v1, v2 in pairs)
+        assert join.unmatched == {1: 50, 2: 60}
+
+    def test_sort_merge_matches_hash_join(self, shuffled_rows):
+        """メモリ上限を超える場合の外部ソートマージ結合がハッシュ結合と同じ組を返すこと"""
+        rows1, rows2 = shuffled_rows
+        hash_join = KeyJoin("id", value_of)
+        sort_join = KeyJoin("id", value_of, memory_limit=2000)
+
+        hashed = list(hash_join.iter_pairs(records(rows1), 100, records(rows2), 200))
+        merged = list(sort_join.iter_pairs(records(rows1), 100000, records(rows2), 200000))
+
+        assert sort_join.method == "sort_merge"
+        assert sort_join.spilled_runs > 2
+        assert sorted(merged) == sorted(hashed)
+        assert sort_join.unmatched == hash_join.unmatched
+
+    @pytest.mark.parametrize("memory_limit", [None, 1])
+    def test_duplicate_and_missing_keys(self, memory_limit):
+        """重複キーは出現順に1対1で対応付け、キーのない行は未対応とすること"""
+        rows1 = [{"id": "x", "inference": "x1"}, {"id": "x", "inference": "x2"}, {"inference": "nokey"}]
+        rows2 = [{"id": "x", "inference": "y1"}, {"id": 1, "inference": "int"}]
+        join = KeyJoin("id", value_of, memory_limit=memory_limit)
+
+        pairs = list(join.iter_pairs(records(rows1), 10, records(rows2), 10))
+
+        assert pairs == [("x", "x1", "y1")]
+        assert join.matched == 1
+        assert join.unmatched == {1: 2, 2: 1}
+        summary = join.summary()
+        assert {"line": 3, "key": None} in summary["unmatched_samples"]["file1"]
+        assert summary["unmatched_samples"]["file2"] == [{"line": 2, "key": 1}]
+
+    def test_unmatched_samples_are_capped(self, monkeypatch):
+        """未対応行のサンプル数に上限があること"""
+        monkeypatch.setattr(key_join, "UNMATCHED_SAMPLE_LIMIT", 3)
+        join = KeyJoin("id", value_of)
+
+        list(join.iter_pairs(records([{"id": i} for i in range(10)]), 1, [], 0))
+
+        assert join.unmatched[1] == 10
+        assert len(join.summary()["unmatched_samples"]["file1"]) == 3
@@ -0,0 +1,213 @@
+"""
+llm_batchモジュール（LLMリクエストの同時実行数制御）のテスト
+"""
+
+import asyncio
+import random
+import sys
+from pathlib import Path
+from unittest.mock import MagicMock
+
+import httpx
+import pytest
+
+# プロジェクトルートをパスに追加
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.enhanced_cli import parse_enhanced_args
+from src.llm_batch import AdaptiveConcurrencyLimiter, run_bounded
+from src.llm_client import ChatMessage, LLMClient, LLMClientError, LLMConfig, LLMResponse
+from src.llm_similarity import LLMSimilarity
+
+
+class TestAdaptiveConcurrencyLimiter:
+    """AdaptiveConcurrencyLimiterのテストクラス"""
+
+    def test_additive_increase(self):
+        """応答時間が安定している間は1往復あたりおよそ1ずつ上限を増やすこと"""
+        limiter = AdaptiveConcurrencyLimiter(initial=4, max_limit=8)
+        for _ in range(4):
+            limiter.record_latency(0.1)
+
+        assert limiter.limit == 4
+        limiter.record_latency(0.1)
+        assert limiter.limit == 5
+
+        for _ in range(100):
+            limiter.record_latency(0.1)
+        assert limiter.limit == 8
+
+    def test_multiplicative_decrease_on_latency(self):
+        limiter = AdaptiveConcurrencyLimiter(initial=16, max_limit=16)
+        limiter.record_latency(0.1)
+        limiter.record_latency(0.5)
+
+        assert limiter.limit == 8
+        assert limiter.decreases == 1
+
+    def test_overload_decreases_once_per_round_trip(self):
+        """同じ混雑による連続した429では1回だけ減らすこと"""
+        limiter = AdaptiveConcurrencyLimiter(initial=16, max_limit=16)
+        limiter.record_latency(10.0)
+        for _ in range(5):
+            limiter.record_overload()
+
+        assert limiter.limit == 8
+        assert limiter.overloads == 5
+        assert limiter.decreases == 1
+
+    def test_lower_bound(self):
+        limiter = AdaptiveConcurrencyLimiter(initial=2, min_limit=1)
+        for _ in range(5):
+            limiter._last_decrease = 0.0
+            limiter.record_overload()
+
+        assert limiter.limit == 1
+
+    @pytest.mark.parametrize("kwargs", [
+        {"min_limit": 0},
+        {"min_limit": 4, "max_limit": 2},
+        {"decrease_factor": 1.0},
+        {"latency_tolerance": 0.5},
+    ])
+    def test_invalid_configuration(self, kwargs):
+        with pytest.raises(ValueError):
+            AdaptiveConcurrencyLimiter(**kwargs)
+
+
+class TestRunBounded:
+    """run_boundedのテストクラス"""
+
+    def test_order_and_bound(self):
+        """同時実行数が上限を超えず、結果が入力順に並ぶこと"""
+        limiter = AdaptiveConcurrencyLimiter(initial=3, max_limit=3)
+        active = 0
+        peak = 0
+
+        async def work(item):
+            nonlocal active, peak
+            active += 1
+            peak = max(peak, active)
+            await asyncio.sleep(random.uniform(0, 0.01))
+            active -= 1
+            if item == 5:
+                raise ValueError("失敗")
+            return item * 10
+
+        results = asyncio.run(run_bounded(list(range(20)), work, limiter))
+
+        assert peak == 3
+        assert results[:5] == [0, 10, 20, 30, 40]
+        assert isinstance(results[5], ValueError)
+        assert results[6:] == [i * 10 for i in range(6, 20)]
+        assert limiter.in_flight == 0
+
+    def test_empty(self):
+        limiter = AdaptiveConcurrencyLimiter()
+        assert asyncio.run(run_bounded([], lambda item: item, limiter)) == []
+
+    def test_on_done_is_called_as_items_complete(self):
+        """要素が終わるたびに完了順でon_doneが呼ばれること"""
+        limiter = AdaptiveConcurrencyLimiter(initial=4, max_limit=4)
+        done = []
+
+        async def work(item):
+            await asyncio.sleep(0.01 * (4 - item))
+            if item == 2:
+                raise ValueError("失敗")
+            return item
+
+        asyncio.run(run_bounded([0, 1, 2, 3], work, limiter, on_done=lambda i, r: done.append((i, r))))
+
+        assert [i for i, _ in done] == [3, 2, 1, 0]
+        assert isinstance(done[1][1], ValueError)
+
+
+class FakeBatchingServer:
+    """同時にcapacity件までは一定時間で応答し、それを超えると応答が遅くなるダミーのLLMクライアント"""
+
+    def __init__(self, capacity: int, limiter: AdaptiveConcurrencyLimiter):
+        self.capacity = capacity
+        self.concurrency_limiter = limiter
+        self.active = 0
+        self.peak = 0
+
+    async def chat_completion(self, messages, **kwargs):
+        self.active += 1
+        self.peak = max(self.peak, self.active)
+        latency = 0.01 * max(1.0, self.active / self.capacity)
+        await asyncio.sleep(latency)
+        self.active -= 1
+        self.concurrency_limiter.record_latency(latency)
+        text = messages[-1].content
+        return LLMResponse(content=f"**スコア**: 0.{len(text) % 10}\n**カテゴリ**: 類似", model="fake")
+
+
+class TestParallelBatchSimilarity:
+    """LLMSimilarity.calculate_batch_similarity（並列処理）のテストクラス"""
+
+    def test_parallel_batch_adapts_to_server_capacity(self):
+        """サーバーの処理能力まで同時リクエスト数を増やし、結果は入力順に返すこと"""
+        limiter = AdaptiveConcurrencyLimiter(initial=2, max_limit=32)
+        server = FakeBatchingServer(capacity=8, limiter=limiter)
+        template = MagicMock()
+        template.render.side_effect = lambda template_data, variables: f"{variables['text1']}|{variables['text2']}"
+        engine = LLMSimilarity(llm_client=server, prompt_template=template)
+        engine.current_template = {"prompts": {"system": "s", "user": "{text1}|{text2}"}}
+        pairs = [(f"a{i}", "b" * (i % 7 + 1)) for i in range(300)]
+
+        results = asyncio.run(engine.calculate_batch_similarity(pairs, sequential=False))
+
+        assert [r.method for r in results] == ["llm"] * len(pairs)
+        assert [r.score for r in results] == [
+            float(f"0.{len(f'{a}|{b}') % 10}") for a, b in pairs
+        ]
+        assert engine.concurrency_limiter is limiter
+        assert server.peak > 2
+        assert server.peak <= 32
+        assert limiter.get_statistics()["increases"] > 0
+
+    def test_llm_config_max_concurrency(self, monkeypatch):
+        monkeypatch.setenv("VLLM_MAX_CONCURRENCY", "48")
+        assert LLMConfig.from_environment().max_concurrency == 48
+        # CLIでは --llm-concurrency 未指定時の既定値になる
+        _, config = parse_enhanced_args(["input.jsonl", "--llm"])
+        assert config.llm_concurrency == 48
+        assert config.to_llm_config()["max_concurrency"] == 48
+        _, config = parse_enhanced_args(["input.jsonl", "--llm", "--llm-concurrency", "4"])
+        assert config.llm_concurrency == 4
+        with pytest.raises(ValueError):
+            LLMConfig(max_concurrency=0)
+
+
+class TestClientFeedback:
+    """LLMClientからリミッターへのフィードバックのテストクラス"""
+
+    def test_latency_and_rate_limit_are_recorded(self):
+        statuses = iter([200, 429])
+
+        def handler(request):
+            status = next(statuses)
+            if status == 429:
+                return httpx.Response(429, json={"error": {"message": "too many requests"}})
+            return httpx.Response(200, json={
+                "choices": [{"message": {"content": "**スコア**: 0.9"}, "finish_reason": "stop"}],
+                "model": "fake", "usage": {"total_tokens": 3}
+            })
+
+        async def scenario():
+            client = LLMClient(LLMConfig(max_concurrency=4))
+            client._client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+            messages = [ChatMessage(role="user", content="x")]
+            await client.chat_completion(messages)
+            with pytest.raises(LLMClientError, match="レート制限"):
+                await client.chat_completion(messages)
+            await client.close()
+            return client.concurrency_limiter
+
+        limiter = asyncio.run(scenario())
+
+        assert limiter.max_limit == 4
+        assert limiter.baseline_latency is not None
+        assert limiter.overloads == 1
+        assert limiter.limit == 2
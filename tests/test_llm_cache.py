@@ -0,0 +1,239 @@
+"""
+LLM応答キャッシュのテスト
+"""
+
+import asyncio
+import sys
+from pathlib import Path
+from unittest.mock import AsyncMock, patch
+
+import httpx
+import pytest
+
+# プロジェクトルートをパスに追加
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src import llm_cache
+from src.enhanced_cli import CLIConfig, EnhancedCLI, create_enhanced_argument_parser
+from src.llm_cache import LLMResponseCache, make_llm_cache_key
+from src.llm_client import ChatMessage, LLMClient, LLMClientError, LLMConfig
+from src.llm_metrics import LLMMetricsCollector
+from src.similarity_strategy import StrategyResult, create_similarity_calculator
+
+
+def api_response(content: str) -> dict:
+    return {
+        "choices": [{"message": {"content": content}, "finish_reason": "stop"}],
+        "model": "fake",
+        "usage": {"total_tokens": 5}
+    }
+
+
+@pytest.fixture
+def cache(tmp_path):
+    cache = LLMResponseCache(str(tmp_path / "llm.sqlite"))
+    yield cache
+    cache.close()
+
+
+class TestMakeLLMCacheKey:
+    """make_llm_cache_keyのテストクラス"""
+
+    def test_key_depends_on_request(self):
+        """モデル名・メッセージ・生成パラメータのいずれが違ってもキーが変わること"""
+        request = {"model": "m", "temperature": 0.2, "max_tokens": 64,
+                   "messages": [{"role": "user", "content": "公共政策"}]}
+        base = make_llm_cache_key(request)
+
+        assert base == make_llm_cache_key(dict(reversed(list(request.items()))))
+        assert base != make_llm_cache_key({**request, "model": "other"})
+        assert base != make_llm_cache_key({**request, "temperature": 0.7})
+        assert base != make_llm_cache_key({**request, "max_tokens": 128})
+        assert base != make_llm_cache_key({**request, "messages": [{"role": "user", "content": "広告"}]})
+
+
+class TestLLMResponseCache:
+    """LLMResponseCacheのテストクラス"""
+
+    def test_persists_across_instances(self, tmp_path):
+        path = str(tmp_path / "llm.sqlite")
+        first = LLMResponseCache(path)
+        first.put("k", api_response("**スコア**: 0.9"))
+        first.close()
+
+        second = LLMResponseCache(path)
+        assert second.get("k") == api_response("**スコア**: 0.9")
+        assert second.get("missing") is None
+        stats = second.get_statistics()
+        second.close()
+
+        assert stats["hits"] == 1
+        assert stats["misses"] == 1
+        assert stats["hit_rate"] == 0.5
+
+    def test_ttl(self, cache, monkeypatch):
+        cache.ttl = 60
+        cache.put("k", api_response("a"))
+        now = llm_cache.time.time()
+        monkeypatch.setattr(llm_cache.time, "time", lambda: now + 61)
+
+        assert cache.get("k") is None
+        assert cache.get_statistics()["expired"] == 1
+        assert len(cache) == 0
+
+    def test_purge_expired(self, cache, monkeypatch):
+        cache.ttl = 60
+        cache.put("a", api_response("a"))
+        cache.put("b", api_response("b"))
+        now = llm_cache.time.time()
+        monkeypatch.setattr(llm_cache.time, "time", lambda: now + 61)
+
+        assert cache.purge_expired() == 2
+        assert len(cache) == 0
+
+    def test_evicts_least_recently_used(self, cache, monkeypatch):
+        clock = iter(range(100))
+        monkeypatch.setattr(llm_cache.time, "time", lambda: float(next(clock)))
+        cache.max_entries = 2
+        cache.put("a", api_response("a"))
+        cache.put("b", api_response("b"))
+        cache.get("a")
+        cache.put("c", api_response("c"))
+
+        assert cache.get("b") is None
+        assert cache.get("a") is not None
+        assert cache.get("c") is not None
+        assert cache.get_statistics()["evictions"] == 1
+
+    def test_count_is_tracked_without_recounting(self, cache):
+        """上書きでは件数が増えず、上限を超えたら上限の1%分も余分に削除すること"""
+        cache.put("k", api_response("a"))
+        cache.put("k", api_response("b"))
+        assert cache.get("k") == api_response("b")
+        assert len(cache) == 1
+
+        cache.max_entries = 200
+        for i in range(200):
+            cache.put(f"k{i}", api_response(str(i)))
+
+        assert len(cache) == 198
+        assert cache.get_statistics()["evictions"] == 3
+        assert cache.get("k") is None
+
+    @pytest.mark.parametrize("kwargs", [{"ttl": 0}, {"max_entries": 0}])
+    def test_invalid_configuration(self, tmp_path, kwargs):
+        with pytest.raises(ValueError):
+            LLMResponseCache(str(tmp_path / "llm.sqlite"), **kwargs)
+
+
+class TestClientCache:
+    """LLMClientの応答キャッシュのテストクラス"""
+
+    def test_repeated_request_is_not_sent(self, cache, tmp_path):
+        """同じリクエストはvLLMに送らず、ヒット率がメトリクスに記録されること"""
+        sent = []
+
+        def handler(request):
+            sent.append(request)
+            return httpx.Response(200, json=api_response(f"**スコア**: 0.{len(sent)}"))
+
+        metrics = LLMMetricsCollector(log_dir=str(tmp_path / "logs"))
+
+        async def scenario():
+            client = LLMClient(LLMConfig(), metrics_collector=metrics, response_cache=cache)
+            client._client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+            messages = [ChatMessage(role="user", content="テキスト1: a\nテキスト2: b")]
+            first = await client.chat_completion(messages)
+            second = await client.chat_completion(messages)
+            other = await client.chat_completion(messages, temperature=0.7)
+            await client.close()
+            return first, second, other
+
+        first, second, other = asyncio.run(scenario())
+
+        assert len(sent) == 2
+        assert second.content == first.content == "**スコア**: 0.1"
+        assert other.content == "**スコア**: 0.2"
+        assert metrics.get_cache_statistics() == {
+            "cache_hits": 1,
+            "cache_misses": 2,
+            "cache_hit_rate": pytest.approx(100 / 3)
+        }
+        assert metrics.get_api_statistics()["total_api_calls"] == 2
+
+    def test_errors_are_not_cached(self, cache):
+        statuses = iter([500, 200])
+
+        def handler(request):
+            status = next(statuses)
+            if status == 500:
+                return httpx.Response(500, json={"error": {"message": "boom"}})
+            return httpx.Response(200, json=api_response("ok"))
+
+        async def scenario():
+            client = LLMClient(LLMConfig(), response_cache=cache)
+            client._client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+            messages = [ChatMessage(role="user", content="x")]
+            with pytest.raises(LLMClientError, match="500"):
+                await client.chat_completion(messages)
+            response = await client.chat_completion(messages)
+            await client.close()
+            return response
+
+        assert asyncio.run(scenario()).content == "ok"
+        assert len(cache) == 1
+
+    def test_metrics_collector_reaches_client(self, tmp_path):
+        """ファクトリーに渡したメトリクス収集インスタンスがLLMクライアントに渡ること"""
+        metrics = LLMMetricsCollector(log_dir=str(tmp_path / "logs"))
+        calculator = asyncio.run(create_similarity_calculator(
+            llm_config={"cache_path": str(tmp_path / "llm.sqlite")}, metrics_collector=metrics
+        ))
+
+        assert calculator.llm_strategy.llm_similarity.llm_client.metrics_collector is metrics
+        assert calculator.response_cache is not None
+
+    def test_cache_disabled_by_default(self):
+        assert LLMClient(LLMConfig()).response_cache is None
+
+
+class TestCLIOption:
+    """--no-llm-cacheオプションのテストクラス"""
+
+    def test_no_llm_cache(self, monkeypatch, tmp_path):
+        monkeypatch.setenv("LLM_CACHE_PATH", str(tmp_path / "llm.sqlite"))
+        parser = create_enhanced_argument_parser()
+
+        assert parser.parse_args(["data.jsonl"]).llm_cache is True
+        assert parser.parse_args(["data.jsonl", "--no-llm-cache"]).llm_cache is False
+        assert CLIConfig(llm_enabled=True).to_llm_config()["cache_path"] == str(tmp_path / "llm.sqlite")
+        assert CLIConfig(llm_enabled=True, llm_cache=False).to_llm_config()["cache_path"] is None
+
+    def test_hit_rate_in_cli_output(self, cache, tmp_path):
+        """CLIの出力メタデータにこの実行でのキャッシュのヒット/ミスが含まれること"""
+        cache.put("seen", api_response("ok"))
+        cache.get("seen")
+
+        class CachingCalculator:
+            response_cache = cache
+
+            async def calculate_batch_similarity(self, json_pairs, **kwargs):
+                return [
+                    StrategyResult(score=1.0 if cache.get(json1) else 0.0, method="llm")
+                    for json1, json2 in json_pairs
+                ]
+
+        input_file = tmp_path / "input.jsonl"
+        input_file.write_text(
+            "".join(f'{{"inference1": "{key}", "inference2": "x"}}\n' for key in ["seen", "new", "seen", "new"]),
+            encoding="utf-8"
+        )
+        config = CLIConfig(calculation_method="llm", checkpoint_file=str(tmp_path / "cp.jsonl"))
+
+        async def scenario():
+            with patch("src.enhanced_cli.create_similarity_calculator_from_args", AsyncMock(return_value=CachingCalculator())):
+                return await EnhancedCLI().process_single_file(str(input_file), config, "score")
+
+        result = asyncio.run(scenario())
+
+        assert result["metadata"]["llm_cache"] == {"hits": 2, "misses": 2, "hit_rate": 0.5}
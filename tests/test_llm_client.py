@@ -8,12 +8,14 @@ import httpx
 import os
 
 # これから実装するモジュールをインポート
+from src import llm_client
 from src.llm_client import (
     LLMClient,
     LLMClientError,
     LLMResponse,
     ChatMessage,
-    LLMConfig
+    LLMConfig,
+    RequestHedger
 )
 
 
@@ -406,4 +408,102 @@ class TestLLMClient:
             assert call_count == 3
             assert len(backoff_delays) >= 2  # 少なくとも2回のバックオフ
             # Retry-Afterヘッダーの値（2秒）が使用されることを確認
-            assert 2.0 in backoff_delays
\ No newline at end of file
+            assert 2.0 in backoff_delays
+
+
+def ok_response(content: str) -> httpx.Response:
+    return httpx.Response(200, json={
+        "choices": [{"message": {"content": content}, "finish_reason": "stop"}],
+        "usage": {"total_tokens": 5}
+    })
+
+
+class TestSlowRequestsAndHedging:
+    """遅いリクエストの扱い（重複送信の防止とヘッジ）のテストクラス"""
+
+    @pytest.fixture
+    def make_client(self):
+        def make(handler, **config):
+            client = LLMClient(LLMConfig(**config))
+            client._client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+            return client
+        return make
+
+    @pytest.mark.asyncio
+    async def test_slow_request_is_sent_once(self, make_client, monkeypatch):
+        """進捗表示の閾値を超えても同じリクエストを送り直さないこと"""
+        monkeypatch.setattr(llm_client, "PROGRESS_NOTICE_DELAY", 0.05)
+        calls = []
+
+        async def handler(request):
+            calls.append(request)
+            await asyncio.sleep(0.3)
+            return ok_response("遅いレスポンス")
+
+        client = make_client(handler)
+        with patch('src.llm_client.tqdm') as mock_tqdm:
+            response = await client.chat_completion([ChatMessage(role="user", content="遅いテスト")])
+
+        assert response.content == "遅いレスポンス"
+        assert len(calls) == 1
+        mock_tqdm.assert_called_once()
+        mock_tqdm.return_value.close.assert_called_once()
+        await client.close()
+
+    @pytest.mark.asyncio
+    async def test_hedge_wins_and_loser_is_cancelled(self, make_client):
+        """p95を超えたリクエストにヘッジを送り、先に返った方を使って遅い方をキャンセルすること"""
+        calls = []
+        cancelled = []
+
+        async def handler(request):
+            calls.append(request)
+            try:
+                await asyncio.sleep(2.0 if len(calls) == 1 else 0.01)
+            except asyncio.CancelledError:
+                cancelled.append(len(calls))
+                raise
+            return ok_response(f"応答{len(calls)}")
+
+        client = make_client(handler, hedge_ratio=1.0)
+        for _ in range(llm_client.HEDGE_MIN_SAMPLES):
+            client.hedger.record_request()
+            client.hedger.record_latency(0.05)
+
+        response = await client.chat_completion([ChatMessage(role="user", content="ヘッジ")])
+        await asyncio.sleep(0)
+
+        assert response.content == "応答2"
+        assert len(calls) == 2
+        assert cancelled
+        stats = client.hedger.get_statistics()
+        assert stats["hedges"] == 1
+        assert stats["hedge_wins"] == 1
+        await client.close()
+
+    def test_hedge_budget(self):
+        """ヘッジの数をリクエスト数の割合までに抑えること"""
+        hedger = RequestHedger(ratio=0.05)
+        for _ in range(llm_client.HEDGE_MIN_SAMPLES):
+            hedger.record_request()
+            hedger.record_latency(0.1)
+
+        assert hedger.hedge_delay() == pytest.approx(0.1)
+        assert hedger.try_acquire() is True
+        assert hedger.try_acquire() is False
+        for _ in range(20):
+            hedger.record_request()
+        assert hedger.try_acquire() is True
+
+    def test_hedging_disabled_by_default(self):
+        hedger = LLMClient().hedger
+        for _ in range(100):
+            hedger.record_latency(0.1)
+
+        assert hedger.hedge_delay() is None
+
+    def test_hedge_ratio_validation(self, monkeypatch):
+        monkeypatch.setenv("VLLM_HEDGE_RATIO", "0.05")
+        assert LLMConfig.from_environment().hedge_ratio == 0.05
+        with pytest.raises(ValueError):
+            LLMConfig(hedge_ratio=1.5)
@@ -247,4 +247,75 @@ class TestLLMSimilarity:
         assert stats["total_requests"] == 10
         assert stats["success_rate"] == 0.8
         assert stats["average_processing_time"] == 1.5
-        assert "qwen3-14b-awq" in stats["model_usage"]
\ No newline at end of file
+        assert "qwen3-14b-awq" in stats["model_usage"]
+
+
+class FakePackingClient:
+    """まとめて評価するプロンプトにはomitのテキストを含むペアを除いて回答するダミーのLLMクライアント"""
+
+    def __init__(self, omit=(), fail_packed=False):
+        self.omit = set(omit)
+        self.fail_packed = fail_packed
+        self.max_tokens = []
+
+    async def chat_completion(self, messages, **kwargs):
+        import re
+        from src.llm_client import LLMClientError
+
+        self.max_tokens.append(kwargs.get("max_tokens"))
+        pairs = re.findall(r"### ペア(\d+)\nテキスト1:\n(.+?)\n", messages[-1].content)
+        if not pairs:
+            return LLMResponse(content="**スコア**: 0.5\n**カテゴリ**: やや類似", model="fake", total_tokens=10)
+        if self.fail_packed:
+            raise LLMClientError("context length exceeded")
+        blocks = [
+            f"**ペア**: {number}\n**スコア**: 0.{text[-1]}\n**カテゴリ**: 類似\n**理由**: 理由{number}"
+            for number, text in pairs if text not in self.omit
+        ]
+        return LLMResponse(content="\n\n".join(blocks), model="fake", total_tokens=40)
+
+
+class TestPackedSimilarity:
+    """複数ペアをまとめて評価する処理のテストクラス"""
+
+    def make_engine(self, client):
+        engine = LLMSimilarity(llm_client=client, prompt_template=PromptTemplate())
+        engine.current_template = engine._get_builtin_template()
+        return engine
+
+    @pytest.mark.asyncio
+    async def test_packed_batch_reissues_unparsed_pairs(self):
+        """解析できなかったペアだけを1件ずつ評価し直し、結果は入力順に返すこと"""
+        client = FakePackingClient(omit={"a3"})
+        engine = self.make_engine(client)
+        pairs = [(f"a{i}", f"b{i}") for i in range(1, 8)]
+
+        results = await engine.calculate_batch_similarity(pairs, sequential=False, pack_size=4)
+
+        assert [r.score for r in results] == [0.1, 0.2, 0.5, 0.4, 0.5, 0.6, 0.7]
+        assert [r.pack_size for r in results] == [4, 4, 1, 4, 3, 3, 3]
+        assert results[1].reason == "理由2"
+        assert results[0].tokens_used == 10
+        # 最大トークン数は1ペアあたりの値のペア数倍
+        assert sorted(client.max_tokens) == [64, 64 * 3, 64 * 4]
+
+    @pytest.mark.asyncio
+    async def test_packed_failure_falls_back_to_single_requests(self):
+        client = FakePackingClient(fail_packed=True)
+        engine = self.make_engine(client)
+
+        results = await engine.calculate_batch_similarity([("a1", "b1"), ("a2", "b2")], pack_size=2)
+
+        assert [r.score for r in results] == [0.5, 0.5]
+        assert [r.pack_size for r in results] == [1, 1]
+        assert engine.get_statistics()["failed_requests"] == 1
+
+    @pytest.mark.asyncio
+    async def test_invalid_pair_is_reported_individually(self):
+        engine = self.make_engine(FakePackingClient())
+
+        results = await engine.calculate_batch_similarity([("a1", "b1"), ("", "b2"), ("a3", "b3")], pack_size=3)
+
+        assert [r.method for r in results] == ["llm", "error", "llm"]
+        assert [r.score for r in results] == [0.1, 0.0, 0.3]
+        assert results[0].pack_size == 2
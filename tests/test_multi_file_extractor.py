@@ -0,0 +1,118 @@
+"""
+MultiFileExtractorのテスト
+
+埋め込みモデルは決定的なダミー実装に差し替え、対応付けと集計の挙動だけを検証する。
+"""
+
+import json
+import sys
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+# プロジェクトルートをパスに追加
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src import similarity
+from src.dual_file_extractor import DualFileExtractor
+from src.multi_file_extractor import MultiFileExtractor
+
+
+class CountingEmbedding:
+    """埋め込んだテキストを記録する決定的なダミー埋め込みモデル"""
+
+    def __init__(self):
+        self.encoded = []
+
+    def encode_batch(self, texts, batch_size: int = 32) -> np.ndarray:
+        self.encoded.extend(texts)
+        vectors = np.zeros((len(texts), 16), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for pos, char in enumerate(text):
+                vectors[row, (ord(char) * 7 + pos) % 16] += 1.0
+        return vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-6)
+
+
+@pytest.fixture
+def model(monkeypatch):
+    fake = CountingEmbedding()
+    monkeypatch.setattr(similarity, "_embedding_model", fake)
+    return fake
+
+
+def write_jsonl(path, rows):
+    path.write_text("".join(json.dumps(row, ensure_ascii=False) + "\n" for row in rows), encoding="utf-8")
+    return str(path)
+
+
+@pytest.fixture
+def files(tmp_path):
+    """参照ファイルと3つの候補ファイル"""
+    reference = write_jsonl(tmp_path / "gold.jsonl", [
+        {"inference": {"category": f"カテゴリ{i % 4}", "reason": f"理由{i}"}} for i in range(40)
+    ])
+    candidates = [
+        write_jsonl(tmp_path / f"infer.{m}.jsonl", [
+            {"inference": {"category": f"カテゴリ{(i + m) % 4}", "reason": f"理由{i % (m + 2)}"}} for i in range(40)
+        ])
+        for m in range(3)
+    ]
+    return reference, candidates
+
+
+class TestCompareMultiFiles:
+    """compare_multi_filesのテストクラス"""
+
+    def test_scores_match_dual_comparison(self, model, files):
+        """候補ごとのスコアが参照ファイルとの2ファイル比較と同じであること"""
+        reference, candidates = files
+
+        result = MultiFileExtractor().compare_multi_files(reference, candidates)
+
+        assert result["reference_lines"] == 40
+        assert [entry["file"] for entry in result["candidates"]] == candidates
+        for entry, candidate in zip(result["candidates"], candidates):
+            dual = DualFileExtractor().compare_dual_files(reference, candidate)
+            assert entry["score"] == dual["score"]
+            assert entry["json"] == dual["json"]
+            assert entry["total_lines"] == 40
+
+    def test_reference_strings_embedded_once(self, model, files):
+        """参照側の文字列を候補の数だけ重複して埋め込まないこと"""
+        reference, candidates = files
+
+        MultiFileExtractor().compare_multi_files(reference, candidates)
+
+        assert len(model.encoded) == len(set(model.encoded))
+
+    def test_shorter_candidate(self, model, files, tmp_path, capsys):
+        """参照ファイルより短い候補は存在する行だけで集計し、警告すること"""
+        reference, candidates = files
+        short = write_jsonl(tmp_path / "short.jsonl", [{"inference": {"category": "カテゴリ0"}}] * 10)
+
+        result = MultiFileExtractor().compare_multi_files(reference, [candidates[0], short])
+
+        assert result["candidates"][0]["total_lines"] == 40
+        assert result["candidates"][1]["total_lines"] == 10
+        assert "候補ファイル2の行数が参照ファイルと異なります（40行 vs 10行）" in capsys.readouterr().err
+
+    def test_file_type_rows(self, model, files):
+        """fileタイプは参照ファイルの行ごとに全候補の結果を返すこと"""
+        reference, candidates = files
+        received = []
+
+        returned = MultiFileExtractor().compare_multi_files(reference, candidates, output_type="file",
+                                                           on_result=received.append)
+
+        assert returned == []
+        assert len(received) == 40
+        assert received[0]["line"] == 1
+        assert [entry["file"] for entry in received[0]["candidates"]] == candidates
+        assert all("similarity_score" in entry for entry in received[0]["candidates"])
+
+    def test_missing_candidate(self, model, files):
+        """存在しない候補ファイルはFileNotFoundError"""
+        reference, _ = files
+        with pytest.raises(FileNotFoundError, match="候補ファイル1が見つかりません"):
+            MultiFileExtractor().compare_multi_files(reference, ["missing.jsonl"])
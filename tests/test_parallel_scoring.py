@@ -0,0 +1,324 @@
+"""
+parallel_scoringモジュールのテスト
+
+埋め込みモデルは決定的なダミー実装に差し替え、プロセスプールは同一プロセス内で
+順に実行する代替実装に差し替えて、分割と結合の挙動だけを検証する。
+"""
+
+import json
+import sys
+from pathlib import Path
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+# プロジェクトルートをパスに追加
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src import parallel_scoring, similarity
+from src.__main__ import process_jsonl_file
+from src.parallel_scoring import (
+    RunningScores,
+    ScoringCancelled,
+    iter_scored_records,
+    iter_scored_records_parallel,
+    plan_byte_shards,
+    summarize_scored_rows
+)
+
+
+class FakeEmbedding:
+    """文字ごとのハッシュから決定的なベクトルを作るダミー埋め込みモデル"""
+
+    def encode_batch(self, texts, batch_size: int = 32) -> np.ndarray:
+        vectors = np.zeros((len(texts), 16), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for pos, char in enumerate(text):
+                vectors[row, (ord(char) * 7 + pos) % 16] += 1.0
+        return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+class InProcessPool:
+    """プロセスを起動せずに同一プロセスで順に実行するプールの代替"""
+
+    def __init__(self, processes=None, initializer=None, initargs=()):
+        self.initargs = initargs
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def imap(self, func, tasks):
+        return (func(task) for task in tasks)
+
+    def apply_async(self, func, args):
+        result = func(*args)
+        return SimpleNamespace(get=lambda: result)
+
+
+class InProcessContext:
+    def Pool(self, **kwargs):
+        return InProcessPool(**kwargs)
+
+
+@pytest.fixture
+def fake_model(monkeypatch):
+    """埋め込みモデルとプロセスプールを差し替え"""
+    monkeypatch.setattr(similarity, "_embedding_model", FakeEmbedding())
+    monkeypatch.setattr(parallel_scoring.multiprocessing, "get_context", lambda method: InProcessContext())
+
+
+@pytest.fixture
+def jsonl_file(tmp_path):
+    """採点用のJSONLファイル（空行と不正な行を含む）"""
+    lines = []
+    for i in range(150):
+        if i == 40:
+            lines.append("")
+        elif i == 77:
+            lines.append("not json")
+        else:
+            lines.append(json.dumps({
+                "id": i,
+                "inference1": json.dumps({"name": f"商品{i}", "tags": ["a", f"t{i % 7}"], "price": i}),
+                "inference2": json.dumps({"name": f"商品{i % 13}", "tags": [f"t{i % 5}", "a"], "price": i % 9})
+            }, ensure_ascii=False))
+    path = tmp_path / "input.jsonl"
+    path.write_text("\n".join(lines) + "\n", encoding="utf-8")
+    return path
+
+
+class TestPlanByteShards:
+    """plan_byte_shardsのテストクラス"""
+
+    def test_shards_cover_file_on_line_boundaries(self, jsonl_file):
+        """シャードがファイル全体を隙間なく覆い、各境界が行頭であること"""
+        data = jsonl_file.read_bytes()
+        shards = plan_byte_shards(str(jsonl_file), 7)
+
+        assert shards[0][0] == 0
+        assert shards[-1][1] == len(data)
+        for (_, end), (start, _) in zip(shards, shards[1:]):
+            assert end == start
+            assert data[start - 1:start] == b"\n"
+
+    def test_more_shards_than_lines(self, tmp_path):
+        """行数より多く分割しようとしても空のシャードを作らないこと"""
+        path = tmp_path / "small.jsonl"
+        path.write_text('{"a": 1}\n{"b": 2}\n', encoding="utf-8")
+
+        shards = plan_byte_shards(str(path), 50)
+
+        assert len(shards) == 2
+        assert all(start < end for start, end in shards)
+
+    def test_empty_file(self, tmp_path):
+        """空ファイルはシャードなし"""
+        path = tmp_path / "empty.jsonl"
+        path.write_text("", encoding="utf-8")
+        assert plan_byte_shards(str(path), 4) == []
+
+
+class TestParallelScoring:
+    """マルチプロセス採点のテストクラス"""
+
+    def test_score_type_identical(self, fake_model, jsonl_file):
+        """scoreタイプの集計値が1プロセス時と同一であること"""
+        single = process_jsonl_file(str(jsonl_file), "score")
+        parallel = process_jsonl_file(str(jsonl_file), "score", workers=3)
+
+        assert parallel == single
+        # 空行は数えず、読めない行は採点できなかった行として数える
+        assert single["total_lines"] == 149
+
+    def test_file_type_keeps_line_order(self, fake_model, jsonl_file):
+        """fileタイプの結果が元の行順で1プロセス時と同一であること"""
+        single = process_jsonl_file(str(jsonl_file), "file")
+        parallel = process_jsonl_file(str(jsonl_file), "file", workers=4)
+
+        assert parallel == single
+        assert [row["id"] for row in parallel] == [i for i in range(150) if i not in (40, 77)]
+
+    def test_fixed_temp_file_is_removed(self, fake_model, jsonl_file, monkeypatch):
+        """フォーマット修正で作った一時ファイルを採点後に削除し、元のファイルは残すこと"""
+        import src.__main__ as main_module
+
+        original = main_module.auto_fix_jsonl_file
+        fixed_paths = []
+
+        def auto_fix(file_path, **kwargs):
+            fixed_paths.append(original(file_path, **kwargs))
+            return fixed_paths[-1]
+
+        monkeypatch.setattr(main_module, "auto_fix_jsonl_file", auto_fix)
+
+        process_jsonl_file(str(jsonl_file), "score", workers=3)
+
+        assert fixed_paths and fixed_paths[0] != str(jsonl_file)
+        assert not Path(fixed_paths[0]).exists()
+        assert jsonl_file.exists()
+
+    @pytest.mark.parametrize("workers", [1, 2])
+    def test_malformed_line_counted_in_total_lines(self, fake_model, tmp_path, capsys, workers):
+        """読めない行を警告したうえでtotal_linesに数え、平均には含めないこと"""
+        pair = json.dumps({"inference1": '{"a": 1}', "inference2": '{"a": 1}'})
+        path = tmp_path / "broken.jsonl"
+        path.write_text(f"{pair}\n{{broken\n\n{pair}\n", encoding="utf-8")
+
+        result = process_jsonl_file(str(path), "score", workers=workers)
+
+        assert result["total_lines"] == 3
+        assert result["score"] == pytest.approx(1.0)
+        assert "2行目のJSONパースエラー" in capsys.readouterr().err
+
+    def test_should_stop_cancels_between_chunks(self, fake_model, jsonl_file):
+        """should_stopがTrueになったら残りのチャンクを採点せずに中止すること"""
+        scored = []
+        rows = iter_scored_records(
+            ((i, json.loads(line)) for i, line in enumerate(jsonl_file.read_text(encoding="utf-8").splitlines(), 1)
+             if line.startswith("{")),
+            "score", lambda n, m: None, scored.append
+        )
+
+        with pytest.raises(ScoringCancelled):
+            summarize_scored_rows(rows, "score", "input.jsonl", should_stop=lambda: len(scored) > 0)
+
+        assert scored == [parallel_scoring.SCORING_CHUNK_SIZE]
+
+    def test_warnings_use_file_line_numbers(self, fake_model, jsonl_file):
+        """警告の行番号がファイル全体での行番号であること"""
+        warnings = []
+        rows = list(parallel_scoring.iter_scored_file_parallel(
+            str(jsonl_file), "score", 5, lambda n, m: warnings.append((n, m))
+        ))
+
+        # 読めない行は採点できなかった行（None）として返る
+        assert len(rows) == 149
+        assert rows.count(None) == 1
+        assert len(warnings) == 1
+        assert warnings[0][0] == 78
+        assert warnings[0][1].startswith("JSONパースエラー")
+
+    def test_single_process_warns_unparseable_lines(self, fake_model, jsonl_file, capsys):
+        """1プロセス時は読めない行をファイル上の行番号で警告すること"""
+        process_jsonl_file(str(jsonl_file), "score")
+
+        assert "警告: 78行目のJSONパースエラー" in capsys.readouterr().err
+
+    def test_invalid_workers(self, jsonl_file):
+        """workersが0以下ならValueError"""
+        with pytest.raises(ValueError):
+            process_jsonl_file(str(jsonl_file), "score", workers=0)
+
+
+class TestIterScoredRecords:
+    """iter_scored_recordsのテストクラス"""
+
+    def test_rows_and_progress(self, fake_model):
+        """レコードごとに1件ずつ結果を返し、進捗を全レコード分通知すること"""
+        progress = []
+        warnings = []
+        records = [
+            (1, {"inference1": '{"a": 1}', "inference2": '{"a": 1}'}),
+            (3, ["not", "an", "object"]),
+            (4, {"inference1": '{"a": 1}', "inference2": '{"a": 2}'}),
+        ]
+
+        rows = list(iter_scored_records(records, "score", lambda n, m: warnings.append(n), progress.append))
+
+        assert len(rows) == 3
+        assert rows[0][0] == 1.0
+        assert rows[1] is None
+        assert rows[2][0] == pytest.approx(0.1)
+        assert sum(progress) == 3
+        assert warnings == [3]
+
+    def test_lazy_chunks(self, fake_model):
+        """入力を読み切る前に最初のチャンクの結果を返すこと"""
+        pulled = []
+
+        def records():
+            for i in range(parallel_scoring.SCORING_CHUNK_SIZE * 3):
+                pulled.append(i)
+                yield i, {"inference1": '{"a": 1}', "inference2": '{"a": 1}'}
+
+        first = next(iter_scored_records(records(), "score", lambda n, m: None))
+
+        assert first[0] == 1.0
+        assert len(pulled) == parallel_scoring.SCORING_CHUNK_SIZE
+
+
+class TestIterScoredRecordsParallel:
+    """iter_scored_records_parallelのテストクラス"""
+
+    def test_matches_single_process(self, fake_model, monkeypatch):
+        """結果が元の順序で1プロセス時と同一であること"""
+        monkeypatch.setattr(parallel_scoring, "CHUNKS_PER_TASK", 1)
+        records = [
+            (i, {"inference1": json.dumps({"v": i}), "inference2": json.dumps({"v": i % 4})})
+            for i in range(1, 300)
+        ]
+
+        single = list(iter_scored_records(records, "file", lambda n, m: None))
+        parallel = list(iter_scored_records_parallel(records, "file", 2, lambda n, m: None))
+
+        assert parallel == single
+
+    def test_bounded_read_ahead(self, fake_model, monkeypatch):
+        """投入済みで未回収のレコード数に上限があること"""
+        monkeypatch.setattr(parallel_scoring, "CHUNKS_PER_TASK", 1)
+        pulled = []
+
+        def records():
+            for i in range(parallel_scoring.SCORING_CHUNK_SIZE * 20):
+                pulled.append(i)
+                yield i, {"inference1": '{"a": 1}', "inference2": '{"a": 1}'}
+
+        rows = iter_scored_records_parallel(records(), "score", 2, lambda n, m: None)
+        next(rows)
+
+        limit = parallel_scoring.SCORING_CHUNK_SIZE * 2 * parallel_scoring.TASKS_IN_FLIGHT_PER_WORKER
+        assert len(pulled) <= limit
+
+
+class TestRunningScores:
+    """RunningScoresのテストクラス"""
+
+    def test_matches_list_average(self):
+        """リストを合計して割った平均と同じ値になること"""
+        rows = [(0.1 * i, 0.3, 1.0 / (i + 1), None) for i in range(1, 50)]
+        totals = RunningScores()
+        for row in rows + [None]:
+            totals.add(row)
+
+        scores = [row[0] for row in rows]
+        values = [row[2] for row in rows]
+        assert totals.total_lines == 50
+        assert totals.averages()[0] == sum(scores) / len(scores)
+        assert totals.averages()[2] == sum(values) / len(values)
+
+
+class TestStreamingOutput:
+    """NDJSON出力のテストクラス"""
+
+    def test_on_result_streams_file_rows(self, fake_model, jsonl_file):
+        """on_result指定時は各行を即座に渡し、リストを返さないこと"""
+        received = []
+        returned = process_jsonl_file(str(jsonl_file), "file", on_result=received.append)
+
+        assert returned == []
+        assert received == process_jsonl_file(str(jsonl_file), "file")
+
+    def test_ndjson_writer(self, tmp_path):
+        """1行1件で書き出すこと"""
+        from src.__main__ import open_ndjson_writer
+
+        output = tmp_path / "out.ndjson"
+        with open_ndjson_writer(str(output)) as write:
+            write({"a": "日本語"})
+            write({"b": 2})
+
+        assert output.read_text(encoding="utf-8") == '{"a": "日本語"}\n{"b": 2}\n'
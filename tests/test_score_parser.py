@@ -231,4 +231,36 @@ class TestScoreParser:
         assert stats["total_parsed"] == 3
         assert stats["successful_parsed"] == 2
         assert stats["failed_parsed"] == 1
-        assert stats["success_rate"] == 2/3
\ No newline at end of file
+        assert stats["success_rate"] == 2/3
+
+    def test_parse_packed_response(self, score_parser):
+        """まとめて評価したレスポンスをペアごとに解析できること"""
+        response = """**ペア**: 1
+**スコア**: 0.9
+**カテゴリ**: 非常に類似
+**理由**: 同じ内容です。
+
+**ペア**: ２
+**スコア**: ０．３
+**理由**: 関連性が低い。
+
+**ペア**: 3
+**カテゴリ**: 類似"""
+
+        results = score_parser.parse_packed_response(response, 4)
+
+        assert [r.score if r else None for r in results] == [0.9, 0.3, None, None]
+        assert results[0].category == "非常に類似"
+        assert results[0].reason == "同じ内容です。"
+        assert results[1].category == "低い類似度"
+        assert "ペア" not in results[0].raw_response
+        assert score_parser.get_parsing_statistics()["failed_parsed"] == 2
+
+    def test_parse_packed_response_duplicate_pair(self, score_parser):
+        """同じペア番号が重複した場合はそのペアを解析しないこと"""
+        response = "**ペア**: 1\n**スコア**: 0.9\n**ペア**: 1\n**スコア**: 0.1\n**ペア**: 2\n**スコア**: 0.5"
+
+        results = score_parser.parse_packed_response(response, 2)
+
+        assert results[0] is None
+        assert results[1].score == 0.5
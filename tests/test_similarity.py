@@ -0,0 +1,277 @@
+"""
+similarityモジュールのテスト
+
+埋め込みモデルは決定的なダミー実装に差し替え、採点ロジックだけを検証する。
+"""
+
+import sys
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+# プロジェクトルートをパスに追加
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src import similarity
+from src.similarity import (
+    calculate_json_similarity,
+    calculate_json_similarity_batch,
+    collect_embedding_texts,
+    compare_lists,
+    compare_values,
+    list_similarity_matrix,
+    match_similarity_matrix,
+    set_list_matching,
+)
+
+
+class FakeEmbedding:
+    """文字ごとのハッシュから決定的なベクトルを作るダミー埋め込みモデル"""
+
+    def __init__(self, dim: int = 16):
+        self.dim = dim
+        self.encoded_batches = []
+        self.pair_calls = 0
+
+    def _vector(self, text: str) -> np.ndarray:
+        vec = np.zeros(self.dim, dtype=np.float32)
+        for pos, char in enumerate(text):
+            vec[(ord(char) * 7 + pos) % self.dim] += 1.0
+        return vec / np.linalg.norm(vec)
+
+    def encode_batch(self, texts, batch_size: int = 32) -> np.ndarray:
+        self.encoded_batches.append(list(texts))
+        if not texts:
+            return np.zeros((0, self.dim), dtype=np.float32)
+        return np.vstack([self._vector(t) for t in texts]).astype(np.float32)
+
+    def calculate_similarity(self, text1: str, text2: str) -> float:
+        self.pair_calls += 1
+        if not text1 or not text2:
+            return 1.0 if text1 == text2 else 0.0
+        vectors = self.encode_batch([text1, text2])
+        return max(0.0, min(1.0, float(np.dot(vectors[0], vectors[1]))))
+
+
+@pytest.fixture
+def fake_model(monkeypatch):
+    """埋め込みモデルのシングルトンをダミーに差し替え"""
+    model = FakeEmbedding()
+    monkeypatch.setattr(similarity, "_embedding_model", model)
+    return model
+
+
+PAIRS = [
+    ('{"category": "公共政策", "tags": ["広告", "経済"]}', '{"category": "公共政策", "tags": ["経済", "広告費"]}'),
+    ('{"name": "山田", "age": 30}', '{"name": "山田太郎", "age": "31"}'),
+    ('{"items": [{"a": "りんご"}, {"a": "みかん"}]}', '{"items": [{"a": "りんご"}, {"a": "ぶどう"}]}'),
+    ('ただのテキスト', 'ただのテキストです'),
+    ('{"x": null}', '{"x": ""}'),
+    ('', '{"a": 1}'),
+]
+
+
+class TestTwoPhaseScoring:
+    """2段階採点のテストクラス"""
+
+    def test_batch_matches_per_pair_scoring(self, fake_model):
+        """バッチ採点の結果が従来の逐次採点と一致すること"""
+        batch_results = calculate_json_similarity_batch(PAIRS)
+
+        for (json1, json2), (score, details) in zip(PAIRS, batch_results):
+            dict1 = similarity.repair_and_parse_json(json1)
+            dict2 = similarity.repair_and_parse_json(json2)
+            if dict1 is None or dict2 is None:
+                assert score == 0.0
+                continue
+            expected_a = similarity.calculate_field_match_ratio(dict1, dict2)
+            expected_b = similarity.calculate_field_similarity(dict1, dict2)
+            assert details["field_match_ratio"] == expected_a
+            assert details["value_similarity"] == pytest.approx(expected_b, abs=1e-6)
+            assert score == pytest.approx(expected_a * expected_b, abs=1e-6)
+
+    def test_single_embedding_call_per_batch(self, fake_model):
+        """バッチ全体で埋め込みは1回だけ、ペア単位の呼び出しは発生しないこと"""
+        calculate_json_similarity_batch(PAIRS)
+
+        assert len(fake_model.encoded_batches) == 1
+        assert fake_model.pair_calls == 0
+        # 重複なく収集されていること
+        batch = fake_model.encoded_batches[0]
+        assert len(batch) == len(set(batch))
+
+    def test_calculate_json_similarity_uses_planner(self, fake_model):
+        """単一ペアAPIも同じ経路で計算されること"""
+        score, details = calculate_json_similarity(*PAIRS[0])
+        batch_score, batch_details = calculate_json_similarity_batch([PAIRS[0]])[0]
+
+        assert score == batch_score
+        assert details == batch_details
+
+    def test_numeric_only_does_not_load_model(self, monkeypatch):
+        """埋め込みが不要な入力ではモデルをロードしないこと"""
+        monkeypatch.setattr(similarity, "_embedding_model", None)
+
+        def fail():
+            raise AssertionError("モデルがロードされた")
+
+        monkeypatch.setattr(similarity, "get_embedding_model", fail)
+        score, _ = calculate_json_similarity('{"a": 1, "b": [1, 2]}', '{"a": 2, "b": [1, 2]}')
+        assert score == pytest.approx(0.55)
+
+
+class TestCollectEmbeddingTexts:
+    """collect_embedding_textsのテストクラス"""
+
+    def test_skips_exact_null_and_numeric(self):
+        """完全一致・null・数値・空文字列は収集しないこと"""
+        texts = set()
+        collect_embedding_texts(
+            {"a": "同じ", "b": None, "c": 1, "d": "", "e": "x"},
+            {"a": "同じ", "b": "値", "c": "2", "d": "y", "e": "z"},
+            texts
+        )
+        assert texts == {"x", "z"}
+
+    def test_lists_collect_residual_cross_product(self):
+        """リストは完全一致を除いた残りの全組み合わせを収集すること"""
+        texts = set()
+        collect_embedding_texts(["共通", "a", "b"], ["共通", "c"], texts)
+        assert texts == {"a", "b", "c"}
+
+
+class TestCompareLists:
+    """compare_listsのテストクラス"""
+
+    def test_exact_matches(self):
+        """完全一致のみのリスト"""
+        assert compare_lists([1, 2, 3], [3, 2, 1]) == 1.0
+
+    def test_empty_lists(self):
+        """空リストの扱い"""
+        assert compare_lists([], []) == 1.0
+        assert compare_lists([], [1]) == 0.0
+
+    def test_unmatched_normalization(self):
+        """未マッチ要素がある場合は未マッチ数+1で割ること"""
+        # 1と1が完全一致、2と3は数値不一致で0.1、4は未マッチ
+        assert compare_lists([1, 2, 4], [1, 3]) == pytest.approx((1.0 + 0.1) / 2)
+
+    def test_uses_vector_table(self, fake_model):
+        """ベクトル表があればペア単位の埋め込みを呼ばないこと"""
+        vectors = similarity.embed_texts(["りんご", "みかん"])
+        fake_model.pair_calls = 0
+
+        compare_values(["りんご"], ["みかん"], vectors)
+        assert fake_model.pair_calls == 0
+
+
+def _reference_greedy(list1, list2, vectors=None):
+    """従来実装（残り全ペアを毎回再計算する貪欲法）"""
+    remaining1, remaining2 = similarity._remove_exact_matches(list1, list2)
+    similarity_sum = float(len(list1) - len(remaining1))
+    while remaining1 and remaining2:
+        best, best_i, best_j = 0.0, 0, 0
+        for i in range(len(remaining1)):
+            for j in range(len(remaining2)):
+                sim = compare_values(remaining1[i], remaining2[j], vectors)
+                if sim > best:
+                    best, best_i, best_j = sim, i, j
+        similarity_sum += best
+        remaining1.pop(best_i)
+        remaining2.pop(best_j)
+    unmatched = len(remaining1) + len(remaining2)
+    if unmatched > 0:
+        return similarity_sum / (unmatched + 1)
+    return similarity_sum / max(len(list1), len(list2))
+
+
+class TestListMatching:
+    """類似度行列によるリストマッチングのテストクラス"""
+
+    @pytest.fixture(autouse=True)
+    def reset_matching(self):
+        yield
+        set_list_matching("greedy")
+
+    def test_greedy_matches_reference(self, fake_model):
+        """貪欲法の結果が従来実装と一致すること"""
+        list1 = ["りんご", "みかん", 3, None, {"a": "x"}, ["b"], "共通", "ぶどう"]
+        list2 = ["りんごジュース", "共通", "4", {"a": "y"}, ["c", "b"], "もも", "ん", "ぶどう園"]
+
+        assert compare_lists(list1, list2) == pytest.approx(_reference_greedy(list1, list2), abs=1e-6)
+
+    def test_greedy_tie_break(self):
+        """同値の場合は行優先で先に現れるペアが選ばれること"""
+        matrix = np.array([[0.5, 0.5], [0.5, 0.9]])
+        assert match_similarity_matrix(matrix) == [(1, 1), (0, 0)]
+        assert match_similarity_matrix(np.zeros((2, 3))) == [(0, 0), (1, 1)]
+
+    def test_hungarian_is_optimal(self):
+        """最適割当は類似度の総和が貪欲法以上になること"""
+        matrix = np.array([[0.9, 0.8], [0.8, 0.1]])
+        greedy = match_similarity_matrix(matrix, "greedy")
+        hungarian = match_similarity_matrix(matrix, "hungarian")
+
+        assert sum(matrix[i, j] for i, j in greedy) == pytest.approx(1.0)
+        assert sum(matrix[i, j] for i, j in hungarian) == pytest.approx(1.6)
+
+    def test_hungarian_keeps_normalization(self):
+        """最適割当でも正規化規則は変わらないこと"""
+        set_list_matching("hungarian")
+        # 1と1が完全一致、2と3は数値不一致で0.1、4は未マッチ
+        assert compare_lists([1, 2, 4], [1, 3]) == pytest.approx((1.0 + 0.1) / 2)
+
+    def test_matrix_embeds_each_element_once(self, fake_model):
+        """要素ごとに1回だけ、まとめて埋め込むこと"""
+        matrix = list_similarity_matrix(["a", "b", "c"], ["d", "e"])
+
+        assert matrix.shape == (3, 2)
+        assert len(fake_model.encoded_batches) == 1
+        assert sorted(fake_model.encoded_batches[0]) == ["a", "b", "c", "d", "e"]
+        assert fake_model.pair_calls == 0
+
+    def test_invalid_method(self):
+        """未対応の方式はValueError"""
+        with pytest.raises(ValueError):
+            set_list_matching("random")
+
+
+class TestRemoveExactMatches:
+    """完全一致の事前除外のテストクラス"""
+
+    CASES = [
+        ([1, 2, 2, 3], [2, 3, 3, 2, 2]),
+        ([1, True, 1.0, 0], [1.0, 1, False, True]),
+        (["1", 1, None], [1, "1", None, None]),
+        ([{"a": 1, "b": [1, 2]}, {"b": [2, 1], "a": 1}], [{"b": [1, 2], "a": 1.0}]),
+        ([["x", {"y": None}], ["x"]], [["x"], ["x", {"y": None}], ["x"]]),
+        (["a", "b", "a"], ["b", "c", "a", "a", "a"]),
+    ]
+
+    @pytest.mark.parametrize("list1,list2", CASES)
+    def test_same_as_nested_loop(self, list1, list2):
+        """逐次比較版と残り要素（順序・重複数を含む）が一致すること"""
+        expected = similarity._remove_exact_matches_slow(list1, list2)
+        actual = similarity._remove_exact_matches(list1, list2)
+
+        assert actual == expected
+        assert [type(v) for v in actual[0]] == [type(v) for v in expected[0]]
+        assert [type(v) for v in actual[1]] == [type(v) for v in expected[1]]
+
+    def test_inputs_not_modified(self):
+        """入力リストを変更しないこと"""
+        list1, list2 = [1, 2], [2, 3]
+        similarity._remove_exact_matches(list1, list2)
+        assert list1 == [1, 2] and list2 == [2, 3]
+
+    def test_nan_falls_back(self):
+        """NaNを含む場合も逐次比較と同じ結果になること"""
+        nan = float("nan")
+        list1, list2 = [nan, 1, [nan]], [1, nan, [nan]]
+
+        actual = similarity._remove_exact_matches(list1, list2)
+        expected = similarity._remove_exact_matches_slow(list1, list2)
+        assert len(actual[0]) == len(expected[0])
+        assert len(actual[1]) == len(expected[1])
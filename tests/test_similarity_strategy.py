@@ -1,7 +1,7 @@
 """類似度計算戦略パターンのテスト"""
 
 import pytest
-from unittest.mock import AsyncMock, MagicMock, patch
+from unittest.mock import ANY, AsyncMock, MagicMock, patch
 from pathlib import Path
 
 # これから実装するモジュールをインポート
@@ -314,4 +314,162 @@ class TestSimilarityCalculator:
                 '{"data": "test"}', '{"data": "example"}', method="embedding"
             )
 
-            assert result.score == 0.8
\ No newline at end of file
+            assert result.score == 0.8
+
+
+class TestPackedBatch:
+    """SimilarityCalculatorのまとめて評価する一括計算のテストクラス"""
+
+    @pytest.mark.asyncio
+    async def test_llm_pairs_are_packed_and_failures_fall_back(self):
+        """LLMで計算するペアだけをまとめて評価し、失敗したペアは埋め込みにフォールバックすること"""
+        embedding_strategy = AsyncMock()
+        embedding_strategy.calculate_similarity.side_effect = lambda json1, json2: StrategyResult(
+            score=0.3, method="embedding", processing_time=0.1
+        )
+        llm_strategy = AsyncMock()
+        llm_strategy.calculate_packed_batch.return_value = [
+            StrategyResult(score=0.9, method="llm", processing_time=0.2, metadata={"pack_size": 2}),
+            StrategyError("解析に失敗")
+        ]
+        calculator = SimilarityCalculator(embedding_strategy=embedding_strategy, llm_strategy=llm_strategy)
+        pairs = [
+            ('{"text": "a"}', '{"text": "b"}'),
+            ('{"id": 1}', '{"id": 2}'),
+            ('{"text": "c"}', '{"text": "d"}')
+        ]
+
+        results = await calculator.calculate_batch_similarity(pairs, method="auto", pack_size=4)
+
+        llm_strategy.calculate_packed_batch.assert_awaited_once_with([pairs[0], pairs[2]], 4, sequential=True, on_result=ANY)
+        assert [r.method for r in results] == ["llm", "embedding", "embedding_fallback"]
+        stats = calculator.get_statistics()
+        assert stats["total_calculations"] == 3
+        assert stats["llm_used"] == 1
+        assert stats["fallback_used"] == 1
+
+    @pytest.mark.asyncio
+    async def test_failure_without_fallback_is_error_result(self):
+        llm_strategy = AsyncMock()
+        llm_strategy.calculate_packed_batch.return_value = [StrategyError("解析に失敗")]
+        calculator = SimilarityCalculator(embedding_strategy=AsyncMock(), llm_strategy=llm_strategy)
+
+        results = await calculator.calculate_batch_similarity(
+            [("{}", "{}")], method="llm", fallback_enabled=False, pack_size=2
+        )
+
+        assert results[0].method == "error"
+        assert calculator.get_statistics()["failed_calculations"] == 1
+
+
+class TestCascade:
+    """カスケード方式（埋め込みで確定できないペアだけLLMで計算）のテストクラス"""
+
+    PAIRS = [('{"v": 1}', '{"v": 1}'), ('{"v": 2}', '{"v": 3}'), ('{"v": 4}', '{"v": 5}'), ('{"v": 6}', '{"v": 7}')]
+
+    @pytest.fixture
+    def embedding_strategy(self):
+        strategy = AsyncMock()
+        strategy.calculate_batch_similarity.side_effect = lambda pairs: [
+            StrategyResult(score=score, method="embedding", processing_time=0.01, metadata={"field_match_ratio": 1.0})
+            for score in [0.98, 0.6, 0.05, 0.5][:len(pairs)]
+        ]
+        return strategy
+
+    @pytest.mark.asyncio
+    async def test_only_uncertain_pairs_go_to_llm(self, embedding_strategy):
+        """帯の範囲内のペアだけLLMで計算し、どちらで確定したかを記録すること"""
+        llm_strategy = AsyncMock()
+        llm_strategy.calculate_similarity.side_effect = [
+            StrategyResult(score=0.7, method="llm", processing_time=0.5, metadata={"category": "類似"}),
+            StrategyError("LLM API error")
+        ]
+        calculator = SimilarityCalculator(embedding_strategy=embedding_strategy, llm_strategy=llm_strategy)
+
+        results = await calculator.calculate_batch_similarity(self.PAIRS, method="cascade")
+
+        embedding_strategy.calculate_batch_similarity.assert_awaited_once_with(self.PAIRS)
+        assert [call.args for call in llm_strategy.calculate_similarity.await_args_list] == [self.PAIRS[1], self.PAIRS[3]]
+        assert [r.score for r in results] == [0.98, 0.7, 0.05, 0.5]
+        assert [r.method for r in results] == ["embedding", "llm", "embedding", "embedding_fallback"]
+        assert [r.metadata["cascade_tier"] for r in results] == ["embedding", "llm", "embedding", "embedding_fallback"]
+        assert results[1].metadata["embedding_score"] == 0.6
+        stats = calculator.get_statistics()
+        assert stats["total_calculations"] == 4
+        assert stats["llm_used"] == 1
+        assert stats["embedding_used"] == 3
+        assert stats["fallback_used"] == 1
+
+    @pytest.mark.asyncio
+    async def test_custom_band_and_packing(self, embedding_strategy):
+        llm_strategy = AsyncMock()
+        llm_strategy.calculate_packed_batch.return_value = [
+            StrategyResult(score=0.2, method="llm", metadata={"pack_size": 2}),
+            StrategyResult(score=0.9, method="llm", metadata={"pack_size": 2})
+        ]
+        calculator = SimilarityCalculator(
+            embedding_strategy=embedding_strategy, llm_strategy=llm_strategy, cascade_band=(0.0, 0.55)
+        )
+
+        results = await calculator.calculate_batch_similarity(
+            self.PAIRS, method="cascade", sequential=False, pack_size=4
+        )
+
+        llm_strategy.calculate_packed_batch.assert_awaited_once_with(
+            [self.PAIRS[2], self.PAIRS[3]], 4, sequential=False, on_result=ANY
+        )
+        assert [r.score for r in results] == [0.98, 0.6, 0.2, 0.9]
+        assert [r.metadata["cascade_tier"] for r in results] == ["embedding", "embedding", "llm", "llm"]
+
+    @pytest.mark.asyncio
+    async def test_single_pair_without_fallback_raises(self, embedding_strategy):
+        llm_strategy = AsyncMock()
+        llm_strategy.calculate_similarity.side_effect = StrategyError("LLM API error")
+        calculator = SimilarityCalculator(
+            embedding_strategy=embedding_strategy, llm_strategy=llm_strategy, cascade_band=(0.9, 1.0)
+        )
+
+        with pytest.raises(StrategyError, match="LLM API error"):
+            await calculator.calculate_similarity('{"v": 2}', '{"v": 3}', method="cascade", fallback_enabled=False)
+
+    @pytest.mark.asyncio
+    async def test_on_result_reports_embedding_tier_before_llm(self, embedding_strategy):
+        """埋め込みで確定したペアはLLMの完了を待たずにon_resultに渡されること"""
+        llm_strategy = AsyncMock()
+        llm_strategy.calculate_similarity.side_effect = lambda json1, json2: StrategyResult(
+            score=0.7, method="llm", processing_time=0.5
+        )
+        calculator = SimilarityCalculator(embedding_strategy=embedding_strategy, llm_strategy=llm_strategy)
+        reported = []
+
+        results = await calculator.calculate_batch_similarity(
+            self.PAIRS, method="cascade", sequential=False, on_result=lambda i, r: reported.append((i, r))
+        )
+
+        assert [i for i, _ in reported[:2]] == [0, 2]
+        assert sorted(i for i, _ in reported) == [0, 1, 2, 3]
+        assert all(results[i] is result for i, result in reported)
+
+    def test_invalid_band(self):
+        with pytest.raises(ValueError):
+            SimilarityCalculator(embedding_strategy=AsyncMock(), llm_strategy=AsyncMock(), cascade_band=(0.9, 0.4))
+
+    @pytest.mark.asyncio
+    async def test_embedding_batch(self, monkeypatch):
+        """埋め込み戦略のバッチ計算が1回の一括計算で全ペアを採点すること"""
+        from src import similarity
+
+        calls = []
+
+        def fake_batch(pairs):
+            calls.append(pairs)
+            return [(0.5, {"pair": i}) for i, _ in enumerate(pairs)]
+
+        monkeypatch.setattr(similarity, "calculate_json_similarity_batch", fake_batch)
+        strategy = EmbeddingSimilarityStrategy()
+
+        results = await strategy.calculate_batch_similarity(self.PAIRS)
+
+        assert calls == [self.PAIRS]
+        assert [r.metadata["pair"] for r in results] == [0, 1, 2, 3]
+        assert all(r.method == "embedding" for r in results)
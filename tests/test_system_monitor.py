@@ -0,0 +1,107 @@
+"""
+system_monitorモジュールのテスト
+"""
+
+import asyncio
+import dataclasses
+import sys
+import time
+from pathlib import Path
+
+import pytest
+
+# プロジェクトルートをパスに追加
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src import system_monitor
+from src.error_handler import ErrorHandler
+from src.logger import SystemLogger
+from src.system_monitor import SystemMetricsSampler
+
+
+@pytest.fixture
+def sampler(monkeypatch):
+    sampler = SystemMetricsSampler(interval=0.05)
+    monkeypatch.setattr(system_monitor, "_sampler", sampler)
+    return sampler
+
+
+def fail_cpu_percent(*args, **kwargs):
+    raise AssertionError("cpu_percent should not be called")
+
+
+class TestSampler:
+    """SystemMetricsSamplerのテストクラス"""
+
+    def test_sample(self, sampler):
+        snapshot = sampler.sample()
+
+        assert snapshot.cpu_count >= 1
+        assert 0 <= snapshot.memory_percent <= 100
+        assert snapshot.process_memory > 0
+        assert sampler.snapshot is snapshot
+        metrics = snapshot.to_metrics()
+        assert set(metrics) == {"timestamp", "cpu", "memory", "disk", "process"}
+
+    def test_background_refresh(self, sampler):
+        """バックグラウンドで取得している間は読み取りで計測しないこと"""
+        async def scenario():
+            await sampler.start()
+            first = sampler.snapshot
+            await asyncio.sleep(0.2)
+            latest = sampler.snapshot
+            background = sampler.get_statistics()["background"]
+            await sampler.stop()
+            return first, latest, background
+
+        first, latest, background = asyncio.run(scenario())
+
+        assert latest.sampled_at > first.sampled_at
+        assert sampler.samples >= 3
+        assert background is True
+        assert not sampler.running
+
+    def test_stale_snapshot_is_refreshed_without_background(self, sampler):
+        """バックグラウンドで取得していない場合は古いスナップショットを取り直すこと"""
+        first = sampler.sample()
+        time.sleep(0.1)
+
+        assert sampler.snapshot is not first
+
+    def test_invalid_interval(self):
+        with pytest.raises(ValueError):
+            SystemMetricsSampler(interval=0)
+
+
+class TestSnapshotConsumers:
+    """スナップショットを読む処理のテストクラス"""
+
+    def test_check_system_resources_uses_snapshot(self, sampler, monkeypatch):
+        sampler.sample()
+        sampler._snapshot = dataclasses.replace(sampler.snapshot, memory_available=100 * 1024 * 1024)
+        sampler._task = object()  # バックグラウンドで取得中とみなす
+        monkeypatch.setattr(system_monitor.psutil, "cpu_percent", fail_cpu_percent)
+
+        ok, message = ErrorHandler.check_system_resources()
+
+        assert ok is False
+        assert message == "メモリ不足: 利用可能 100MB"
+
+    def test_high_cpu_is_warning(self, sampler):
+        sampler._snapshot = dataclasses.replace(sampler.sample(), cpu_percent=95.0)
+        sampler._task = object()
+
+        assert ErrorHandler.check_system_resources() == (True, "CPU高負荷: 95%")
+
+    def test_log_metrics_does_not_block(self, sampler, tmp_path, monkeypatch):
+        """log_metricsがCPU使用率の計測で待たないこと"""
+        sampler.sample()
+        sampler._task = object()
+        monkeypatch.setattr(system_monitor.psutil, "cpu_percent", fail_cpu_percent)
+        system_logger = SystemLogger(log_dir=str(tmp_path))
+
+        start = time.perf_counter()
+        system_logger.log_metrics()
+
+        assert time.perf_counter() - start < 0.1
+        assert 'cpu' in (tmp_path / "metrics.log").read_text(encoding="utf-8")